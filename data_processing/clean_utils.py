@@ -3,14 +3,52 @@ EMC知识图谱数据清理工具
 为实体消歧提供高质量的输入数据
 """
 
+import os
 import re
 import string
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Tuple, Optional, Set
 import unicodedata
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 标准类型 -> 规范化后的编号前缀
+STANDARD_PREFIXES = {'iec': 'IEC', 'cispr': 'CISPR', 'fcc': 'FCC', 'en': 'EN', 'iso': 'ISO'}
+
+
+class _ControlCharTable(dict):
+    """
+    str.translate 使用的控制字符表
+    
+    首次遇到某个码位时查询 unicodedata 并缓存：控制字符（换行和制表符除外）映射为 None 即删除，
+    其余字符映射为自身。之后同一字符的处理全部在 C 层完成。
+    """
+    
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        char = chr(codepoint)
+        value = None if unicodedata.category(char)[0] == 'C' and char not in '\n\t' else codepoint
+        self[codepoint] = value
+        return value
+
+
+_CONTROL_CHAR_TABLE = _ControlCharTable()
+
+# 进程池工作进程中复用的清理器，由 _init_cleaner_worker 设置
+_worker_cleaner: Optional["EMCDataCleaner"] = None
+
+
+def _init_cleaner_worker(cleaner: "EMCDataCleaner"):
+    """进程池初始化：每个工作进程只反序列化一次已编译的清理器"""
+    global _worker_cleaner
+    _worker_cleaner = cleaner
+
+
+def _clean_pairs_in_worker(pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """在工作进程中清理一个分块的 (实体, 上下文) 对"""
+    return _worker_cleaner._clean_pairs(pairs)
+
+
 class EMCDataCleaner:
     """
     EMC领域专用的数据清理器
@@ -56,6 +94,106 @@ class EMCDataCleaner:
         # 需要移除的噪声字符
         self.noise_chars = set('•○●◦‣⁃')
         
+        self.compile_rules()
+    
+    def compile_rules(self):
+        """
+        将清理规则预编译为单遍扫描的正则表达式
+        
+        所有术语合并为一个按长度降序排列的交替式正则，替换时用字典查表；
+        所有标准编号格式合并为一个正则，用回调一次完成替换。
+        修改 term_normalizations / standard_patterns / noise_chars 后需要重新调用。
+        """
+        # 实体术语：区分大小写的子串替换，按字典顺序逐条生效
+        entity_terms = self._ordered_single_pass_terms(self.term_normalizations)
+        self._entity_term_map = {term: self.term_normalizations[term] for term in entity_terms or []}
+        self._entity_term_pattern = (
+            re.compile('|'.join(re.escape(term) for term in entity_terms)) if entity_terms else None
+        )
+        # 无法证明单遍扫描与逐条替换等价时，退回逐条替换
+        self._entity_term_sequence = (
+            list(self.term_normalizations.items()) if entity_terms is None else []
+        )
+        
+        # 上下文术语：忽略大小写、按词边界匹配；同一术语的多个大小写写法以最后一个为准
+        self._context_term_map = {term.lower(): normalized for term, normalized in self.term_normalizations.items()}
+        if self._context_terms_independent(self._context_term_map):
+            terms = sorted(self._context_term_map, key=len, reverse=True)
+            self._context_term_pattern = re.compile(
+                r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\b', re.IGNORECASE
+            ) if terms else None
+            self._context_term_sequence = []
+        else:
+            self._context_term_pattern = None
+            self._context_term_sequence = [
+                (re.compile(r'\b' + re.escape(term) + r'\b', re.IGNORECASE), normalized)
+                for term, normalized in self.term_normalizations.items()
+            ]
+        
+        # 标准编号：每种格式一个命名组，其内部捕获组紧随其后
+        alternatives = [
+            f"(?P<{standard_type}>{pattern.pattern})"
+            for standard_type, pattern in self.standard_patterns.items()
+        ]
+        self._standard_pattern = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+        
+        self._noise_table = str.maketrans('', '', ''.join(self.noise_chars))
+        self._punctuation_pattern = re.compile(r'[^\w\s\-/().,:]')
+        self._whitespace_pattern = re.compile(r'\s+')
+    
+    @staticmethod
+    def _ordered_single_pass_terms(term_map: Dict[str, str]) -> Optional[List[str]]:
+        """
+        计算与逐条 str.replace 等价的单遍扫描术语列表（按优先级排列）
+        
+        逐条替换时先出现的术语优先：包含更高优先级术语的术语永远不会被匹配到，直接剔除；
+        剩余术语之间若存在"低优先级术语的后缀等于高优先级术语的前缀"，或替换结果能与
+        后续术语拼出新的匹配，单遍扫描的结果就可能不同，此时返回 None。
+        """
+        def overlaps(left: str, right: str) -> bool:
+            """left 的真后缀是否等于 right 的真前缀"""
+            return any(left.endswith(right[:k]) for k in range(1, min(len(left), len(right))))
+        
+        live: List[Tuple[str, str]] = []
+        for term, normalized in term_map.items():
+            if term == normalized or not term:
+                continue
+            if any(higher in term for higher, _ in live):
+                continue
+            live.append((term, normalized))
+        
+        for i, (higher, normalized) in enumerate(live):
+            if overlaps(higher, higher):
+                return None
+            for lower, _ in live[i + 1:]:
+                if overlaps(lower, higher):
+                    return None
+                if (lower in normalized or normalized in lower
+                        or overlaps(lower, normalized) or overlaps(normalized, lower)):
+                    return None
+        return [term for term, _ in live]
+    
+    @staticmethod
+    def _context_terms_independent(term_map: Dict[str, str]) -> bool:
+        """
+        判断按词边界匹配的上下文术语能否合并为一个交替式
+        
+        要求替换只改变大小写，且任意两个术语在词级别上互不包含、首尾不重叠。
+        """
+        words = {term: term.split() for term in term_map}
+        for term, normalized in term_map.items():
+            if normalized.lower() != term:
+                return False
+            for other in term_map:
+                if other == term:
+                    continue
+                a, b = words[term], words[other]
+                if any(a[i:i + len(b)] == b for i in range(len(a) - len(b) + 1)):
+                    return False
+                if any(a[-k:] == b[:k] for k in range(1, min(len(a), len(b)))):
+                    return False
+        return True
+    
     def clean_entity_text(self, text: str) -> str:
         """
         清理单个实体文本
@@ -107,47 +245,56 @@ class EMCDataCleaner:
         cleaned = self._normalize_unicode(context)
         cleaned = self._remove_noise_characters(cleaned)
         
-        # 轻度术语标准化（保持上下文的自然性）
-        for term, normalized in self.term_normalizations.items():
-            # 使用词边界匹配，避免过度替换
-            pattern = r'\b' + re.escape(term) + r'\b'
-            cleaned = re.sub(pattern, normalized, cleaned, flags=re.IGNORECASE)
+        # 轻度术语标准化（保持上下文的自然性），使用词边界匹配，避免过度替换
+        if self._context_term_pattern:
+            term_map = self._context_term_map
+            cleaned = self._context_term_pattern.sub(
+                lambda m: term_map.get(m.group(0).lower(), m.group(0)), cleaned
+            )
+        for pattern, normalized in self._context_term_sequence:
+            cleaned = pattern.sub(normalized, cleaned)
         
         # 清理多余空白
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = self._whitespace_pattern.sub(' ', cleaned)
         
         return cleaned.strip()
     
     def batch_clean_entities(self, 
                            entities: List[str], 
-                           contexts: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+                           contexts: Optional[List[str]] = None,
+                           n_process: int = 1,
+                           chunk_size: int = 2000,
+                           min_parallel_size: int = 20000) -> Tuple[List[str], List[str]]:
         """
         批量清理实体和上下文
         
-        这个方法优化了批处理性能，适合处理大量数据。
+        这个方法优化了批处理性能，适合处理大量数据。n_process 不为 1 且数据量达到
+        min_parallel_size 时，按 chunk_size 分块交给进程池处理，结果保持输入顺序。
         
         Args:
             entities: 实体文本列表
             contexts: 上下文文本列表（可选）
+            n_process: 进程数，-1 表示使用全部CPU核心
+            chunk_size: 每个进程池任务包含的实体数
+            min_parallel_size: 启用进程池的最小数据量，更小的批次在当前进程内处理
             
         Returns:
             (清理后的实体列表, 清理后的上下文列表)
         """
         logger.info(f"开始批量清理 {len(entities)} 个实体")
         
-        # 清理实体
-        cleaned_entities = [self.clean_entity_text(entity) for entity in entities]
+        pairs = list(zip(entities, contexts if contexts else [""] * len(entities)))
         
-        # 清理上下文
-        if contexts:
-            cleaned_contexts = [self.clean_context_text(ctx) for ctx in contexts]
+        # 清理实体和上下文
+        if n_process != 1 and len(pairs) >= min_parallel_size:
+            cleaned_pairs = self._clean_pairs_parallel(pairs, n_process, chunk_size)
         else:
-            cleaned_contexts = [""] * len(entities)
+            cleaned_pairs = self._clean_pairs(pairs)
         
         # 过滤空实体
         valid_pairs = [
             (entity, context) 
-            for entity, context in zip(cleaned_entities, cleaned_contexts)
+            for entity, context in cleaned_pairs
             if entity.strip()
         ]
         
@@ -159,74 +306,74 @@ class EMCDataCleaner:
         logger.info(f"批量清理完成，有效实体: {len(final_entities)}")
         return list(final_entities), list(final_contexts)
     
+    def _clean_pairs(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """在当前进程内清理 (实体, 上下文) 对"""
+        return [
+            (self.clean_entity_text(entity), self.clean_context_text(context))
+            for entity, context in pairs
+        ]
+    
+    def _clean_pairs_parallel(self, 
+                              pairs: List[Tuple[str, str]], 
+                              n_process: int, 
+                              chunk_size: int) -> List[Tuple[str, str]]:
+        """分块交给进程池清理，每个工作进程复用同一个已编译的清理器"""
+        max_workers = os.cpu_count() if n_process < 0 else n_process
+        chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_cleaner_worker,
+                                     initargs=(self,)) as executor:
+                return [pair for chunk in executor.map(_clean_pairs_in_worker, chunks) for pair in chunk]
+        except Exception as e:
+            logger.warning(f"进程池清理失败，改为在当前进程内处理: {e}")
+            return self._clean_pairs(pairs)
+    
     def _normalize_unicode(self, text: str) -> str:
         """Unicode标准化和编码修复"""
         # NFKD标准化 - 将复合字符分解
         normalized = unicodedata.normalize('NFKD', text)
         
         # 移除控制字符但保留换行和制表符
-        cleaned = ''.join(
-            char for char in normalized 
-            if unicodedata.category(char)[0] != 'C' or char in '\n\t'
-        )
-        
-        return cleaned
+        return normalized.translate(_CONTROL_CHAR_TABLE)
     
     def _remove_noise_characters(self, text: str) -> str:
         """移除噪声字符"""
         # 移除预定义的噪声字符
-        for char in self.noise_chars:
-            text = text.replace(char, '')
+        text = text.translate(self._noise_table)
         
         # 移除多余的标点符号
-        text = re.sub(r'[^\w\s\-/().,:]', ' ', text)
+        text = self._punctuation_pattern.sub(' ', text)
         
         return text
     
     def _normalize_emc_terms(self, text: str) -> str:
         """标准化EMC术语"""
-        result = text
-        for term, normalized in self.term_normalizations.items():
-            # 精确匹配，区分大小写
-            if term in result:
-                result = result.replace(term, normalized)
-        
-        return result
+        # 精确匹配，区分大小写
+        for term, normalized in self._entity_term_sequence:
+            if term in text:
+                text = text.replace(term, normalized)
+        if not self._entity_term_pattern:
+            return text
+        return self._entity_term_pattern.sub(lambda m: self._entity_term_map[m.group(0)], text)
     
     def _normalize_standards(self, text: str) -> str:
         """标准化技术标准编号"""
-        result = text
-        
-        for standard_type, pattern in self.standard_patterns.items():
-            matches = pattern.findall(result)
-            for match in matches:
-                # 重新构造标准化的标准编号
-                if standard_type == 'iec':
-                    normalized = f"IEC {match}"
-                elif standard_type == 'cispr':
-                    normalized = f"CISPR {match}"
-                elif standard_type == 'fcc':
-                    normalized = f"FCC {match}"
-                elif standard_type == 'en':
-                    normalized = f"EN {match}"
-                elif standard_type == 'iso':
-                    normalized = f"ISO {match}"
-                else:
-                    normalized = str(match)
-                
-                # 替换原始匹配
-                original_match = pattern.search(result)
-                if original_match:
-                    # 替换第一个匹配项
-                    result = result[:original_match.start()] + normalized + result[original_match.end():]
-
-        
-        return result
+        if not self._standard_pattern:
+            return text
+        return self._standard_pattern.sub(self._replace_standard, text)
+    
+    def _replace_standard(self, match: "re.Match") -> str:
+        """重新构造标准化的标准编号，如 'iec61000-4-2' -> 'IEC 61000-4-2'"""
+        standard_type = match.lastgroup
+        number = match.group(self._standard_pattern.groupindex[standard_type] + 1)
+        prefix = STANDARD_PREFIXES.get(standard_type)
+        return f"{prefix} {number}" if prefix else number
     
     def _final_formatting(self, text: str) -> str:
         """最终格式化处理"""
         # 标准化空白字符
-        text = re.sub(r'\s+', ' ', text)
+        text = self._whitespace_pattern.sub(' ', text)
         
         # 移除首尾空白
         text = text.strip()
@@ -246,15 +393,17 @@ class EMCDataCleaner:
 
 # 便利函数，保持接口兼容性
 def clean_entities_for_disambiguation(entities: List[str], 
-                                    contexts: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+                                    contexts: Optional[List[str]] = None,
+                                    n_process: int = 1,
+                                    chunk_size: int = 2000) -> Tuple[List[str], List[str]]:
     """
     为实体消歧准备清理后的数据
     
     这个函数提供了一个简单的接口，用于将原始提取的实体
-    转换为适合消歧处理的标准化格式。
+    转换为适合消歧处理的标准化格式。n_process 不为 1 时大批量数据使用进程池并行清理。
     """
     cleaner = EMCDataCleaner()
-    return cleaner.batch_clean_entities(entities, contexts)
+    return cleaner.batch_clean_entities(entities, contexts, n_process=n_process, chunk_size=chunk_size)
 
 # 使用示例
 def example_usage():
@@ -44,6 +44,22 @@ class Settings(BaseSettings):
     deepseek_temperature: float = Field(default=0.7, description="温度参数")
     deepseek_timeout: int = Field(default=30, description="请求超时时间")
     deepseek_max_retries: int = Field(default=3, description="最大重试次数")
+    deepseek_max_concurrency: int = Field(default=8, description="同时发出的请求数上限")
+    deepseek_initial_concurrency: int = Field(default=4, description="自适应并发窗口的初始值")
+    deepseek_retry_base_delay: float = Field(default=0.5, description="指数退避的基础等待时间(秒)")
+    deepseek_retry_max_delay: float = Field(default=30.0, description="单次退避的最长等待时间(秒)")
+    deepseek_session_backend: str = Field(default="memory", description="会话历史存储: memory 或 redis")
+    deepseek_max_sessions: int = Field(default=1000, description="进程内最多保留的会话数")
+    deepseek_session_ttl: int = Field(default=3600, description="会话空闲过期时间(秒)")
+    deepseek_history_max_tokens: int = Field(default=3000, description="会话历史的token预算")
+    deepseek_summarize_history: bool = Field(default=False, description="是否把超出预算的早期对话折叠为摘要")
+    deepseek_extraction_chunk_tokens: int = Field(default=3000, description="分块实体提取时每块文本的token预算")
+    deepseek_extraction_chunk_overlap_tokens: int = Field(default=200, description="相邻分块的重叠token数")
+    deepseek_extraction_concurrency: int = Field(default=4, description="分块实体提取的最大并发请求数")
+    deepseek_response_cache_enabled: bool = Field(default=True, description="是否缓存低温度请求的响应")
+    deepseek_response_cache_path: str = Field(default="./uploads/deepseek_response_cache.sqlite3", description="响应缓存数据库路径")
+    deepseek_response_cache_max_mb: int = Field(default=64, description="响应缓存大小上限(MB)")
+    deepseek_response_cache_max_temperature: float = Field(default=0.3, description="可缓存请求的最高temperature")
     
     # Neo4j配置
     neo4j_uri: str = Field(default="bolt://localhost:7687", description="Neo4j URI")
@@ -52,6 +68,7 @@ class Settings(BaseSettings):
     neo4j_database: str = Field(default="neo4j", description="数据库名称")
     neo4j_max_pool_size: int = Field(default=20, description="连接池大小")
     neo4j_connection_timeout: int = Field(default=30, description="连接超时")
+    neo4j_fetch_size: int = Field(default=1000, description="每次从服务器拉取的记录数")
     
     # PostgreSQL配置
     postgres_host: str = Field(default="localhost", description="PostgreSQL主机")
@@ -69,6 +86,7 @@ class Settings(BaseSettings):
     redis_password: Optional[str] = Field(default=None, description="Redis密码")
     redis_max_connections: int = Field(default=20, description="最大连接数")
     redis_timeout: int = Field(default=5, description="连接超时")
+    auth_state_backend: str = Field(default="redis", description="会话与token黑名单存储: redis 或 memory(单节点/测试)")
     
     # 文件处理配置
     upload_directory: str = Field(default="./uploads", description="上传目录")
@@ -79,6 +97,9 @@ class Settings(BaseSettings):
     )
     file_processing_timeout: int = Field(default=300, description="文件处理超时")
     max_concurrent_processing: int = Field(default=3, description="最大并发处理数")
+    ingestion_queue_max_size: int = Field(default=100, description="文件处理队列最大等待任务数")
+    parse_process_workers: int = Field(default=2, description="文件解析进程池大小，0表示不使用进程池")
+    extraction_cache_max_bytes: int = Field(default=512 * 1024 * 1024, description="提取结果缓存上限(字节)，0表示禁用")
     
     # 速率限制配置
     rate_limit_requests_per_minute: int = Field(default=60, description="每分钟请求限制")
@@ -207,6 +228,7 @@ class TestingSettings(Settings):
     # 测试数据库
     postgres_db: str = "emc_knowledge_test"
     redis_db: int = 1
+    auth_state_backend: str = "memory"
     
     # 测试环境快速处理
     file_processing_timeout: int = 60
@@ -290,6 +312,15 @@ EMC_DEEPSEEK_BASE_URL=https://api.deepseek.com/v1
 EMC_DEEPSEEK_MODEL=deepseek-chat
 EMC_DEEPSEEK_MAX_TOKENS=4000
 EMC_DEEPSEEK_TEMPERATURE=0.7
+EMC_DEEPSEEK_MAX_RETRIES=3
+EMC_DEEPSEEK_MAX_CONCURRENCY=8
+EMC_DEEPSEEK_SESSION_BACKEND=memory
+EMC_DEEPSEEK_SESSION_TTL=3600
+EMC_DEEPSEEK_HISTORY_MAX_TOKENS=3000
+EMC_DEEPSEEK_EXTRACTION_CHUNK_TOKENS=3000
+EMC_DEEPSEEK_EXTRACTION_CONCURRENCY=4
+EMC_DEEPSEEK_RESPONSE_CACHE_ENABLED=true
+EMC_DEEPSEEK_RESPONSE_CACHE_MAX_MB=64
 
 # Neo4j配置
 EMC_NEO4J_URI=bolt://localhost:7687
@@ -314,6 +345,10 @@ EMC_REDIS_PASSWORD=
 EMC_UPLOAD_DIRECTORY=./uploads
 EMC_MAX_FILE_SIZE=104857600
 EMC_FILE_PROCESSING_TIMEOUT=300
+EMC_EXTRACTION_CACHE_MAX_BYTES=536870912
+EMC_MAX_CONCURRENT_PROCESSING=3
+EMC_INGESTION_QUEUE_MAX_SIZE=100
+EMC_PARSE_PROCESS_WORKERS=2
 
 # 速率限制配置
 EMC_RATE_LIMIT_REQUESTS_PER_MINUTE=60
@@ -0,0 +1,9 @@
+"""
+文件处理任务队列模块
+
+有界的异步工作池和持久化的任务状态存储，供文件上传路由使用
+"""
+
+from .job_queue import IngestionJob, IngestionQueue, JobStore, QueueFullError
+
+__all__ = ["IngestionJob", "IngestionQueue", "JobStore", "QueueFullError"]
@@ -0,0 +1,314 @@
+"""
+文件处理任务队列
+有界的异步工作池 + 解析用进程池，任务状态持久化在本地SQLite中
+"""
+
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionJob:
+    """文件处理任务"""
+    task_id: str
+    status: str  # pending, processing, completed, failed
+    progress: float
+    message: str
+    started_at: datetime
+    priority: int = 0
+    payload: Dict[str, Any] = field(default_factory=dict)
+    completed_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+
+
+class QueueFullError(Exception):
+    """等待中的任务数已达上限"""
+
+
+# 任务处理函数：接收任务和进度回调 report_progress(progress, message)，返回任务结果
+JobHandler = Callable[[IngestionJob, Callable[[float, str], None]], Awaitable[Dict[str, Any]]]
+
+
+class JobStore:
+    """基于SQLite的任务状态存储，服务重启后任务状态不丢失"""
+
+    _COLUMNS = ("task_id", "status", "progress", "message", "started_at",
+                "priority", "payload", "completed_at", "result")
+
+    def __init__(self, db_path: str = "./uploads/ingestion_jobs.sqlite3"):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL,
+                    message TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    payload TEXT NOT NULL,
+                    completed_at TEXT,
+                    result TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status)")
+
+    def create(self, job: IngestionJob):
+        """保存新任务"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO ingestion_jobs ({', '.join(self._COLUMNS)}) VALUES ({', '.join('?' * len(self._COLUMNS))})",
+                self._to_row(job)
+            )
+
+    def update(self, task_id: str, **fields):
+        """更新任务的部分字段"""
+        job = self.get(task_id)
+        if not job:
+            return
+        for name, value in fields.items():
+            setattr(job, name, value)
+        row = dict(zip(self._COLUMNS, self._to_row(job)))
+        del row["task_id"]
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE ingestion_jobs SET {', '.join(f'{name} = ?' for name in row)} WHERE task_id = ?",
+                (*row.values(), task_id)
+            )
+
+    def get(self, task_id: str) -> Optional[IngestionJob]:
+        """按ID获取任务"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM ingestion_jobs WHERE task_id = ?", (task_id,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def list_jobs(self, statuses: Optional[List[str]] = None) -> List[IngestionJob]:
+        """列出任务，按优先级从高到低、创建时间从早到晚排列"""
+        query = f"SELECT {', '.join(self._COLUMNS)} FROM ingestion_jobs"
+        params: tuple = ()
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            params = tuple(statuses)
+        query += " ORDER BY priority DESC, started_at ASC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """按状态统计任务数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM ingestion_jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def delete(self, task_ids: List[str]):
+        """删除任务记录"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM ingestion_jobs WHERE task_id = ?", [(tid,) for tid in task_ids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_row(job: IngestionJob) -> tuple:
+        return (
+            job.task_id, job.status, job.progress, job.message, job.started_at.isoformat(),
+            job.priority, json.dumps(job.payload, ensure_ascii=False),
+            job.completed_at.isoformat() if job.completed_at else None,
+            json.dumps(job.result, ensure_ascii=False, default=str) if job.result is not None else None
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> IngestionJob:
+        task_id, status, progress, message, started_at, priority, payload, completed_at, result = row
+        return IngestionJob(
+            task_id=task_id,
+            status=status,
+            progress=progress,
+            message=message,
+            started_at=datetime.fromisoformat(started_at),
+            priority=priority,
+            payload=json.loads(payload),
+            completed_at=datetime.fromisoformat(completed_at) if completed_at else None,
+            result=json.loads(result) if result is not None else None
+        )
+
+
+class IngestionQueue:
+    """
+    文件处理任务队列
+
+    num_workers 个异步工作协程按优先级（高者优先，同优先级先进先出）取任务执行，
+    限制同时运行的处理流水线数量。等待中的任务数达到 max_queue_size 时 submit 抛出
+    QueueFullError。parse_workers 大于0时创建供文件解析使用的进程池（parse_executor）。
+    服务重启后，未完成的任务会从 JobStore 中恢复并重新排队。
+
+    JobStore 是同步的SQLite存储，队列的所有存储操作都在一个专用线程中按提交顺序执行，
+    不阻塞事件循环；在异步代码中应使用队列的 get_job / list_jobs 等方法，而不是直接调用 store。
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: JobHandler,
+        num_workers: int = 3,
+        max_queue_size: int = 100,
+        parse_workers: int = 0
+    ):
+        self.store = store
+        self.handler = handler
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self.parse_executor = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+        # 单线程：存储操作（包括不等待结果的进度更新）按提交顺序执行
+        self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion-job-store")
+
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._enqueued: Set[str] = set()
+        self._submitting = 0
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def pending_count(self) -> int:
+        """等待执行的任务数（含正在写入存储的新任务）"""
+        return self._queue.qsize() + self._submitting
+
+    def has_capacity(self, count: int = 1) -> bool:
+        """队列能否再接收 count 个任务"""
+        return self.pending_count + count <= self.max_queue_size
+
+    async def _store_call(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        """在存储线程中执行 JobStore 方法"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._store_executor, functools.partial(method, *args, **kwargs))
+
+    async def get_job(self, task_id: str) -> Optional[IngestionJob]:
+        """按ID获取任务"""
+        return await self._store_call(self.store.get, task_id)
+
+    async def list_jobs(self, statuses: Optional[List[str]] = None) -> List[IngestionJob]:
+        """列出任务，排序同 JobStore.list_jobs"""
+        return await self._store_call(self.store.list_jobs, statuses)
+
+    async def count_by_status(self) -> Dict[str, int]:
+        """按状态统计任务数"""
+        return await self._store_call(self.store.count_by_status)
+
+    async def delete_jobs(self, task_ids: List[str]):
+        """删除任务记录"""
+        await self._store_call(self.store.delete, task_ids)
+
+    async def start(self):
+        """恢复未完成的任务并启动工作协程"""
+        interrupted = await self.list_jobs(statuses=["pending", "processing"])
+        for job in interrupted:
+            if job.status == "processing":
+                await self._store_call(
+                    self.store.update, job.task_id, status="pending", progress=0.0, message="服务重启，任务重新排队"
+                )
+            self._enqueue(job.task_id, job.priority)
+        if interrupted:
+            logger.info(f"恢复 {len(interrupted)} 个未完成的文件处理任务")
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self):
+        """
+        停止工作协程；正在执行的任务保持 processing 状态，下次启动时重新排队。
+        等待已提交的存储操作完成后关闭存储线程，之后队列不可再使用。
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self.parse_executor:
+            self.parse_executor.shutdown(wait=False, cancel_futures=True)
+        await asyncio.get_running_loop().run_in_executor(None, self._store_executor.shutdown)
+
+    async def submit(self, payload: Dict[str, Any], message: str, priority: int = 0) -> IngestionJob:
+        """提交任务，队列已满时抛出 QueueFullError"""
+        if not self.has_capacity():
+            raise QueueFullError(f"文件处理队列已满({self.max_queue_size})，请稍后重试")
+
+        job = IngestionJob(
+            task_id=str(uuid.uuid4()),
+            status="pending",
+            progress=0.0,
+            message=message,
+            started_at=datetime.now(),
+            priority=priority,
+            payload=payload
+        )
+        # 写入存储期间占用一个队列名额，避免并发提交超过 max_queue_size
+        self._submitting += 1
+        try:
+            await self._store_call(self.store.create, job)
+        finally:
+            self._submitting -= 1
+        self._enqueue(job.task_id, priority)
+        return job
+
+    def _enqueue(self, task_id: str, priority: int):
+        if task_id in self._enqueued:
+            return
+        self._enqueued.add(task_id)
+        self._queue.put_nowait((-priority, next(self._sequence), task_id))
+
+    async def _worker(self):
+        while True:
+            _, _, task_id = await self._queue.get()
+            self._enqueued.discard(task_id)
+            try:
+                await self._run(task_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, task_id: str):
+        job = await self.get_job(task_id)
+        if not job or job.status != "pending":
+            return
+
+        await self._store_call(self.store.update, task_id, status="processing", progress=5.0, message="开始处理")
+
+        def report_progress(progress: float, message: str):
+            # 处理流水线中同步调用，不等待写入完成；存储线程保证进度按顺序写入
+            self._store_executor.submit(self.store.update, task_id, progress=progress, message=message)
+
+        try:
+            result = await self.handler(job, report_progress)
+            await self._store_call(
+                self.store.update, task_id, status="completed", progress=100.0, message="文件处理完成",
+                completed_at=datetime.now(), result=result
+            )
+        except Exception as e:
+            logger.error(f"文件处理失败 {task_id}: {str(e)}")
+            await self._store_call(
+                self.store.update, task_id, status="failed", message=f"处理失败: {str(e)}", completed_at=datetime.now()
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计信息"""
+        return {
+            "pending": self.pending_count,
+            "max_queue_size": self.max_queue_size,
+            "workers": self.num_workers,
+            "parse_workers": self.parse_executor._max_workers if self.parse_executor else 0
+        }
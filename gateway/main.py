@@ -17,6 +17,7 @@ from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 
 from .routing import graph_routes
+from services.file_processing.upload_stream import FileTooLargeError, save_upload_stream
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,6 +46,8 @@ class FileInfo(BaseModel):
 
 # 创建上传目录
 UPLOAD_DIRECTORY = Path("uploads")
+# 单个上传文件的大小上限（字节）
+MAX_UPLOAD_SIZE = int(os.getenv("EMC_MAX_FILE_SIZE", str(100 * 1024 * 1024)))
 UPLOAD_DIRECTORY.mkdir(exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIRECTORY), name="uploads")
 
@@ -521,16 +524,18 @@ async def upload_file(file: UploadFile = File(...)):
                 "supported": list(allowed_extensions)
             }
         
-        # 保存文件
+        # 流式保存文件，同时计算校验和
         file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        try:
+            upload = await save_upload_stream(file, file_path, MAX_UPLOAD_SIZE, filename=file.filename)
+        except FileTooLargeError as e:
+            return {"error": str(e)}
         
         return {
             "message": "文件上传成功",
             "filename": file.filename,
-            "size": len(content),
+            "size": upload.size_bytes,
+            "checksum": upload.checksum,
             "file_type": file_ext,
             "download_url": f"http://localhost:8001/uploads/{file.filename}",
             "timestamp": datetime.now().isoformat()
@@ -600,17 +605,16 @@ async def batch_upload_files(files: List[UploadFile] = File(...)):
                 })
                 continue
             
-            # 保存文件
+            # 流式保存文件，同时计算校验和
             file_path = f"uploads/{file.filename}"
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
+            upload = await save_upload_stream(file, file_path, MAX_UPLOAD_SIZE, filename=file.filename)
             
             results.append({
                 "filename": file.filename,
                 "status": "success",
                 "message": "文件上传成功",
-                "size": len(content),
+                "size": upload.size_bytes,
+                "checksum": upload.checksum,
                 "file_type": file_ext,
                 "download_url": f"http://localhost:8000/uploads/{file.filename}",
                 "timestamp": datetime.now().isoformat()
@@ -698,16 +702,32 @@ if __name__ == "__main__":
 # 服务容器
 class ServiceContainer:
     def __init__(self):
+        self.settings = None
         self.neo4j_service = None
+        self.deepseek_service = None
+        self.file_processor = None
+        self.ingestion_queue = None
 
 service_container = ServiceContainer()
 
+
+def _load_settings():
+    """加载应用配置；缺少必需配置项时返回 None，依赖配置的服务不启动"""
+    try:
+        from .config import get_settings
+        return get_settings()
+    except Exception as e:
+        logger.warning(f"⚠️  配置加载失败，依赖配置的服务不可用: {e}")
+        return None
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动时执行的事件"""
+    settings = service_container.settings = _load_settings()
     try:
         # 初始化Neo4j服务
-        from services.knowledge_graph.neo4j_emc_service import Neo4jEMCService
+        from services.knowledge_graph.neo4j_emc_service import DEFAULT_FETCH_SIZE, Neo4jEMCService
         neo4j_uri = os.getenv("EMC_NEO4J_URI", "bolt://localhost:7687")
         neo4j_user = os.getenv("EMC_NEO4J_USER", "neo4j")
         neo4j_password = os.getenv("EMC_NEO4J_PASSWORD", "password")
@@ -715,12 +735,92 @@ async def startup_event():
         service_container.neo4j_service = Neo4jEMCService(
             uri=neo4j_uri,
             username=neo4j_user,
-            password=neo4j_password
+            password=neo4j_password,
+            fetch_size=settings.neo4j_fetch_size if settings else DEFAULT_FETCH_SIZE
         )
-        await service_container.neo4j_service.verify_connection()
+        if not await service_container.neo4j_service.connect():
+            raise RuntimeError("无法连接到Neo4j数据库")
         logger.info("✅ Neo4j 连接成功")
     except Exception as e:
         logger.warning(f"⚠️  Neo4j 连接失败，图功能不可用: {e}")
         service_container.neo4j_service = None
     
+    if service_container.neo4j_service:
+        # 按本体幂等地创建约束和索引，失败不影响服务启动
+        try:
+            schema_report = await service_container.neo4j_service.ensure_constraints_and_indexes()
+            if schema_report["failed"]:
+                logger.warning(f"⚠️  部分约束/索引创建失败: {schema_report['failed']}")
+        except Exception as e:
+            logger.warning(f"⚠️  图模式配置失败: {e}")
+
+        # 升级前写入的节点没有 :Entity 标签，按id查找和关系写入都找不到它们
+        try:
+            unlabelled = await service_container.neo4j_service.count_unlabelled_entities()
+            if unlabelled:
+                logger.error(
+                    f"❌ 有 {unlabelled} 个节点缺少 :Entity 标签，关系写入会跳过这些节点；"
+                    f"请运行 scripts/migrate_entity_label.py 回填"
+                )
+        except Exception as e:
+            logger.warning(f"⚠️  检查 :Entity 标签失败: {e}")
+
+    if settings:
+        # 初始化DeepSeek服务
+        try:
+            from services.ai_integration.deepseek_service import create_deepseek_service_from_settings
+            service_container.deepseek_service = create_deepseek_service_from_settings(settings)
+            logger.info("✅ DeepSeek 服务已初始化")
+        except Exception as e:
+            logger.warning(f"⚠️  DeepSeek 服务初始化失败，AI功能不可用: {e}")
+    
+    if service_container.deepseek_service:
+        # 初始化文件处理器，图谱构建使用已连接的Neo4j服务
+        try:
+            from services.file_processing.emc_file_processor import create_emc_file_processor
+            from services.knowledge_graph.graph_manager import EMCGraphManager
+            graph_manager = None
+            if service_container.neo4j_service:
+                graph_manager = EMCGraphManager(neo4j_service=service_container.neo4j_service)
+            service_container.file_processor = create_emc_file_processor(
+                service_container.deepseek_service,
+                settings.upload_directory,
+                graph_manager=graph_manager,
+                cache_max_bytes=settings.extraction_cache_max_bytes
+            )
+            logger.info("✅ 文件处理器已初始化")
+        except Exception as e:
+            logger.warning(f"⚠️  文件处理器初始化失败，文件解析功能不可用: {e}")
+    
+    if service_container.file_processor:
+        # 启动文件处理任务队列，恢复上次未完成的任务
+        try:
+            from .routing.file_routes import create_ingestion_queue
+            queue = create_ingestion_queue(service_container.file_processor, settings)
+            await queue.start()
+            service_container.ingestion_queue = queue
+            logger.info("✅ 文件处理队列已启动")
+        except Exception as e:
+            logger.warning(f"⚠️  文件处理队列启动失败，异步文件处理不可用: {e}")
+    
     logger.info("🚀 EMC知识图谱系统启动完成 - v2")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时执行的事件"""
+    if service_container.ingestion_queue:
+        # 正在执行的任务保持 processing 状态，下次启动时重新排队
+        try:
+            await service_container.ingestion_queue.stop()
+            service_container.ingestion_queue.store.close()
+        except Exception as e:
+            logger.warning(f"⚠️  文件处理队列关闭失败: {e}")
+        service_container.ingestion_queue = None
+    
+    # 关闭认证状态存储的连接池（未创建时不做任何事）
+    try:
+        from .middleware.auth import close_auth_store
+        await close_auth_store()
+    except Exception as e:
+        logger.warning(f"⚠️  认证状态存储关闭失败: {e}")
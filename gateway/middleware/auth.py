@@ -3,11 +3,13 @@
 提供JWT认证、RBAC权限控制和会话管理
 """
 
+import asyncio
+import json
 import jwt
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set
 from functools import wraps
 
 from fastapi import HTTPException, Request, Depends
@@ -15,15 +17,43 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
-from data_access.connections.redis_connection import redis_conn
 from data_access.repositories.user_repository import UserRepository
 from data_access.connections.database_connection import db_connection
 from ..config import get_settings
+from .auth_store import AuthStateStore, create_auth_state_store
 
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
+SESSION_TTL_SECONDS = 86400  # 会话24小时未活动过期
+ACTIVITY_MAX_ENTRIES = 100  # 每个用户保留最近100条活动
+ACTIVITY_TTL_SECONDS = 86400 * 7  # 活动记录7天过期
+
+_auth_store: Optional[AuthStateStore] = None
+
+
+def get_auth_store() -> AuthStateStore:
+    """获取认证状态存储（首次调用时按配置创建，进程内共享同一个连接池）"""
+    global _auth_store
+    if _auth_store is None:
+        settings = get_settings()
+        _auth_store = create_auth_state_store(
+            backend=settings.auth_state_backend,
+            redis_url=settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_timeout
+        )
+    return _auth_store
+
+
+async def close_auth_store():
+    """关闭认证状态存储的连接池"""
+    global _auth_store
+    if _auth_store is not None:
+        await _auth_store.close()
+        _auth_store = None
+
 
 class AuthMiddleware(BaseHTTPMiddleware):
     """认证中间件"""
@@ -47,6 +77,9 @@ class AuthMiddleware(BaseHTTPMiddleware):
         self.admin_paths = {
             "/api/admin", "/api/system"
         }
+        
+        # 后台写入的活动记录任务，保留引用避免任务被回收
+        self._activity_tasks: Set[asyncio.Task] = set()
     
     async def dispatch(self, request: Request, call_next):
         """中间件主要逻辑"""
@@ -76,8 +109,10 @@ class AuthMiddleware(BaseHTTPMiddleware):
                     if user_info.get("role") != "admin":
                         return self._forbidden_response("需要管理员权限")
                 
-                # 记录用户活动
-                await self._log_user_activity(user_info, request)
+                # 记录用户活动（后台写入，不占用请求路径上的Redis往返）
+                task = asyncio.create_task(self._log_user_activity(user_info, request))
+                self._activity_tasks.add(task)
+                task.add_done_callback(self._activity_tasks.discard)
                 
             except Exception as e:
                 logger.error(f"认证中间件错误: {str(e)}")
@@ -139,8 +174,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
     async def _is_token_blacklisted(self, token: str) -> bool:
         """检查token是否在黑名单中"""
         try:
-            with redis_conn.sync_client() as client:
-                return bool(client.get(f"blacklist:{token}"))
+            return await get_auth_store().is_token_blacklisted(token)
         except Exception:
             return False
     
@@ -176,13 +210,13 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 "timestamp": datetime.now().isoformat()
             }
             
-            # 使用Redis记录最近活动
-            with redis_conn.sync_client() as client:
-                key = f"user_activity:{user_info['id']}"
-                client.lpush(key, str(activity_data))
-                client.ltrim(key, 0, 99)  # 保留最近100条活动
-                client.expire(key, 86400 * 7)  # 7天过期
-                
+            await get_auth_store().record_activity(
+                user_info["id"],
+                json.dumps(activity_data, ensure_ascii=False),
+                max_entries=ACTIVITY_MAX_ENTRIES,
+                ttl=ACTIVITY_TTL_SECONDS
+            )
+            
         except Exception as e:
             logger.error(f"记录用户活动失败: {str(e)}")
     
@@ -290,9 +324,7 @@ class JWTManager:
             # 只有未过期的token才需要加入黑名单
             if exp_timestamp > current_timestamp:
                 ttl = int(exp_timestamp - current_timestamp)
-                
-                with redis_conn.sync_client() as client:
-                    client.setex(f"blacklist:{token}", ttl, "1")
+                await get_auth_store().blacklist_token(token, max(ttl, 1))
                     
         except Exception as e:
             logger.error(f"Token黑名单操作失败: {str(e)}")
@@ -425,29 +457,33 @@ def require_permissions(*required_permissions: str):
 class SessionManager:
     """会话管理器"""
     
+    @staticmethod
+    def _decode_session(session_data: Optional[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """把存储中的字符串字段还原为会话信息"""
+        if not session_data:
+            return None
+        session = dict(session_data)
+        session["user_id"] = int(session["user_id"])
+        session["device_info"] = json.loads(session.get("device_info") or "{}")
+        session["is_active"] = session.get("is_active") == "1"
+        return session
+    
     @staticmethod
     async def create_session(user_id: int, device_info: Dict[str, Any]) -> str:
         """创建用户会话"""
         session_id = f"session:{user_id}:{int(time.time())}"
+        now = datetime.now().isoformat()
         
         session_data = {
-            "user_id": user_id,
-            "created_at": datetime.now().isoformat(),
-            "last_activity": datetime.now().isoformat(),
-            "device_info": device_info,
-            "is_active": True
+            "user_id": str(user_id),
+            "created_at": now,
+            "last_activity": now,
+            "device_info": json.dumps(device_info, ensure_ascii=False),
+            "is_active": "1"
         }
         
         try:
-            with redis_conn.sync_client() as client:
-                client.hset(session_id, mapping=session_data)
-                client.expire(session_id, 86400)  # 24小时过期
-                
-                # 记录用户的活跃会话
-                user_sessions_key = f"user_sessions:{user_id}"
-                client.sadd(user_sessions_key, session_id)
-                client.expire(user_sessions_key, 86400)
-                
+            await get_auth_store().create_session(session_id, user_id, session_data, SESSION_TTL_SECONDS)
             return session_id
             
         except Exception as e:
@@ -455,12 +491,17 @@ class SessionManager:
             raise
     
     @staticmethod
-    async def get_session(session_id: str) -> Optional[Dict[str, Any]]:
-        """获取会话信息"""
+    async def get_session(session_id: str, touch: bool = False) -> Optional[Dict[str, Any]]:
+        """获取会话信息；touch 为 True 时同时刷新活动时间（一次往返）"""
         try:
-            with redis_conn.sync_client() as client:
-                session_data = client.hgetall(session_id)
-                return session_data if session_data else None
+            store = get_auth_store()
+            if touch:
+                session_data = await store.touch_session(
+                    session_id, datetime.now().isoformat(), SESSION_TTL_SECONDS
+                )
+            else:
+                session_data = await store.get_session(session_id)
+            return SessionManager._decode_session(session_data)
         except Exception as e:
             logger.error(f"获取会话失败: {str(e)}")
             return None
@@ -469,9 +510,7 @@ class SessionManager:
     async def update_session_activity(session_id: str):
         """更新会话活动时间"""
         try:
-            with redis_conn.sync_client() as client:
-                client.hset(session_id, "last_activity", datetime.now().isoformat())
-                client.expire(session_id, 86400)
+            await get_auth_store().touch_session(session_id, datetime.now().isoformat(), SESSION_TTL_SECONDS)
         except Exception as e:
             logger.error(f"更新会话活动时间失败: {str(e)}")
     
@@ -479,15 +518,7 @@ class SessionManager:
     async def terminate_session(session_id: str):
         """终止会话"""
         try:
-            with redis_conn.sync_client() as client:
-                session_data = client.hgetall(session_id)
-                if session_data:
-                    user_id = session_data.get("user_id")
-                    if user_id:
-                        client.srem(f"user_sessions:{user_id}", session_id)
-                
-                client.delete(session_id)
-                
+            await get_auth_store().terminate_session(session_id)
         except Exception as e:
             logger.error(f"终止会话失败: {str(e)}")
     
@@ -495,8 +526,7 @@ class SessionManager:
     async def get_user_sessions(user_id: int) -> List[str]:
         """获取用户的所有活跃会话"""
         try:
-            with redis_conn.sync_client() as client:
-                return list(client.smembers(f"user_sessions:{user_id}"))
+            return await get_auth_store().get_user_sessions(user_id)
         except Exception as e:
             logger.error(f"获取用户会话失败: {str(e)}")
             return []
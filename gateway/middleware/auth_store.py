@@ -0,0 +1,226 @@
+"""
+认证状态存储
+用户会话、token黑名单和最近活动记录的异步存储；Redis实现使用连接池，
+多条命令通过管道或Lua脚本在一次往返内完成，进程内实现用于单节点部署和测试
+"""
+
+import abc
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+BLACKLIST_KEY_PREFIX = "blacklist:"
+USER_SESSIONS_KEY_PREFIX = "user_sessions:"
+USER_ACTIVITY_KEY_PREFIX = "user_activity:"
+
+# 刷新会话活动时间并返回会话；会话不存在时不创建，返回空列表
+_TOUCH_SESSION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {}
+end
+redis.call('HSET', KEYS[1], 'last_activity', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# 删除会话并把它从所属用户的会话集合中移除
+_TERMINATE_SESSION_SCRIPT = """
+local user_id = redis.call('HGET', KEYS[1], 'user_id')
+if user_id then
+    redis.call('SREM', ARGV[1] .. user_id, KEYS[1])
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+class AuthStateStore(abc.ABC):
+    """
+    认证状态存储基类
+
+    会话以字符串字段的字典保存，键为会话ID；用户的会话ID集合保存在
+    user_sessions:<user_id>，与会话同时过期。子类实现全部抽象方法。
+    """
+
+    @abc.abstractmethod
+    async def is_token_blacklisted(self, token: str) -> bool:
+        """token 是否已被注销"""
+
+    @abc.abstractmethod
+    async def blacklist_token(self, token: str, ttl: int):
+        """把 token 加入黑名单，ttl 秒后过期"""
+
+    @abc.abstractmethod
+    async def create_session(self, session_id: str, user_id: int, data: Dict[str, str], ttl: int):
+        """创建会话并加入用户的会话集合"""
+
+    @abc.abstractmethod
+    async def get_session(self, session_id: str) -> Optional[Dict[str, str]]:
+        """获取会话，不存在时返回 None"""
+
+    @abc.abstractmethod
+    async def touch_session(self, session_id: str, last_activity: str, ttl: int) -> Optional[Dict[str, str]]:
+        """刷新会话的活动时间和过期时间，返回刷新后的会话；会话不存在时返回 None"""
+
+    @abc.abstractmethod
+    async def terminate_session(self, session_id: str):
+        """删除会话并从用户的会话集合中移除"""
+
+    @abc.abstractmethod
+    async def get_user_sessions(self, user_id: int) -> List[str]:
+        """获取用户的会话ID列表"""
+
+    @abc.abstractmethod
+    async def record_activity(self, user_id: int, entry: str, max_entries: int, ttl: int):
+        """把活动记录写到用户活动列表头部，只保留最近 max_entries 条"""
+
+    async def close(self):
+        """释放连接等资源"""
+
+
+class InMemoryAuthStateStore(AuthStateStore):
+    """进程内认证状态存储：各条目带过期时间，读取时惰性过期，写入时定期清理"""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._last_sweep = time.monotonic()
+
+    def _get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def _set(self, key: str, value: Any, ttl: int):
+        now = time.monotonic()
+        self._entries[key] = (value, now + ttl)
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            for expired_key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+                del self._entries[expired_key]
+
+    async def is_token_blacklisted(self, token: str) -> bool:
+        return self._get(f"{BLACKLIST_KEY_PREFIX}{token}") is not None
+
+    async def blacklist_token(self, token: str, ttl: int):
+        self._set(f"{BLACKLIST_KEY_PREFIX}{token}", "1", ttl)
+
+    async def create_session(self, session_id: str, user_id: int, data: Dict[str, str], ttl: int):
+        self._set(session_id, dict(data), ttl)
+        user_sessions_key = f"{USER_SESSIONS_KEY_PREFIX}{user_id}"
+        sessions = self._get(user_sessions_key) or set()
+        sessions.add(session_id)
+        self._set(user_sessions_key, sessions, ttl)
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, str]]:
+        session = self._get(session_id)
+        return dict(session) if session else None
+
+    async def touch_session(self, session_id: str, last_activity: str, ttl: int) -> Optional[Dict[str, str]]:
+        session = self._get(session_id)
+        if not session:
+            return None
+        session["last_activity"] = last_activity
+        self._set(session_id, session, ttl)
+        return dict(session)
+
+    async def terminate_session(self, session_id: str):
+        session = self._get(session_id)
+        if session and session.get("user_id"):
+            sessions = self._get(f"{USER_SESSIONS_KEY_PREFIX}{session['user_id']}")
+            if sessions:
+                sessions.discard(session_id)
+        self._entries.pop(session_id, None)
+
+    async def get_user_sessions(self, user_id: int) -> List[str]:
+        return list(self._get(f"{USER_SESSIONS_KEY_PREFIX}{user_id}") or ())
+
+    async def record_activity(self, user_id: int, entry: str, max_entries: int, ttl: int):
+        key = f"{USER_ACTIVITY_KEY_PREFIX}{user_id}"
+        entries = self._get(key) or []
+        entries.insert(0, entry)
+        del entries[max_entries:]
+        self._set(key, entries, ttl)
+
+
+class RedisAuthStateStore(AuthStateStore):
+    """
+    Redis认证状态存储
+
+    client 为 redis.asyncio.Redis（需 decode_responses=True）或接口兼容的客户端。
+    创建会话、记录活动使用管道一次发送；刷新和终止会话使用Lua脚本（EVALSHA），
+    先读后写也只需一次往返。终止会话的脚本会访问未声明的用户会话集合键，
+    因此不适用于Redis Cluster。
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+        self._touch_session = client.register_script(_TOUCH_SESSION_SCRIPT)
+        self._terminate_session = client.register_script(_TERMINATE_SESSION_SCRIPT)
+
+    async def is_token_blacklisted(self, token: str) -> bool:
+        return bool(await self.client.exists(f"{BLACKLIST_KEY_PREFIX}{token}"))
+
+    async def blacklist_token(self, token: str, ttl: int):
+        await self.client.set(f"{BLACKLIST_KEY_PREFIX}{token}", "1", ex=ttl)
+
+    async def create_session(self, session_id: str, user_id: int, data: Dict[str, str], ttl: int):
+        user_sessions_key = f"{USER_SESSIONS_KEY_PREFIX}{user_id}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(session_id, mapping=data)
+            pipe.expire(session_id, ttl)
+            pipe.sadd(user_sessions_key, session_id)
+            pipe.expire(user_sessions_key, ttl)
+            await pipe.execute()
+
+    async def get_session(self, session_id: str) -> Optional[Dict[str, str]]:
+        return await self.client.hgetall(session_id) or None
+
+    async def touch_session(self, session_id: str, last_activity: str, ttl: int) -> Optional[Dict[str, str]]:
+        fields = await self._touch_session(keys=[session_id], args=[last_activity, ttl])
+        return dict(zip(fields[::2], fields[1::2])) if fields else None
+
+    async def terminate_session(self, session_id: str):
+        await self._terminate_session(keys=[session_id], args=[USER_SESSIONS_KEY_PREFIX])
+
+    async def get_user_sessions(self, user_id: int) -> List[str]:
+        return list(await self.client.smembers(f"{USER_SESSIONS_KEY_PREFIX}{user_id}"))
+
+    async def record_activity(self, user_id: int, entry: str, max_entries: int, ttl: int):
+        key = f"{USER_ACTIVITY_KEY_PREFIX}{user_id}"
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.lpush(key, entry)
+            pipe.ltrim(key, 0, max_entries - 1)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_auth_state_store(
+    backend: str = "redis",
+    redis_url: Optional[str] = None,
+    max_connections: int = 20,
+    timeout: float = 5
+) -> AuthStateStore:
+    """按配置创建认证状态存储，backend 为 redis 或 memory"""
+    if backend == "memory":
+        return InMemoryAuthStateStore()
+    if backend != "redis":
+        raise ValueError(f"未知的认证状态存储类型: {backend}")
+    if not redis_url:
+        raise ValueError("Redis认证状态存储需要提供 redis_url")
+    import redis.asyncio as redis_asyncio
+    # from_url 创建的客户端独占自己的连接池，close() 时一并关闭
+    client = redis_asyncio.from_url(
+        redis_url,
+        max_connections=max_connections,
+        socket_timeout=timeout,
+        socket_connect_timeout=timeout,
+        decode_responses=True
+    )
+    return RedisAuthStateStore(client)
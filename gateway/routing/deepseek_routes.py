@@ -427,7 +427,7 @@ async def get_session_info(
     获取会话信息
     """
     try:
-        history = deepseek_service.get_session_history(session_id)
+        history = await deepseek_service.get_session_history(session_id)
         
         if not history:
             raise HTTPException(status_code=404, detail="会话不存在")
@@ -457,7 +457,7 @@ async def clear_session(
     清除会话历史
     """
     try:
-        deepseek_service.clear_session(session_id)
+        await deepseek_service.clear_session(session_id)
         
         return {
             "message": f"会话 {session_id} 已清除",
@@ -471,12 +471,14 @@ async def clear_session(
 
 @router.get("/usage/stats")
 async def get_usage_stats(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    deepseek_service: DeepSeekEMCService = Depends(get_deepseek_service)
 ):
     """
-    获取API使用统计
+    获取API使用统计，包括响应缓存的命中率、节省的token数和请求调度状态
     """
     try:
+        response_cache = deepseek_service.deepseek.response_cache
         # 这里可以从数据库或缓存中获取用户的使用统计
         # 暂时返回模拟数据
         return {
@@ -494,7 +496,9 @@ async def get_usage_stats(
             "limits": {
                 "daily_requests": 1000,
                 "monthly_tokens": 1000000
-            }
+            },
+            "response_cache": response_cache.get_stats() if response_cache else None,
+            "scheduler": deepseek_service.deepseek.scheduler.get_stats()
         }
         
     except Exception as e:
@@ -9,16 +9,20 @@ import os
 import tempfile
 import uuid
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from dataclasses import asdict
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel, Field, validator
 
+from ..config import get_settings
 from ..middleware.auth import get_current_user
 from ..middleware.rate_limiting import rate_limit
+from ..ingestion.job_queue import IngestionJob, IngestionQueue, JobStore, QueueFullError
 from services.file_processing.emc_file_processor import EMCFileProcessor, FileMetadata, ExtractionResult
+from services.file_processing.upload_stream import FileTooLargeError, UploadedFile, save_upload_stream
 from services.knowledge_graph.neo4j_emc_service import Neo4jEMCService
 
 
@@ -81,6 +85,14 @@ def get_file_processor() -> EMCFileProcessor:
     return service_container.file_processor
 
 
+def get_ingestion_queue() -> IngestionQueue:
+    """获取文件处理队列实例"""
+    from ..main import service_container
+    if not getattr(service_container, "ingestion_queue", None):
+        raise HTTPException(status_code=500, detail="文件处理队列未初始化")
+    return service_container.ingestion_queue
+
+
 def get_neo4j_service() -> Neo4jEMCService:
     """获取Neo4j服务实例"""
     from ..main import service_container
@@ -89,8 +101,33 @@ def get_neo4j_service() -> Neo4jEMCService:
     return service_container.neo4j_service
 
 
-# 全局任务状态跟踪
-processing_tasks: Dict[str, ProcessingStatus] = {}
+def create_ingestion_queue(file_processor: EMCFileProcessor, settings) -> IngestionQueue:
+    """
+    创建文件处理队列
+    
+    应在应用启动时调用并 await queue.start()，关闭时 await queue.stop()。
+    """
+    queue = IngestionQueue(
+        store=JobStore(str(Path(settings.upload_directory) / "ingestion_jobs.sqlite3")),
+        handler=lambda job, report_progress: _process_file_job(job, report_progress, file_processor),
+        num_workers=settings.max_concurrent_processing,
+        max_queue_size=settings.ingestion_queue_max_size,
+        parse_workers=settings.parse_process_workers
+    )
+    if queue.parse_executor and not file_processor.parse_executor:
+        file_processor.parse_executor = queue.parse_executor
+    return queue
+
+
+def _queue_full_error(e: QueueFullError) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+
+async def _get_job(queue: IngestionQueue, task_id: str) -> IngestionJob:
+    job = await queue.get_job(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
+    return job
 
 
 @router.post("/upload")
@@ -100,12 +137,14 @@ async def upload_file(
     extract_entities: bool = Form(True),
     build_graph: bool = Form(True),
     analysis_mode: str = Form("comprehensive"),
-    background_tasks: BackgroundTasks = None,
+    priority: int = Form(0),
     current_user: dict = Depends(get_current_user),
-    file_processor: EMCFileProcessor = Depends(get_file_processor)
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     上传并处理单个文件
+    
+    文件进入处理队列，priority 越大越先处理；队列已满时返回429。
     """
     try:
         # 验证文件类型
@@ -115,45 +154,40 @@ async def upload_file(
                 detail=f"不支持的文件类型: {Path(file.filename).suffix}"
             )
         
-        # 验证文件大小
-        if file.size and file.size > 100 * 1024 * 1024:  # 100MB
+        # 验证文件大小（声明的大小；实际大小在写盘时限制）
+        max_file_size = get_settings().max_file_size
+        if file.size and file.size > max_file_size:
             raise HTTPException(
                 status_code=400,
-                detail="文件大小超过限制(100MB)"
+                detail=f"文件大小超过限制({max_file_size // (1024 * 1024)}MB)"
             )
         
-        # 生成任务ID
-        task_id = str(uuid.uuid4())
+        if not queue.has_capacity():
+            raise _queue_full_error(QueueFullError(f"文件处理队列已满({queue.max_queue_size})，请稍后重试"))
         
         # 保存临时文件
-        temp_file_path = await _save_temp_file(file)
-        
-        # 创建处理状态
-        processing_tasks[task_id] = ProcessingStatus(
-            task_id=task_id,
-            status="pending",
-            progress=0.0,
-            message="准备处理文件",
-            started_at=datetime.now()
-        )
+        try:
+            temp_file_path, upload = await _save_temp_file(file, max_file_size)
+        except FileTooLargeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # 启动后台处理
-        background_tasks.add_task(
-            _process_file_async,
-            task_id,
-            temp_file_path,
-            file.filename,
-            extract_entities,
-            build_graph,
-            analysis_mode,
-            current_user["id"],
-            file_processor
-        )
+        # 加入处理队列
+        try:
+            job = await queue.submit(
+                _job_payload(temp_file_path, file.filename, extract_entities, build_graph, analysis_mode,
+                             current_user["id"], upload),
+                message="准备处理文件",
+                priority=priority
+            )
+        except QueueFullError as e:
+            temp_file_path.unlink(missing_ok=True)
+            raise _queue_full_error(e)
         
         return {
-            "task_id": task_id,
+            "task_id": job.task_id,
             "filename": file.filename,
-            "file_size": file.size,
+            "file_size": upload.size_bytes,
+            "checksum": upload.checksum,
             "status": "processing",
             "message": "文件上传成功，正在处理中",
             "upload_time": datetime.now().isoformat()
@@ -173,19 +207,27 @@ async def upload_batch_files(
     extract_entities: bool = Form(True),
     build_graph: bool = Form(True),
     analysis_mode: str = Form("comprehensive"),
-    background_tasks: BackgroundTasks = None,
+    priority: int = Form(0),
     current_user: dict = Depends(get_current_user),
-    file_processor: EMCFileProcessor = Depends(get_file_processor)
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     批量上传和处理文件
+    
+    队列剩余容量不足以容纳整批文件时返回429，不接收其中任何文件。
     """
     try:
         if len(files) > 10:
             raise HTTPException(status_code=400, detail="单次最多支持上传10个文件")
         
+        if not queue.has_capacity(len(files)):
+            raise _queue_full_error(QueueFullError(
+                f"文件处理队列剩余容量不足，当前等待 {queue.pending_count}/{queue.max_queue_size} 个任务"
+            ))
+        
         batch_id = str(uuid.uuid4())
         task_ids = []
+        max_file_size = get_settings().max_file_size
         
         for file in files:
             # 验证文件
@@ -193,38 +235,25 @@ async def upload_batch_files(
                 logger.warning(f"跳过不支持的文件类型: {file.filename}")
                 continue
             
-            if file.size and file.size > 100 * 1024 * 1024:
+            if file.size and file.size > max_file_size:
                 logger.warning(f"跳过超大文件: {file.filename}")
                 continue
             
-            # 生成任务ID
-            task_id = str(uuid.uuid4())
-            task_ids.append(task_id)
-            
             # 保存临时文件
-            temp_file_path = await _save_temp_file(file)
+            try:
+                temp_file_path, upload = await _save_temp_file(file, max_file_size)
+            except FileTooLargeError:
+                logger.warning(f"跳过超大文件: {file.filename}")
+                continue
             
-            # 创建处理状态
-            processing_tasks[task_id] = ProcessingStatus(
-                task_id=task_id,
-                status="pending",
-                progress=0.0,
+            # 加入处理队列
+            job = await queue.submit(
+                _job_payload(temp_file_path, file.filename, extract_entities, build_graph, analysis_mode,
+                             current_user["id"], upload),
                 message=f"准备处理文件: {file.filename}",
-                started_at=datetime.now()
-            )
-            
-            # 启动后台处理
-            background_tasks.add_task(
-                _process_file_async,
-                task_id,
-                temp_file_path,
-                file.filename,
-                extract_entities,
-                build_graph,
-                analysis_mode,
-                current_user["id"],
-                file_processor
+                priority=priority
             )
+            task_ids.append(job.task_id)
         
         return {
             "batch_id": batch_id,
@@ -245,16 +274,14 @@ async def upload_batch_files(
 @router.get("/status/{task_id}")
 async def get_processing_status(
     task_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     获取文件处理状态
     """
     try:
-        if task_id not in processing_tasks:
-            raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
-        
-        task_status = processing_tasks[task_id]
+        task_status = await _get_job(queue, task_id)
         
         return {
             "task_id": task_id,
@@ -276,16 +303,14 @@ async def get_processing_status(
 @router.get("/result/{task_id}")
 async def get_processing_result(
     task_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     获取文件处理结果
     """
     try:
-        if task_id not in processing_tasks:
-            raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
-        
-        task_status = processing_tasks[task_id]
+        task_status = await _get_job(queue, task_id)
         
         if task_status.status != "completed":
             raise HTTPException(
@@ -314,36 +339,41 @@ async def get_processing_result(
 async def reprocess_file(
     task_id: str,
     processing_options: FileProcessingRequest,
-    background_tasks: BackgroundTasks,
+    priority: int = 0,
     current_user: dict = Depends(get_current_user),
-    file_processor: EMCFileProcessor = Depends(get_file_processor)
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     重新处理已上传的文件
     """
     try:
-        if task_id not in processing_tasks:
-            raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
-        
-        original_task = processing_tasks[task_id]
+        original_task = await _get_job(queue, task_id)
         
-        # 生成新的任务ID
-        new_task_id = str(uuid.uuid4())
-        
-        # 创建新的处理状态
-        processing_tasks[new_task_id] = ProcessingStatus(
-            task_id=new_task_id,
-            status="pending",
-            progress=0.0,
-            message="准备重新处理文件",
-            started_at=datetime.now()
-        )
+        file_path = Path(original_task.payload["file_path"])
+        if not file_path.exists():
+            raise HTTPException(status_code=410, detail=f"任务 {task_id} 的原始文件已被清理")
         
-        # 这里需要从原始任务中获取文件路径等信息
-        # 实际实现中应该将文件元数据存储在数据库中
+        # 使用原始文件和新的处理选项重新排队
+        try:
+            new_task = await queue.submit(
+                _job_payload(
+                    file_path,
+                    original_task.payload["filename"],
+                    processing_options.extract_entities,
+                    processing_options.build_graph,
+                    processing_options.analysis_mode,
+                    current_user["id"],
+                    upload=UploadedFile(**original_task.payload["upload"]) if original_task.payload.get("upload") else None,
+                    file_id=original_task.payload.get("file_id") or original_task.task_id
+                ),
+                message="准备重新处理文件",
+                priority=priority
+            )
+        except QueueFullError as e:
+            raise _queue_full_error(e)
         
         return {
-            "new_task_id": new_task_id,
+            "new_task_id": new_task.task_id,
             "original_task_id": task_id,
             "status": "processing",
             "message": "文件重新处理已启动",
@@ -455,16 +485,14 @@ async def download_file(
 async def download_processed_file(
     task_id: str,
     format: str = "json",
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     下载处理后的文件结果
     """
     try:
-        if task_id not in processing_tasks:
-            raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
-        
-        task_status = processing_tasks[task_id]
+        task_status = await _get_job(queue, task_id)
         
         if task_status.status != "completed":
             raise HTTPException(
@@ -511,7 +539,8 @@ async def download_processed_file(
 @router.get("/statistics")
 async def get_file_statistics(
     current_user: dict = Depends(get_current_user),
-    file_processor: EMCFileProcessor = Depends(get_file_processor)
+    file_processor: EMCFileProcessor = Depends(get_file_processor),
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     获取文件处理统计信息
@@ -524,16 +553,15 @@ async def get_file_statistics(
             "pending": 0,
             "processing": 0,
             "completed": 0,
-            "failed": 0
+            "failed": 0,
+            **(await queue.count_by_status())
         }
         
-        for task in processing_tasks.values():
-            task_stats[task.status] = task_stats.get(task.status, 0) + 1
-        
         return {
             "processing_statistics": processing_stats,
             "task_statistics": task_stats,
-            "total_tasks": len(processing_tasks),
+            "queue_statistics": queue.get_stats(),
+            "total_tasks": sum(task_stats.values()),
             "generated_at": datetime.now().isoformat()
         }
         
@@ -546,7 +574,8 @@ async def get_file_statistics(
 @rate_limit(requests_per_minute=5)
 async def cleanup_temp_files(
     current_user: dict = Depends(get_current_user),
-    file_processor: EMCFileProcessor = Depends(get_file_processor)
+    file_processor: EMCFileProcessor = Depends(get_file_processor),
+    queue: IngestionQueue = Depends(get_ingestion_queue)
 ):
     """
     清理临时文件
@@ -555,26 +584,22 @@ async def cleanup_temp_files(
         # 清理文件处理器的临时文件
         await file_processor.cleanup_temp_files(max_age_days=7)
         
-        # 清理已完成的任务记录（保留最近100个）
-        completed_tasks = [
-            task_id for task_id, task in processing_tasks.items()
-            if task.status in ["completed", "failed"]
-        ]
+        # 清理已完成的任务记录及其上传文件（保留最近100个）
+        completed_tasks = await queue.list_jobs(statuses=["completed", "failed"])
         
         if len(completed_tasks) > 100:
             # 按完成时间排序，删除最旧的
-            sorted_tasks = sorted(
-                completed_tasks,
-                key=lambda tid: processing_tasks[tid].completed_at or datetime.min
-            )
+            sorted_tasks = sorted(completed_tasks, key=lambda task: task.completed_at or datetime.min)
             
-            for task_id in sorted_tasks[:-100]:
-                del processing_tasks[task_id]
+            expired_tasks = sorted_tasks[:-100]
+            for task in expired_tasks:
+                Path(task.payload["file_path"]).unlink(missing_ok=True)
+            await queue.delete_jobs([task.task_id for task in expired_tasks])
         
         return {
             "message": "临时文件清理完成",
             "cleaned_task_records": max(0, len(completed_tasks) - 100),
-            "remaining_tasks": len(processing_tasks),
+            "remaining_tasks": sum((await queue.count_by_status()).values()),
             "cleaned_at": datetime.now().isoformat()
         }
         
@@ -584,8 +609,12 @@ async def cleanup_temp_files(
 
 
 # 辅助函数
-async def _save_temp_file(file: UploadFile) -> Path:
-    """保存上传的文件到临时目录"""
+async def _save_temp_file(file: UploadFile, max_bytes: int) -> Tuple[Path, UploadedFile]:
+    """
+    把上传的文件流式写入临时目录
+    
+    写入时计算校验和并识别MIME类型，超过 max_bytes 时删除部分文件并抛出 FileTooLargeError
+    """
     temp_dir = Path("./temp_uploads")
     temp_dir.mkdir(exist_ok=True)
     
@@ -595,11 +624,9 @@ async def _save_temp_file(file: UploadFile) -> Path:
     temp_file_path = temp_dir / temp_filename
     
     # 保存文件
-    with open(temp_file_path, "wb") as temp_file:
-        content = await file.read()
-        temp_file.write(content)
+    upload = await save_upload_stream(file, temp_file_path, max_bytes, filename=file.filename)
     
-    return temp_file_path
+    return temp_file_path, upload
 
 
 def _is_allowed_file_type(filename: str) -> bool:
@@ -608,83 +635,75 @@ def _is_allowed_file_type(filename: str) -> bool:
     return Path(filename).suffix.lower() in allowed_extensions
 
 
-async def _process_file_async(
-    task_id: str,
+def _job_payload(
     file_path: Path,
     filename: str,
     extract_entities: bool,
     build_graph: bool,
     analysis_mode: str,
     user_id: str,
+    upload: Optional[UploadedFile] = None,
+    file_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    构造持久化到任务存储中的处理参数，upload 为写盘时计算的文件元数据
+
+    file_id 为空时使用任务ID；重新处理时沿用原任务的 file_id，使图谱构建命中提取缓存并复用同一个文档节点。
+    """
+    return {
+        "file_path": str(file_path),
+        "filename": filename,
+        "extract_entities": extract_entities,
+        "build_graph": build_graph,
+        "analysis_mode": analysis_mode,
+        "user_id": user_id,
+        "upload": asdict(upload) if upload else None,
+        "file_id": file_id
+    }
+
+
+async def _process_file_job(
+    job: IngestionJob,
+    report_progress,
     file_processor: EMCFileProcessor
-):
-    """异步处理文件"""
-    try:
-        # 更新状态为处理中
-        processing_tasks[task_id].status = "processing"
-        processing_tasks[task_id].progress = 10.0
-        processing_tasks[task_id].message = "正在分析文件内容"
-        
-        # 处理文件
-        metadata, extraction_result = await file_processor.process_file(
-            file_path=file_path,
-            file_id=task_id
-        )
-        
-        processing_tasks[task_id].progress = 50.0
-        processing_tasks[task_id].message = "文件分析完成，正在提取实体"
-        
-        result = {
-            "file_metadata": {
-                "filename": filename,
-                "file_type": metadata.file_type,
-                "size_bytes": metadata.size_bytes,
-                "checksum": metadata.checksum
-            }
+) -> Dict[str, Any]:
+    """处理队列中的文件任务，进度由文件处理流水线的各阶段上报"""
+    payload = job.payload
+    
+    # 处理文件
+    metadata, extraction_result = await file_processor.process_file(
+        file_path=Path(payload["file_path"]),
+        file_id=payload.get("file_id") or job.task_id,
+        analysis_mode=payload["analysis_mode"],
+        progress_callback=report_progress,
+        upload=UploadedFile(**payload["upload"]) if payload.get("upload") else None
+    )
+    
+    result = {
+        "file_metadata": {
+            "filename": payload["filename"],
+            "file_type": metadata.file_type,
+            "size_bytes": metadata.size_bytes,
+            "checksum": metadata.checksum
+        }
+    }
+    
+    if extraction_result:
+        result["extraction_result"] = {
+            "entities_count": len(extraction_result.entities),
+            "relationships_count": len(extraction_result.relationships),
+            "entities": extraction_result.entities,
+            "relationships": extraction_result.relationships,
+            "confidence_score": extraction_result.confidence_score,
+            "content_summary": extraction_result.content_summary
         }
         
-        if extraction_result:
-            result["extraction_result"] = {
-                "entities_count": len(extraction_result.entities),
-                "relationships_count": len(extraction_result.relationships),
-                "entities": extraction_result.entities,
-                "relationships": extraction_result.relationships,
-                "confidence_score": extraction_result.confidence_score,
-                "content_summary": extraction_result.content_summary
-            }
-            
-            # 如果需要构建图数据
-            if build_graph and extraction_result.entities:
-                processing_tasks[task_id].progress = 80.0
-                processing_tasks[task_id].message = "正在构建知识图谱"
-                
-                # 这里应该调用图数据库服务来构建图谱
-                # 由于需要额外的依赖注入，这里简化处理
-                result["graph_built"] = True
-                result["graph_nodes_created"] = len(extraction_result.entities)
-                result["graph_relationships_created"] = len(extraction_result.relationships)
-        
-        # 完成处理
-        processing_tasks[task_id].status = "completed"
-        processing_tasks[task_id].progress = 100.0
-        processing_tasks[task_id].message = "文件处理完成"
-        processing_tasks[task_id].completed_at = datetime.now()
-        processing_tasks[task_id].result = result
-        
-        # 清理临时文件
-        try:
-            file_path.unlink()
-        except Exception as e:
-            logger.warning(f"清理临时文件失败: {e}")
-        
-    except Exception as e:
-        logger.error(f"文件处理失败 {task_id}: {str(e)}")
-        processing_tasks[task_id].status = "failed"
-        processing_tasks[task_id].message = f"处理失败: {str(e)}"
-        processing_tasks[task_id].completed_at = datetime.now()
-        
-        # 清理临时文件
-        try:
-            file_path.unlink()
-        except Exception:
-            pass
\ No newline at end of file
+        # 如果需要构建图数据
+        if payload["build_graph"] and extraction_result.entities:
+            # 这里应该调用图数据库服务来构建图谱
+            # 由于需要额外的依赖注入，这里简化处理
+            result["graph_built"] = True
+            result["graph_nodes_created"] = len(extraction_result.entities)
+            result["graph_relationships_created"] = len(extraction_result.relationships)
+    
+    return result
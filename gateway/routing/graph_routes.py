@@ -6,11 +6,13 @@
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from neo4j import WRITE_ACCESS
+from neo4j.exceptions import DriverError, Neo4jError
 from pydantic import BaseModel, Field, validator
 
 # 临时禁用认证中间件
@@ -21,7 +23,9 @@ def rate_limit(requests_per_minute: int):
     def decorator(func):
         return func
     return decorator
+from services.knowledge_graph.emc_ontology import ENTITY_LABEL, ONTOLOGY_DEFINITIONS
 from services.knowledge_graph.neo4j_emc_service import Neo4jEMCService, EMCNode, EMCRelationship
+from services.knowledge_graph.query_templates import MAX_SUBGRAPH_DEPTH
 
 
 router = APIRouter()
@@ -37,7 +41,7 @@ class NodeCreateRequest(BaseModel):
     
     @validator('node_type')
     def validate_node_type(cls, v):
-        allowed_types = ['EMCStandard', 'Equipment', 'TestMethod', 'Regulation', 'FrequencyRange']
+        allowed_types = ONTOLOGY_DEFINITIONS["node_labels"]
         if v not in allowed_types:
             raise ValueError(f'节点类型必须是以下之一: {allowed_types}')
         return v
@@ -58,7 +62,7 @@ class RelationshipCreateRequest(BaseModel):
     
     @validator('relationship_type')
     def validate_relationship_type(cls, v):
-        allowed_types = ['APPLIES_TO', 'REQUIRES', 'TESTS', 'COMPLIES_WITH', 'RELATED_TO']
+        allowed_types = ONTOLOGY_DEFINITIONS["relationship_types"]
         if v not in allowed_types:
             raise ValueError(f'关系类型必须是以下之一: {allowed_types}')
         return v
@@ -69,6 +73,7 @@ class CypherQueryRequest(BaseModel):
     query: str = Field(..., description="Cypher查询语句")
     parameters: Dict[str, Any] = Field(default_factory=dict, description="查询参数")
     limit: Optional[int] = Field(100, description="结果限制数量")
+    stream: bool = Field(False, description="以NDJSON流式返回结果行")
     
     @validator('query')
     def validate_query(cls, v):
@@ -129,8 +134,8 @@ class SubgraphRequest(BaseModel):
     
     @validator('depth')
     def validate_depth(cls, v):
-        if not 1 <= v <= 5:
-            raise ValueError('子图深度必须在1-5之间')
+        if not 1 <= v <= MAX_SUBGRAPH_DEPTH:
+            raise ValueError(f'子图深度必须在1-{MAX_SUBGRAPH_DEPTH}之间')
         return v
 
 
@@ -201,86 +206,96 @@ async def get_graph_statistics(
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
 
+@router.get("/query-templates/stats")
+async def get_query_template_stats(
+    current_user: dict = Depends(get_current_user),
+    neo4j_service: Neo4jEMCService = Depends(get_neo4j_service)
+):
+    """本进程内各查询模板的使用次数（确认查询文本被复用，不是Neo4j计划缓存的命中统计）"""
+    return {
+        "template_count": len(neo4j_service.templates),
+        "templates": neo4j_service.templates.stats(),
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+def _graph_record_items(record: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """把 get_graph_data 的一条记录转换为前端格式的 (源节点, 目标节点, 边)"""
+    nodes = []
+    for side in ('source', 'target'):
+        props = record[f'{side}_props']
+        props.pop('id', None)
+        props.pop('label', None)
+        nodes.append({
+            'id': record[f'{side}_id'],
+            'label': record[f'{side}_label'],
+            'type': record[f'{side}_type'].lower(),
+            'properties': props
+        })
+    source, target = nodes
+    edge = {
+        'id': f"{source['id']}-{target['id']}-{record['rel_type']}",
+        'source': source['id'],
+        'target': target['id'],
+        'type': record['rel_type'].lower(),
+        'properties': record['rel_props']
+    }
+    return source, target, edge
+
+
+async def _ndjson_lines(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    transform: Callable[[Dict[str, Any]], Any] = lambda row: row
+) -> AsyncIterator[str]:
+    """
+    把按批产出的记录逐行序列化为NDJSON
+
+    响应头在第一批之前就已发出，之后的查询错误无法再变成HTTP状态码，
+    因此以最后一行 {"error": ...} 告知客户端结果不完整（包括连接中断等驱动错误）。
+    """
+    try:
+        async for batch in batches:
+            yield "".join(json.dumps(transform(row), ensure_ascii=False, default=str) + "\n" for row in batch)
+    except (Neo4jError, DriverError) as e:
+        logger.error(f"流式查询中断: {str(e)}")
+        yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+
+
 @router.get("/data")
 async def get_graph_data(
     node_types: Optional[str] = Query(None, description="节点类型过滤(逗号分隔)"),
     relationship_types: Optional[str] = Query(None, description="关系类型过滤(逗号分隔)"),
     limit: int = Query(1000, description="结果限制"),
+    stream: bool = Query(False, description="以NDJSON流式返回，每行一条 {source, target, edge}，由客户端去重节点"),
     current_user: dict = Depends(get_current_user),
     neo4j_service: Neo4jEMCService = Depends(get_neo4j_service)
 ):
     """获取图数据"""
     try:
-        # 构建查询
-        query_parts = ["MATCH (n)-[r]-(m)"]
-        where_conditions = []
-        
-        if node_types:
-            types = [t.strip() for t in node_types.split(',')]
-            type_conditions = ' OR '.join([f'n:{t}' for t in types])
-            where_conditions.append(f"({type_conditions})")
-        
-        if relationship_types:
-            rel_types = [t.strip() for t in relationship_types.split(',')]
-            rel_conditions = ' OR '.join([f'type(r) = "{t}"' for t in rel_types])
-            where_conditions.append(f"({rel_conditions})")
-        
-        if where_conditions:
-            query_parts.append(f"WHERE {' AND '.join(where_conditions)}")
-        
-        query_parts.append(f"""
-        RETURN DISTINCT
-            n.id as source_id, labels(n)[0] as source_type, n.label as source_label, properties(n) as source_props,
-            m.id as target_id, labels(m)[0] as target_type, m.label as target_label, properties(m) as target_props,
-            type(r) as rel_type, properties(r) as rel_props
-        LIMIT {limit}
-        """)
-        
-        query = " ".join(query_parts)
-        results = await neo4j_service._execute_query(query)
+        filters = {
+            'node_types': [t.strip() for t in node_types.split(',')] if node_types else None,
+            'relationship_types': [t.strip() for t in relationship_types.split(',')] if relationship_types else None,
+            'limit': limit
+        }
+        
+        if stream:
+            batches = neo4j_service.iter_graph_data(**filters)
+            return StreamingResponse(
+                _ndjson_lines(batches, lambda record: dict(zip(('source', 'target', 'edge'), _graph_record_items(record)))),
+                media_type="application/x-ndjson"
+            )
+        
+        results = await neo4j_service.get_graph_data(**filters)
         
         # 转换为前端需要的格式
         nodes_dict = {}
         edges = []
         
         for record in results:
-            # 处理源节点
-            source_id = record['source_id']
-            if source_id not in nodes_dict:
-                source_props = record['source_props']
-                source_props.pop('id', None)
-                source_props.pop('label', None)
-                
-                nodes_dict[source_id] = {
-                    'id': source_id,
-                    'label': record['source_label'],
-                    'type': record['source_type'].lower(),
-                    'properties': source_props
-                }
-            
-            # 处理目标节点
-            target_id = record['target_id']
-            if target_id not in nodes_dict:
-                target_props = record['target_props']
-                target_props.pop('id', None)
-                target_props.pop('label', None)
-                
-                nodes_dict[target_id] = {
-                    'id': target_id,
-                    'label': record['target_label'],
-                    'type': record['target_type'].lower(),
-                    'properties': target_props
-                }
-            
-            # 处理关系
-            rel_props = record['rel_props']
-            edges.append({
-                'id': f"{source_id}-{target_id}-{record['rel_type']}",
-                'source': source_id,
-                'target': target_id,
-                'type': record['rel_type'].lower(),
-                'properties': rel_props
-            })
+            source, target, edge = _graph_record_items(record)
+            nodes_dict.setdefault(source['id'], source)
+            nodes_dict.setdefault(target['id'], target)
+            edges.append(edge)
         
         return {
             'nodes': list(nodes_dict.values()),
@@ -290,6 +305,8 @@ async def get_graph_data(
             'query_time': datetime.now().isoformat()
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取图数据失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取图数据失败: {str(e)}")
@@ -474,6 +491,11 @@ async def execute_cypher_query(
         if request.limit and "LIMIT" not in query.upper():
             query = f"{query} LIMIT {request.limit}"
         
+        if request.stream:
+            # 与 _execute_query 一样以写会话自动提交执行
+            batches = neo4j_service.iter_query(query, request.parameters, access_mode=WRITE_ACCESS)
+            return StreamingResponse(_ndjson_lines(batches), media_type="application/x-ndjson")
+        
         start_time = datetime.now()
         results = await neo4j_service._execute_query(query, request.parameters)
         execution_time = (datetime.now() - start_time).total_seconds()
@@ -501,7 +523,7 @@ async def run_graph_analysis(
     current_user: dict = Depends(get_current_user),
     neo4j_service: Neo4jEMCService = Depends(get_neo4j_service)
 ):
-    """运行图分析"""
+    """运行图分析（各分析的结果规模固定有上限，直接整体返回，不提供流式版本）"""
     try:
         analysis_id = f"analysis_{datetime.now().timestamp()}".replace(".", "_")
         
@@ -549,7 +571,7 @@ async def get_subgraph(
     current_user: dict = Depends(get_current_user),
     neo4j_service: Neo4jEMCService = Depends(get_neo4j_service)
 ):
-    """获取子图"""
+    """获取子图（节点数受模板的 $limit 限制，且由服务器聚合为一行返回，因此不提供NDJSON流式版本）"""
     try:
         subgraph_data = await neo4j_service.export_subgraph(
             center_node_id=request.center_node_id,
@@ -677,7 +699,7 @@ async def _run_centrality_analysis(
     LIMIT 50
     """
     
-    results = await neo4j_service._execute_query(query)
+    results = await neo4j_service._execute_read_query(query)
     
     return {
         "centrality_scores": results,
@@ -692,15 +714,15 @@ async def _run_shortest_path_analysis(
     target_id: str
 ) -> Dict[str, Any]:
     """运行最短路径分析"""
-    query = """
-    MATCH (source {id: $source_id}), (target {id: $target_id})
+    query = f"""
+    MATCH (source:{ENTITY_LABEL} {{id: $source_id}}), (target:{ENTITY_LABEL} {{id: $target_id}})
     MATCH path = shortestPath((source)-[*]-(target))
     RETURN [node in nodes(path) | node.id] as path_nodes,
            [rel in relationships(path) | type(rel)] as path_relationships,
            length(path) as path_length
     """
     
-    results = await neo4j_service._execute_query(query, {
+    results = await neo4j_service._execute_read_query(query, {
         'source_id': source_id,
         'target_id': target_id
     })
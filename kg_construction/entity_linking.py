@@ -4,14 +4,19 @@ EMC知识图谱实体链接模块
 """
 
 from typing import List, Dict, Tuple, Optional, Any
+import json
 import logging
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
 import sys
 
+import numpy as np
+
 # 导入我们刚创建的消歧模块
 sys.path.append(str(Path(__file__).parent.parent))
 from services.knowledge_graph.entity_disambiguation import EntityDisambiguator, DisambiguatedEntity
+from services.knowledge_graph.similarity_clustering import greedy_threshold_clustering, normalize_rows
+from services.knowledge_graph.vector_index import EntityVectorIndex
 
 logger = logging.getLogger(__name__)
 
@@ -36,10 +41,14 @@ class EntityLinker:
     3. 性能优化：使用批处理和并行计算提高效率
     """
     
+    INDEX_FILE = "entity_index.npz"
+    ENTITIES_FILE = "linked_entities.json"
+    
     def __init__(self, 
                  spacy_model: str = "en_core_web_sm",
                  vector_model_path: Optional[str] = None,
-                 similarity_threshold: float = 0.7):
+                 similarity_threshold: float = 0.7,
+                 index_dir: Optional[str] = None):
         """
         初始化实体链接器
         
@@ -47,6 +56,7 @@ class EntityLinker:
         - spacy_model: spaCy模型名称，用于基础NLP处理
         - vector_model_path: 预训练词向量路径，可选
         - similarity_threshold: 实体相似度阈值，控制消歧的严格程度
+        - index_dir: 实体向量索引目录，存在时加载之前保存的索引（见 save_index）
         """
         self.disambiguator = EntityDisambiguator(
             model_path=vector_model_path,
@@ -57,6 +67,14 @@ class EntityLinker:
         # 缓存已处理的实体，提高重复处理效率
         self._entity_cache: Dict[str, LinkedEntity] = {}
         
+        # 跨文档链接：规范实体的上下文向量索引，以及每个实体的向量和/提及数（用于更新中心向量）
+        self.vector_index = EntityVectorIndex()
+        self._linked_by_id: Dict[str, LinkedEntity] = {}
+        self._vector_sums: Dict[str, np.ndarray] = {}
+        self._mention_counts: Dict[str, int] = {}
+        if index_dir and (Path(index_dir) / self.INDEX_FILE).exists():
+            self.load_index(index_dir)
+        
         logger.info(f"EntityLinker initialized with model: {spacy_model}")
     
     def link_entities(self, 
@@ -95,21 +113,168 @@ class EntityLinker:
         
         logger.info(f"Starting entity linking for {len(entities)} entities")
         
-        # 第一步：执行实体消歧
+        # 第一步：提取一次上下文特征向量，消歧和向量索引共用
         entity_context_pairs = [(entity, context) for entity, context in zip(entities, contexts)]
-        disambiguated_entities = self.disambiguator.disambiguate_entities(entity_context_pairs)
+        features = self.disambiguator.extract_context_features_batch(entity_context_pairs)
+        disambiguated_entities = self.disambiguator.disambiguate_entities(entity_context_pairs, features)
         
         # 第二步：将消歧结果转换为LinkedEntity对象
         linked_entities = self._convert_to_linked_entities(
             disambiguated_entities, entities, contexts, entity_types
         )
         
-        # 第三步：更新缓存
+        # 第三步：更新缓存和向量索引
         self._update_cache(linked_entities)
+        vectors = normalize_rows(features)
+        for linked_entity in linked_entities:
+            positions = [mention["position"] for mention in linked_entity.original_mentions]
+            self._register_entity(linked_entity, vectors[positions])
+        self._index_entities([entity.unique_id for entity in linked_entities])
         
         logger.info(f"Entity linking completed. {len(linked_entities)} unique entities identified")
         return linked_entities
     
+    def link_entities_incremental(self, 
+                                  entities: List[str], 
+                                  contexts: Optional[List[str]] = None,
+                                  entity_types: Optional[List[str]] = None) -> List[LinkedEntity]:
+        """
+        增量实体链接 - 基于向量索引的k-NN查找
+        
+        与 link_entities 不同，这里不会对全部实体重新聚类：每个新提及先在
+        已有规范实体的向量索引中查找最近邻，相似度达到阈值即链接到该实体；
+        只有未能链接的提及才在彼此之间做聚类，生成新的规范实体并写入索引。
+        
+        Returns:
+            本次涉及的实体（包括被新提及更新的已有实体），按首次出现顺序
+        """
+        if not entities:
+            return []
+        
+        contexts = list(contexts or [""] * len(entities))
+        contexts = contexts[:len(entities)] + [""] * (len(entities) - len(contexts))
+        entity_types = list(entity_types or ["UNKNOWN"] * len(entities))
+        entity_types = entity_types[:len(entities)] + ["UNKNOWN"] * (len(entities) - len(entity_types))
+        
+        vectors = normalize_rows(self.disambiguator.extract_context_features_batch(list(zip(entities, contexts))))
+        threshold = self.disambiguator.similarity_threshold
+        
+        touched: Dict[str, LinkedEntity] = {}
+        unmatched = []
+        for position, neighbours in enumerate(self.vector_index.search(vectors, k=1)):
+            if neighbours and neighbours[0][1] >= threshold:
+                linked_entity = self._linked_by_id[neighbours[0][0]]
+                mention = {
+                    "text": entities[position],
+                    "context": contexts[position],
+                    "type": entity_types[position],
+                    "position": position
+                }
+                self._add_mention(linked_entity, mention, vectors[position])
+                touched.setdefault(linked_entity.unique_id, linked_entity)
+            else:
+                unmatched.append(position)
+        
+        # 未链接的提及之间做贪心阈值聚类
+        for members in greedy_threshold_clustering(vectors[unmatched], threshold):
+            positions = [unmatched[k] for k in members]
+            texts = [entities[p] for p in positions]
+            canonical_form = max(texts, key=len)
+            unique_id = self.disambiguator.generate_unique_id(canonical_form)
+            mentions = [
+                {"text": entities[p], "context": contexts[p], "type": entity_types[p], "position": p}
+                for p in positions
+            ]
+            
+            existing = self._linked_by_id.get(unique_id)
+            if existing:
+                for mention, p in zip(mentions, positions):
+                    self._add_mention(existing, mention, vectors[p])
+                touched.setdefault(unique_id, existing)
+                continue
+            
+            linked_entity = LinkedEntity(
+                unique_id=unique_id,
+                canonical_form=canonical_form,
+                entity_type=self._primary_type(mentions),
+                confidence=1.0 / len(positions),
+                variants=list(set(texts)),
+                original_mentions=mentions
+            )
+            self._register_entity(linked_entity, vectors[positions])
+            touched[unique_id] = linked_entity
+        
+        linked_entities = list(touched.values())
+        self._update_cache(linked_entities)
+        self._index_entities(list(touched.keys()))
+        
+        logger.info(f"Incremental linking: {len(entities)} mentions, "
+                    f"{len(entities) - len(unmatched)} linked via index, {len(linked_entities)} entities touched")
+        return linked_entities
+    
+    def _register_entity(self, linked_entity: LinkedEntity, mention_vectors: np.ndarray):
+        """登记实体及其提及向量（同ID的实体会合并）"""
+        unique_id = linked_entity.unique_id
+        if unique_id in self._linked_by_id and self._linked_by_id[unique_id] is not linked_entity:
+            existing = self._linked_by_id[unique_id]
+            for mention, vector in zip(linked_entity.original_mentions, mention_vectors):
+                self._add_mention(existing, mention, vector)
+            return
+        self._linked_by_id[unique_id] = linked_entity
+        self._vector_sums[unique_id] = mention_vectors.sum(axis=0)
+        self._mention_counts[unique_id] = len(mention_vectors)
+    
+    def _add_mention(self, linked_entity: LinkedEntity, mention: Dict[str, Any], vector: np.ndarray):
+        """把新提及并入已有实体并更新其向量和"""
+        linked_entity.original_mentions.append(mention)
+        if mention["text"] not in linked_entity.variants:
+            linked_entity.variants.append(mention["text"])
+        unique_id = linked_entity.unique_id
+        self._vector_sums[unique_id] = self._vector_sums[unique_id] + vector
+        self._mention_counts[unique_id] += 1
+    
+    def _index_entities(self, unique_ids: List[str]):
+        """把实体的平均上下文向量写入索引"""
+        unique_ids = list(dict.fromkeys(unique_ids))
+        if not unique_ids:
+            return
+        centroids = np.vstack([self._vector_sums[uid] / self._mention_counts[uid] for uid in unique_ids])
+        self.vector_index.add(unique_ids, centroids)
+    
+    def save_index(self, index_dir: str):
+        """将向量索引和已链接实体保存到目录"""
+        directory = Path(index_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.vector_index.save(directory / self.INDEX_FILE)
+        
+        entities = []
+        for unique_id, linked_entity in self._linked_by_id.items():
+            record = asdict(linked_entity)
+            record["vector_sum"] = self._vector_sums[unique_id].tolist()
+            record["mention_count"] = self._mention_counts[unique_id]
+            entities.append(record)
+        with open(directory / self.ENTITIES_FILE, "w", encoding="utf-8") as f:
+            json.dump(entities, f, ensure_ascii=False)
+        logger.info(f"Saved entity index with {len(entities)} entities to {directory}")
+    
+    def load_index(self, index_dir: str):
+        """从目录加载之前保存的向量索引和已链接实体"""
+        directory = Path(index_dir)
+        self.vector_index = EntityVectorIndex.load(directory / self.INDEX_FILE)
+        with open(directory / self.ENTITIES_FILE, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        
+        self._linked_by_id, self._vector_sums, self._mention_counts = {}, {}, {}
+        for record in records:
+            vector_sum = np.asarray(record.pop("vector_sum"), dtype=np.float32)
+            mention_count = record.pop("mention_count")
+            linked_entity = LinkedEntity(**record)
+            self._linked_by_id[linked_entity.unique_id] = linked_entity
+            self._vector_sums[linked_entity.unique_id] = vector_sum
+            self._mention_counts[linked_entity.unique_id] = mention_count
+        self._update_cache(list(self._linked_by_id.values()))
+        logger.info(f"Loaded entity index with {len(records)} entities from {directory}")
+    
     def _convert_to_linked_entities(self, 
                                    disambiguated: List[DisambiguatedEntity],
                                    original_entities: List[str],
@@ -137,12 +302,7 @@ class EntityLinker:
                     original_mentions.append(mention)
             
             # 确定实体类型 - 使用最常见的类型
-            type_counts = {}
-            for mention in original_mentions:
-                entity_type = mention["type"]
-                type_counts[entity_type] = type_counts.get(entity_type, 0) + 1
-            
-            primary_type = max(type_counts.keys(), key=lambda k: type_counts[k]) if type_counts else "UNKNOWN"
+            primary_type = self._primary_type(original_mentions)
             
             # 创建LinkedEntity对象
             linked_entity = LinkedEntity(
@@ -158,6 +318,16 @@ class EntityLinker:
         
         return linked_entities
     
+    @staticmethod
+    def _primary_type(mentions: List[Dict[str, Any]]) -> str:
+        """提及中最常见的实体类型"""
+        type_counts = {}
+        for mention in mentions:
+            entity_type = mention["type"]
+            type_counts[entity_type] = type_counts.get(entity_type, 0) + 1
+        
+        return max(type_counts.keys(), key=lambda k: type_counts[k]) if type_counts else "UNKNOWN"
+    
     def _update_cache(self, linked_entities: List[LinkedEntity]):
         """更新实体缓存，提高后续处理效率"""
         for entity in linked_entities:
@@ -190,7 +360,9 @@ class EntityLinker:
             "cached_entities": len(self._entity_cache),
             "unique_entities": unique_entities,
             "disambiguation_threshold": self.disambiguator.similarity_threshold,
-            "spacy_model": self.disambiguator.nlp.meta.get("name", "unknown")
+            "spacy_model": self.disambiguator.nlp.meta.get("name", "unknown"),
+            "vector_cache": self.disambiguator.get_cache_stats(),
+            "indexed_entities": len(self.vector_index)
         }
 
 # 为了保持向后兼容性，提供一个简化的函数接口
@@ -0,0 +1,86 @@
+"""
+Neo4j会话模式基准测试
+对一个运行中的Neo4j实例比较两种执行只读查询的方式:
+  - per-call: 每条查询新开一个会话并自动提交 (原 _execute_query 的做法)
+  - uow:      unit_of_work 中一个会话、一个托管读事务执行同一组查询 (execute_read)
+
+每轮执行 get_knowledge_graph_summary 的两条统计查询加 --lookups 次按ID查询，
+并发 --concurrency 个请求，报告每轮平均耗时。
+
+用法: python scripts/benchmark_neo4j_sessions.py --uri bolt://localhost:7687 --password ... [--rounds 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from neo4j import Query
+from services.knowledge_graph.neo4j_emc_service import Neo4jEMCService
+
+NODE_QUERY = """
+MATCH (n)
+WITH labels(n)[0] as label, count(n) as count
+RETURN collect({type: label, count: count}) as node_stats
+"""
+REL_QUERY = """
+MATCH ()-[r]->()
+WITH type(r) as rel_type, count(r) as count
+RETURN collect({type: rel_type, count: count}) as rel_stats
+"""
+LOOKUP_QUERY = "MATCH (n {id: $id}) RETURN n.id as id, properties(n) as props"
+
+
+def statements(lookups: int):
+    return [(NODE_QUERY, {}), (REL_QUERY, {})] + [(LOOKUP_QUERY, {"id": f"bench_{i}"}) for i in range(lookups)]
+
+
+async def per_call_round(service: Neo4jEMCService, lookups: int):
+    for query_str, parameters in statements(lookups):
+        async with service.driver.session() as session:
+            result = await session.run(Query(query_str), parameters)
+            [record.data() async for record in result]
+
+
+async def uow_round(service: Neo4jEMCService, lookups: int):
+    async with service.unit_of_work() as uow:
+        await uow.read_batch(statements(lookups))
+
+
+async def measure(label: str, round_func, service: Neo4jEMCService, args):
+    await round_func(service, args.lookups)  # 预热连接池
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        await asyncio.gather(*(round_func(service, args.lookups) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    per_round = elapsed / (args.rounds * args.concurrency) * 1000
+    print(f"  {label:<9} {elapsed:8.2f}s  每轮 {per_round:7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("EMC_NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("EMC_NEO4J_USER", "neo4j"))
+    parser.add_argument("--password", default=os.getenv("EMC_NEO4J_PASSWORD", "password"))
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=5)
+    parser.add_argument("--fetch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    service = Neo4jEMCService(args.uri, args.user, args.password, fetch_size=args.fetch_size)
+    if not await service.connect():
+        raise SystemExit("无法连接到Neo4j")
+    try:
+        print(f"{args.rounds} 轮 x {args.concurrency} 并发, 每轮 {2 + args.lookups} 条查询")
+        await measure("per-call", per_call_round, service, args)
+        await measure("uow", uow_round, service, args)
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
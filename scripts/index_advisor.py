@@ -0,0 +1,52 @@
+"""
+Neo4j索引顾问
+读取查询日志（每行一个Cypher查询，或JSON行的 "query" 字段，如Neo4j的JSON格式query.log），
+找出没有索引支撑的标签/属性查找。默认连接Neo4j读取现有索引；--offline 时对照本体生成的配置计划。
+
+用法: python scripts/index_advisor.py query.log [--offline] [--uri bolt://localhost:7687 --password ...]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from services.knowledge_graph.neo4j_emc_service import Neo4jEMCService
+from services.knowledge_graph.schema_provisioner import (
+    advise_indexes, build_schema_plan, indexes_from_plan, load_query_templates
+)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="查询日志文件")
+    parser.add_argument("--offline", action="store_true", help="不连接数据库，对照本体配置计划")
+    parser.add_argument("--uri", default=os.getenv("EMC_NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("EMC_NEO4J_USER", "neo4j"))
+    parser.add_argument("--password", default=os.getenv("EMC_NEO4J_PASSWORD", "password"))
+    args = parser.parse_args()
+
+    templates = load_query_templates(args.log)
+    if args.offline:
+        advice = advise_indexes(templates, indexes_from_plan(build_schema_plan()))
+    else:
+        service = Neo4jEMCService(args.uri, args.user, args.password)
+        if not await service.connect():
+            raise SystemExit("无法连接到Neo4j，可使用 --offline")
+        try:
+            advice = await service.advise_indexes(templates)
+        finally:
+            await service.close()
+
+    print(f"分析 {len(templates)} 条查询，发现 {len(advice)} 处缺少索引的查找")
+    for item in advice:
+        target = f"{item.label or '(无标签)'}.{item.property}"
+        suggestion = f"建议 {item.suggested.upper()} 索引" if item.suggested else "需改写查询"
+        print(f"  {target:<36} {item.operator:<12} {item.occurrences:>5} 次  {suggestion} - {item.reason}")
+        print(f"      例: {item.example[:160]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+:Entity 标签回填迁移（一次性，可在线执行）
+为已有图谱中所有节点补上共享的 :Entity 标签（没有 id 的节点补一个 UUID），
+使按 id 的查找可以使用 :Entity(id) 唯一约束，而不是全图扫描。
+分批提交，每批 --batch-size 个节点；中断后可重新执行。存在重复 id 时不做修改并列出冲突。
+
+用法: python scripts/migrate_entity_label.py --uri bolt://localhost:7687 --password ... [--batch-size 10000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from services.knowledge_graph.neo4j_emc_service import Neo4jEMCService
+from services.knowledge_graph.schema_provisioner import ENTITY_BACKFILL_BATCH_SIZE
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("EMC_NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("EMC_NEO4J_USER", "neo4j"))
+    parser.add_argument("--password", default=os.getenv("EMC_NEO4J_PASSWORD", "password"))
+    parser.add_argument("--batch-size", type=int, default=ENTITY_BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    service = Neo4jEMCService(args.uri, args.user, args.password)
+    if not await service.connect():
+        raise SystemExit("无法连接到Neo4j")
+    try:
+        # 先确保 :Entity(id) 唯一约束存在，回填过程中即可防止新的重复
+        await service.ensure_constraints_and_indexes()
+        report = await service.migrate_entity_label(args.batch_size)
+    finally:
+        await service.close()
+
+    if report["duplicates"]:
+        print("存在被多个节点共用的 id，迁移未执行:")
+        for row in report["duplicates"]:
+            print(f"  {row['id']:<40} {row['nodes']:>4} 个节点  {row['labels']}")
+        raise SystemExit(1)
+    print(f"已标记 {report['labelled']} 个节点，剩余 {report['remaining']} 个")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
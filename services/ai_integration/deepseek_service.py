@@ -14,6 +14,11 @@ import aiohttp
 import openai
 from openai import AsyncOpenAI
 
+from .request_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestScheduler
+from .response_cache import ResponseCache
+from .session_store import ConversationStore, InMemorySessionStore, create_session_store
+from .token_utils import chunk_text
+
 
 @dataclass
 class DeepSeekConfig:
@@ -26,6 +31,15 @@ class DeepSeekConfig:
     top_p: float = 0.9
     timeout: int = 30
     max_retries: int = 3
+    max_concurrency: int = 8  # 同时发出的请求数上限（自适应窗口的最大值）
+    initial_concurrency: int = 4  # 自适应并发窗口的初始值
+    retry_base_delay: float = 0.5  # 指数退避的基础等待时间（秒）
+    retry_max_delay: float = 30.0  # 单次退避的最长等待时间（秒）
+    history_max_tokens: int = 3000  # 会话历史的token预算
+    summarize_history: bool = False  # 是否把超出预算的早期对话折叠为摘要
+    extraction_chunk_tokens: int = 3000  # 分块实体提取时每块文本的token预算
+    extraction_chunk_overlap_tokens: int = 200  # 相邻分块的重叠token数
+    extraction_concurrency: int = 4  # 分块实体提取的最大并发请求数
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -51,21 +65,39 @@ class EMCPromptTemplate:
 class DeepSeekService:
     """DeepSeek AI服务核心类"""
     
-    def __init__(self, config: DeepSeekConfig):
+    def __init__(
+        self,
+        config: DeepSeekConfig,
+        session_store: Optional[ConversationStore] = None,
+        response_cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
         self.config = config
+        # 重试由调度器负责，关闭客户端自带的重试
         self.client = AsyncOpenAI(
             api_key=config.api_key,
             base_url=config.base_url,
-            timeout=config.timeout
+            timeout=config.timeout,
+            max_retries=0
         )
         self.logger = logging.getLogger(__name__)
-        self._conversation_history: Dict[str, List[Dict]] = {}
+        self.session_store = session_store or InMemorySessionStore(max_history_tokens=config.history_max_tokens)
+        self.response_cache = response_cache
+        self.scheduler = scheduler or RequestScheduler(
+            max_concurrency=config.max_concurrency,
+            initial_concurrency=config.initial_concurrency,
+            max_retries=config.max_retries,
+            base_delay=config.retry_base_delay,
+            max_delay=config.retry_max_delay,
+            retryable_exceptions=(openai.APIConnectionError,)
+        )
         
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
         session_id: Optional[str] = None,
         stream: bool = False,
+        priority: int = PRIORITY_INTERACTIVE,
         **kwargs
     ) -> Union[Dict[str, Any], AsyncGenerator[Dict[str, Any], None]]:
         """
@@ -75,11 +107,13 @@ class DeepSeekService:
             messages: 消息列表，格式为[{"role": "user/assistant", "content": "..."}]
             session_id: 会话ID，用于维护对话历史
             stream: 是否启用流式响应
+            priority: 调度优先级，后台任务使用 PRIORITY_BACKGROUND
             **kwargs: 额外的API参数
         """
-        # 合并会话历史
-        if session_id and session_id in self._conversation_history:
-            messages = self._conversation_history[session_id] + messages
+        # 合并会话历史，只有本次新增的消息会写回历史
+        new_messages = messages
+        if session_id:
+            messages = await self.session_store.get_prompt_messages(session_id) + messages
         
         # API参数配置
         params = {
@@ -93,9 +127,9 @@ class DeepSeekService:
         
         try:
             if stream:
-                return self._stream_chat_completion(params, session_id)
+                return self._stream_chat_completion(params, session_id, new_messages, priority)
             else:
-                return await self._single_chat_completion(params, session_id)
+                return await self._single_chat_completion(params, session_id, new_messages, priority)
                 
         except Exception as e:
             self.logger.error(f"DeepSeek API调用失败: {str(e)}")
@@ -104,24 +138,35 @@ class DeepSeekService:
     async def _single_chat_completion(
         self, 
         params: Dict[str, Any], 
-        session_id: Optional[str]
+        session_id: Optional[str],
+        new_messages: Optional[List[Dict[str, str]]] = None,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> Dict[str, Any]:
-        """单次聊天完成"""
-        start_time = time.time()
-        
-        response = await self.client.chat.completions.create(**params)
-        
-        # 记录响应时间
-        response_time = time.time() - start_time
+        """单次聊天完成，配置了响应缓存时先查缓存"""
+        if self.response_cache:
+            result = await self.response_cache.get_or_fetch(params, lambda: self._request_completion(params, priority))
+        else:
+            result = await self._request_completion(params, priority)
         
         # 更新会话历史
         if session_id:
-            self._update_conversation_history(
+            await self._update_conversation_history(
                 session_id, 
-                params["messages"], 
-                response.choices[0].message.content
+                params["messages"] if new_messages is None else new_messages, 
+                result["content"]
             )
         
+        return result
+    
+    async def _request_completion(self, params: Dict[str, Any], priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """经调度器调用上游接口完成一次非流式请求"""
+        start_time = time.time()
+        
+        response = await self.scheduler.run(lambda: self.client.chat.completions.create(**params), priority)
+        
+        # 记录响应时间
+        response_time = time.time() - start_time
+        
         return {
             "id": response.id,
             "content": response.choices[0].message.content,
@@ -138,13 +183,16 @@ class DeepSeekService:
     async def _stream_chat_completion(
         self, 
         params: Dict[str, Any], 
-        session_id: Optional[str]
+        session_id: Optional[str],
+        new_messages: Optional[List[Dict[str, str]]] = None,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """流式聊天完成"""
+        """流式聊天完成，调度器只负责建立流（收到首个响应前可重试）"""
         full_content = ""
         start_time = time.time()
         
-        async for chunk in await self.client.chat.completions.create(**params):
+        stream = await self.scheduler.run(lambda: self.client.chat.completions.create(**params), priority)
+        async for chunk in stream:
             if chunk.choices[0].delta.content:
                 content = chunk.choices[0].delta.content
                 full_content += content
@@ -160,9 +208,9 @@ class DeepSeekService:
         # 最终响应
         response_time = time.time() - start_time
         if session_id:
-            self._update_conversation_history(
+            await self._update_conversation_history(
                 session_id, 
-                params["messages"], 
+                params["messages"] if new_messages is None else new_messages, 
                 full_content
             )
         
@@ -175,29 +223,37 @@ class DeepSeekService:
             "response_time": response_time
         }
     
-    def _update_conversation_history(
+    async def _update_conversation_history(
         self, 
         session_id: str, 
         messages: List[Dict], 
         response: str
     ):
-        """更新对话历史"""
-        if session_id not in self._conversation_history:
-            self._conversation_history[session_id] = []
-        
-        # 添加用户消息和助手响应
-        if messages:
-            self._conversation_history[session_id].extend(messages)
-        
-        self._conversation_history[session_id].append({
-            "role": "assistant",
-            "content": response
-        })
-        
-        # 限制历史长度，保留最近20条消息
-        if len(self._conversation_history[session_id]) > 20:
-            self._conversation_history[session_id] = \
-                self._conversation_history[session_id][-20:]
+        """更新对话历史：写入本次消息和助手响应，按token预算裁剪"""
+        await self.session_store.append(
+            session_id,
+            list(messages) + [{"role": "assistant", "content": response}],
+            summarizer=self._summarize_history if self.config.summarize_history else None
+        )
+
+    async def _summarize_history(
+        self,
+        previous_summary: Optional[str],
+        dropped_messages: List[Dict[str, str]]
+    ) -> str:
+        """把超出token预算的早期对话与已有摘要合并为新的摘要"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped_messages)
+        prompt = (
+            "请将以下EMC对话内容压缩为简洁的摘要，保留标准编号、设备信息、测试数据和已得出的结论。\n\n"
+            f"已有摘要：\n{previous_summary or '无'}\n\n新增对话：\n{transcript}"
+        )
+        response = await self.scheduler.run(lambda: self.client.chat.completions.create(
+            model=self.config.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max(self.config.history_max_tokens // 4, 200),
+            temperature=0.2
+        ), PRIORITY_BACKGROUND)
+        return response.choices[0].message.content
 
 
 class EMCPromptManager:
@@ -326,10 +382,19 @@ class EMCPromptManager:
 class DeepSeekEMCService:
     """面向EMC应用的DeepSeek服务封装"""
     
-    def __init__(self, config: DeepSeekConfig):
-        self.deepseek = DeepSeekService(config)
+    def __init__(
+        self,
+        config: DeepSeekConfig,
+        session_store: Optional[ConversationStore] = None,
+        response_cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        self.deepseek = DeepSeekService(
+            config, session_store=session_store, response_cache=response_cache, scheduler=scheduler
+        )
         self.prompt_manager = EMCPromptManager()
         self.logger = logging.getLogger(__name__)
+        self._extraction_semaphore = asyncio.Semaphore(max(1, config.extraction_concurrency))
     
     async def analyze_emc_document(
         self, 
@@ -376,7 +441,8 @@ class DeepSeekEMCService:
     async def extract_entities_from_text(
         self,
         text_content: str,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> Dict[str, Any]:
         """从文本中提取EMC实体和关系"""
         prompt = self.prompt_manager.format_template(
@@ -389,9 +455,42 @@ class DeepSeekEMCService:
         return await self.deepseek.chat_completion(
             messages=messages,
             session_id=session_id,
+            priority=priority,
             temperature=0.1  # 实体提取需要高度一致性
         )
     
+    async def extract_entities_chunked(
+        self,
+        text_content: str,
+        priority: int = PRIORITY_BACKGROUND
+    ) -> List[Dict[str, Any]]:
+        """
+        分块提取EMC实体和关系
+
+        按段落/章节边界把文本切成不超过 extraction_chunk_tokens 的重叠分块，
+        在 extraction_concurrency 并发限制下逐块调用模型（不使用会话历史）。
+        返回按分块顺序排列的结果，每项含 chunk_index、start、end、text，
+        以及成功时的 response 或失败时的 error。
+        """
+        config = self.deepseek.config
+        chunks = chunk_text(
+            text_content,
+            max_tokens=config.extraction_chunk_tokens,
+            overlap_tokens=config.extraction_chunk_overlap_tokens
+        )
+
+        async def extract_chunk(chunk) -> Dict[str, Any]:
+            result = {"chunk_index": chunk.index, "start": chunk.start, "end": chunk.end, "text": chunk.text}
+            async with self._extraction_semaphore:
+                try:
+                    result["response"] = await self.extract_entities_from_text(chunk.text, priority=priority)
+                except Exception as e:
+                    self.logger.warning(f"分块 {chunk.index} ({chunk.start}-{chunk.end}) 实体提取失败: {str(e)}")
+                    result["error"] = str(e)
+            return result
+
+        return list(await asyncio.gather(*(extract_chunk(chunk) for chunk in chunks)))
+    
     async def interactive_chat(
         self,
         user_message: str,
@@ -425,19 +524,26 @@ class DeepSeekEMCService:
             temperature=0.7  # 对话保持适度创造性
         )
     
-    def clear_session(self, session_id: str):
+    async def clear_session(self, session_id: str):
         """清除会话历史"""
-        if session_id in self.deepseek._conversation_history:
-            del self.deepseek._conversation_history[session_id]
+        await self.deepseek.session_store.clear(session_id)
     
-    def get_session_history(self, session_id: str) -> List[Dict[str, str]]:
+    async def get_session_history(self, session_id: str) -> List[Dict[str, str]]:
         """获取会话历史"""
-        return self.deepseek._conversation_history.get(session_id, [])
+        return await self.deepseek.session_store.get_history(session_id)
 
 
 # 使用示例和配置
-def create_deepseek_service(api_key: str) -> DeepSeekEMCService:
-    """创建DeepSeek EMC服务实例"""
+def create_deepseek_service(
+    api_key: str,
+    session_store: Optional[ConversationStore] = None,
+    response_cache: Optional[ResponseCache] = None
+) -> DeepSeekEMCService:
+    """
+    创建DeepSeek EMC服务实例
+
+    多进程部署时可传入 RedisSessionStore 共享会话；传入 ResponseCache 时相同的低温度请求复用缓存的响应
+    """
     config = DeepSeekConfig(
         api_key=api_key,
         model="deepseek-chat",  # 或使用其他DeepSeek模型
@@ -445,7 +551,45 @@ def create_deepseek_service(api_key: str) -> DeepSeekEMCService:
         temperature=0.7
     )
     
-    return DeepSeekEMCService(config)
+    return DeepSeekEMCService(config, session_store=session_store, response_cache=response_cache)
+
+
+def create_deepseek_service_from_settings(settings: Any) -> DeepSeekEMCService:
+    """按网关配置（gateway.config.Settings）中的 deepseek_* 配置项创建DeepSeek EMC服务实例"""
+    config = DeepSeekConfig(
+        api_key=settings.deepseek_api_key,
+        base_url=settings.deepseek_base_url,
+        model=settings.deepseek_model,
+        max_tokens=settings.deepseek_max_tokens,
+        temperature=settings.deepseek_temperature,
+        timeout=settings.deepseek_timeout,
+        max_retries=settings.deepseek_max_retries,
+        max_concurrency=settings.deepseek_max_concurrency,
+        initial_concurrency=settings.deepseek_initial_concurrency,
+        retry_base_delay=settings.deepseek_retry_base_delay,
+        retry_max_delay=settings.deepseek_retry_max_delay,
+        history_max_tokens=settings.deepseek_history_max_tokens,
+        summarize_history=settings.deepseek_summarize_history,
+        extraction_chunk_tokens=settings.deepseek_extraction_chunk_tokens,
+        extraction_chunk_overlap_tokens=settings.deepseek_extraction_chunk_overlap_tokens,
+        extraction_concurrency=settings.deepseek_extraction_concurrency
+    )
+    session_store = create_session_store(
+        settings.deepseek_session_backend,
+        redis_url=settings.redis_url,
+        max_sessions=settings.deepseek_max_sessions,
+        max_history_tokens=settings.deepseek_history_max_tokens,
+        ttl_seconds=settings.deepseek_session_ttl
+    )
+    response_cache = None
+    if settings.deepseek_response_cache_enabled:
+        response_cache = ResponseCache(
+            settings.deepseek_response_cache_path,
+            max_bytes=settings.deepseek_response_cache_max_mb * 1024 * 1024,
+            max_temperature=settings.deepseek_response_cache_max_temperature
+        )
+    
+    return DeepSeekEMCService(config, session_store=session_store, response_cache=response_cache)
 
 
 # 异步上下文管理器用于服务生命周期管理
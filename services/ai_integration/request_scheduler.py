@@ -0,0 +1,187 @@
+"""
+DeepSeek请求调度
+客户端侧的自适应并发控制（AIMD）、带抖动的指数退避重试，以及按优先级排队：
+交互式请求（如 /chat）先于后台文件提取获得并发名额
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+# 优先级，数值越小越先获得并发名额
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# 触发重试的HTTP状态码；其中429和5xx表示上游过载，会收缩并发窗口
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429})
+
+
+def _is_overload_status(status_code: Optional[int]) -> bool:
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """从异常携带的响应头中读取 retry-after-ms 或 Retry-After（秒数或HTTP日期）"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms is not None:
+            return max(0.0, float(retry_after_ms) / 1000)
+    except ValueError:
+        pass
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    AIMD并发窗口 + 重试 + 优先级队列
+
+    并发窗口成功时每个请求加 1/窗口（约每轮加1），遇到429/5xx时乘以 decrease_factor；
+    同一轮中先于上次收缩发出的请求失败不会再次收缩。可重试的失败在释放名额后按
+    Retry-After 或带抖动的指数退避等待，再重新排队，最多重试 max_retries 次。
+    retryable_exceptions 指定无状态码但可重试的异常（如连接错误）。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        decrease_factor: float = 0.5,
+        retryable_exceptions: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.decrease_factor = decrease_factor
+        self.retryable_exceptions = retryable_exceptions
+        self.window = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.logger = logging.getLogger(__name__)
+
+        self._active = 0
+        self._epoch = 0  # 每次收缩窗口加1
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._stats = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "throttled": 0}
+
+    @property
+    def limit(self) -> int:
+        """当前允许的并发请求数"""
+        return max(self.min_concurrency, int(self.window))
+
+    async def run(self, call: Callable[[], Awaitable[T]], priority: int = PRIORITY_INTERACTIVE) -> T:
+        """在并发限制下执行 call，可重试的失败按退避策略重试"""
+        self._stats["requests"] += 1
+        attempt = 0
+        while True:
+            epoch = await self._acquire(priority)
+            try:
+                result = await call()
+            except Exception as e:
+                status_code = getattr(e, "status_code", None)
+                if _is_overload_status(status_code):
+                    self._on_overload(epoch)
+                if not self._is_retryable(e, status_code) or attempt >= self.max_retries:
+                    self._stats["failed"] += 1
+                    raise
+                delay = self._retry_delay(e, attempt)
+            else:
+                self._on_success()
+                return result
+            finally:
+                self._release()
+
+            attempt += 1
+            self._stats["retries"] += 1
+            self.logger.warning(f"DeepSeek请求失败，{delay:.2f}秒后第{attempt}次重试 (并发窗口 {self.limit})")
+            await asyncio.sleep(delay)
+
+    def _is_retryable(self, exc: Exception, status_code: Optional[int]) -> bool:
+        if status_code is not None:
+            return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+        return isinstance(exc, self.retryable_exceptions)
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> float:
+        """优先使用服务端给出的 Retry-After，否则为带抖动的指数退避（上限的一半到全部之间）"""
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            return retry_after
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    async def _acquire(self, priority: int) -> int:
+        """获取并发名额，返回获取时的窗口轮次"""
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return self._epoch
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 名额已分配但等待方被取消时归还名额
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        return self._epoch
+
+    def _release(self):
+        self._active -= 1
+        self._wake()
+
+    def _wake(self):
+        """按优先级把空出的名额分给等待中的请求，跳过已取消的等待方"""
+        while self._waiters and self._active < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._active += 1
+            future.set_result(None)
+
+    def _on_success(self):
+        self._stats["succeeded"] += 1
+        self.window = min(float(self.max_concurrency), self.window + 1 / self.window)
+        self._wake()
+
+    def _on_overload(self, epoch: int):
+        self._stats["throttled"] += 1
+        if epoch != self._epoch:
+            return
+        self._epoch += 1
+        self.window = max(float(self.min_concurrency), self.window * self.decrease_factor)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计信息"""
+        return {
+            **self._stats,
+            "concurrency_limit": self.limit,
+            "window": round(self.window, 2),
+            "active": self._active,
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done())
+        }
@@ -0,0 +1,199 @@
+"""
+DeepSeek响应缓存
+按 (model, messages, temperature, max_tokens, top_p) 的哈希把非流式响应缓存在本地SQLite中，
+总大小超过上限时按最近最少使用顺序淘汰；相同的并发请求只调用一次上游接口
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# 参与缓存键计算的请求参数
+CACHE_KEY_PARAMS = ("model", "messages", "temperature", "max_tokens", "top_p")
+
+
+class _FetchCancelled(Exception):
+    """发起上游请求的一方被取消，等待同一结果的请求需要重试"""
+
+
+class ResponseCache:
+    """
+    持久化的提示词-响应缓存
+
+    只有确定性足够高的请求（非流式，temperature 不超过 max_temperature）会被缓存，
+    其他请求直接调用上游。get_or_fetch 在未命中时合并相同的并发请求：
+    第一个请求调用上游，其余请求等待同一结果。
+    get / put 是同步的SQLite操作，get_or_fetch 在默认线程池中执行它们，不阻塞事件循环。
+    """
+
+    def __init__(
+        self,
+        db_path: str = "./uploads/deepseek_response_cache.sqlite3",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_temperature: float = 0.3
+    ):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_temperature = max_temperature
+        self.logger = logging.getLogger(__name__)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS deepseek_responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_deepseek_responses_accessed ON deepseek_responses (accessed_at)"
+            )
+            self._entries, self._total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM deepseek_responses"
+            ).fetchone()
+
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {"requests": 0, "hits": 0, "coalesced": 0, "misses": 0, "bypassed": 0, "saved_tokens": 0}
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """生成缓存键"""
+        data = json.dumps({name: params.get(name) for name in CACHE_KEY_PARAMS}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, params: Dict[str, Any]) -> bool:
+        """流式请求和高温度采样的结果不可复现，不缓存"""
+        return not params.get("stream") and (params.get("temperature") or 0.0) <= self.max_temperature
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的响应，未命中返回 None"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT response FROM deepseek_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE deepseek_responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """写入响应，必要时淘汰最久未使用的条目"""
+        data = json.dumps(response, ensure_ascii=False, default=str)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            self.logger.info(f"响应大小 {size} 字节超过缓存上限，不缓存")
+            return
+
+        with self._lock, self._conn:
+            previous = self._conn.execute("SELECT size FROM deepseek_responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO deepseek_responses (key, response, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time())
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._entries += 0 if previous else 1
+            self._evict()
+
+    def _evict(self):
+        """按最近最少使用顺序淘汰，直到总大小不超过上限（调用方持有锁）"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM deepseek_responses ORDER BY accessed_at ASC").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM deepseek_responses WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self._entries -= 1
+
+    async def get_or_fetch(
+        self,
+        params: Dict[str, Any],
+        fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        返回请求的响应：命中缓存时直接返回（带 cached=True），
+        相同请求正在进行时等待其结果，否则调用 fetch 并缓存结果。
+        发起上游请求的一方被取消时，等待方不会收到 CancelledError，而是重新查找或自行发起请求。
+        """
+        if not self.is_cacheable(params):
+            self._stats["bypassed"] += 1
+            return await fetch()
+
+        self._stats["requests"] += 1
+        key = self.make_key(params)
+        loop = asyncio.get_running_loop()
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                cached = await loop.run_in_executor(None, self.get, key)
+                if cached is not None:
+                    self._stats["hits"] += 1
+                    self._stats["saved_tokens"] += cached.get("usage", {}).get("total_tokens", 0)
+                    return {**cached, "cached": True}
+                # 查询缓存期间可能已有相同的请求发起
+                inflight = self._inflight.get(key)
+
+            if inflight is None:
+                return await self._fetch_and_put(key, fetch, loop)
+
+            try:
+                # shield: 等待方被取消时不影响正在进行的上游请求
+                response = await asyncio.shield(inflight)
+            except _FetchCancelled:
+                continue
+            self._stats["coalesced"] += 1
+            self._stats["saved_tokens"] += response.get("usage", {}).get("total_tokens", 0)
+            return {**response, "cached": True}
+
+    async def _fetch_and_put(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        loop: asyncio.AbstractEventLoop
+    ) -> Dict[str, Any]:
+        """调用上游并写入缓存；写入完成前相同的请求继续等待本次结果，而不是重复调用上游"""
+        self._stats["misses"] += 1
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                response = await fetch()
+            except asyncio.CancelledError:
+                future.set_exception(_FetchCancelled())
+                future.exception()  # 没有等待方时避免 "exception was never retrieved" 警告
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()
+                raise
+
+            future.set_result(response)
+            try:
+                await loop.run_in_executor(None, self.put, key, response)
+            except sqlite3.Error as e:
+                self.logger.warning(f"响应缓存写入失败: {str(e)}")
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息（不访问数据库）"""
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "hit_ratio": (self._stats["hits"] + self._stats["coalesced"]) / requests if requests else 0.0,
+            "entries": self._entries,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
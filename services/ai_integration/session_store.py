@@ -0,0 +1,250 @@
+"""
+DeepSeek会话历史存储
+按token预算裁剪对话历史，可选地把被裁掉的早期对话折叠为摘要；
+支持进程内存储（LRU + TTL）和Redis兼容存储（多个网关进程共享会话）
+"""
+
+import abc
+import asyncio
+import json
+import logging
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .token_utils import estimate_message_tokens
+
+# 摘要函数：接收已有摘要和被裁掉的消息，返回新的摘要
+HistorySummarizer = Callable[[Optional[str], List[Dict[str, str]]], Awaitable[str]]
+
+
+@dataclass
+class ConversationSession:
+    """单个会话的历史"""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    summary: Optional[str] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> "ConversationSession":
+        return cls(**json.loads(data))
+
+
+class ConversationStore(abc.ABC):
+    """
+    会话历史存储基类
+
+    append 写入新消息后，从最早的消息开始丢弃，直到历史不超过 max_history_tokens；
+    传入 summarizer 时，丢弃的消息会与已有摘要合并为新摘要，作为一条系统消息放在历史最前面。
+    system 消息由每次请求自行携带，不写入历史。子类实现 _load / _save / _delete。
+
+    append 是 读取-修改-写回，同一进程内按会话加锁串行执行；不同进程（共享Redis时）
+    并发追加同一会话没有原子保证，后写入的一方会覆盖另一方刚追加的消息。
+    """
+
+    def __init__(self, max_history_tokens: int = 3000, ttl_seconds: int = 3600):
+        self.max_history_tokens = max_history_tokens
+        self.ttl_seconds = ttl_seconds
+        self.logger = logging.getLogger(__name__)
+        # 会话没有进行中的 append 时锁即被回收
+        self._append_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @abc.abstractmethod
+    async def _load(self, session_id: str) -> Optional[ConversationSession]:
+        """读取会话，不存在或已过期时返回 None"""
+
+    @abc.abstractmethod
+    async def _save(self, session_id: str, session: ConversationSession):
+        """写入会话"""
+
+    @abc.abstractmethod
+    async def _delete(self, session_id: str):
+        """删除会话"""
+
+    async def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        """获取会话中保存的消息（含时间戳），会话不存在时返回空列表"""
+        session = await self._load(session_id)
+        return list(session.messages) if session else []
+
+    async def get_prompt_messages(self, session_id: str) -> List[Dict[str, str]]:
+        """获取发送给模型的历史消息：摘要（如有）+ 保留的消息，只含 role 和 content"""
+        session = await self._load(session_id)
+        if not session:
+            return []
+        messages = [{"role": m["role"], "content": m["content"]} for m in session.messages]
+        if session.summary:
+            messages.insert(0, {"role": "system", "content": f"此前对话摘要：{session.summary}"})
+        return messages
+
+    async def append(
+        self,
+        session_id: str,
+        messages: List[Dict[str, str]],
+        summarizer: Optional[HistorySummarizer] = None
+    ):
+        """追加消息并按token预算裁剪"""
+        lock = self._append_locks.get(session_id)
+        if lock is None:
+            lock = self._append_locks[session_id] = asyncio.Lock()
+        async with lock:
+            await self._append(session_id, messages, summarizer)
+
+    async def _append(
+        self,
+        session_id: str,
+        messages: List[Dict[str, str]],
+        summarizer: Optional[HistorySummarizer]
+    ):
+        session = await self._load(session_id) or ConversationSession()
+        timestamp = datetime.now().isoformat()
+        session.messages.extend(
+            {"role": m["role"], "content": m["content"], "timestamp": timestamp}
+            for m in messages if m.get("role") != "system"
+        )
+
+        session.messages, dropped = self._trim(session.messages)
+        if dropped and summarizer:
+            try:
+                session.summary = await summarizer(
+                    session.summary, [{"role": m["role"], "content": m["content"]} for m in dropped]
+                )
+            except Exception as e:
+                self.logger.warning(f"会话 {session_id} 历史摘要生成失败，保留原摘要: {str(e)}")
+
+        session.updated_at = time.time()
+        await self._save(session_id, session)
+
+    async def clear(self, session_id: str):
+        """清除会话"""
+        await self._delete(session_id)
+
+    def _trim(self, messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """从最新的消息往前保留，直到超出token预算；返回 (保留的消息, 丢弃的消息)"""
+        budget = self.max_history_tokens
+        keep_from = len(messages)
+        while keep_from > 0:
+            cost = estimate_message_tokens(messages[keep_from - 1])
+            if cost > budget:
+                break
+            budget -= cost
+            keep_from -= 1
+        return messages[keep_from:], messages[:keep_from]
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        return {
+            "max_history_tokens": self.max_history_tokens,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+class InMemorySessionStore(ConversationStore):
+    """进程内会话存储：超过 max_sessions 时淘汰最久未访问的会话，超过 ttl_seconds 未访问的会话过期"""
+
+    def __init__(self, max_sessions: int = 1000, max_history_tokens: int = 3000, ttl_seconds: int = 3600):
+        super().__init__(max_history_tokens=max_history_tokens, ttl_seconds=ttl_seconds)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+
+    def _expired(self, session: ConversationSession) -> bool:
+        return self.ttl_seconds > 0 and time.time() - session.updated_at > self.ttl_seconds
+
+    async def _load(self, session_id: str) -> Optional[ConversationSession]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if self._expired(session):
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def _save(self, session_id: str, session: ConversationSession):
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def _delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        stats = await super().get_stats()
+        stats.update({"backend": "memory", "sessions": len(self._sessions), "max_sessions": self.max_sessions})
+        return stats
+
+
+class RedisSessionStore(ConversationStore):
+    """
+    Redis兼容的会话存储
+
+    每个会话是一个JSON字符串键，写入时设置 ttl_seconds 过期时间；
+    跨会话的容量淘汰由Redis的 maxmemory-policy（如 allkeys-lru）负责。
+    读取和写回之间没有 WATCH，多个进程并发追加同一会话时以最后写回的为准（见 ConversationStore）。
+    client 为 redis.asyncio.Redis 或接口兼容的客户端。
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_history_tokens: int = 3000,
+        ttl_seconds: int = 3600,
+        key_prefix: str = "emc:deepseek:session:"
+    ):
+        super().__init__(max_history_tokens=max_history_tokens, ttl_seconds=ttl_seconds)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    async def _load(self, session_id: str) -> Optional[ConversationSession]:
+        data = await self.client.get(self._key(session_id))
+        if data is None:
+            return None
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return ConversationSession.from_json(data)
+
+    async def _save(self, session_id: str, session: ConversationSession):
+        await self.client.set(self._key(session_id), session.to_json(), ex=self.ttl_seconds or None)
+
+    async def _delete(self, session_id: str):
+        await self.client.delete(self._key(session_id))
+
+    async def get_stats(self) -> Dict[str, Any]:
+        stats = await super().get_stats()
+        stats["backend"] = "redis"
+        return stats
+
+
+def create_session_store(
+    backend: str = "memory",
+    redis_url: Optional[str] = None,
+    max_sessions: int = 1000,
+    max_history_tokens: int = 3000,
+    ttl_seconds: int = 3600
+) -> ConversationStore:
+    """按配置创建会话存储，backend 为 memory 或 redis"""
+    if backend == "redis":
+        if not redis_url:
+            raise ValueError("Redis会话存储需要提供 redis_url")
+        import redis.asyncio as redis_asyncio
+        return RedisSessionStore(
+            redis_asyncio.from_url(redis_url),
+            max_history_tokens=max_history_tokens,
+            ttl_seconds=ttl_seconds
+        )
+    if backend != "memory":
+        raise ValueError(f"未知的会话存储类型: {backend}")
+    return InMemorySessionStore(
+        max_sessions=max_sessions,
+        max_history_tokens=max_history_tokens,
+        ttl_seconds=ttl_seconds
+    )
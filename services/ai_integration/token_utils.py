@@ -0,0 +1,112 @@
+"""
+Token估算与文本分块工具
+不依赖分词器，按DeepSeek公布的换算比例估算文本的token数：
+1个中文字符约0.6个token，1个英文字符约0.3个token
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数"""
+    if not text:
+        return 0
+    cjk_chars = len(text) - len(_CJK_PATTERN.sub('', text))
+    other_chars = len(text) - cjk_chars
+    return math.ceil(cjk_chars * CJK_TOKENS_PER_CHAR + other_chars * OTHER_TOKENS_PER_CHAR)
+
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    """估算单条聊天消息的token数"""
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    """估算消息列表的token数"""
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+@dataclass
+class TextChunk:
+    """文本分块，start/end 为在原文中的字符偏移"""
+    index: int
+    start: int
+    end: int
+    text: str
+
+
+# 段落边界（空行）之后、章节标题（如 "3.2 测试方法"、"第三章"、Markdown标题）之前可以切分
+_BLOCK_BOUNDARY_PATTERN = re.compile(
+    r'\n[ \t]*\n|\n(?=[ \t]*(?:\d+(?:\.\d+)*\.?[ \t]+\S|第[一二三四五六七八九十百\d]+[章节条]|#{1,6}[ \t]))'
+)
+_SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?;。！？；])\s*')
+
+
+def _split_points(text: str, start: int, end: int, pattern: re.Pattern) -> List[int]:
+    points = [match.end() for match in pattern.finditer(text, start, end) if start < match.end() < end]
+    return [start] + points + [end]
+
+
+def _units(text: str, max_tokens: int) -> List[Tuple[int, int, int]]:
+    """把文本切成不超过 max_tokens 的单元 (start, end, tokens)：先按段落/章节，再按句子，最后按字符数硬切"""
+    hard_cut_chars = max(1, int(max_tokens / max(CJK_TOKENS_PER_CHAR, OTHER_TOKENS_PER_CHAR)))
+    units = []
+    block_points = _split_points(text, 0, len(text), _BLOCK_BOUNDARY_PATTERN)
+    for block_start, block_end in zip(block_points, block_points[1:]):
+        tokens = estimate_tokens(text[block_start:block_end])
+        if tokens <= max_tokens:
+            units.append((block_start, block_end, tokens))
+            continue
+        sentence_points = _split_points(text, block_start, block_end, _SENTENCE_BOUNDARY_PATTERN)
+        for sentence_start, sentence_end in zip(sentence_points, sentence_points[1:]):
+            tokens = estimate_tokens(text[sentence_start:sentence_end])
+            if tokens <= max_tokens:
+                units.append((sentence_start, sentence_end, tokens))
+                continue
+            for cut_start in range(sentence_start, sentence_end, hard_cut_chars):
+                cut_end = min(cut_start + hard_cut_chars, sentence_end)
+                units.append((cut_start, cut_end, estimate_tokens(text[cut_start:cut_end])))
+    return units
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[TextChunk]:
+    """
+    按token预算切分文本
+
+    优先在段落和章节边界切分，超长段落再按句子切分。每块估算token数不超过 max_tokens；
+    overlap_tokens 大于0时，下一块从上一块末尾不超过该预算的若干完整单元开始，
+    使跨块的实体和关系在至少一块中完整出现。
+    """
+    if not text:
+        return []
+    units = _units(text, max_tokens)
+    chunks = []
+    first = 0
+    while first < len(units):
+        last, budget = first, max_tokens - units[first][2]
+        while last + 1 < len(units) and units[last + 1][2] <= budget:
+            last += 1
+            budget -= units[last][2]
+
+        start, end = units[first][0], units[last][1]
+        chunks.append(TextChunk(index=len(chunks), start=start, end=end, text=text[start:end]))
+        if last + 1 >= len(units):
+            break
+
+        # 回退若干单元作为下一块的重叠部分，但至少前进一个单元
+        next_first, overlap = last + 1, overlap_tokens
+        while next_first - 1 > first and units[next_first - 1][2] <= overlap:
+            next_first -= 1
+            overlap -= units[next_first][2]
+        first = next_first
+    return chunks
@@ -4,11 +4,15 @@ EMC文件处理服务
 """
 
 import asyncio
+import contextlib
 import json
 import logging
 import mimetypes
+import uuid
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple, Union, AsyncGenerator
+from typing import Dict, List, Optional, Any, Tuple, Union, AsyncGenerator, Awaitable, Callable
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import hashlib
@@ -24,7 +28,9 @@ import chardet
 
 # 自定义模块
 from .content_extractor import EMCContentExtractor
+from .extraction_cache import ExtractionCache
 from .format_converter import FormatConverter
+from .upload_stream import UPLOAD_CHUNK_SIZE, UploadedFile
 from ..ai_integration.deepseek_service import DeepSeekEMCService
 from ..knowledge_graph.graph_manager import EMCGraphManager
 
@@ -56,9 +62,83 @@ class ExtractionResult:
     extracted_at: datetime
 
 
+# AI提取失败时的摘要，这类结果不写入提取缓存
+AI_EXTRACTION_FAILED_SUMMARY = "提取失败"
+AI_INVOCATION_FAILED_SUMMARY = "AI extraction failed."
+
+# PDF边解析边构建图谱时，每累计这么多页作为一个窗口送入AI分块提取，最多同时提取的窗口数
+PDF_AI_WINDOW_PAGES = 8
+PDF_AI_WINDOWS_IN_FLIGHT = 2
+
+
+def _extraction_result_to_dict(result: ExtractionResult) -> Dict[str, Any]:
+    """ExtractionResult 转为可JSON序列化的字典"""
+    data = asdict(result)
+    data['extracted_at'] = result.extracted_at.isoformat()
+    return data
+
+
+def _extraction_result_from_dict(data: Dict[str, Any]) -> ExtractionResult:
+    """从缓存字典还原 ExtractionResult"""
+    return ExtractionResult(**{**data, 'extracted_at': datetime.fromisoformat(data['extracted_at'])})
+
+
+@dataclass
+class PdfPageChunk:
+    """流式PDF提取的单页内容"""
+    page_number: int  # 从1开始
+    text: str
+
+
+def _file_sha256(file_path: Path) -> str:
+    """按大块读取文件计算SHA256（阻塞调用，在线程池中执行）"""
+    sha256_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+def _pdf_page_count(file_path: str) -> int:
+    """读取PDF页数"""
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> List[PdfPageChunk]:
+    """
+    提取 [start, end) 页的文本和表格
+    
+    模块级函数，可在进程池中执行；每页处理完后释放 pdfplumber 的页面缓存。
+    """
+    chunks = []
+    with pdfplumber.open(file_path) as pdf:
+        for index in range(start, end):
+            page = pdf.pages[index]
+            page_parts = []
+            text = page.extract_text()
+            if text:
+                page_parts.append(text)
+            
+            # 提取表格
+            tables = page.extract_tables()
+            for table in tables:
+                table_text = "\n".join(["\t".join(row) for row in table if row])
+                if table_text:
+                    page_parts.append(f"\n[表格数据]\n{table_text}\n")
+            
+            page.flush_cache()
+            if page_parts:
+                chunks.append(PdfPageChunk(page_number=index + 1, text="\n\n".join(page_parts)))
+    return chunks
+
+
 class EMCFileProcessor:
     """EMC文件处理核心类"""
     
+    # 提取逻辑变化时递增，使旧的提取缓存条目失效
+    EXTRACTOR_VERSION = "1"
+    
     # 支持的文件格式
     SUPPORTED_FORMATS = {
         '.pdf': 'application/pdf',
@@ -74,7 +154,9 @@ class EMCFileProcessor:
         self, 
         deepseek_service: DeepSeekEMCService, # Assuming DeepSeekEMCService is correctly typed
         storage_path: str = "./uploads",
-        graph_manager: Optional[EMCGraphManager] = None # New argument
+        graph_manager: Optional[EMCGraphManager] = None, # New argument
+        extraction_cache: Optional[ExtractionCache] = None,
+        parse_executor: Optional[Executor] = None
     ):
         self.deepseek = deepseek_service
         self.storage_path = Path(storage_path)
@@ -94,6 +176,10 @@ class EMCFileProcessor:
 
         self.content_extractor = EMCContentExtractor()
         self.format_converter = FormatConverter()
+        # 按文件校验和缓存提取文本、AI提取结果和图谱构建摘要，为 None 时不缓存
+        self.extraction_cache = extraction_cache
+        # 共享的PDF解析进程池，为 None 时 stream_pdf_pages 按 max_workers 自行决定
+        self.parse_executor = parse_executor
         
         self._processing_stats = {
             'files_processed': 0,
@@ -101,19 +187,38 @@ class EMCFileProcessor:
             'relationships_found': 0,
             'processing_errors': 0,
             'graph_processing_invocation_errors': 0, # Renamed for clarity
-            'graph_processing_content_errors': 0
+            'graph_processing_content_errors': 0,
+            # 提取缓存按阶段统计：content（文本）、ai（AI提取结果）、graph（图谱构建）
+            'extraction_cache_content_hits': 0,
+            'extraction_cache_content_misses': 0,
+            'extraction_cache_ai_hits': 0,
+            'extraction_cache_ai_misses': 0,
+            'extraction_cache_graph_hits': 0,
+            'extraction_cache_graph_misses': 0
         }
     
     async def process_file(
         self, 
         file_path: Union[str, Path],
         file_id: Optional[str] = None,
-        trigger_graph_processing: bool = True # New flag
+        trigger_graph_processing: bool = True, # New flag
+        analysis_mode: str = "comprehensive",
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+        upload: Optional[UploadedFile] = None
     ) -> Tuple[FileMetadata, Optional[ExtractionResult]]:
         """
         处理单个文件
         返回元数据和提取结果
+        
+        upload 为上传时流式计算的元数据（校验和、MIME类型、编码），传入时不再重新读取文件计算。
+        
+        配置了 extraction_cache 时，按 (校验和, EXTRACTOR_VERSION, analysis_mode) 查找缓存，
+        命中的阶段（内容提取、AI提取、图谱构建）直接使用缓存结果。图谱构建结果另按 file_id 区分：
+        相同内容以新的 file_id 上传时仍会构建图谱，写入该文件自己的 Document 节点。
+        PDF需要构建图谱时，页面通过 process_document_stream 边解析边送入图谱构建。
+        progress_callback(progress, message) 在每个阶段完成后调用，progress 为0-100。
         """
+        report_progress = progress_callback or (lambda progress, message: None)
         file_path = Path(file_path)
         
         if not file_path.exists():
@@ -124,7 +229,8 @@ class EMCFileProcessor:
             file_id = self._generate_file_id(file_path)
         
         # 提取文件元数据
-        metadata = await self._extract_metadata(file_path, file_id)
+        metadata = await self._extract_metadata(file_path, file_id, upload)
+        report_progress(10.0, "文件元数据已提取，正在解析内容")
         
         # 验证文件格式
         if not self._is_supported_format(file_path):
@@ -132,57 +238,91 @@ class EMCFileProcessor:
             return metadata, None
         
         extraction_result: Optional[ExtractionResult] = None
+        graph_summary: Optional[Dict[str, Any]] = None
+        
+        cache_key = None
+        cached_entry: Dict[str, Any] = {}
+        if self.extraction_cache:
+            cache_key = ExtractionCache.make_key(metadata.checksum, self.EXTRACTOR_VERSION, analysis_mode)
+            cached_entry = await self.extraction_cache.get(cache_key) or {}
+            self._count_cache_lookup('content', 'content' in cached_entry)
+            self._count_cache_lookup('ai', bool(cached_entry.get('extraction_result')))
+            if trigger_graph_processing:
+                self._count_cache_lookup('graph', file_id in cached_entry.get('graph_summaries', {}))
+        cached_graph_summary = cached_entry.get('graph_summaries', {}).get(file_id)
 
+        # 需要构建图谱且无可用缓存的PDF，在解析页面的同时送入图谱构建
+        stream_pdf_into_graph = (
+            trigger_graph_processing and self.graph_manager is not None
+            and metadata.mime_type == 'application/pdf'
+            and 'content' not in cached_entry and cached_graph_summary is None
+        )
+        
+        # 流式PDF不在内存中保留全文：AI按页面窗口提取，需要写入缓存时全文逐页写入临时文件
+        content: Optional[str] = None
+        content_file: Optional[Path] = None
+        has_text = False
+        
         try:
             # 提取文件内容
-            content = await self._extract_content(file_path, metadata.mime_type)
+            if 'content' in cached_entry:
+                content = cached_entry['content']
+            elif stream_pdf_into_graph:
+                if cache_key:
+                    content_file = self.storage_path / "temp" / f".{file_id}.{uuid.uuid4().hex}.content"
+                    content_file.parent.mkdir(parents=True, exist_ok=True)
+                has_text, extraction_result, graph_summary = await self._stream_pdf_into_graph(
+                    file_path, file_id, metadata,
+                    extract_entities=not cached_entry.get('extraction_result'),
+                    content_file=content_file
+                )
+            else:
+                content = await self._extract_content(file_path, metadata.mime_type)
             
-            if not content.strip():
+            if not (content.strip() if content is not None else has_text):
                 metadata.extraction_status = "empty_content"
                 return metadata, None
+            report_progress(40.0, "文件内容解析完成，正在提取实体")
             
             # --- Current AI extraction (for ExtractionResult) ---
             # This part can remain for now, but its output (ExtractionResult) might be
             # less critical if graph_manager handles the primary structured data output.
-            try:
-                extraction_result = await self._extract_entities_with_ai(
-                    file_id, content, metadata # metadata is FileMetadata object
-                )
-                # Statistics for this extraction are handled within _extract_entities_with_ai
-            except Exception as e:
-                self.logger.error(f"Original _extract_entities_with_ai failed for {file_id}: {e}", exc_info=True)
-                # self._processing_stats['ai_invocation_errors'] += 1 # Assuming this was the old stat name
-                if extraction_result is None:
-                    extraction_result = ExtractionResult(
-                        file_id=file_id, entities=[], relationships=[], content_summary="AI extraction failed.",
-                        confidence_score=0.0, processing_time=0.0, extracted_at=datetime.now()
+            if cached_entry.get('extraction_result'):
+                extraction_result = _extraction_result_from_dict(cached_entry['extraction_result'])
+            elif stream_pdf_into_graph:
+                pass # 已在解析PDF时按页面窗口完成
+            else:
+                try:
+                    extraction_result = await self._extract_entities_with_ai(
+                        file_id, content, metadata # metadata is FileMetadata object
                     )
+                    # Statistics for this extraction are handled within _extract_entities_with_ai
+                except Exception as e:
+                    self.logger.error(f"Original _extract_entities_with_ai failed for {file_id}: {e}", exc_info=True)
+                    # self._processing_stats['ai_invocation_errors'] += 1 # Assuming this was the old stat name
+                    if extraction_result is None:
+                        extraction_result = ExtractionResult(
+                            file_id=file_id, entities=[], relationships=[], content_summary=AI_INVOCATION_FAILED_SUMMARY,
+                            confidence_score=0.0, processing_time=0.0, extracted_at=datetime.now()
+                        )
 
             # --- New: EMCGraphManager processing ---
             if trigger_graph_processing:
-                if self.graph_manager:
-                    self.logger.info(f"Calling EMCGraphManager to process document: {file_id}")
-                    try:
-                        # Convert FileMetadata object to dict for graph_manager
-                        metadata_dict = asdict(metadata) # Ensure asdict is imported from dataclasses
-                        graph_summary = await self.graph_manager.process_document_content(
+                report_progress(70.0, "实体提取完成，正在构建知识图谱")
+                if stream_pdf_into_graph:
+                    pass # 已在解析PDF时完成
+                elif cached_graph_summary is not None:
+                    graph_summary = cached_graph_summary
+                    self.logger.info(f"Using cached graph processing summary for {file_id}: {graph_summary.get('status')}")
+                elif self.graph_manager:
+                    graph_summary = await self._run_graph_processing(
+                        file_id, metadata,
+                        lambda metadata_dict: self.graph_manager.process_document_content(
                             text_content=content,
                             document_id=file_id,
                             document_metadata=metadata_dict
                         )
-                        self.logger.info(f"Graph processing summary for {file_id}: {graph_summary.get('status')}")
-                        if graph_summary.get("status") == "failed" or graph_summary.get("errors"):
-                            self._processing_stats['graph_processing_content_errors'] += 1
-                            # Update status only if it's not already a more severe failure
-                            if not metadata.extraction_status or "failed" not in metadata.extraction_status.lower():
-                                metadata.extraction_status = "completed_with_graph_errors"
-                        # Optionally, you could merge entities/rels from graph_summary into extraction_result if needed
-
-                    except Exception as e:
-                        self.logger.error(f"EMCGraphManager invocation failed for {file_id}: {e}", exc_info=True)
-                        self._processing_stats['graph_processing_invocation_errors'] += 1
-                        if not metadata.extraction_status or "failed" not in metadata.extraction_status.lower():
-                             metadata.extraction_status = "graph_processing_failed"
+                    )
                 else:
                     self.logger.warning(f"Graph manager not available for document {file_id}. Skipping graph processing.")
                     if not metadata.extraction_status or "failed" not in metadata.extraction_status.lower():
@@ -198,6 +338,12 @@ class EMCFileProcessor:
                  else: # This implies extraction_result might be None or have no entities
                       metadata.extraction_status = "completed_no_entities_found"
             
+            if cache_key:
+                await self._update_extraction_cache(
+                    cache_key, cached_entry, file_id, content, extraction_result, graph_summary, content_file
+                )
+            report_progress(95.0, "文件处理完成，正在整理结果")
+            
             return metadata, extraction_result
             
         except Exception as e:
@@ -205,6 +351,9 @@ class EMCFileProcessor:
             metadata.extraction_status = "failed_in_file_processing" # More specific outer failure
             self._processing_stats['processing_errors'] += 1
             return metadata, None
+        finally:
+            if content_file is not None:
+                content_file.unlink(missing_ok=True)
     
     async def batch_process_files(
         self, 
@@ -228,15 +377,199 @@ class EMCFileProcessor:
         for task in asyncio.as_completed(tasks):
             yield await task
     
+    async def _run_graph_processing(
+        self,
+        file_id: str,
+        metadata: FileMetadata,
+        process: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+    ) -> Optional[Dict[str, Any]]:
+        """调用 graph_manager 构建图谱（process 接收元数据字典），并据结果更新处理状态和统计"""
+        self.logger.info(f"Calling EMCGraphManager to process document: {file_id}")
+        try:
+            graph_summary = await process(asdict(metadata))
+        except Exception as e:
+            self.logger.error(f"EMCGraphManager invocation failed for {file_id}: {e}", exc_info=True)
+            self._processing_stats['graph_processing_invocation_errors'] += 1
+            if not metadata.extraction_status or "failed" not in metadata.extraction_status.lower():
+                metadata.extraction_status = "graph_processing_failed"
+            return None
+        
+        self.logger.info(f"Graph processing summary for {file_id}: {graph_summary.get('status')}")
+        if graph_summary.get("status") == "failed" or graph_summary.get("errors"):
+            self._processing_stats['graph_processing_content_errors'] += 1
+            # Update status only if it's not already a more severe failure
+            if not metadata.extraction_status or "failed" not in metadata.extraction_status.lower():
+                metadata.extraction_status = "completed_with_graph_errors"
+        return graph_summary
+    
+    async def _stream_pdf_into_graph(
+        self,
+        file_path: Path,
+        file_id: str,
+        metadata: FileMetadata,
+        extract_entities: bool = True,
+        content_file: Optional[Path] = None
+    ) -> Tuple[bool, Optional[ExtractionResult], Optional[Dict[str, Any]]]:
+        """
+        把 stream_pdf_pages 的页面逐页送入 graph_manager.process_document_stream，
+        后续页面仍在解析时即开始提取已返回页面中的实体。
+        
+        extract_entities 为真时，页面每 PDF_AI_WINDOW_PAGES 页组成一个窗口送入AI分块提取
+        （最多 PDF_AI_WINDOWS_IN_FLIGHT 个窗口同时进行），分块偏移与 _extract_pdf_content 返回的全文一致；
+        传入 content_file 时各页文本逐页追加写入该文件（供提取缓存使用）。内存中只保留进行中的窗口，不随页数增长。
+        返回 (是否有非空白文本, AI提取结果, 图谱处理摘要)。PDF解析失败时重新抛出解析异常，而不是记为图谱构建失败。
+        """
+        start_time = datetime.now()
+        parse_errors: List[Exception] = []
+        window: List[str] = []
+        in_flight: deque = deque()
+        chunk_results: List[Dict[str, Any]] = []
+        # 以下偏移和长度均按页面以空行连接后的全文计算
+        pages_seen = 0
+        content_length = 0
+        window_start = 0
+        has_text = False
+        summary_source = ""
+        
+        async def submit_window():
+            nonlocal window, window_start, summary_source
+            window_text = "\n\n".join(window)
+            window = []
+            summary_source = summary_source or window_text
+            if len(in_flight) >= PDF_AI_WINDOWS_IN_FLIGHT:
+                chunk_results.extend(await in_flight.popleft())
+            in_flight.append(asyncio.ensure_future(self._extract_pdf_window(window_text, window_start)))
+            window_start += len(window_text) + 2
+        
+        async def page_texts(content_out):
+            nonlocal pages_seen, content_length, has_text
+            try:
+                async for chunk in self.stream_pdf_pages(file_path):
+                    separator = "\n\n" if pages_seen else ""
+                    pages_seen += 1
+                    content_length += len(separator) + len(chunk.text)
+                    has_text = has_text or bool(chunk.text.strip())
+                    if content_out is not None:
+                        await content_out.write(separator + chunk.text)
+                    if extract_entities:
+                        window.append(chunk.text)
+                        if len(window) >= PDF_AI_WINDOW_PAGES:
+                            await submit_window()
+                    yield chunk.text
+            except Exception as e:
+                parse_errors.append(e)
+                raise
+        
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                content_out = None
+                if content_file is not None:
+                    content_out = await stack.enter_async_context(
+                        aiofiles.open(content_file, 'w', encoding='utf-8', newline='')
+                    )
+                graph_summary = await self._run_graph_processing(
+                    file_id, metadata,
+                    lambda metadata_dict: self.graph_manager.process_document_stream(
+                        page_texts(content_out),
+                        document_id=file_id,
+                        document_metadata=metadata_dict
+                    )
+                )
+            if parse_errors:
+                self.logger.error(f"内容提取失败: {file_path}, 错误: {str(parse_errors[0])}")
+                raise parse_errors[0]
+            
+            if window:
+                await submit_window()
+            while in_flight:
+                chunk_results.extend(await in_flight.popleft())
+        finally:
+            for task in in_flight:
+                task.cancel()
+        
+        extraction_result = None
+        if extract_entities and has_text:
+            extraction_result = self._build_extraction_result(
+                file_id, chunk_results, content_length, summary_source, start_time
+            )
+        return has_text, extraction_result, graph_summary
+    
+    async def _extract_pdf_window(self, window_text: str, window_start: int) -> List[Dict[str, Any]]:
+        """AI分块提取一个页面窗口，分块偏移平移到全文位置并立即解析，不保留分块文本"""
+        try:
+            chunk_results = await self.deepseek.extract_entities_chunked(window_text)
+        except Exception as e:
+            chunk_results = [{'chunk_index': 0, 'start': 0, 'end': len(window_text), 'text': window_text, 'error': str(e)}]
+        return [
+            self._resolve_chunk_extraction(
+                {**chunk, 'start': chunk['start'] + window_start, 'end': chunk['end'] + window_start}
+            )
+            for chunk in chunk_results
+        ]
+    
+    def _count_cache_lookup(self, stage: str, hit: bool):
+        """记录一次提取缓存查找，stage 为 content / ai / graph"""
+        self._processing_stats[f'extraction_cache_{stage}_{"hits" if hit else "misses"}'] += 1
+    
+    async def _update_extraction_cache(
+        self,
+        cache_key: str,
+        cached_entry: Dict[str, Any],
+        file_id: str,
+        content: Optional[str],
+        extraction_result: Optional[ExtractionResult],
+        graph_summary: Optional[Dict[str, Any]],
+        content_file: Optional[Path] = None
+    ):
+        """
+        把本次新完成的阶段写入提取缓存；失败的AI提取和未完全成功的图谱构建不缓存，图谱构建结果按 file_id 记录
+        
+        content 为 None 时全文从 content_file 分块写入缓存（流式PDF）。
+        """
+        entry = dict(cached_entry) if content is None else {'content': content, **cached_entry}
+        if (extraction_result and 'extraction_result' not in entry
+                and extraction_result.content_summary not in (AI_EXTRACTION_FAILED_SUMMARY, AI_INVOCATION_FAILED_SUMMARY)):
+            entry['extraction_result'] = _extraction_result_to_dict(extraction_result)
+        graph_summaries = entry.get('graph_summaries', {})
+        if graph_summary and file_id not in graph_summaries and graph_summary.get('status') == 'completed':
+            entry['graph_summaries'] = {**graph_summaries, file_id: graph_summary}
+        
+        stream_content = content_file if content is None and 'content' not in entry else None
+        if entry != cached_entry or stream_content is not None:
+            try:
+                await self.extraction_cache.put(cache_key, entry, content_file=stream_content)
+            except Exception as e:
+                self.logger.warning(f"写入提取缓存失败: {e}")
+    
     def _generate_file_id(self, file_path: Path) -> str:
         """生成唯一文件ID"""
         content_hash = hashlib.md5(f"{file_path.name}_{file_path.stat().st_mtime}".encode()).hexdigest()
         return f"file_{content_hash[:12]}"
     
-    async def _extract_metadata(self, file_path: Path, file_id: str) -> FileMetadata:
-        """提取文件元数据"""
+    async def _extract_metadata(
+        self,
+        file_path: Path,
+        file_id: str,
+        upload: Optional[UploadedFile] = None
+    ) -> FileMetadata:
+        """提取文件元数据，有上传时计算的元数据则直接使用"""
         stat = file_path.stat()
         
+        if upload:
+            mime_type, checksum, encoding = upload.mime_type, upload.checksum, upload.encoding
+            if mime_type == 'application/octet-stream':
+                mime_type = self.SUPPORTED_FORMATS.get(file_path.suffix.lower(), mime_type)
+            return FileMetadata(
+                file_id=file_id,
+                filename=file_path.name,
+                file_type=file_path.suffix[1:].lower(),
+                size_bytes=upload.size_bytes,
+                mime_type=mime_type,
+                encoding=encoding,
+                checksum=checksum,
+                upload_time=datetime.fromtimestamp(stat.st_mtime)
+            )
+        
         # 检测MIME类型
         mime_type, _ = mimetypes.guess_type(str(file_path))
         if not mime_type:
@@ -263,14 +596,8 @@ class EMCFileProcessor:
         )
     
     async def _calculate_checksum(self, file_path: Path) -> str:
-        """计算文件SHA256校验和"""
-        sha256_hash = hashlib.sha256()
-        
-        async with aiofiles.open(file_path, 'rb') as f:
-            while chunk := await f.read(8192):
-                sha256_hash.update(chunk)
-        
-        return sha256_hash.hexdigest()
+        """计算文件SHA256校验和（整个文件在一次线程池调用中按大块读取）"""
+        return await asyncio.get_running_loop().run_in_executor(None, _file_sha256, file_path)
     
     async def _detect_encoding(self, file_path: Path) -> Optional[str]:
         """检测文件编码"""
@@ -313,27 +640,50 @@ class EMCFileProcessor:
     
     async def _extract_pdf_content(self, file_path: Path) -> str:
         """提取PDF内容"""
-        content_parts = []
-        
-        def extract_pdf():
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        content_parts.append(text)
-                    
-                    # 提取表格
-                    tables = page.extract_tables()
-                    for table in tables:
-                        table_text = "\n".join(["\t".join(row) for row in table if row])
-                        if table_text:
-                            content_parts.append(f"\n[表格数据]\n{table_text}\n")
-        
-        # 在线程池中运行CPU密集的PDF处理
-        await asyncio.get_event_loop().run_in_executor(None, extract_pdf)
-        
+        content_parts = [chunk.text async for chunk in self.stream_pdf_pages(file_path)]
         return "\n\n".join(content_parts)
     
+    async def stream_pdf_pages(
+        self,
+        file_path: Union[str, Path],
+        pages_per_range: int = 8,
+        max_workers: int = 1,
+        window_pages: int = 32
+    ) -> AsyncGenerator[PdfPageChunk, None]:
+        """
+        流式提取PDF内容，按页码顺序逐页返回
+        
+        PDF按 pages_per_range 页切分为页码区间。max_workers 大于 1 时在新建的进程池中并行解析多个区间；
+        为 1 时使用共享的 parse_executor，未配置则使用默认线程池。同时在解析中或等待消费的页数不超过 window_pages，
+        因此内存占用只与窗口大小有关，与文档总页数无关。没有文本和表格的页面会被跳过。
+        
+        可与 EMCGraphManager.process_document_stream 配合使用，在后续页面仍在解析时
+        开始处理已返回页面中的实体。
+        """
+        file_path = str(file_path)
+        loop = asyncio.get_event_loop()
+        owns_executor = max_workers > 1
+        executor = ProcessPoolExecutor(max_workers=max_workers) if owns_executor else self.parse_executor
+        try:
+            page_count = await loop.run_in_executor(executor, _pdf_page_count, file_path)
+            ranges = deque(
+                (start, min(start + pages_per_range, page_count))
+                for start in range(0, page_count, pages_per_range)
+            )
+            max_pending = max(1, window_pages // pages_per_range)
+            
+            # 在线程池/进程池中运行CPU密集的PDF处理
+            pending = deque()
+            while ranges or pending:
+                while ranges and len(pending) < max_pending:
+                    start, end = ranges.popleft()
+                    pending.append(loop.run_in_executor(executor, _extract_pdf_page_range, file_path, start, end))
+                for chunk in await pending.popleft():
+                    yield chunk
+        finally:
+            if owns_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
     async def _extract_docx_content(self, file_path: Path) -> str:
         """提取Word文档内容"""
         def extract_docx():
@@ -458,33 +808,47 @@ class EMCFileProcessor:
         content: str, 
         metadata: FileMetadata
     ) -> ExtractionResult:
-        """使用AI提取实体和关系"""
+        """
+        使用AI提取实体和关系
+
+        文本按token预算分块后并发提取，各分块结果合并去重；
+        每个实体的 chunk_offsets 记录其所在分块在原文中的 [start, end] 偏移。
+        """
         start_time = datetime.now()
         
         try:
-            # 调用DeepSeek进行实体提取
-            response = await self.deepseek.extract_entities_from_text(
-                text_content=content,
-                session_id=f"file_processing_{file_id}"
-            )
-            
-            # 解析AI响应
-            ai_content = response.get('content', '')
+            # 调用DeepSeek进行分块实体提取
+            chunk_results = await self.deepseek.extract_entities_chunked(content)
+        except Exception as e:
+            return self._failed_extraction_result(file_id, e, start_time)
+        return self._build_extraction_result(file_id, chunk_results, len(content), content, start_time)
+    
+    def _build_extraction_result(
+        self,
+        file_id: str,
+        chunk_results: List[Dict[str, Any]],
+        content_length: int,
+        summary_source: str,
+        start_time: datetime
+    ) -> ExtractionResult:
+        """
+        合并分块提取结果并生成 ExtractionResult
+
+        content_length 为全文长度，summary_source 为用于生成摘要的文档开头部分。
+        """
+        try:
+            if not chunk_results or all('error' in chunk for chunk in chunk_results):
+                raise RuntimeError("所有分块的AI提取均失败")
             
-            # 尝试解析JSON格式的响应
-            try:
-                extraction_data = json.loads(ai_content)
-            except json.JSONDecodeError:
-                # 如果不是JSON格式，使用简单解析
-                extraction_data = self._fallback_entity_extraction(content)
+            extraction_data, usage = self._merge_chunk_extractions(chunk_results)
             
             # 计算置信度分数
             confidence_score = self._calculate_confidence_score(
-                extraction_data, content, response
+                extraction_data, content_length, {'usage': usage}
             )
             
             # 生成内容摘要
-            content_summary = self._generate_content_summary(content)
+            content_summary = self._generate_content_summary(summary_source)
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
@@ -503,18 +867,92 @@ class EMCFileProcessor:
             )
             
         except Exception as e:
-            self.logger.error(f"AI实体提取失败: {str(e)}")
-            processing_time = (datetime.now() - start_time).total_seconds()
+            return self._failed_extraction_result(file_id, e, start_time)
+    
+    def _failed_extraction_result(self, file_id: str, error: Exception, start_time: datetime) -> ExtractionResult:
+        """AI提取失败时的结果"""
+        self.logger.error(f"AI实体提取失败: {str(error)}")
+        processing_time = (datetime.now() - start_time).total_seconds()
+        
+        return ExtractionResult(
+            file_id=file_id,
+            entities=[],
+            relationships=[],
+            content_summary=AI_EXTRACTION_FAILED_SUMMARY,
+            confidence_score=0.0,
+            processing_time=processing_time,
+            extracted_at=datetime.now()
+        )
+    
+    def _merge_chunk_extractions(
+        self,
+        chunk_results: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, List], Dict[str, int]]:
+        """
+        合并分块提取结果
+
+        实体按 (类型, 名称小写) 去重，属性以先出现的为准、后续分块补充缺失项；
+        关系按 (源, 目标, 类型) 去重。AI调用失败或响应不是JSON的分块改用规则提取。
+        返回 (合并后的提取数据, 累计的token用量)。
+        """
+        entities: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        relationships: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        usage: Dict[str, int] = {}
+        
+        for chunk in chunk_results:
+            if 'extraction_data' not in chunk:
+                chunk = self._resolve_chunk_extraction(chunk)
+            extraction_data = chunk['extraction_data']
+            for key, value in chunk['usage'].items():
+                usage[key] = usage.get(key, 0) + value
             
-            return ExtractionResult(
-                file_id=file_id,
-                entities=[],
-                relationships=[],
-                content_summary="提取失败",
-                confidence_score=0.0,
-                processing_time=processing_time,
-                extracted_at=datetime.now()
-            )
+            offset = [chunk['start'], chunk['end']]
+            for entity in extraction_data.get('entities', []):
+                key = (str(entity.get('type', '')), str(entity.get('name', '')).strip().lower())
+                merged = entities.get(key)
+                if merged is None:
+                    entities[key] = {**entity, 'chunk_offsets': [offset]}
+                    continue
+                merged['properties'] = {**(entity.get('properties') or {}), **(merged.get('properties') or {})}
+                if offset not in merged['chunk_offsets']:
+                    merged['chunk_offsets'].append(offset)
+            
+            for relationship in extraction_data.get('relationships', []):
+                key = (
+                    str(relationship.get('source', '')).strip().lower(),
+                    str(relationship.get('target', '')).strip().lower(),
+                    str(relationship.get('type', ''))
+                )
+                relationships.setdefault(key, relationship)
+        
+        return {
+            'entities': list(entities.values()),
+            'relationships': list(relationships.values())
+        }, usage
+    
+    def _resolve_chunk_extraction(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把一个分块的AI响应解析为提取数据，不再保留分块文本
+
+        返回 {start, end, extraction_data, usage}（失败的分块另带 error），可直接传给 _merge_chunk_extractions。
+        """
+        response = chunk.get('response')
+        extraction_data = None
+        usage: Dict[str, int] = {}
+        if response is not None:
+            usage = {key: value for key, value in (response.get('usage') or {}).items() if isinstance(value, int)}
+            try:
+                extraction_data = json.loads(response.get('content', ''))
+            except json.JSONDecodeError:
+                pass
+        if not isinstance(extraction_data, dict):
+            # 如果不是JSON格式，使用简单解析
+            extraction_data = self._fallback_entity_extraction(chunk['text'])
+        
+        resolved = {'start': chunk['start'], 'end': chunk['end'], 'extraction_data': extraction_data, 'usage': usage}
+        if 'error' in chunk:
+            resolved['error'] = chunk['error']
+        return resolved
     
     def _fallback_entity_extraction(self, content: str) -> Dict[str, List]:
         """备用实体提取方法（基于规则）"""
@@ -560,7 +998,7 @@ class EMCFileProcessor:
     def _calculate_confidence_score(
         self, 
         extraction_data: Dict, 
-        content: str, 
+        content_length: int, 
         ai_response: Dict
     ) -> float:
         """计算提取结果的置信度分数"""
@@ -581,7 +1019,7 @@ class EMCFileProcessor:
             score += 0.2
         
         # 基于内容长度
-        if len(content) > 1000:
+        if content_length > 1000:
             score += 0.1
         
         return min(score, 1.0)
@@ -670,11 +1108,16 @@ class FormatConverter:
 def create_emc_file_processor(
     deepseek_service: DeepSeekEMCService,
     storage_path: str = "./uploads",
-    graph_manager: Optional[EMCGraphManager] = None # Add graph_manager
+    graph_manager: Optional[EMCGraphManager] = None, # Add graph_manager
+    cache_max_bytes: int = 0
 ) -> EMCFileProcessor:
-    """创建EMC文件处理器实例"""
+    """创建EMC文件处理器实例，cache_max_bytes 大于0时在 storage_path 下启用提取缓存"""
+    extraction_cache = None
+    if cache_max_bytes > 0:
+        extraction_cache = ExtractionCache(str(Path(storage_path) / "extraction_cache"), max_bytes=cache_max_bytes)
     return EMCFileProcessor(
         deepseek_service,
         storage_path,
-        graph_manager=graph_manager # Pass it to constructor
+        graph_manager=graph_manager, # Pass it to constructor
+        extraction_cache=extraction_cache
     )
\ No newline at end of file
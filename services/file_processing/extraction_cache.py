@@ -0,0 +1,116 @@
+"""
+EMC文件提取结果缓存
+按 (文件校验和, 提取器版本, 分析模式) 在磁盘上缓存提取文本、AI提取结果和图谱构建摘要
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import aiofiles
+
+# 从文本文件写入条目 'content' 字段时每次读取的字符数
+CONTENT_BLOCK_CHARS = 1024 * 1024
+
+
+class ExtractionCache:
+    """
+    内容寻址的磁盘缓存
+
+    每个条目是缓存目录下的一个JSON文件，文件名由缓存键的SHA-256决定。
+    文件的修改时间记录最近一次访问，总大小超过 max_bytes 时按最近最少使用顺序淘汰。
+    """
+
+    def __init__(self, cache_dir: str = "./uploads/extraction_cache", max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+
+        # 条目文件名 -> 字节数，按访问时间从旧到新排列
+        entries = sorted(self.cache_dir.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        self._entries: Dict[str, int] = {path.name: path.stat().st_size for path in entries}
+        self._total_bytes = sum(self._entries.values())
+
+    @staticmethod
+    def make_key(checksum: str, extractor_version: str, analysis_mode: str) -> str:
+        """生成缓存键"""
+        return hashlib.sha256(f"{checksum}:{extractor_version}:{analysis_mode}".encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，未命中返回 None"""
+        filename = f"{key}.json"
+        if filename not in self._entries:
+            return None
+
+        path = self.cache_dir / filename
+        try:
+            async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+                entry = json.loads(await f.read())
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"缓存条目读取失败，已丢弃: {path}, 错误: {e}")
+            self._remove(filename)
+            return None
+
+        # 更新访问时间
+        os.utime(path)
+        self._entries[filename] = self._entries.pop(filename)
+        return entry
+
+    async def put(self, key: str, entry: Dict[str, Any], content_file: Optional[Path] = None):
+        """
+        写入缓存条目，必要时淘汰最久未使用的条目
+
+        传入 content_file 时，该UTF-8文本文件的内容作为条目的 'content' 字段分块写入，
+        不需要把全文读入内存。
+        """
+        filename = f"{key}.json"
+        data = json.dumps(entry, ensure_ascii=False, default=str)
+        size = len(data.encode('utf-8'))
+        if content_file is not None:
+            size += os.path.getsize(content_file)
+        if size > self.max_bytes:
+            self.logger.info(f"缓存条目大小 {size} 字节超过上限，不缓存")
+            return
+
+        # 先写临时文件再替换，避免读到写了一半的条目
+        path = self.cache_dir / filename
+        temp_path = path.with_suffix('.tmp')
+        async with aiofiles.open(temp_path, 'w', encoding='utf-8') as f:
+            if content_file is None:
+                await f.write(data)
+            else:
+                await f.write('{"content": "')
+                async with aiofiles.open(content_file, 'r', encoding='utf-8', newline='') as source:
+                    while block := await source.read(CONTENT_BLOCK_CHARS):
+                        await f.write(json.dumps(block, ensure_ascii=False)[1:-1])
+                await f.write('", ' + data[1:] if entry else '"}')
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+
+        self._total_bytes -= self._entries.pop(filename, 0)
+        self._entries[filename] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        """按最近最少使用顺序淘汰，直到总大小不超过上限"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, filename: str):
+        self._total_bytes -= self._entries.pop(filename, 0)
+        try:
+            (self.cache_dir / filename).unlink()
+        except FileNotFoundError:
+            pass
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        return {
+            'entries': len(self._entries),
+            'size_bytes': self._total_bytes
+        }
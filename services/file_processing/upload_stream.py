@@ -0,0 +1,95 @@
+"""
+上传文件流式落盘
+按大块把请求体写入磁盘，写入过程中限制文件大小，并在同一遍中计算SHA-256、
+识别MIME类型和文本编码，后续处理直接使用这些元数据，不再重新读取文件
+"""
+
+import hashlib
+import mimetypes
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import aiofiles
+import chardet
+
+# 每次从请求体读取并写盘的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# 用于MIME识别和编码检测的文件头字节数（与 EMCFileProcessor._detect_encoding 一致）
+SNIFF_BYTES = 10240
+
+# 文件头魔数 -> MIME类型
+_MAGIC_NUMBERS = (
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+)
+# ZIP容器（docx、xlsx等）只能结合扩展名判断具体类型
+_ZIP_MAGIC = b"PK\x03\x04"
+
+
+class FileTooLargeError(Exception):
+    """上传文件超过大小上限"""
+
+
+@dataclass
+class UploadedFile:
+    """写盘时计算出的文件元数据"""
+    size_bytes: int
+    checksum: str
+    mime_type: str
+    encoding: Optional[str] = None
+
+
+def sniff_mime_type(head: bytes, filename: str) -> str:
+    """根据文件头魔数和文件名确定MIME类型，魔数优先"""
+    guessed, _ = mimetypes.guess_type(filename)
+    for magic, mime_type in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    if head.startswith(_ZIP_MAGIC):
+        return guessed if guessed and (guessed.endswith("+zip") or "openxmlformats" in guessed) else "application/zip"
+    return guessed or "application/octet-stream"
+
+
+async def save_upload_stream(
+    source: Any,
+    destination: Union[str, Path],
+    max_bytes: int,
+    filename: Optional[str] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> UploadedFile:
+    """
+    把上传流写入 destination 并返回文件元数据
+
+    source 需提供 async read(size)（如 fastapi.UploadFile）。先写入同目录下的临时文件，
+    全部写完后才原子地替换 destination，因此失败的上传不会破坏同名的已有文件。
+    写入字节数超过 max_bytes 时删除临时文件并抛出 FileTooLargeError。
+    """
+    destination = Path(destination)
+    sha256_hash = hashlib.sha256()
+    head = b""
+    size = 0
+
+    temp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.part")
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            while chunk := await source.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeError(f"文件大小超过限制({max_bytes // (1024 * 1024)}MB)")
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                sha256_hash.update(chunk)
+                await f.write(chunk)
+        os.replace(temp_path, destination)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    mime_type = sniff_mime_type(head, filename or destination.name)
+    encoding = chardet.detect(head).get("encoding") if mime_type.startswith("text/") else None
+    return UploadedFile(size_bytes=size, checksum=sha256_hash.hexdigest(), mime_type=mime_type, encoding=encoding)
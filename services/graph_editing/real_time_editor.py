@@ -3,6 +3,8 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from neo4j import AsyncGraphDatabase
 
+from ..knowledge_graph.emc_ontology import ENTITY_LABEL
+
 @dataclass
 class GraphEditOperation:
     """图编辑操作"""
@@ -58,14 +60,14 @@ class RealTimeGraphEditor:
             node_data.update(position)
         
         query = f"""
-        CREATE (n:{node_data.get('type', 'Entity')} {{
+        CREATE (n:{node_data.get('type', ENTITY_LABEL)} {{
             id: $id,
             label: $label,
             x: $x,
             y: $y,
             created_at: datetime()
         }})
-        SET n += $properties
+        SET n += $properties, n:{ENTITY_LABEL}
         RETURN n.id as id
         """
         
@@ -83,8 +85,8 @@ class RealTimeGraphEditor:
     
     async def _update_node(self, node_id: str, node_data: Dict[str, Any]) -> bool:
         """更新节点"""
-        query = """
-        MATCH (n {id: $node_id})
+        query = f"""
+        MATCH (n:{ENTITY_LABEL} {{id: $node_id}})
         SET n += $properties
         SET n.updated_at = datetime()
         RETURN count(n) as updated
@@ -100,7 +102,7 @@ class RealTimeGraphEditor:
     async def _create_relationship(self, rel_data: Dict[str, Any]) -> bool:
         """创建关系"""
         query = f"""
-        MATCH (a {{id: $source_id}}), (b {{id: $target_id}})
+        MATCH (a:{ENTITY_LABEL} {{id: $source_id}}), (b:{ENTITY_LABEL} {{id: $target_id}})
         CREATE (a)-[r:{rel_data.get('type', 'RELATES_TO')}]->(b)
         SET r += $properties
         SET r.created_at = datetime()
@@ -117,8 +119,8 @@ class RealTimeGraphEditor:
     
     async def _delete_node(self, node_id: str) -> bool:
         """删除节点"""
-        query = """
-        MATCH (n {id: $node_id})
+        query = f"""
+        MATCH (n:{ENTITY_LABEL} {{id: $node_id}})
         DETACH DELETE n
         RETURN count(n) as deleted
         """
@@ -5,8 +5,11 @@ EMC项目的KAG适配器
 
 import os
 import json
+import time
 import yaml
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any, Union
 from pathlib import Path
 
@@ -31,14 +34,26 @@ from ..knowledge_graph.emc_ontology import (
 )
 
 
+def _read_pdf_text(pdf_path: str) -> str:
+    """用pdfplumber读取PDF全文（阻塞调用，在线程池中执行）"""
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+
 class EMCKAGAdapter:
     """
     EMC项目的KAG适配器
     这个类封装了KAG的复杂性，提供了适合EMC场景的简单接口
+
+    KAG组件的读取、分块和抽取都是同步阻塞调用，统一放到最多 max_workers 个线程的
+    线程池中执行，各分块并行抽取，不阻塞事件循环
     """
     
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, max_workers: int = 4):
         self.logger = logging.getLogger(__name__)
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
         
         if not KAG_AVAILABLE:
             self.logger.warning("KAG不可用，将使用降级模式")
@@ -151,16 +166,39 @@ class EMCKAGAdapter:
             self.logger.error(f"DeepSeek服务初始化失败: {e}")
             return None
     
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kag")
+        return self._executor
+    
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在KAG线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), lambda: func(*args, **kwargs))
+    
+    def close(self):
+        """关闭KAG线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
     async def extract_from_emc_pdf(
         self, 
         pdf_path: str,
         use_kag: bool = True,
-        fallback_to_deepseek: bool = True
+        fallback_to_deepseek: bool = True,
+        text_content: Optional[str] = None,
+        pages: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         从EMC PDF文档中提取知识
         这个方法将KAG的通用PDF处理能力适配为EMC特定的处理流程
+
+        调用方已提取过文本时可传入 text_content 或逐页文本 pages，避免再次解析PDF
         """
+        if text_content is None and pages is not None:
+            text_content = "\n\n".join(pages)
+        
         result = {
             "entities": [],
             "relationships": [],
@@ -175,7 +213,7 @@ class EMCKAGAdapter:
         # 尝试使用KAG进行提取
         if use_kag and self.kag_enabled and self.pdf_reader and self.extractor:
             try:
-                kag_result = await self._extract_with_kag(pdf_path)
+                kag_result = await self._extract_with_kag(pdf_path, text_content=text_content, pages=pages)
                 if kag_result["metadata"]["success"]:
                     return kag_result
                 else:
@@ -186,7 +224,7 @@ class EMCKAGAdapter:
         # 降级到DeepSeek服务
         if fallback_to_deepseek and self.deepseek_service:
             try:
-                return await self._extract_with_deepseek(pdf_path)
+                return await self._extract_with_deepseek(pdf_path, text_content=text_content)
             except Exception as e:
                 self.logger.error(f"DeepSeek提取失败: {e}")
         
@@ -194,8 +232,18 @@ class EMCKAGAdapter:
         self.logger.error(f"所有提取方法都失败了: {pdf_path}")
         return result
     
-    async def _extract_with_kag(self, pdf_path: str) -> Dict[str, Any]:
-        """使用KAG进行提取"""
+    async def _extract_with_kag(
+        self,
+        pdf_path: str,
+        text_content: Optional[str] = None,
+        pages: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        使用KAG进行提取
+
+        读取、分块和各分块的抽取在线程池中执行，分块并行抽取；
+        metadata["chunk_timings"] 记录每个分块的抽取耗时
+        """
         result = {
             "entities": [],
             "relationships": [],
@@ -206,29 +254,44 @@ class EMCKAGAdapter:
                 "success": False
             }
         }
+        start_time = time.perf_counter()
         
         try:
-            # 1. 读取PDF内容
-            content = self.pdf_reader.read(pdf_path)
+            # 1. 读取PDF内容（已有文本时跳过）
+            content = text_content if text_content is not None else await self._run_blocking(
+                self.pdf_reader.read, pdf_path
+            )
             
             # 2. 分块处理
             if self.chunk_runner:
-                chunks = self.chunk_runner.run(content)
+                chunks = await self._run_blocking(self.chunk_runner.run, content)
                 result["chunks"] = [chunk.content for chunk in chunks]
+            elif pages:
+                chunks = list(pages)  # 没有分块器时按页分块
+                result["chunks"] = list(pages)
             else:
                 chunks = [content]  # 如果没有分块器，使用整个文档
                 result["chunks"] = [content]
             
-            # 3. 使用EMC特定的模式进行知识提取
-            all_entities = []
-            all_relationships = []
-            
-            for chunk in chunks:
+            # 3. 使用EMC特定的模式并行抽取各分块
+            def extract_chunk(chunk):
+                chunk_start = time.perf_counter()
                 extracted_knowledge = self.extractor.extract(
                     chunk, 
                     schema=self.emc_schema,
                     domain_context="EMC"
                 )
+                return extracted_knowledge, time.perf_counter() - chunk_start
+            
+            chunk_results = await asyncio.gather(*(self._run_blocking(extract_chunk, chunk) for chunk in chunks))
+            
+            all_entities = []
+            all_relationships = []
+            chunk_timings = []
+            
+            for index, (extracted_knowledge, seconds) in enumerate(chunk_results):
+                entities = []
+                relationships = []
                 
                 # 处理提取的实体
                 if "entities" in extracted_knowledge:
@@ -239,9 +302,17 @@ class EMCKAGAdapter:
                 if "relationships" in extracted_knowledge:
                     relationships = self._process_kag_relationships(extracted_knowledge["relationships"])
                     all_relationships.extend(relationships)
+                
+                chunk_timings.append({
+                    "chunk_index": index,
+                    "seconds": round(seconds, 3),
+                    "entities": len(entities),
+                    "relationships": len(relationships)
+                })
             
             result["entities"] = all_entities
             result["relationships"] = all_relationships
+            result["metadata"]["chunk_timings"] = chunk_timings
             result["metadata"]["success"] = True
             
             self.logger.info(f"KAG成功提取 {len(all_entities)} 个实体和 {len(all_relationships)} 个关系")
@@ -250,10 +321,11 @@ class EMCKAGAdapter:
             self.logger.error(f"KAG提取过程出错: {e}")
             result["metadata"]["error"] = str(e)
         
+        result["metadata"]["elapsed_seconds"] = round(time.perf_counter() - start_time, 3)
         return result
     
-    async def _extract_with_deepseek(self, pdf_path: str) -> Dict[str, Any]:
-        """使用DeepSeek进行提取"""
+    async def _extract_with_deepseek(self, pdf_path: str, text_content: Optional[str] = None) -> Dict[str, Any]:
+        """使用DeepSeek进行提取，已有文本时不再解析PDF"""
         result = {
             "entities": [],
             "relationships": [],
@@ -267,11 +339,8 @@ class EMCKAGAdapter:
         
         try:
             # 读取PDF内容（简单方式）
-            import pdfplumber
-            text_content = ""
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text_content += page.extract_text() + "\n"
+            if text_content is None:
+                text_content = await self._run_blocking(_read_pdf_text, pdf_path)
             
             # 使用DeepSeek提取实体和关系
             deepseek_result = await self.deepseek_service.extract_entities_from_text(
@@ -448,15 +517,13 @@ class EMCKAGAdapter:
 
 
 # 工厂函数
-def create_emc_kag_adapter(config_path: Optional[str] = None) -> EMCKAGAdapter:
-    """创建EMC KAG适配器实例"""
-    return EMCKAGAdapter(config_path=config_path)
+def create_emc_kag_adapter(config_path: Optional[str] = None, max_workers: int = 4) -> EMCKAGAdapter:
+    """创建EMC KAG适配器实例，max_workers 为KAG阻塞调用的线程数（分块并行抽取的宽度）"""
+    return EMCKAGAdapter(config_path=config_path, max_workers=max_workers)
 
 
 # 使用示例
 if __name__ == "__main__":
-    import asyncio
-    
     async def test_adapter():
         adapter = create_emc_kag_adapter()
         
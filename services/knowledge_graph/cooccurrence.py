@@ -0,0 +1,100 @@
+"""
+Co-occurrence windows for rule-based relationship building.
+
+Entity mentions are character spans in the document text. The text is cut into
+windows (sentences, paragraphs or table rows) and only mentions that share a
+window, and lie within max_distance characters of each other, are paired. Pairing
+is one sweep over the mentions sorted by offset, so its cost grows with the number
+of mentions per window rather than with the product of all entities of two labels
+in the document.
+"""
+
+import bisect
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Pattern, Sequence, Tuple
+
+WINDOW_SENTENCE = "sentence"
+WINDOW_PARAGRAPH = "paragraph"
+WINDOW_TABLE_ROW = "table_row"
+
+# A line holding cell separators (tab or pipe) is a table row and always forms its own window
+_TABLE_ROW_PATTERN = re.compile(r"^[^\n]*[\t|][^\n]*$", re.MULTILINE)
+_PARAGRAPH_BREAK_PATTERN = re.compile(r"\n[ \t]*\n")
+
+WINDOW_BOUNDARY_PATTERNS: Dict[str, Tuple[Pattern, ...]] = {
+    WINDOW_SENTENCE: (
+        re.compile(r"(?<=[.!?;。！？；])\s+"),
+        _PARAGRAPH_BREAK_PATTERN,
+        _TABLE_ROW_PATTERN,
+    ),
+    WINDOW_PARAGRAPH: (_PARAGRAPH_BREAK_PATTERN, _TABLE_ROW_PATTERN),
+    WINDOW_TABLE_ROW: (re.compile(r"\n"),),
+}
+
+# A mention is (start, end, key); key identifies the entity the mention belongs to
+Mention = Tuple[int, int, int]
+
+
+def window_cuts(text: str, window: str = WINDOW_SENTENCE, offset: int = 0) -> List[int]:
+    """
+    Returns the sorted offsets at which the text is cut into windows of the given kind.
+    Offsets are shifted by `offset`, so cuts for consecutive chunks of one document can
+    be concatenated.
+    """
+    try:
+        patterns = WINDOW_BOUNDARY_PATTERNS[window]
+    except KeyError:
+        raise ValueError(f"Unknown co-occurrence window: {window}") from None
+
+    cuts = []
+    for pattern in patterns:
+        for match in pattern.finditer(text):
+            cuts.append(offset + match.start())
+            cuts.append(offset + match.end())
+    cuts.sort()
+    return cuts
+
+
+def locate_mentions(text: str, names: Iterable[str]) -> Iterator[Tuple[int, int, str]]:
+    """
+    Yields (start, end, lowercased name) for every case-insensitive occurrence of the
+    given names, in one pass over the text. Longer names win where names overlap.
+    """
+    unique_names = sorted({name.lower() for name in names if name}, key=len, reverse=True)
+    if not unique_names or not text:
+        return
+    pattern = re.compile("|".join(re.escape(name) for name in unique_names), re.IGNORECASE)
+    for match in pattern.finditer(text):
+        yield match.start(), match.end(), match.group().lower()
+
+
+def cooccurring_pairs(
+    mentions: Sequence[Mention],
+    cuts: Sequence[int],
+    max_distance: int
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yields (earlier key, later key, distance) for mentions of different entities that
+    fall in the same window and are at most max_distance characters apart.
+
+    mentions must be sorted by start offset. The distance is the gap between the end
+    of the earlier mention and the start of the later one (0 when they overlap).
+    """
+    active = deque()  # (end, key) of earlier mentions in the current window
+    current_window = None
+    for start, end, key in mentions:
+        window = bisect.bisect_right(cuts, start)
+        if window != current_window:
+            active.clear()
+            current_window = window
+        while active and start - active[0][0] > max_distance:
+            active.popleft()
+
+        for previous_end, previous_key in active:
+            if previous_key == key:
+                continue
+            distance = max(0, start - previous_end)
+            if distance <= max_distance:
+                yield previous_key, key, distance
+        active.append((end, key))
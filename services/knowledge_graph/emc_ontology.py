@@ -22,6 +22,11 @@ NODE_MITIGATION_MEASURE = "MitigationMeasure"  # e.g., Ferrite Bead, Shielding
 NODE_DOCUMENT = "Document" # e.g., Test Report, Standard Document, Datasheet
 NODE_ORGANIZATION = "Organization" # e.g., Test Lab, Manufacturer, Regulatory Body
 NODE_EQUIPMENT = "Equipment" # e.g., Spectrum Analyzer, LISN
+NODE_TEST_METHOD = "TestMethod" # e.g., IEC 61000-4-3 radiated immunity procedure
+
+# Shared label carried by every node the services write, in addition to its type label.
+# (:Entity {id}) is unique, so id lookups that don't know the node type can still use an index.
+ENTITY_LABEL = "Entity"
 
 # --- Relationship Types ---
 REL_APPLIES_TO = "APPLIES_TO"  # (EMCStandard) -[APPLIES_TO]-> (Product)
@@ -42,6 +47,11 @@ REL_MANUFACTURED_BY = "MANUFACTURED_BY" # (Product) -[MANUFACTURED_BY]-> (Organi
 REL_ISSUED_BY = "ISSUED_BY" # (Regulation) -[ISSUED_BY]-> (Organization)
 REL_USES_EQUIPMENT = "USES_EQUIPMENT" # (Test) -[USES_EQUIPMENT]-> (Equipment)
 REL_PART_OF = "PART_OF" # (Component) -[PART_OF]-> (Product) or (Frequency) -[PART_OF]-> (FrequencyRange)
+# Generic types emitted by the AI extraction prompt and the graph frontend
+REL_REQUIRES = "REQUIRES" # (EMCStandard) -[REQUIRES]-> (TestMethod) or (Product) -[REQUIRES]-> (EMCStandard)
+REL_TESTS = "TESTS" # (TestMethod) -[TESTS]-> (Phenomenon) or (Equipment) -[TESTS]-> (Product)
+REL_COMPLIES_WITH = "COMPLIES_WITH" # (Product) -[COMPLIES_WITH]-> (EMCStandard)
+REL_RELATED_TO = "RELATED_TO" # Untyped association between any two entities
 
 # --- Node Properties ---
 # It's good practice to define common properties if they appear in many nodes,
@@ -128,6 +138,11 @@ class EquipmentNode(BaseNode): # Name is equipment model
     serial_number: Optional[str] = None
     calibration_due_date: Optional[str] = None
 
+@dataclass
+class TestMethodNode(BaseNode): # Name is the method or procedure title
+    standard_reference: Optional[str] = None # e.g., "IEC 61000-4-3 clause 8"
+    method_type: Optional[str] = None # e.g., Emission, Immunity
+
 # --- Relationship Properties ---
 @dataclass
 class BaseRelationship:
@@ -158,14 +173,16 @@ ONTOLOGY_DEFINITIONS = {
     "node_labels": [
         NODE_EMC_STANDARD, NODE_PRODUCT, NODE_COMPONENT, NODE_TEST, NODE_TEST_RESULT,
         NODE_FREQUENCY, NODE_FREQUENCY_RANGE, NODE_PHENOMENON, NODE_REGULATION,
-        NODE_MITIGATION_MEASURE, NODE_DOCUMENT, NODE_ORGANIZATION, NODE_EQUIPMENT
+        NODE_MITIGATION_MEASURE, NODE_DOCUMENT, NODE_ORGANIZATION, NODE_EQUIPMENT,
+        NODE_TEST_METHOD
     ],
     "relationship_types": [
         REL_APPLIES_TO, REL_CONTAINS_COMPONENT, REL_HAS_STANDARD, REL_PERFORMED_TEST,
         REL_HAS_TEST_RESULT, REL_OBSERVES_PHENOMENON, REL_REGULATES, REL_MITIGATES,
         REL_REFERENCES_STANDARD, REL_MENTIONS_PRODUCT, REL_USES_FREQUENCY,
         REL_HAS_FREQUENCY_RANGE, REL_SPECIFIES_LIMIT, REL_CONDUCTED_BY,
-        REL_MANUFACTURED_BY, REL_ISSUED_BY, REL_USES_EQUIPMENT, REL_PART_OF
+        REL_MANUFACTURED_BY, REL_ISSUED_BY, REL_USES_EQUIPMENT, REL_PART_OF,
+        REL_REQUIRES, REL_TESTS, REL_COMPLIES_WITH, REL_RELATED_TO
     ],
     "node_schemas": {
         NODE_EMC_STANDARD: EMCStandardNode,
@@ -181,6 +198,7 @@ ONTOLOGY_DEFINITIONS = {
         NODE_DOCUMENT: DocumentNode,
         NODE_ORGANIZATION: OrganizationNode,
         NODE_EQUIPMENT: EquipmentNode,
+        NODE_TEST_METHOD: TestMethodNode,
     },
     "relationship_schemas": {
         REL_APPLIES_TO: AppliesToRel,
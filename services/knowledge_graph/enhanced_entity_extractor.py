@@ -3,26 +3,80 @@
 这个类扩展了原有的实体提取器，添加了KAG的知识提取能力
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Union
+import time
+from concurrent.futures import Executor
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 
-from .entity_extractor import EMCEntityExtractor
+from .entity_extractor import EMCEntityExtractor, merge_duplicate_entities
 from ..integrations.kag_adapter import create_emc_kag_adapter, EMCKAGAdapter
 from ..ai_integration.deepseek_service import DeepSeekEMCService
 
 
+def _read_file_text(file_path: str, file_type: str) -> Tuple[str, List[str]]:
+    """
+    从不同类型的文件中提取文本（阻塞调用，在工作线程或进程中执行）
+    返回 (全文, 逐页文本)，只有PDF有逐页文本
+    """
+    pages: List[str] = []
+    parts: List[str] = []
+    
+    if file_type == 'pdf':
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    pages.append(page_text)
+        parts = pages
+    
+    elif file_type in ['txt', 'md']:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            parts = [f.read()]
+    
+    elif file_type in ['docx']:
+        try:
+            from docx import Document
+            parts = [paragraph.text for paragraph in Document(file_path).paragraphs]
+        except ImportError:
+            logging.getLogger(__name__).warning("python-docx未安装，无法处理DOCX文件")
+    
+    elif file_type in ['html', 'htm']:
+        try:
+            from bs4 import BeautifulSoup
+            with open(file_path, 'r', encoding='utf-8') as f:
+                parts = [BeautifulSoup(f.read(), 'html.parser').get_text()]
+        except ImportError:
+            logging.getLogger(__name__).warning("beautifulsoup4未安装，无法处理HTML文件")
+    
+    else:
+        logging.getLogger(__name__).warning(f"不支持的文件类型: {file_type}")
+    
+    return "\n".join(parts).strip(), pages
+
+
 class EnhancedEMCEntityExtractor(EMCEntityExtractor):
     """
     增强的EMC实体提取器
     这个类扩展了现有的实体提取器，添加了KAG的知识提取能力
+
+    文件只在工作线程（或传入的 parse_executor，如进程池）中解析一次，
+    之后KAG、DeepSeek和规则提取并发执行，总耗时约等于最慢的一种方法
     """
     
-    def __init__(self, deepseek_service: Optional[Any] = None, kag_config_path: Optional[str] = None):
+    def __init__(
+        self,
+        deepseek_service: Optional[Any] = None,
+        kag_config_path: Optional[str] = None,
+        parse_executor: Optional[Executor] = None
+    ):
         # 初始化基础实体提取器
         super().__init__(deepseek_service)
         
         self.logger = logging.getLogger(__name__)
+        self.parse_executor = parse_executor
         
         # 初始化KAG适配器
         try:
@@ -76,62 +130,74 @@ class EnhancedEMCEntityExtractor(EMCEntityExtractor):
             }
         }
         
-        # 1. 尝试使用KAG进行文件级提取（针对PDF等复杂文档）
-        if use_kag and self.kag_available and file_type == 'pdf':
-            try:
-                kag_result = await self.kag_adapter.extract_from_emc_pdf(
-                    pdf_path=file_path,
-                    use_kag=True,
-                    fallback_to_deepseek=True
-                )
-                
-                if kag_result["metadata"]["success"]:
-                    result["entities"].extend(kag_result["entities"])
-                    result["relationships"].extend(kag_result["relationships"])
-                    result["chunks"] = kag_result["chunks"]
-                    result["metadata"]["extraction_methods"].append(
-                        kag_result["metadata"]["extraction_method"]
-                    )
-                    
-                    self.logger.info(f"KAG提取成功: {len(kag_result['entities'])} 实体, {len(kag_result['relationships'])} 关系")
-                
-            except Exception as e:
-                self.logger.error(f"KAG文件提取失败: {e}")
+        # 1. 在工作线程中解析一次文件，后续各方法共用
+        loop = asyncio.get_running_loop()
+        try:
+            text_content, pages = await loop.run_in_executor(
+                self.parse_executor, _read_file_text, file_path, file_type
+            )
+        except Exception as e:
+            self.logger.error(f"文本提取失败: {e}")
+            text_content, pages = "", []
+        
+        # 2. 并发执行KAG、DeepSeek和规则提取
+        method_timings: Dict[str, float] = {}
         
-        # 2. 如果KAG没有成功或不适用，回退到文本级提取
-        if not result["entities"] or use_ai or use_rules:
+        async def timed(name: str, coro):
+            started = time.perf_counter()
             try:
-                # 提取文本内容
-                text_content = await self._extract_text_from_file(file_path, file_type)
-                
-                if text_content:
-                    # 使用原有的文本提取方法
-                    text_entities = await self.extract_entities(
-                        text_content=text_content,
-                        document_id=file_path,
-                        use_ai=use_ai,
-                        use_rules=use_rules
-                    )
-                    
-                    # 转换格式以保持一致性
-                    converted_entities = self._convert_legacy_entities(text_entities)
-                    result["entities"].extend(converted_entities)
-                    
-                    if not result["chunks"]:
-                        result["chunks"] = [text_content]
-                    
-                    methods = []
-                    if use_ai and self.deepseek_service:
-                        methods.append("DeepSeek_Legacy")
-                    if use_rules:
-                        methods.append("Rules")
-                    
-                    result["metadata"]["extraction_methods"].extend(methods)
-                    
-                    self.logger.info(f"文本提取成功: {len(converted_entities)} 实体")
-                
-            except Exception as e:
-                self.logger.error(f"文本提取失败: {e}")
+                return await coro
+            finally:
+                method_timings[name] = round(time.perf_counter() - started, 3)
+        
+        tasks = {}
+        if use_kag and self.kag_available and file_type == 'pdf':
+            tasks["kag"] = timed("kag", self.kag_adapter.extract_from_emc_pdf(
+                pdf_path=file_path,
+                use_kag=True,
+                fallback_to_deepseek=True,
+                text_content=text_content or None,
+                pages=pages or None
+            ))
+        if text_content and use_ai and self.deepseek_service:
+            tasks["ai"] = timed("ai", self.extract_entities_ai(text_content, file_path))
+        if text_content and use_rules:
+            tasks["rules"] = timed("rules", loop.run_in_executor(
+                None, self.extract_entities_rule_based, text_content, file_path
+            ))
+        
+        outcomes = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+        for name, outcome in outcomes.items():
+            # CancelledError 不是 Exception 的子类，也会作为结果返回
+            if isinstance(outcome, BaseException):
+                self.logger.error(f"{name}提取失败: {outcome!r}")
+        
+        kag_result = outcomes.get("kag")
+        if isinstance(kag_result, dict) and kag_result["metadata"]["success"]:
+            result["entities"].extend(kag_result["entities"])
+            result["relationships"].extend(kag_result["relationships"])
+            result["chunks"] = kag_result["chunks"]
+            result["metadata"]["extraction_methods"].append(
+                kag_result["metadata"]["extraction_method"]
+            )
+            
+            self.logger.info(f"KAG提取成功: {len(kag_result['entities'])} 实体, {len(kag_result['relationships'])} 关系")
+        
+        # 原有的AI与规则提取结果先按原方式合并，再转换格式以保持一致性
+        legacy_entities = []
+        for name, method in (("ai", "DeepSeek_Legacy"), ("rules", "Rules")):
+            if name in outcomes and not isinstance(outcomes[name], BaseException):
+                legacy_entities.extend(outcomes[name])
+                result["metadata"]["extraction_methods"].append(method)
+        
+        if legacy_entities:
+            converted_entities = self._convert_legacy_entities(merge_duplicate_entities(legacy_entities))
+            result["entities"].extend(converted_entities)
+            self.logger.info(f"文本提取成功: {len(converted_entities)} 实体")
+        
+        if not result["chunks"] and text_content:
+            result["chunks"] = [text_content]
+        result["metadata"]["method_timings"] = method_timings
         
         # 3. 统计和元数据
         result["metadata"]["total_entities"] = len(result["entities"])
@@ -151,47 +217,15 @@ class EnhancedEMCEntityExtractor(EMCEntityExtractor):
         return result
     
     async def _extract_text_from_file(self, file_path: str, file_type: str) -> str:
-        """从不同类型的文件中提取文本"""
-        text_content = ""
-        
+        """从不同类型的文件中提取文本（在工作线程中执行）"""
         try:
-            if file_type == 'pdf':
-                import pdfplumber
-                with pdfplumber.open(file_path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_content += page_text + "\n"
-            
-            elif file_type in ['txt', 'md']:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text_content = f.read()
-            
-            elif file_type in ['docx']:
-                try:
-                    from docx import Document
-                    doc = Document(file_path)
-                    for paragraph in doc.paragraphs:
-                        text_content += paragraph.text + "\n"
-                except ImportError:
-                    self.logger.warning("python-docx未安装，无法处理DOCX文件")
-            
-            elif file_type in ['html', 'htm']:
-                try:
-                    from bs4 import BeautifulSoup
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        soup = BeautifulSoup(f.read(), 'html.parser')
-                        text_content = soup.get_text()
-                except ImportError:
-                    self.logger.warning("beautifulsoup4未安装，无法处理HTML文件")
-            
-            else:
-                self.logger.warning(f"不支持的文件类型: {file_type}")
-        
+            text_content, _ = await asyncio.get_running_loop().run_in_executor(
+                self.parse_executor, _read_file_text, file_path, file_type
+            )
+            return text_content
         except Exception as e:
             self.logger.error(f"文本提取失败: {e}")
-        
-        return text_content.strip()
+            return ""
     
     def _convert_legacy_entities(self, legacy_entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """将原有格式的实体转换为新格式"""
@@ -275,8 +309,6 @@ class EnhancedEMCEntityExtractor(EMCEntityExtractor):
         """
         批量处理多个文件
         """
-        import asyncio
-        
         # 限制并发数量
         semaphore = asyncio.Semaphore(max_concurrent)
         
@@ -358,18 +390,19 @@ class EnhancedEMCEntityExtractor(EMCEntityExtractor):
 # 工厂函数
 def create_enhanced_entity_extractor(
     deepseek_service: Optional[Any] = None,
-    kag_config_path: Optional[str] = None
+    kag_config_path: Optional[str] = None,
+    parse_executor: Optional[Executor] = None
 ) -> EnhancedEMCEntityExtractor:
-    """创建增强实体提取器实例"""
+    """创建增强实体提取器实例，parse_executor 可传入进程池用于文件解析"""
     return EnhancedEMCEntityExtractor(
         deepseek_service=deepseek_service,
-        kag_config_path=kag_config_path
+        kag_config_path=kag_config_path,
+        parse_executor=parse_executor
     )
 
 
 # 使用示例
 if __name__ == "__main__":
-    import asyncio
     import os
     
     async def test_enhanced_extractor():
@@ -5,13 +5,18 @@
 
 from typing import List, Dict, Any, Optional
 import asyncio
+import random
 from neo4j import AsyncGraphDatabase, Query
 
+from .emc_ontology import ENTITY_LABEL
+from .query_templates import DEFAULT_SUBGRAPH_LIMIT, SUBGRAPH, QueryTemplateRegistry
+
 class EnhancedNeo4jService:
     """增强的Neo4j服务，支持实时编辑"""
     
     def __init__(self, uri: str, username: str, password: str, mock_mode: bool = False):
         self.mock_mode = mock_mode
+        self.templates = QueryTemplateRegistry()
         if not mock_mode:
             self.driver = AsyncGraphDatabase.driver(uri, auth=(username, password))
         else:
@@ -36,8 +41,8 @@ class EnhancedNeo4jService:
                     return True
             return False
             
-        query_str = """
-        MATCH (n {id: $node_id})
+        query_str = f"""
+        MATCH (n:{ENTITY_LABEL} {{id: $node_id}})
         SET n.x = $x, n.y = $y, n.updated_at = datetime()
         RETURN count(n) as updated
         """
@@ -51,7 +56,7 @@ class EnhancedNeo4jService:
     async def create_node_interactive(self, node_data: Dict[str, Any]) -> str:
         """交互式创建节点 - 实用版本"""
         node_id = f"node_{int(asyncio.get_event_loop().time() * 1000)}"
-        node_type = node_data.get('type', 'Entity')
+        node_type = node_data.get('type', ENTITY_LABEL)
         
         if self.mock_mode:
             new_node = {
@@ -74,7 +79,7 @@ class EnhancedNeo4jService:
             y: $y,
             created_at: datetime()
         }})
-        SET n += $properties
+        SET n += $properties, n:{ENTITY_LABEL}
         RETURN n.id as id
         """
         
@@ -115,7 +120,7 @@ class EnhancedNeo4jService:
             return True
             
         query_str = f"""
-        MATCH (a {{id: $source_id}}), (b {{id: $target_id}})
+        MATCH (a:{ENTITY_LABEL} {{id: $source_id}}), (b:{ENTITY_LABEL} {{id: $target_id}})
         CREATE (a)-[r:{rel_type}]->(b)
         SET r += $properties
         SET r.created_at = datetime()
@@ -145,43 +150,26 @@ class EnhancedNeo4jService:
                 'links': self.mock_data['links']
             }
             
-        query_str = f"""
-        MATCH (center {{id: $center_id}})
-        MATCH path = (center)-[*1..{depth}]-(n)
-        WITH collect(DISTINCT center) + collect(DISTINCT n) as nodes,
-             collect(DISTINCT relationships(path)) as rels
-        UNWIND nodes as node
-        WITH collect(DISTINCT {{
-            id: node.id,
-            label: node.label,
-            type: labels(node)[0],
-            x: coalesce(node.x, rand() * 1000),
-            y: coalesce(node.y, rand() * 1000),
-            properties: properties(node)
-        }}) as node_list,
-        rels
-        
-        UNWIND rels as rel_list
-        UNWIND rel_list as rel
-        WITH node_list, collect(DISTINCT {{
-            source: startNode(rel).id,
-            target: endNode(rel).id,
-            type: type(rel),
-            properties: properties(rel)
-        }}) as relationship_list
-        
-        RETURN node_list as nodes, relationship_list as links
-        """
+        query_str = self.templates.get(SUBGRAPH, depth)
         
         async with self.driver.session() as session:
             query = Query(query_str)
-            result = await session.run(query, center_id=center_node_id)
+            result = await session.run(query, center_id=center_node_id, limit=DEFAULT_SUBGRAPH_LIMIT)
             record = await result.single()
             
             if record:
+                # 没有保存位置的节点随机放置
+                nodes = [
+                    {
+                        **node,
+                        'x': node['properties'].get('x', random.random() * 1000),
+                        'y': node['properties'].get('y', random.random() * 1000)
+                    }
+                    for node in record['nodes']
+                ]
                 return {
-                    'nodes': record['nodes'],
-                    'links': record['links']
+                    'nodes': nodes,
+                    'links': record['relationships']
                 }
             
             return {'nodes': [], 'links': []}
\ No newline at end of file
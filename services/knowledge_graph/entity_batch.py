@@ -0,0 +1,152 @@
+"""
+EMC Entity Batch
+
+A columnar, offset-preserving record of entity mentions. Instead of one dict
+holding a full BaseNode.__dict__ per mention, a batch keeps parallel arrays
+(label id, start/end offset, name id, unit id, normalised values) and an
+interned string table, so a mention costs a few dozen bytes regardless of how
+many times its name repeats.
+"""
+
+import math
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class EntityMention(NamedTuple):
+    """One row of an EntityBatch."""
+    label: str
+    name: str
+    start: int
+    end: int
+    unit: Optional[str]
+    value_hz: Optional[float]
+    max_value_hz: Optional[float]
+
+
+class StringTable:
+    """Interns strings: each distinct string is stored once and referred to by its index."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self._ids[value] = string_id
+        return string_id
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.strings[string_id]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class EntityBatch:
+    """
+    Entity mentions stored column-wise.
+
+    Row i is the mention text[starts[i]:ends[i]] of the entity named
+    strings[name_ids[i]] with label labels[label_ids[i]]. unit_ids[i] is -1 when the
+    mention has no unit. value_hz holds the frequency (or the lower bound of a range)
+    and max_value_hz the upper bound of a range; both are NaN when not applicable.
+    Labels, names and units share the string table.
+    """
+
+    NO_UNIT = -1
+
+    def __init__(self):
+        self.strings = StringTable()
+        self.label_ids = array('I')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.name_ids = array('I')
+        self.unit_ids = array('i')
+        self.value_hz = array('d')
+        self.max_value_hz = array('d')
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def append(
+        self,
+        label: str,
+        name: str,
+        start: int,
+        end: int,
+        unit: Optional[str] = None,
+        value_hz: Optional[float] = None,
+        max_value_hz: Optional[float] = None
+    ) -> None:
+        """Adds one mention."""
+        self.label_ids.append(self.strings.intern(label))
+        self.starts.append(start)
+        self.ends.append(end)
+        self.name_ids.append(self.strings.intern(name))
+        self.unit_ids.append(self.strings.intern(unit) if unit is not None else self.NO_UNIT)
+        self.value_hz.append(math.nan if value_hz is None else value_hz)
+        self.max_value_hz.append(math.nan if max_value_hz is None else max_value_hz)
+
+    def extend(self, other: "EntityBatch", offset: int = 0) -> None:
+        """
+        Appends the mentions of another batch (e.g. one extracted from a later chunk),
+        shifting its offsets by `offset` and re-interning its strings.
+        """
+        remap = array('i', (self.strings.intern(value) for value in other.strings.strings))
+        self.label_ids.extend(remap[i] for i in other.label_ids)
+        self.starts.extend(start + offset for start in other.starts)
+        self.ends.extend(end + offset for end in other.ends)
+        self.name_ids.extend(remap[i] for i in other.name_ids)
+        self.unit_ids.extend(remap[i] if i != self.NO_UNIT else self.NO_UNIT for i in other.unit_ids)
+        self.value_hz.extend(other.value_hz)
+        self.max_value_hz.extend(other.max_value_hz)
+
+    def __getitem__(self, index: int) -> EntityMention:
+        unit_id = self.unit_ids[index]
+        value_hz = self.value_hz[index]
+        max_value_hz = self.max_value_hz[index]
+        return EntityMention(
+            label=self.strings[self.label_ids[index]],
+            name=self.strings[self.name_ids[index]],
+            start=self.starts[index],
+            end=self.ends[index],
+            unit=self.strings[unit_id] if unit_id != self.NO_UNIT else None,
+            value_hz=None if math.isnan(value_hz) else value_hz,
+            max_value_hz=None if math.isnan(max_value_hz) else max_value_hz
+        )
+
+    def __iter__(self) -> Iterator[EntityMention]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def spans_by_entity(self) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+        """Groups mention offsets by (name, label), in first-mention order."""
+        grouped: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for name_id, label_id, start, end in zip(self.name_ids, self.label_ids, self.starts, self.ends):
+            grouped.setdefault((name_id, label_id), []).append((start, end))
+        return {
+            (self.strings[name_id], self.strings[label_id]): spans
+            for (name_id, label_id), spans in grouped.items()
+        }
+
+    def context(self, text: str, index: int, width: int = 100) -> str:
+        """The text around mention `index`, up to `width` characters on each side."""
+        return text[max(0, self.starts[index] - width):self.ends[index] + width]
+
+    def highlights(self) -> List[Dict[str, object]]:
+        """Mention offsets and labels, e.g. for highlighting entities in the UI."""
+        return [
+            {"start": start, "end": end, "label": self.strings[label_id]}
+            for start, end, label_id in zip(self.starts, self.ends, self.label_ids)
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the column arrays in bytes (the string table is not included)."""
+        columns = (self.label_ids, self.starts, self.ends, self.name_ids,
+                   self.unit_ids, self.value_hz, self.max_value_hz)
+        return sum(column.itemsize * len(column) for column in columns)
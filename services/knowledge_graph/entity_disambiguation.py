@@ -4,13 +4,15 @@ EMC知识图谱实体消歧模块
 """
 
 from typing import List, Dict, Tuple, Optional
+from collections import OrderedDict
 import hashlib
 import time
 from dataclasses import dataclass
 from gensim.models import Word2Vec, KeyedVectors
 import spacy
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .similarity_clustering import greedy_threshold_clustering, DEFAULT_MAX_BLOCK_ELEMENTS
 
 @dataclass
 class EntityCandidate:
@@ -32,21 +34,47 @@ class DisambiguatedEntity:
 class EntityDisambiguator:
     """基于词向量的实体消歧器"""
     
-    def __init__(self, model_path: Optional[str] = None, spacy_model: str = "en_core_web_sm"):
+    def __init__(self, 
+                 model_path: Optional[str] = None, 
+                 spacy_model: str = "en_core_web_sm",
+                 batch_size: int = 256,
+                 n_process: int = 1,
+                 vector_cache_size: int = 50000):
         """
         初始化消歧器
         
         Args:
             model_path: 预训练词向量模型路径（可选）
             spacy_model: spaCy模型名称
+            batch_size: nlp.pipe 的批大小
+            n_process: nlp.pipe 的进程数
+            vector_cache_size: 上下文特征向量LRU缓存的最大条目数（0表示不缓存）
         """
         self.nlp = spacy.load(spacy_model)
         self.word_vectors = None
         self.similarity_threshold = 0.7  # 相似度阈值
+        self.max_block_elements = DEFAULT_MAX_BLOCK_ELEMENTS  # 相似度分块大小上限
+        self.batch_size = batch_size
+        self.n_process = n_process
+        
+        # 特征提取只需要分词和词向量，其余组件（parser、ner等）全部禁用
+        self._feature_disabled_pipes = self._get_unneeded_pipes()
+        
+        # (实体, 上下文) 内容哈希 -> 特征向量
+        self.vector_cache_size = vector_cache_size
+        self._vector_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
         
         if model_path:
             self.load_pretrained_vectors(model_path)
     
+    def _get_unneeded_pipes(self) -> List[str]:
+        """返回特征提取时可以禁用的管道组件"""
+        # 没有静态词向量的模型（如 *_sm）由 tok2vec 提供 token.vector，需要保留
+        needed = set() if self.nlp.vocab.vectors_length else {"tok2vec"}
+        return [name for name in self.nlp.pipe_names if name not in needed]
+    
     def load_pretrained_vectors(self, model_path: str):
         """加载预训练词向量模型"""
         try:
@@ -66,9 +94,54 @@ class EntityDisambiguator:
         Returns:
             特征向量
         """
-        # 使用spaCy处理文本
-        doc = self.nlp(f"{entity} {context}")
+        return self.extract_context_features_batch([(entity, context)])[0]
+    
+    def extract_context_features_batch(self, pairs: List[Tuple[str, str]]) -> List[np.ndarray]:
+        """
+        批量提取实体上下文特征向量
+        
+        已缓存的 (实体, 上下文) 直接命中LRU缓存；其余文本去重后
+        通过 nlp.pipe 按 batch_size / n_process 批量处理。
+        
+        Args:
+            pairs: (实体文本, 上下文) 元组列表
+            
+        Returns:
+            与输入顺序一致的特征向量列表
+        """
+        keys = [self._cache_key(entity, context) for entity, context in pairs]
+        vectors: Dict[str, np.ndarray] = {}
+        pending: Dict[str, str] = {}  # 缓存未命中: 键 -> 待处理文本
+        
+        for key, (entity, context) in zip(keys, pairs):
+            if key in vectors or key in pending:
+                continue
+            cached = self._vector_cache.get(key)
+            if cached is not None:
+                self._vector_cache.move_to_end(key)
+                self._cache_hits += 1
+                vectors[key] = cached
+            else:
+                self._cache_misses += 1
+                pending[key] = f"{entity} {context}"
         
+        if pending:
+            # 使用spaCy批量处理文本
+            docs = self.nlp.pipe(
+                pending.values(),
+                batch_size=self.batch_size,
+                n_process=self.n_process,
+                disable=self._feature_disabled_pipes
+            )
+            for key, doc in zip(pending.keys(), docs):
+                vector = self._doc_vector(doc)
+                vectors[key] = vector
+                self._cache_vector(key, vector)
+        
+        return [vectors[key] for key in keys]
+    
+    def _doc_vector(self, doc) -> np.ndarray:
+        """对文档中非停用词、非标点的词向量取平均"""
         # 收集词向量
         vectors = []
         for token in doc:
@@ -76,12 +149,38 @@ class EntityDisambiguator:
                 vectors.append(token.vector)
         
         if not vectors:
-            # 如果没有找到向量，返回零向量
-            return np.zeros(self.nlp.vocab.vectors_length)
+            # 如果没有找到向量，返回零向量（无静态词向量的模型使用tok2vec的维度，保证可以堆叠成矩阵）
+            dim = self.nlp.vocab.vectors_length or (doc.tensor.shape[-1] if doc.tensor.ndim == 2 else 0)
+            return np.zeros(dim)
         
         # 返回平均向量
         return np.mean(vectors, axis=0)
     
+    @staticmethod
+    def _cache_key(entity: str, context: str) -> str:
+        """(实体, 上下文) 的内容哈希"""
+        return hashlib.sha1(f"{entity}\x1f{context}".encode("utf-8")).hexdigest()
+    
+    def _cache_vector(self, key: str, vector: np.ndarray):
+        """写入LRU缓存，超出容量时淘汰最久未使用的条目"""
+        if self.vector_cache_size <= 0:
+            return
+        self._vector_cache[key] = vector
+        self._vector_cache.move_to_end(key)
+        while len(self._vector_cache) > self.vector_cache_size:
+            self._vector_cache.popitem(last=False)
+    
+    def get_cache_stats(self) -> Dict[str, float]:
+        """获取特征向量缓存的统计信息"""
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            "size": len(self._vector_cache),
+            "max_size": self.vector_cache_size,
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "hit_ratio": self._cache_hits / lookups if lookups else 0.0
+        }
+    
     def calculate_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """
         计算两个向量的余弦相似度
@@ -115,39 +214,31 @@ class EntityDisambiguator:
         hash_input = canonical_form.lower().strip()
         return f"entity_{hashlib.md5(hash_input.encode()).hexdigest()[:12]}"
     
-    def disambiguate_entities(self, entities: List[Tuple[str, str]]) -> List[DisambiguatedEntity]:
+    def disambiguate_entities(
+        self,
+        entities: List[Tuple[str, str]],
+        vectors: Optional[List[np.ndarray]] = None
+    ) -> List[DisambiguatedEntity]:
         """
         对实体列表进行消歧
         
         Args:
             entities: (实体文本, 上下文) 元组列表
+            vectors: 已提取的上下文特征向量（与 entities 一一对应），不传时在此提取
             
         Returns:
             消歧后的实体列表
         """
         start_time = time.time()
         
-        # 提取特征向量（并行处理）
-        candidates = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            future_to_idx = {
-                executor.submit(self._process_entity, idx, entity, context): idx
-                for idx, (entity, context) in enumerate(entities)
-            }
-            
-            for future in as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                try:
-                    candidate = future.result()
-                    candidates.append(candidate)
-                except Exception as e:
-                    print(f"Error processing entity {idx}: {e}")
-        
-        # 按原始索引排序
-        candidates.sort(key=lambda x: x.original_index)
+        # 构造候选项（特征向量在聚类时通过 nlp.pipe 批量提取）
+        candidates = [
+            self._process_entity(idx, entity, context)
+            for idx, (entity, context) in enumerate(entities)
+        ]
         
         # 执行聚类消歧
-        disambiguated = self._cluster_entities(candidates)
+        disambiguated = self._cluster_entities(candidates, vectors)
         
         elapsed = time.time() - start_time
         print(f"Disambiguated {len(entities)} entities in {elapsed:.2f}s")
@@ -155,55 +246,43 @@ class EntityDisambiguator:
         return disambiguated
     
     def _process_entity(self, idx: int, entity: str, context: str) -> EntityCandidate:
-        """处理单个实体（用于并行处理）"""
+        """处理单个实体"""
         return EntityCandidate(
             text=entity,
             context=context,
             original_index=idx
         )
     
-    def _cluster_entities(self, candidates: List[EntityCandidate]) -> List[DisambiguatedEntity]:
+    def _cluster_entities(
+        self,
+        candidates: List[EntityCandidate],
+        vectors: Optional[List[np.ndarray]] = None
+    ) -> List[DisambiguatedEntity]:
         """
         使用相似度聚类对实体进行分组
         
         Args:
             candidates: 实体候选列表
+            vectors: 候选项的特征向量，不传时批量提取
             
         Returns:
             聚类后的消歧实体
         """
-        # 计算特征向量
-        vectors = []
-        for candidate in candidates:
-            vector = self.extract_context_features(candidate.text, candidate.context)
-            vectors.append(vector)
+        # 批量计算特征向量
+        if vectors is None:
+            vectors = self.extract_context_features_batch(
+                [(candidate.text, candidate.context) for candidate in candidates]
+            )
         
-        # 简单的层次聚类
+        # 贪心阈值聚类（分块矩阵乘法计算相似度）
         clusters = []
-        used = set()
+        member_lists = greedy_threshold_clustering(
+            vectors, self.similarity_threshold, self.max_block_elements
+        )
         
-        for i, candidate in enumerate(candidates):
-            if i in used:
-                continue
-                
-            # 创建新聚类
-            cluster_members = [i]
-            cluster_texts = [candidate.text]
-            cluster_indices = [candidate.original_index]
-            
-            # 寻找相似实体
-            for j, other_candidate in enumerate(candidates[i+1:], i+1):
-                if j in used:
-                    continue
-                    
-                similarity = self.calculate_similarity(vectors[i], vectors[j])
-                if similarity >= self.similarity_threshold:
-                    cluster_members.append(j)
-                    cluster_texts.append(other_candidate.text)
-                    cluster_indices.append(other_candidate.original_index)
-                    used.add(j)
-            
-            used.add(i)
+        for cluster_members in member_lists:
+            cluster_texts = [candidates[k].text for k in cluster_members]
+            cluster_indices = [candidates[k].original_index for k in cluster_members]
             
             # 生成消歧实体
             canonical_form = max(cluster_texts, key=len)  # 选择最长的作为规范形式
@@ -8,7 +8,7 @@ as well as rule-based methods.
 
 import re
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Pattern, Tuple
 
 # Assuming deepseek_service is correctly configured and passed
 # from ..ai_integration.deepseek_service import DeepSeekEMCService
@@ -24,9 +24,116 @@ from .emc_ontology import (
     get_node_schema, BaseNode, FrequencyNode, FrequencyRangeNode,
     EMCStandardNode, ProductNode # Import other specific node types as needed
 )
+from .entity_batch import EntityBatch
+
+# Normalised values of one mention: (name, unit, value_hz, max_value_hz)
+MentionValues = Tuple[str, Optional[str], Optional[float], Optional[float]]
+
+_DESCRIPTION_KINDS = {
+    NODE_EMC_STANDARD: "EMC Standard",
+    NODE_FREQUENCY: "Frequency",
+    NODE_FREQUENCY_RANGE: "Frequency Range",
+}
 
 logger = logging.getLogger(__name__)
 
+
+def merge_duplicate_entities(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Deduplicates entity dicts by (name, label). The last occurrence wins, but the
+    'spans' of all occurrences are kept, in order.
+    """
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    spans: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    for entity in entities:
+        key = (entity["data"]["name"], entity["label"])
+        merged[key] = entity
+        if entity.get("spans"):
+            spans.setdefault(key, []).extend(entity["spans"])
+    return [
+        {**entity, "spans": spans[key]} if key in spans else entity
+        for key, entity in merged.items()
+    ]
+
+
+class EntityPatternScanner:
+    """
+    Finds matches for several entity patterns in a single pass over the text.
+
+    All registered patterns are compiled into one alternation, so the text is
+    walked once no matter how many entity kinds are registered. Matches never
+    overlap: when several patterns match at the same offset, the longest match
+    wins and scanning resumes after it, so e.g. the endpoints of "30MHz-1GHz"
+    are not reported again as single frequencies.
+    """
+
+    def __init__(self):
+        self._patterns: List[Tuple[str, Pattern]] = []
+        self._combined: Optional[Pattern] = None
+        self._group_slices: Dict[str, Tuple[int, int]] = {}
+
+    def register(self, label: str, pattern: Pattern) -> None:
+        """Adds (or replaces) the pattern for an entity label."""
+        self._patterns = [(l, p) for l, p in self._patterns if l != label]
+        self._patterns.append((label, pattern))
+        self._combined = None
+
+    @property
+    def labels(self) -> List[str]:
+        return [label for label, _ in self._patterns]
+
+    def _compile(self) -> Pattern:
+        alternatives = []
+        for i, (label, pattern) in enumerate(self._patterns):
+            flags = "i" if pattern.flags & re.IGNORECASE else ""
+            body = f"(?{flags}:{pattern.pattern})" if flags else f"(?:{pattern.pattern})"
+            alternatives.append(f"(?P<_p{i}>{body})")
+        combined = re.compile("|".join(alternatives))
+
+        # Inner capture groups of pattern i sit right after its wrapping named group
+        self._group_slices = {}
+        for i, (label, pattern) in enumerate(self._patterns):
+            outer = combined.groupindex[f"_p{i}"]
+            self._group_slices[f"_p{i}"] = (outer, outer + pattern.groups)
+        return combined
+
+    def scan(self, text: str) -> Iterator[Tuple[str, Tuple[Optional[str], ...], int, int]]:
+        """
+        Yields (label, groups, start, end) for each non-overlapping match, in text order.
+        groups are the pattern's capture groups, or just the matched text if it has none.
+        """
+        if not self._patterns:
+            return
+        if self._combined is None:
+            self._combined = self._compile()
+
+        pos = 0
+        while True:
+            match = self._combined.search(text, pos)
+            if not match:
+                return
+            start = match.start()
+            index = int(match.lastgroup[2:])
+            label, groups, end = self._patterns[index][0], None, match.end()
+
+            # Alternation takes the first pattern that matches; re-check the others at
+            # this offset only, so the cost grows with matches, not with text length.
+            for other_label, other_pattern in self._patterns:
+                if other_label == label:
+                    continue
+                other = other_pattern.match(text, start)
+                if other and other.end() > end:
+                    label, groups, end = other_label, other.groups(), other.end()
+
+            if groups is None:
+                first, last = self._group_slices[match.lastgroup]
+                groups = match.groups()[first:last]
+            if not groups:
+                groups = (text[start:end],)
+            yield label, groups, start, end
+            pos = end if end > start else start + 1
+
+
 class EMCEntityExtractor:
     # Placeholder for DeepSeekEMCService, will be properly initialized later
     # def __init__(self, deepseek_service: Optional[DeepSeekEMCService] = None):
@@ -42,6 +149,70 @@ class EMCEntityExtractor:
             NODE_FREQUENCY_RANGE: re.compile(r'(\d+(?:\.\d+)?)\s*(k|M|G)?Hz\s*(?:-|to|至)\s*(\d+(?:\.\d+)?)\s*(k|M|G)?Hz', re.IGNORECASE),
             # Add more specific regex for other entities if useful for rule-based fallback
         }
+        # Builders turn a match's groups into an entity dataclass for each label
+        self._entity_builders: Dict[str, Callable[[Tuple[Optional[str], ...], List[str]], BaseNode]] = {
+            NODE_EMC_STANDARD: self._build_standard_entity,
+            NODE_FREQUENCY: self._build_frequency_entity,
+            NODE_FREQUENCY_RANGE: self._build_frequency_range_entity,
+        }
+        # Normalizers turn a match's groups into the compact values kept in an EntityBatch:
+        # (name, unit, value_hz, max_value_hz)
+        self._entity_normalizers: Dict[str, Callable[[Tuple[Optional[str], ...]], MentionValues]] = {
+            NODE_EMC_STANDARD: self._normalize_standard,
+            NODE_FREQUENCY: self._normalize_frequency,
+            NODE_FREQUENCY_RANGE: self._normalize_frequency_range,
+        }
+        self.scanner = EntityPatternScanner()
+        for label, pattern in self.patterns.items():
+            self.scanner.register(label, pattern)
+
+    def register_pattern(
+        self,
+        label: str,
+        pattern: Pattern,
+        builder: Optional[Callable[[Tuple[Optional[str], ...], List[str]], BaseNode]] = None
+    ) -> None:
+        """
+        Adds a rule-based pattern (e.g. for Product, Equipment or Organization names)
+        to the single-pass scanner. Without a builder the first capture group, or the
+        whole match if the pattern has none, becomes the entity name.
+        """
+        self.patterns[label] = pattern
+        self._entity_builders[label] = builder or self._make_default_builder(label)
+        self._entity_normalizers[label] = (
+            self._make_builder_normalizer(builder) if builder else self._normalize_default
+        )
+        self.scanner.register(label, pattern)
+
+    def _make_default_builder(self, label: str) -> Callable[[Tuple[Optional[str], ...], List[str]], BaseNode]:
+        def build(groups: Tuple[Optional[str], ...], source_doc_ids: List[str]) -> BaseNode:
+            name = groups[0]
+            schema_class = get_node_schema(label) or BaseNode
+            return schema_class(
+                name=name.strip(),
+                description=f"Detected {label}: {name.strip()}",
+                source_document_ids=source_doc_ids,
+                properties={'detection_method': 'regex'}
+            )
+        return build
+
+    @staticmethod
+    def _normalize_default(groups: Tuple[Optional[str], ...]) -> MentionValues:
+        return groups[0].strip(), None, None, None
+
+    @staticmethod
+    def _make_builder_normalizer(
+        builder: Callable[[Tuple[Optional[str], ...], List[str]], BaseNode]
+    ) -> Callable[[Tuple[Optional[str], ...]], MentionValues]:
+        def normalize(groups: Tuple[Optional[str], ...]) -> MentionValues:
+            entity = builder(groups, [])
+            return (
+                entity.name,
+                getattr(entity, 'unit', None),
+                getattr(entity, 'value_hz', getattr(entity, 'min_value_hz', None)),
+                getattr(entity, 'max_value_hz', None)
+            )
+        return normalize
 
     def _parse_frequency_value(self, value_str: str, unit_prefix: Optional[str]) -> float:
         """Converts frequency string with prefix to Hz."""
@@ -56,76 +227,144 @@ class EMCEntityExtractor:
                 value *= 1e9
         return value
 
+    def _normalize_standard(self, groups: Tuple[Optional[str], ...]) -> MentionValues:
+        return groups[0].upper(), None, None, None
+
+    def _normalize_frequency(self, groups: Tuple[Optional[str], ...]) -> MentionValues:
+        value_str, unit_prefix = groups
+        original_unit = f"{unit_prefix or ''}Hz"
+        return f"{value_str}{original_unit}", original_unit, self._parse_frequency_value(value_str, unit_prefix), None
+
+    def _normalize_frequency_range(self, groups: Tuple[Optional[str], ...]) -> MentionValues:
+        min_val_str, min_pref, max_val_str, max_pref = groups
+        min_hz = self._parse_frequency_value(min_val_str, min_pref)
+        max_hz = self._parse_frequency_value(max_val_str, max_pref)
+
+        original_min_unit = f"{min_pref or ''}Hz"
+        original_max_unit = f"{max_pref or ''}Hz"
+        range_name = f"{min_val_str}{original_min_unit}-{max_val_str}{original_max_unit}"
+        # Storing base unit for values
+        return range_name, "Hz", min_hz, max_hz
+
+    def _build_standard_entity(self, groups: Tuple[Optional[str], ...], source_doc_ids: List[str]) -> BaseNode:
+        name, _, _, _ = self._normalize_standard(groups)
+        schema_class = get_node_schema(NODE_EMC_STANDARD) or BaseNode
+        entity = schema_class(
+            name=name,
+            description=f"Detected EMC Standard: {groups[0]}",
+            source_document_ids=source_doc_ids,
+            properties={'detection_method': 'regex'}
+        )
+        if isinstance(entity, EMCStandardNode): # Example of adding specific props
+             # Try to parse version if possible from name or surrounding text (simplified here)
+            pass
+        return entity
+
+    def _build_frequency_entity(self, groups: Tuple[Optional[str], ...], source_doc_ids: List[str]) -> BaseNode:
+        name, unit, value_hz, _ = self._normalize_frequency(groups)
+        return self._build_normalized_entity(NODE_FREQUENCY, name, unit, value_hz, None, source_doc_ids)
+
+    def _build_frequency_range_entity(self, groups: Tuple[Optional[str], ...], source_doc_ids: List[str]) -> BaseNode:
+        name, unit, min_hz, max_hz = self._normalize_frequency_range(groups)
+        return self._build_normalized_entity(NODE_FREQUENCY_RANGE, name, unit, min_hz, max_hz, source_doc_ids)
+
+    def _build_normalized_entity(
+        self,
+        label: str,
+        name: str,
+        unit: Optional[str],
+        value_hz: Optional[float],
+        max_value_hz: Optional[float],
+        source_doc_ids: List[str]
+    ) -> BaseNode:
+        """Builds the ontology node for a mention's normalised values."""
+        schema_class = get_node_schema(label) or BaseNode
+        entity = schema_class(
+            name=name,
+            description=f"Detected {_DESCRIPTION_KINDS.get(label, label)}: {name}",
+            source_document_ids=source_doc_ids,
+            properties={'detection_method': 'regex'}
+        )
+        if isinstance(entity, FrequencyNode):
+            entity.value_hz = value_hz
+            entity.unit = unit
+        elif isinstance(entity, FrequencyRangeNode):
+            entity.min_value_hz = value_hz
+            entity.max_value_hz = max_value_hz
+            # Decide on a common unit for display if necessary, or store original parts
+            entity.unit = unit
+        return entity
+
     def extract_entities_rule_based(self, text_content: str, document_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Extracts entities using rule-based methods (regex, keywords).
         This can serve as a baseline or a supplement to AI-based extraction.
+
+        All patterns are matched in a single pass over the text (see EntityPatternScanner);
+        overlapping matches are resolved in favour of the longest one, so a frequency
+        range does not also yield its endpoints as separate frequencies.
+
+        Each entity dict carries 'spans': [(start, end)], the offsets of the match in
+        text_content, which EMCRelationBuilder uses for co-occurrence windows.
         """
         extracted_entities = []
         source_doc_ids = [document_id] if document_id else []
 
-        # Extract EMC Standards
-        for match in self.patterns[NODE_EMC_STANDARD].finditer(text_content):
-            schema_class = get_node_schema(NODE_EMC_STANDARD) or BaseNode
-            entity = schema_class(
-                name=match.group(1).upper(),
-                description=f"Detected EMC Standard: {match.group(1)}",
-                source_document_ids=source_doc_ids,
-                properties={'detection_method': 'regex'}
-            )
-            if isinstance(entity, EMCStandardNode): # Example of adding specific props
-                 # Try to parse version if possible from name or surrounding text (simplified here)
-                pass
-            extracted_entities.append({"label": NODE_EMC_STANDARD, "data": entity.__dict__})
-
-        # Extract Frequencies
-        for match in self.patterns[NODE_FREQUENCY].finditer(text_content):
-            value_str, unit_prefix = match.groups()
-            value_hz = self._parse_frequency_value(value_str, unit_prefix)
-            original_unit = f"{unit_prefix or ''}Hz"
-
-            schema_class = get_node_schema(NODE_FREQUENCY) or BaseNode
-            entity = schema_class(
-                name=f"{value_str}{original_unit}",
-                description=f"Detected Frequency: {value_str}{original_unit}",
-                source_document_ids=source_doc_ids,
-                properties={'detection_method': 'regex'}
-            )
-            if isinstance(entity, FrequencyNode):
-                entity.value_hz = value_hz
-                entity.unit = original_unit
-            extracted_entities.append({"label": NODE_FREQUENCY, "data": entity.__dict__})
-
-        # Extract Frequency Ranges
-        for match in self.patterns[NODE_FREQUENCY_RANGE].finditer(text_content):
-            min_val_str, min_pref, max_val_str, max_pref = match.groups()
-            min_hz = self._parse_frequency_value(min_val_str, min_pref)
-            max_hz = self._parse_frequency_value(max_val_str, max_pref)
-
-            original_min_unit = f"{min_pref or ''}Hz"
-            original_max_unit = f"{max_pref or ''}Hz"
-            range_name = f"{min_val_str}{original_min_unit}-{max_val_str}{original_max_unit}"
-
-            schema_class = get_node_schema(NODE_FREQUENCY_RANGE) or BaseNode
-            entity = schema_class(
-                name=range_name,
-                description=f"Detected Frequency Range: {range_name}",
-                source_document_ids=source_doc_ids,
-                properties={'detection_method': 'regex'}
-            )
-            if isinstance(entity, FrequencyRangeNode):
-                entity.min_value_hz = min_hz
-                entity.max_value_hz = max_hz
-                # Decide on a common unit for display if necessary, or store original parts
-                entity.unit = "Hz" # Storing base unit for values
-            extracted_entities.append({"label": NODE_FREQUENCY_RANGE, "data": entity.__dict__})
+        for label, groups, start, end in self.scanner.scan(text_content):
+            entity = self._entity_builders[label](groups, source_doc_ids)
+            extracted_entities.append({"label": label, "data": entity.__dict__, "spans": [(start, end)]})
 
-        # Placeholder for other entity types (Product, Component, etc.)
-        # These often require more sophisticated NLP or AI.
+        # Product, Component, etc. often require more sophisticated NLP or AI;
+        # simple patterns for them can be added with register_pattern().
 
         logger.info(f"Rule-based extraction found {len(extracted_entities)} entities from document {document_id or 'N/A'}.")
         return extracted_entities
 
+    def extract_entity_batch(
+        self,
+        text_content: str,
+        batch: Optional[EntityBatch] = None,
+        offset: int = 0
+    ) -> EntityBatch:
+        """
+        Rule-based extraction into a columnar EntityBatch: one row per mention with its
+        offsets and normalised values, and no per-mention node dicts. Mentions are
+        appended to `batch` if given (with offsets shifted by `offset`, e.g. for
+        consecutive chunks of one document), otherwise to a new batch.
+        """
+        if batch is None:
+            batch = EntityBatch()
+        for label, groups, start, end in self.scanner.scan(text_content):
+            name, unit, value_hz, max_value_hz = self._entity_normalizers[label](groups)
+            batch.append(label, name, start + offset, end + offset, unit, value_hz, max_value_hz)
+        return batch
+
+    def entities_from_batch(self, batch: EntityBatch, document_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Builds one entity dict per distinct (name, label) in the batch, in first-mention
+        order, with the 'spans' of all its mentions, as extract_entities returns them.
+        Nodes are rebuilt from the normalised values, so fields set only by a custom
+        register_pattern() builder are not restored.
+        """
+        source_doc_ids = [document_id] if document_id else []
+        first_rows: Dict[Tuple[int, int], int] = {}
+        for row, key in enumerate(zip(batch.name_ids, batch.label_ids)):
+            first_rows.setdefault(key, row)
+        spans = batch.spans_by_entity()
+
+        entities = []
+        for row in first_rows.values():
+            mention = batch[row]
+            entity = self._build_normalized_entity(
+                mention.label, mention.name, mention.unit, mention.value_hz, mention.max_value_hz, source_doc_ids
+            )
+            entities.append({
+                "label": mention.label,
+                "data": entity.__dict__,
+                "spans": spans[(mention.name, mention.label)]
+            })
+        return entities
+
     async def extract_entities_ai(self, text_content: str, document_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Extracts entities using an AI service (e.g., DeepSeek).
@@ -213,8 +452,7 @@ class EMCEntityExtractor:
             all_entities.extend(rule_entities)
             # A basic deduplication by name and label
             # This is very naive, proper deduplication is complex.
-            final_entities_map = {(e["data"]["name"], e["label"]): e for e in all_entities}
-            all_entities = list(final_entities_map.values())
+            all_entities = merge_duplicate_entities(all_entities)
 
 
         logger.info(f"Total entities extracted for doc {document_id or 'N/A'}: {len(all_entities)}")
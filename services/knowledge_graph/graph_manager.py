@@ -8,13 +8,13 @@ process documents, extract information, and store it in the graph.
 
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterable, Awaitable, Callable
 from dataclasses import asdict
 
 
 # Assuming services are in the same directory or paths are correctly configured
 from .emc_ontology import ONTOLOGY_DEFINITIONS # For reference or validation if needed
-from .entity_extractor import EMCEntityExtractor
+from .entity_extractor import EMCEntityExtractor, merge_duplicate_entities
 from .relation_builder import EMCRelationBuilder
 from .neo4j_emc_service import Neo4jEMCService # This will be used conceptually
 
@@ -24,6 +24,28 @@ import os
 
 logger = logging.getLogger(__name__)
 
+
+def _unique_id_field(label: str, data: Dict[str, Any]) -> str:
+    """Property used to MERGE an entity: 'file_id' for Document nodes that carry one, otherwise 'name'."""
+    if label == "Document" and "file_id" in data: # Using string literal for "Document"
+        return "file_id"
+    # Add other specific unique_id_fields if necessary for other labels
+    return "name"
+
+
+def _build_unique_value_map(entities: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Maps each entity's id_in_document to its label and unique property, for linking relationships."""
+    entity_id_to_unique_value_map = {}
+    for entity_detail in entities:
+        unique_id_field = _unique_id_field(entity_detail["label"], entity_detail["data"])
+        entity_id_to_unique_value_map[entity_detail["id_in_document"]] = {
+            "label": entity_detail["label"],
+            "unique_field": unique_id_field,
+            "unique_value": entity_detail["data"].get(unique_id_field)
+        }
+    return entity_id_to_unique_value_map
+
+
 class EMCGraphManager:
     def __init__(
         self,
@@ -64,7 +86,8 @@ class EMCGraphManager:
         self,
         text_content: str,
         document_id: str, # A unique identifier for the document
-        document_metadata: Optional[Dict[str, Any]] = None # e.g., filename, type from FileMetadata
+        document_metadata: Optional[Dict[str, Any]] = None, # e.g., filename, type from FileMetadata
+        bulk_ingest: bool = False
     ) -> Dict[str, Any]:
         """
         Processes the textual content of a document to extract entities and relationships,
@@ -74,10 +97,115 @@ class EMCGraphManager:
             text_content: The raw text from the document.
             document_id: A unique ID for this document (e.g., hash, database ID).
             document_metadata: Optional dictionary containing metadata about the document.
+            bulk_ingest: If True, the Document node, entities and relationships are written
+                with one UNWIND ... MERGE per label/type group in a single transaction
+                instead of one round-trip per item.
+
+        Returns:
+            A dictionary summarizing the processing results.
+        """
+        return await self._process_document(
+            document_id,
+            document_metadata,
+            bulk_ingest,
+            text_content=text_content,
+            extract_entities=lambda: self.entity_extractor.extract_entities(
+                text_content=text_content,
+                document_id=document_id,
+                use_ai=False, # Defaulting to rules; AI integration needs more setup
+                use_rules=True
+            )
+        )
+
+    async def process_document_stream(
+        self,
+        text_chunks: AsyncIterable[str],
+        document_id: str,
+        document_metadata: Optional[Dict[str, Any]] = None,
+        bulk_ingest: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Like process_document_content, but takes the document as an async stream of
+        text chunks (e.g. pages from EMCFileProcessor.stream_pdf_pages). Rule-based
+        entity extraction starts on each chunk as soon as it arrives, while later
+        chunks are still being parsed, and the full text is never held in memory.
+
+        Entities are deduplicated by (name, label) across chunks, as extract_entities
+        does within one text. Relationship building runs once all chunks are extracted
+        and receives no text_content: mention spans are shifted to document offsets and
+        the co-occurrence window boundaries of each chunk are collected as it arrives,
+        with a boundary between consecutive chunks.
 
         Returns:
             A dictionary summarizing the processing results.
         """
+        window_cuts: List[int] = []
+        return await self._process_document(
+            document_id,
+            document_metadata,
+            bulk_ingest,
+            text_content="",
+            extract_entities=lambda: self._extract_entities_from_stream(text_chunks, document_id, window_cuts),
+            window_cuts=window_cuts
+        )
+
+    async def _extract_entities_from_stream(
+        self,
+        text_chunks: AsyncIterable[str],
+        document_id: str,
+        window_cuts: List[int]
+    ) -> List[Dict[str, Any]]:
+        """
+        Schedules entity extraction per chunk as chunks arrive and merges the results in chunk order.
+        Appends each chunk's window boundaries, in document offsets, to window_cuts.
+        """
+        extraction_tasks = []
+        chunk_offsets = []
+        offset = 0
+        try:
+            async for chunk in text_chunks:
+                if not chunk.strip():
+                    continue
+                window_cuts.append(offset)
+                window_cuts.extend(self.relation_builder.window_cuts(chunk, offset))
+                chunk_offsets.append(offset)
+                offset += len(chunk) + 1
+                extraction_tasks.append(asyncio.create_task(self.entity_extractor.extract_entities(
+                    text_content=chunk,
+                    document_id=document_id,
+                    use_ai=False,
+                    use_rules=True
+                )))
+            chunk_results = await asyncio.gather(*extraction_tasks)
+        except BaseException:
+            for task in extraction_tasks:
+                task.cancel()
+            raise
+
+        shifted_entities = []
+        for chunk_offset, chunk_entities in zip(chunk_offsets, chunk_results):
+            for entity in chunk_entities:
+                if entity.get("spans"):
+                    entity = {
+                        **entity,
+                        "spans": [(start + chunk_offset, end + chunk_offset) for start, end in entity["spans"]]
+                    }
+                shifted_entities.append(entity)
+        return merge_duplicate_entities(shifted_entities)
+
+    async def _process_document(
+        self,
+        document_id: str,
+        document_metadata: Optional[Dict[str, Any]],
+        bulk_ingest: bool,
+        text_content: str,
+        extract_entities: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        window_cuts: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Shared pipeline: Document node, entity extraction via extract_entities, relationships, storage.
+        window_cuts, if given, is read after extract_entities completes and passed to the relation builder.
+        """
         logger.info(f"Starting processing for document_id: {document_id}")
         processing_summary = {
             "document_id": document_id,
@@ -91,7 +219,8 @@ class EMCGraphManager:
 
         try:
             # 1. Add/Update Document Node itself
-            if self.neo4j_service and document_metadata:
+            doc_node_data = None
+            if document_metadata:
                 doc_node_data = {
                     "file_id": document_id, # Assuming document_id can serve as unique file_id for Document node
                     "name": document_metadata.get("filename", document_id),
@@ -100,6 +229,8 @@ class EMCGraphManager:
                     "size_bytes": document_metadata.get("size_bytes", 0),
                     # Add other relevant metadata from document_metadata
                 }
+            # In bulk mode the Document node is written together with the extracted entities
+            if self.neo4j_service and doc_node_data and not bulk_ingest:
                 # Use 'file_id' as the unique identifier for Document nodes
                 try:
                     logger.info(f"Attempting to merge document node for {document_id}")
@@ -120,12 +251,7 @@ class EMCGraphManager:
             # The 'data' part needs to be converted to a dict for Neo4j.
             logger.info(f"Extracting entities from document: {document_id}")
             # TODO: Determine if AI or rules or both should be used based on config/strategy
-            extracted_entity_dicts = await self.entity_extractor.extract_entities(
-                text_content=text_content,
-                document_id=document_id,
-                use_ai=False, # Defaulting to rules; AI integration needs more setup
-                use_rules=True
-            )
+            extracted_entity_dicts = await extract_entities()
             processing_summary["entities_extracted_count"] = len(extracted_entity_dicts)
             logger.info(f"Extracted {len(extracted_entity_dicts)} entities for document {document_id}.")
 
@@ -145,20 +271,26 @@ class EMCGraphManager:
                 # Ensure 'name' exists for temporary ID generation
                 entity_name = entity_data_as_dict.get("name", f"unnamed_entity_{i}")
 
-                entities_for_relation_builder.append({
+                entity_for_relation_builder = {
                     "label": entity_info["label"],
                     "data": entity_data_as_dict, # This is already a dict
                     "id_in_document": f"{entity_info['label']}_{entity_name}_{i}" # Temp ID
-                })
+                }
+                if entity_info.get("spans"):
+                    # Mention offsets, used by the relation builder's co-occurrence windows
+                    entity_for_relation_builder["spans"] = entity_info["spans"]
+                entities_for_relation_builder.append(entity_for_relation_builder)
 
             # 3. Extract Relationships
             logger.info(f"Building relationships for document: {document_id}")
+            relation_kwargs = {"window_cuts": window_cuts} if window_cuts is not None else {}
             extracted_relation_dicts = await self.relation_builder.build_relationships(
                 entities=entities_for_relation_builder, # Pass entities with temp IDs
                 text_content=text_content,
                 document_id=document_id,
                 use_ai=False, # Defaulting to rules
-                use_rules=True
+                use_rules=True,
+                **relation_kwargs
             )
             processing_summary["relationships_extracted_count"] = len(extracted_relation_dicts)
             logger.info(f"Extracted {len(extracted_relation_dicts)} relationships for document {document_id}.")
@@ -170,88 +302,79 @@ class EMCGraphManager:
                 processing_summary["status"] = "completed_without_storage"
                 return processing_summary
 
-            # Map temp entity IDs to Neo4j node objects/IDs after creation for linking relationships
-            # For simplicity, we'll re-fetch or rely on merge_node to handle uniqueness.
-            # A more robust way would be to get actual Neo4j elementIds.
-
-            nodes_added_this_run = 0
-            for entity_detail in entities_for_relation_builder: # Using the list with temp IDs
-                label = entity_detail["label"]
-                # Data should be a dict of the dataclass from ontology (e.g. EMCStandardNode.__dict__)
-                data_dict = entity_detail["data"]
-
-                # Determine unique_id_field based on label, default to "name"
-                unique_id_field = "name"
-                if label == "Document" and "file_id" in data_dict: # Using string literal for "Document"
-                    unique_id_field = "file_id"
-                # Add other specific unique_id_fields if necessary for other labels
-
-                try:
-                    # add_emc_entity expects a flat dict of properties
-                    self.neo4j_service.add_emc_entity(
-                        entity_label=label,
-                        entity_data=data_dict,
-                        unique_id_field=unique_id_field
-                    )
-                    nodes_added_this_run +=1
-                except Exception as e:
-                    error_msg = f"Failed to add entity {label} ({data_dict.get(unique_id_field, 'N/A')}): {e}"
-                    logger.error(error_msg, exc_info=True)
-                    processing_summary["errors"].append(error_msg)
-            processing_summary["nodes_added_count"] = nodes_added_this_run
-
-            rels_added_this_run = 0
-            # Create a mapping from id_in_document to the actual unique property value (e.g., name)
-            # This is crucial for linking relationships correctly.
-            entity_id_to_unique_value_map = {}
-            for entity_detail in entities_for_relation_builder:
-                unique_id_field = "name" # Default
-                if entity_detail["label"] == "Document" and "file_id" in entity_detail["data"]:
-                    unique_id_field = "file_id"
-
-                entity_id_to_unique_value_map[entity_detail["id_in_document"]] = {
-                    "label": entity_detail["label"],
-                    "unique_field": unique_id_field,
-                    "unique_value": entity_detail["data"].get(unique_id_field)
-                }
-
-            for rel_info in extracted_relation_dicts:
-                from_id_temp = rel_info["from_entity_id"]
-                to_id_temp = rel_info["to_entity_id"]
-
-                from_entity_details = entity_id_to_unique_value_map.get(from_id_temp)
-                to_entity_details = entity_id_to_unique_value_map.get(to_id_temp)
-
-                if not from_entity_details or not to_entity_details:
-                    error_msg = f"Could not find entity details for relationship {rel_info['type']} between {from_id_temp} and {to_id_temp}."
-                    logger.error(error_msg)
-                    processing_summary["errors"].append(error_msg)
-                    continue
-
-                # Ensure unique values exist
-                if not from_entity_details["unique_value"] or not to_entity_details["unique_value"]:
-                    error_msg = f"Missing unique value for entities in relationship {rel_info['type']}. From: {from_entity_details}, To: {to_entity_details}."
-                    logger.error(error_msg)
-                    processing_summary["errors"].append(error_msg)
-                    continue
-
-                try:
-                    self.neo4j_service.add_emc_relationship(
-                        from_entity_label=from_entity_details["label"],
-                        from_entity_unique_id_value=from_entity_details["unique_value"],
-                        from_entity_unique_id_field=from_entity_details["unique_field"],
-                        to_entity_label=to_entity_details["label"],
-                        to_entity_unique_id_value=to_entity_details["unique_value"],
-                        to_entity_unique_id_field=to_entity_details["unique_field"],
-                        relationship_type=rel_info["type"],
-                        relationship_data=rel_info["data"] # This should be a dict of properties
-                    )
-                    rels_added_this_run += 1
-                except Exception as e:
-                    error_msg = f"Failed to add relationship {rel_info['type']} between {from_entity_details['unique_value']} and {to_entity_details['unique_value']}: {e}"
-                    logger.error(error_msg, exc_info=True)
-                    processing_summary["errors"].append(error_msg)
-            processing_summary["relationships_added_count"] = rels_added_this_run
+            if bulk_ingest:
+                await self._store_graph_bulk(
+                    doc_node_data, entities_for_relation_builder, extracted_relation_dicts, processing_summary
+                )
+            else:
+                # Map temp entity IDs to Neo4j node objects/IDs after creation for linking relationships
+                # For simplicity, we'll re-fetch or rely on merge_node to handle uniqueness.
+                # A more robust way would be to get actual Neo4j elementIds.
+
+                nodes_added_this_run = 0
+                for entity_detail in entities_for_relation_builder: # Using the list with temp IDs
+                    label = entity_detail["label"]
+                    # Data should be a dict of the dataclass from ontology (e.g. EMCStandardNode.__dict__)
+                    data_dict = entity_detail["data"]
+
+                    unique_id_field = _unique_id_field(label, data_dict)
+
+                    try:
+                        # add_emc_entity expects a flat dict of properties
+                        self.neo4j_service.add_emc_entity(
+                            entity_label=label,
+                            entity_data=data_dict,
+                            unique_id_field=unique_id_field
+                        )
+                        nodes_added_this_run +=1
+                    except Exception as e:
+                        error_msg = f"Failed to add entity {label} ({data_dict.get(unique_id_field, 'N/A')}): {e}"
+                        logger.error(error_msg, exc_info=True)
+                        processing_summary["errors"].append(error_msg)
+                processing_summary["nodes_added_count"] = nodes_added_this_run
+
+                rels_added_this_run = 0
+                # Create a mapping from id_in_document to the actual unique property value (e.g., name)
+                # This is crucial for linking relationships correctly.
+                entity_id_to_unique_value_map = _build_unique_value_map(entities_for_relation_builder)
+
+                for rel_info in extracted_relation_dicts:
+                    from_id_temp = rel_info["from_entity_id"]
+                    to_id_temp = rel_info["to_entity_id"]
+
+                    from_entity_details = entity_id_to_unique_value_map.get(from_id_temp)
+                    to_entity_details = entity_id_to_unique_value_map.get(to_id_temp)
+
+                    if not from_entity_details or not to_entity_details:
+                        error_msg = f"Could not find entity details for relationship {rel_info['type']} between {from_id_temp} and {to_id_temp}."
+                        logger.error(error_msg)
+                        processing_summary["errors"].append(error_msg)
+                        continue
+
+                    # Ensure unique values exist
+                    if not from_entity_details["unique_value"] or not to_entity_details["unique_value"]:
+                        error_msg = f"Missing unique value for entities in relationship {rel_info['type']}. From: {from_entity_details}, To: {to_entity_details}."
+                        logger.error(error_msg)
+                        processing_summary["errors"].append(error_msg)
+                        continue
+
+                    try:
+                        self.neo4j_service.add_emc_relationship(
+                            from_entity_label=from_entity_details["label"],
+                            from_entity_unique_id_value=from_entity_details["unique_value"],
+                            from_entity_unique_id_field=from_entity_details["unique_field"],
+                            to_entity_label=to_entity_details["label"],
+                            to_entity_unique_id_value=to_entity_details["unique_value"],
+                            to_entity_unique_id_field=to_entity_details["unique_field"],
+                            relationship_type=rel_info["type"],
+                            relationship_data=rel_info["data"] # This should be a dict of properties
+                        )
+                        rels_added_this_run += 1
+                    except Exception as e:
+                        error_msg = f"Failed to add relationship {rel_info['type']} between {from_entity_details['unique_value']} and {to_entity_details['unique_value']}: {e}"
+                        logger.error(error_msg, exc_info=True)
+                        processing_summary["errors"].append(error_msg)
+                processing_summary["relationships_added_count"] = rels_added_this_run
 
             processing_summary["status"] = "completed"
             if processing_summary["errors"]:
@@ -265,6 +388,76 @@ class EMCGraphManager:
         logger.info(f"Finished processing for document_id: {document_id}. Status: {processing_summary['status']}")
         return processing_summary
 
+    async def _store_graph_bulk(
+        self,
+        doc_node_data: Optional[Dict[str, Any]],
+        entities: List[Dict[str, Any]],
+        relations: List[Dict[str, Any]],
+        processing_summary: Dict[str, Any]
+    ) -> None:
+        """
+        Writes the Document node, entities and relationships through
+        Neo4jEMCService.bulk_merge_entities_and_relationships and records
+        per-item failures in processing_summary, using the same counters and
+        error messages as the one-item-at-a-time path.
+        """
+        bulk_entities = []
+        if doc_node_data:
+            bulk_entities.append({"label": "Document", "unique_field": "file_id", "properties": doc_node_data})
+        for entity_detail in entities:
+            bulk_entities.append({
+                "label": entity_detail["label"],
+                "unique_field": _unique_id_field(entity_detail["label"], entity_detail["data"]),
+                "properties": entity_detail["data"]
+            })
+
+        entity_id_to_unique_value_map = _build_unique_value_map(entities)
+        bulk_relationships = []
+        for rel_info in relations:
+            from_entity_details = entity_id_to_unique_value_map.get(rel_info["from_entity_id"])
+            to_entity_details = entity_id_to_unique_value_map.get(rel_info["to_entity_id"])
+
+            if not from_entity_details or not to_entity_details:
+                error_msg = f"Could not find entity details for relationship {rel_info['type']} between {rel_info['from_entity_id']} and {rel_info['to_entity_id']}."
+                logger.error(error_msg)
+                processing_summary["errors"].append(error_msg)
+                continue
+            if not from_entity_details["unique_value"] or not to_entity_details["unique_value"]:
+                error_msg = f"Missing unique value for entities in relationship {rel_info['type']}. From: {from_entity_details}, To: {to_entity_details}."
+                logger.error(error_msg)
+                processing_summary["errors"].append(error_msg)
+                continue
+
+            bulk_relationships.append({
+                "type": rel_info["type"],
+                "from_label": from_entity_details["label"],
+                "from_field": from_entity_details["unique_field"],
+                "from_value": from_entity_details["unique_value"],
+                "to_label": to_entity_details["label"],
+                "to_field": to_entity_details["unique_field"],
+                "to_value": to_entity_details["unique_value"],
+                "properties": rel_info["data"]
+            })
+
+        result = await self.neo4j_service.bulk_merge_entities_and_relationships(
+            entities=bulk_entities,
+            relationships=bulk_relationships
+        )
+
+        for failure in result["failures"]:
+            if failure["kind"] == "entity":
+                entity = bulk_entities[failure["index"]]
+                unique_value = entity["properties"].get(entity["unique_field"], "N/A")
+                error_msg = f"Failed to add entity {entity['label']} ({unique_value}): {failure['error']}"
+            else:
+                rel = bulk_relationships[failure["index"]]
+                error_msg = f"Failed to add relationship {rel['type']} between {rel['from_value']} and {rel['to_value']}: {failure['error']}"
+            logger.error(error_msg)
+            processing_summary["errors"].append(error_msg)
+
+        processing_summary["nodes_added_count"] = len(result["entities_written"])
+        processing_summary["relationships_added_count"] = len(result["relationships_written"])
+
     def close_connections(self):
         """Closes any underlying service connections, like to Neo4j."""
         if self.neo4j_service:
@@ -6,12 +6,30 @@ Neo4j EMC知识图谱服务 - 修复类型错误
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Any, Tuple, Union, cast
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Any, Tuple, Union, cast
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
-from neo4j import AsyncGraphDatabase, AsyncDriver, AsyncSession, Query
-from neo4j.exceptions import Neo4jError
+from neo4j import (
+    AsyncGraphDatabase, AsyncDriver, AsyncSession, AsyncTransaction, Query, READ_ACCESS, WRITE_ACCESS
+)
+from neo4j.exceptions import AuthError, Neo4jError, ServiceUnavailable
+
+from .emc_ontology import ENTITY_LABEL, ONTOLOGY_DEFINITIONS
+from .query_templates import (
+    CREATE_NODE, CREATE_RELATIONSHIP, DEFAULT_SUBGRAPH_LIMIT, GRAPH_DATA, SUBGRAPH, QueryTemplateRegistry, node_type_expr
+)
+from .schema_provisioner import (
+    ENTITY_BACKFILL_BATCH_SIZE, IndexAdvice, advise_indexes, backfill_entity_label, count_unlabelled_entities, indexes_from_rows, provision_schema
+)
+
+# 拼接进Cypher的属性名必须是合法标识符
+_CYPHER_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# 每次从服务器拉取的记录数
+DEFAULT_FETCH_SIZE = 1000
 
 
 @dataclass
@@ -48,14 +66,57 @@ class EMCRelationship:
         }
 
 
+async def _run_statements(tx, statements: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[List[Dict[str, Any]]]:
+    """在事务中依次执行多条查询，返回每条查询的结果"""
+    results = []
+    for query_str, parameters in statements:
+        result = await tx.run(Query(query_str), parameters or {})
+        results.append([record.data() async for record in result])
+    return results
+
+
+class UnitOfWork:
+    """
+    复用同一个会话执行多个托管事务
+
+    read / read_batch 通过 execute_read 执行（集群中路由到从节点），write / write_batch
+    通过 execute_write 执行；遇到瞬时错误时驱动会自动重试整个事务。
+    同一会话内的事务按书签因果一致，先写后读能读到刚提交的数据。
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def read(self, query_str: str, parameters: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """执行只读查询"""
+        return (await self.read_batch([(query_str, parameters)]))[0]
+
+    async def read_batch(self, statements: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[List[Dict[str, Any]]]:
+        """在同一个读事务（同一快照）中依次执行多条查询"""
+        return await self.session.execute_read(_run_statements, statements)
+
+    async def write(self, query_str: str, parameters: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """执行写入查询"""
+        return (await self.write_batch([(query_str, parameters)]))[0]
+
+    async def write_batch(self, statements: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[List[Dict[str, Any]]]:
+        """在同一个写事务中依次执行多条查询"""
+        return await self.session.execute_write(_run_statements, statements)
+
+
 class Neo4jEMCService:
     """Neo4j EMC知识图谱核心服务 - 实用高效版本"""
     
-    def __init__(self, uri: str, username: str, password: str):
+    def __init__(self, uri: str, username: str, password: str, fetch_size: int = DEFAULT_FETCH_SIZE):
         self.uri = uri
         self.username = username
         self.password = password
+        self.fetch_size = fetch_size
         self.driver: Optional[AsyncDriver] = None
+        # 所有会话共享同一个书签管理器：每个会话都从此前提交的写入之后开始读，
+        # 不同请求之间也保持因果一致
+        self.bookmark_manager = AsyncGraphDatabase.bookmark_manager()
+        self.templates = QueryTemplateRegistry()
         self.logger = logging.getLogger(__name__)
     
     async def connect(self) -> bool:
@@ -77,7 +138,7 @@ class Neo4jEMCService:
             self.logger.info("Neo4j连接成功")
             return True
 
-        except (Neo4jError, neo4j.exceptions.ServiceUnavailable, neo4j.exceptions.AuthError) as e:
+        except (Neo4jError, ServiceUnavailable, AuthError) as e:
             self.logger.error(f"Neo4j连接失败: {type(e).__name__} - {str(e)}")
             return False
         except Exception as e:
@@ -90,35 +151,74 @@ class Neo4jEMCService:
             await self.driver.close()
             self.logger.info("Neo4j连接已关闭")
 
-    async def ensure_constraints_and_indexes(self):
-        """确保知识图谱的约束和索引符合EMC本体定义"""
-        node_types_for_constraints = ["EMCStandard", "Product", "Document", "Component"]
+    async def ensure_constraints_and_indexes(self) -> Dict[str, Any]:
+        """按EMC本体幂等地创建唯一约束、范围/文本索引和全文索引，返回配置报告"""
+        return await provision_schema(self)
 
-        for node_type in node_types_for_constraints:
-            constraint_query = f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:{node_type}) REQUIRE n.id IS UNIQUE"
-            try:
-                await self._execute_write_query(constraint_query)
-                self.logger.info(f"Constraint created or already exists for node type: {node_type}")
-            except Neo4jError as e:
-                self.logger.error(f"Failed to create constraint for node type {node_type}: {str(e)}")
-            except Exception as e:
-                self.logger.error(f"An unexpected error occurred while creating constraint for {node_type}: {str(e)}")
+    async def count_unlabelled_entities(self) -> int:
+        """统计缺少共享 :Entity 标签的节点数（大于0时需要运行 migrate_entity_label）"""
+        return await count_unlabelled_entities(self)
+
+    async def migrate_entity_label(self, batch_size: int = ENTITY_BACKFILL_BATCH_SIZE) -> Dict[str, Any]:
+        """为已有图谱分批补打 :Entity 标签（一次性在线迁移），返回迁移报告"""
+        return await backfill_entity_label(self, batch_size)
+
+    async def advise_indexes(self, query_templates: Iterable[str]) -> List[IndexAdvice]:
+        """对照数据库中现有的索引，找出查询模板里没有索引支撑的标签/属性查找"""
+        rows = await self._execute_query(
+            "SHOW INDEXES YIELD type, entityType, labelsOrTypes, properties"
+        )
+        return advise_indexes(query_templates, indexes_from_rows(rows))
+
+    def _session(self, access_mode: str = WRITE_ACCESS, fetch_size: Optional[int] = None) -> AsyncSession:
+        """创建共享书签管理器和拉取批量的会话"""
+        if not self.driver:
+            raise RuntimeError("Neo4j驱动未初始化")
+        return self.driver.session(
+            default_access_mode=access_mode,
+            fetch_size=fetch_size or self.fetch_size,
+            bookmark_manager=self.bookmark_manager
+        )
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[UnitOfWork]:
+        """
+        在一个会话中执行多个事务
+
+        用法:
+            async with service.unit_of_work() as uow:
+                nodes, rels = await uow.read_batch([(node_query, {}), (rel_query, {})])
+                await uow.write(update_query, params)
+        """
+        async with self._session() as session:
+            yield UnitOfWork(session)
+
+    @asynccontextmanager
+    async def read_tx(self) -> AsyncIterator[AsyncTransaction]:
+        """
+        显式读事务：在读会话（集群中路由到从节点）上开启事务，正常退出时提交，异常时回滚
+
+        显式事务不会自动重试，需要重试时使用 unit_of_work().read_batch
+        """
+        async with self._session(READ_ACCESS) as session:
+            async with await session.begin_transaction() as tx:
+                yield tx
+
+    @asynccontextmanager
+    async def write_tx(self) -> AsyncIterator[AsyncTransaction]:
+        """显式写事务：正常退出时提交，异常时回滚；不会自动重试"""
+        async with self._session(WRITE_ACCESS) as session:
+            async with await session.begin_transaction() as tx:
+                yield tx
 
-        # TODO: 根据EMC_ONTOLOGY.md中的定义，扩展此方法以覆盖所有节点类型，
-        # 并考虑为经常查询的属性添加其他索引 (例如: CREATE INDEX IF NOT EXISTS FOR (n:Product) ON (n.name);)
-        pass
-    
     async def _execute_query(
         self, 
         query_str: str, 
         parameters: Optional[Dict] = None
     ) -> List[Dict[str, Any]]:
-        """执行Cypher查询 - 类型安全版本"""
-        if not self.driver:
-            raise RuntimeError("Neo4j驱动未初始化")
-        
+        """执行任意Cypher查询（自动提交，可能包含写入）；只读查询应使用 _execute_read_query"""
         try:
-            async with self.driver.session() as session:
+            async with self._session() as session:
                 # 将字符串包装为Query类型
                 query = Query(query_str)
                 result = await session.run(query, parameters or {})
@@ -127,6 +227,50 @@ class Neo4jEMCService:
         except Neo4jError as e:
             self.logger.error(f"查询执行失败: {query_str}, 错误: {str(e)}")
             raise
+
+    async def iter_query(
+        self,
+        query_str: str,
+        parameters: Optional[Dict] = None,
+        batch_size: Optional[int] = None,
+        access_mode: str = READ_ACCESS
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        流式执行查询，按批产出记录（自动提交）
+
+        驱动每次从服务器拉取 batch_size 条（默认 fetch_size），消费完一批才拉取下一批，
+        内存中只保留当前一批，与结果集总大小无关。提前停止迭代会关闭会话并丢弃剩余结果。
+        """
+        batch_size = batch_size or self.fetch_size
+        try:
+            async with self._session(access_mode, fetch_size=batch_size) as session:
+                result = await session.run(Query(query_str), parameters or {})
+                batch: List[Dict[str, Any]] = []
+                async for record in result:
+                    batch.append(record.data())
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+
+        except Neo4jError as e:
+            self.logger.error(f"流式查询失败: {query_str}, 错误: {str(e)}")
+            raise
+
+    async def _execute_read_query(
+        self,
+        query_str: str,
+        parameters: Optional[Dict] = None
+    ) -> List[Dict[str, Any]]:
+        """执行只读查询 - 托管读事务，集群中路由到从节点"""
+        try:
+            async with self.unit_of_work() as uow:
+                return await uow.read(query_str, parameters)
+
+        except Neo4jError as e:
+            self.logger.error(f"只读查询失败: {query_str}, 错误: {str(e)}")
+            raise
     
     async def _execute_write_query(
         self,
@@ -134,38 +278,157 @@ class Neo4jEMCService:
         parameters: Optional[Dict] = None
     ) -> List[Dict[str, Any]]:
         """执行写入查询 - 类型安全版本"""
-        if not self.driver:
-            raise RuntimeError("Neo4j驱动未初始化")
-        
         try:
-            async with self.driver.session() as session:
-                # 使用事务执行写入操作
-                async def _write_transaction(tx):
-                    query = Query(query_str)
-                    result = await tx.run(query, parameters or {})
-                    return [record.data() async for record in result]
-                
-                return await session.execute_write(_write_transaction)
+            async with self.unit_of_work() as uow:
+                return await uow.write(query_str, parameters)
                 
         except Neo4jError as e:
             self.logger.error(f"写入查询失败: {query_str}, 错误: {str(e)}")
             raise
 
+    async def _execute_write_batch(
+        self,
+        statements: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[List[Dict[str, Any]]]:
+        """在同一个写事务中依次执行多条查询，返回每条查询的结果"""
+        try:
+            async with self.unit_of_work() as uow:
+                return await uow.write_batch(statements)
+
+        except Neo4jError as e:
+            self.logger.error(f"批量写入事务失败({len(statements)}条语句), 错误: {str(e)}")
+            raise
+
+    @staticmethod
+    def _to_neo4j_properties(data: Dict[str, Any]) -> Dict[str, Any]:
+        """转换为Neo4j可存储的扁平属性: 丢弃None, 嵌套结构序列化为JSON"""
+        properties = {}
+        for key, value in data.items():
+            if value is None:
+                continue
+            if isinstance(value, dict) or (
+                isinstance(value, list) and any(isinstance(v, (dict, list)) for v in value)
+            ):
+                value = json.dumps(value, ensure_ascii=False, default=str)
+            properties[key] = value
+        return properties
+
+    async def bulk_merge_entities_and_relationships(
+        self,
+        entities: List[Dict[str, Any]],
+        relationships: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        批量写入实体和关系 - UNWIND版本
+
+        实体按(标签, 唯一字段)分组, 关系按(类型, 起止标签和唯一字段)分组,
+        每组一条参数化的 UNWIND ... MERGE 语句, 所有分组在同一个写事务中执行。
+
+        entities 每项: {label, unique_field, properties}
+        relationships 每项: {type, from_label, from_field, from_value,
+                            to_label, to_field, to_value, properties}
+
+        返回 {'entities_written': [...], 'relationships_written': [...], 'failures': [...]},
+        前两项为写入成功的输入下标, failures 为 {kind, index, error} 列表。
+        """
+        node_labels = set(ONTOLOGY_DEFINITIONS["node_labels"])
+        rel_types = set(ONTOLOGY_DEFINITIONS["relationship_types"])
+        failures: List[Dict[str, Any]] = []
+
+        entity_groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for idx, entity in enumerate(entities):
+            label = entity.get("label")
+            field = entity.get("unique_field", "name")
+            properties = entity.get("properties") or {}
+            key = properties.get(field)
+            if label not in node_labels or not _CYPHER_IDENTIFIER.match(field or ""):
+                failures.append({"kind": "entity", "index": idx, "error": f"不支持的标签或唯一字段: {label}.{field}"})
+                continue
+            if key is None or key == "":
+                failures.append({"kind": "entity", "index": idx, "error": f"缺少唯一字段 '{field}' 的值"})
+                continue
+            entity_groups.setdefault((label, field), []).append({
+                "idx": idx,
+                "key": key,
+                "props": self._to_neo4j_properties(properties)
+            })
+
+        rel_groups: Dict[Tuple[str, str, str, str, str], List[Dict[str, Any]]] = {}
+        for idx, rel in enumerate(relationships):
+            group_key = (
+                rel.get("type"), rel.get("from_label"), rel.get("from_field", "name"),
+                rel.get("to_label"), rel.get("to_field", "name")
+            )
+            rel_type, from_label, from_field, to_label, to_field = group_key
+            if (rel_type not in rel_types or from_label not in node_labels or to_label not in node_labels
+                    or not _CYPHER_IDENTIFIER.match(from_field or "")
+                    or not _CYPHER_IDENTIFIER.match(to_field or "")):
+                failures.append({"kind": "relationship", "index": idx, "error": f"不支持的关系定义: {group_key}"})
+                continue
+            if not rel.get("from_value") or not rel.get("to_value"):
+                failures.append({"kind": "relationship", "index": idx, "error": "缺少起点或终点的唯一值"})
+                continue
+            rel_groups.setdefault(group_key, []).append({
+                "idx": idx,
+                "from_key": rel["from_value"],
+                "to_key": rel["to_value"],
+                "props": self._to_neo4j_properties(rel.get("properties") or {})
+            })
+
+        statements: List[Tuple[str, Dict[str, Any]]] = []
+        statement_groups: List[Tuple[str, List[Dict[str, Any]]]] = []
+        for (label, field), rows in entity_groups.items():
+            statements.append((f"""
+            UNWIND $rows AS row
+            MERGE (n:{label} {{{field}: row.key}})
+            ON CREATE SET n.created_at = datetime(), n.id = coalesce(n.id, randomUUID())
+            SET n += row.props, n:{ENTITY_LABEL}, n.updated_at = datetime()
+            RETURN row.idx AS idx
+            """, {"rows": rows}))
+            statement_groups.append(("entity", rows))
+
+        for (rel_type, from_label, from_field, to_label, to_field), rows in rel_groups.items():
+            statements.append((f"""
+            UNWIND $rows AS row
+            MATCH (a:{from_label} {{{from_field}: row.from_key}})
+            MATCH (b:{to_label} {{{to_field}: row.to_key}})
+            MERGE (a)-[r:{rel_type}]->(b)
+            ON CREATE SET r.created_at = datetime()
+            SET r += row.props, r.updated_at = datetime()
+            RETURN DISTINCT row.idx AS idx
+            """, {"rows": rows}))
+            statement_groups.append(("relationship", rows))
+
+        written: Dict[str, List[int]] = {"entity": [], "relationship": []}
+        if statements:
+            try:
+                results = await self._execute_write_batch(statements)
+            except Exception as e:
+                # 整个事务已回滚, 本批次所有条目均视为失败
+                for kind, rows in statement_groups:
+                    for row in rows:
+                        failures.append({"kind": kind, "index": row["idx"], "error": f"批量事务失败: {str(e)}"})
+                results = []
+
+            for (kind, rows), records in zip(statement_groups, results):
+                matched = {record["idx"] for record in records}
+                for row in rows:
+                    if row["idx"] in matched:
+                        written[kind].append(row["idx"])
+                    elif kind == "relationship":
+                        failures.append({"kind": kind, "index": row["idx"], "error": "未找到起点或终点节点"})
+                    else:
+                        failures.append({"kind": kind, "index": row["idx"], "error": "节点未写入"})
+
+        return {
+            "entities_written": sorted(written["entity"]),
+            "relationships_written": sorted(written["relationship"]),
+            "failures": failures
+        }
+
     async def create_emc_node(self, node: EMCNode) -> str:
         """创建EMC节点 - 实用版本"""
-        query_str = f"""
-        MERGE (n:{node.node_type} {{id: $id}})
-        ON CREATE SET
-            n.label = $label,
-            n.created_at = datetime(),
-            n.updated_at = datetime(),
-            n += $properties
-        ON MATCH SET
-            n.label = $label,
-            n.updated_at = datetime(),
-            n += $properties
-        RETURN n.id as id
-        """
+        query_str = self.templates.get(CREATE_NODE, node.node_type)
         
         result = await self._execute_write_query(query_str, {
             'id': node.id,
@@ -177,12 +440,12 @@ class Neo4jEMCService:
     
     async def get_node_by_id(self, node_id: str) -> Optional[EMCNode]:
         """根据ID获取节点"""
-        query_str = """
-        MATCH (n {id: $id})
-        RETURN n.id as id, labels(n)[0] as type, n.label as label, properties(n) as props
+        query_str = f"""
+        MATCH (n:{ENTITY_LABEL} {{id: $id}})
+        RETURN n.id as id, {node_type_expr('n')} as type, n.label as label, properties(n) as props
         """
         
-        result = await self._execute_query(query_str, {'id': node_id})
+        result = await self._execute_read_query(query_str, {'id': node_id})
         
         if result:
             record = result[0]
@@ -202,18 +465,7 @@ class Neo4jEMCService:
     
     async def create_relationship(self, relationship: EMCRelationship) -> bool:
         """创建关系 - 实用版本"""
-        query_str = f"""
-        MATCH (a {{id: $source_id}}), (b {{id: $target_id}})
-        MERGE (a)-[r:{relationship.relationship_type}]->(b)
-        ON CREATE SET
-            r.created_at = datetime(),
-            r.updated_at = datetime(),
-            r += $properties
-        ON MATCH SET
-            r.updated_at = datetime(),
-            r += $properties
-        RETURN r IS NOT NULL as created_or_matched
-        """
+        query_str = self.templates.get(CREATE_RELATIONSHIP, relationship.relationship_type)
         
         result = await self._execute_write_query(query_str, {
             'source_id': relationship.source_id,
@@ -222,14 +474,72 @@ class Neo4jEMCService:
         })
         
         return result[0]['created_or_matched'] if result else False
-    
+
+    async def export_subgraph(
+        self, center_node_id: str, depth: int = 2, limit: int = DEFAULT_SUBGRAPH_LIMIT
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """导出以指定节点为中心、depth 跳以内的子图（最多 limit 个节点）"""
+        query_str = self.templates.get(SUBGRAPH, depth)
+        result = await self._execute_read_query(query_str, {'center_id': center_node_id, 'limit': limit})
+        if not result:
+            return {'nodes': [], 'relationships': []}
+        return {'nodes': result[0]['nodes'], 'relationships': result[0]['relationships']}
+
+    def _graph_data_queries(
+        self, node_types: Optional[List[str]], relationship_types: Optional[List[str]]
+    ) -> Tuple[List[str], Dict[str, Any]]:
+        """校验类型并返回 get_graph_data 需要依次执行的查询（每个节点类型一条，按标签扫描）"""
+        labels = self.templates.validate_node_labels(list(dict.fromkeys(node_types))) if node_types else [""]
+        parameters = {
+            'relationship_types': (
+                self.templates.validate_relationship_types(relationship_types) if relationship_types else None
+            )
+        }
+        return [self.templates.get(GRAPH_DATA, label) for label in labels], parameters
+
+    async def get_graph_data(
+        self,
+        node_types: Optional[List[str]] = None,
+        relationship_types: Optional[List[str]] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """按节点/关系类型过滤，返回 (源节点, 关系, 目标节点) 记录，合计最多 limit 条"""
+        queries, parameters = self._graph_data_queries(node_types, relationship_types)
+        records: List[Dict[str, Any]] = []
+        for query_str in queries:
+            if len(records) >= limit:
+                break
+            records.extend(await self._execute_read_query(query_str, {**parameters, 'limit': limit - len(records)}))
+        return records
+
+    def iter_graph_data(
+        self,
+        node_types: Optional[List[str]] = None,
+        relationship_types: Optional[List[str]] = None,
+        limit: int = 1000,
+        batch_size: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """get_graph_data 的流式版本；类型在调用时即校验，而不是在开始迭代后"""
+        queries, parameters = self._graph_data_queries(node_types, relationship_types)
+
+        async def batches() -> AsyncIterator[List[Dict[str, Any]]]:
+            remaining = limit
+            for query_str in queries:
+                if remaining <= 0:
+                    break
+                async for batch in self.iter_query(query_str, {**parameters, 'limit': remaining}, batch_size):
+                    remaining -= len(batch)
+                    yield batch
+
+        return batches()
+
     async def get_knowledge_graph_summary(self) -> Dict[str, Any]:
         """获取知识图谱统计摘要 - 高效版本"""
         # 分别查询节点和关系统计
-        node_query = """
+        node_query = f"""
         MATCH (n)
-        WITH labels(n)[0] as label, count(n) as count
-        RETURN collect({type: label, count: count}) as node_stats
+        WITH {node_type_expr('n')} as label, count(n) as count
+        RETURN collect({{type: label, count: count}}) as node_stats
         """
         
         rel_query = """
@@ -239,8 +549,9 @@ class Neo4jEMCService:
         """
         
         try:
-            node_result = await self._execute_query(node_query)
-            rel_result = await self._execute_query(rel_query)
+            # 两条统计查询在同一个会话的同一个读事务中执行
+            async with self.unit_of_work() as uow:
+                node_result, rel_result = await uow.read_batch([(node_query, {}), (rel_query, {})])
             
             node_stats = {}
             rel_stats = {}
@@ -284,10 +595,11 @@ class Neo4jEMCService:
 async def create_emc_knowledge_service(
     uri: str, 
     username: str, 
-    password: str
+    password: str,
+    fetch_size: int = DEFAULT_FETCH_SIZE
 ) -> Neo4jEMCService:
     """创建EMC知识图谱服务 - 实用工厂函数"""
-    service = Neo4jEMCService(uri, username, password)
+    service = Neo4jEMCService(uri, username, password, fetch_size=fetch_size)
     if await service.connect():
         return service
     else:
@@ -0,0 +1,154 @@
+"""
+Cypher查询模板注册表
+标签、关系类型和路径深度无法作为Cypher参数传入，拼接进查询的每个不同取值都会产生新的查询文本，
+Neo4j需要为其重新生成执行计划。注册表根据本体为每个 (操作, 标签/关系类型) 预先生成一条固定模板，
+其余取值（id、属性、LIMIT等）一律作为参数传入；不在本体中的标签/类型直接拒绝，避免Cypher注入。
+"""
+
+from collections import Counter
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple, Union
+
+from .emc_ontology import ENTITY_LABEL, ONTOLOGY_DEFINITIONS
+
+# 变长路径的上下界只能写在查询文本里，子图深度按 1..MAX_SUBGRAPH_DEPTH 各预生成一条模板
+MAX_SUBGRAPH_DEPTH = 5
+DEFAULT_SUBGRAPH_LIMIT = 500
+
+CREATE_NODE = "create_node"
+CREATE_RELATIONSHIP = "create_relationship"
+SUBGRAPH = "subgraph"
+GRAPH_DATA = "graph_data"
+
+TemplateKey = Union[str, int]
+
+
+def node_type_expr(variable: str) -> str:
+    """返回节点类型标签的Cypher表达式（排除共享的 :Entity 标签）"""
+    return f"coalesce([l IN labels({variable}) WHERE l <> '{ENTITY_LABEL}'][0], '{ENTITY_LABEL}')"
+
+
+def _create_node(label: str) -> str:
+    return f"""
+    MERGE (n:{label} {{id: $id}})
+    ON CREATE SET
+        n.label = $label,
+        n.created_at = datetime(),
+        n.updated_at = datetime(),
+        n += $properties
+    ON MATCH SET
+        n.label = $label,
+        n.updated_at = datetime(),
+        n += $properties
+    SET n:{ENTITY_LABEL}
+    RETURN n.id as id
+    """
+
+
+def _create_relationship(rel_type: str) -> str:
+    return f"""
+    MATCH (a:{ENTITY_LABEL} {{id: $source_id}}), (b:{ENTITY_LABEL} {{id: $target_id}})
+    MERGE (a)-[r:{rel_type}]->(b)
+    ON CREATE SET
+        r.created_at = datetime(),
+        r.updated_at = datetime(),
+        r += $properties
+    ON MATCH SET
+        r.updated_at = datetime(),
+        r += $properties
+    RETURN r IS NOT NULL as created_or_matched
+    """
+
+
+def _subgraph(depth: int) -> str:
+    # $limit 限制节点数，只返回两端都在结果中的关系
+    return f"""
+    MATCH (center:{ENTITY_LABEL} {{id: $center_id}})
+    OPTIONAL MATCH path = (center)-[*1..{depth}]-(n)
+    WITH center, collect(path) AS paths
+    WITH [center] + reduce(acc = [], p IN paths | acc + nodes(p)) AS path_nodes,
+         reduce(acc = [], p IN paths | acc + relationships(p)) AS path_rels
+    UNWIND path_nodes AS node
+    WITH collect(DISTINCT node)[..$limit] AS nodes, path_rels
+    UNWIND (CASE path_rels WHEN [] THEN [null] ELSE path_rels END) AS rel
+    WITH nodes, collect(DISTINCT rel) AS rels
+    RETURN [node IN nodes | {{
+               id: node.id, label: node.label, type: {node_type_expr('node')}, properties: properties(node)
+           }}] AS nodes,
+           [rel IN rels WHERE startNode(rel) IN nodes AND endNode(rel) IN nodes | {{
+               source: startNode(rel).id, target: endNode(rel).id, type: type(rel), properties: properties(rel)
+           }}] AS relationships
+    """
+
+
+def _graph_data(label: str) -> str:
+    # 每个节点类型一条模板，按标签扫描；空键不过滤节点类型。关系类型以列表参数传入，为 null 时不过滤
+    start = f"(n:{label})" if label else "(n)"
+    return f"""
+    MATCH {start}-[r]-(m)
+    WHERE $relationship_types IS NULL OR type(r) IN $relationship_types
+    RETURN DISTINCT
+        n.id as source_id, {node_type_expr('n')} as source_type, n.label as source_label, properties(n) as source_props,
+        m.id as target_id, {node_type_expr('m')} as target_type, m.label as target_label, properties(m) as target_props,
+        type(r) as rel_type, properties(r) as rel_props
+    LIMIT $limit
+    """
+
+
+class QueryTemplateRegistry:
+    """按 (操作, 键) 预生成的Cypher模板，并统计每条模板的使用情况"""
+
+    def __init__(self, ontology: Dict[str, Any] = ONTOLOGY_DEFINITIONS):
+        self.node_labels: FrozenSet[str] = frozenset(ontology["node_labels"]) | {ENTITY_LABEL}
+        self.relationship_types: FrozenSet[str] = frozenset(ontology["relationship_types"])
+        builders: Dict[str, Tuple[Callable[[Any], str], Tuple[TemplateKey, ...]]] = {
+            CREATE_NODE: (_create_node, tuple(sorted(self.node_labels))),
+            CREATE_RELATIONSHIP: (_create_relationship, tuple(sorted(self.relationship_types))),
+            SUBGRAPH: (_subgraph, tuple(range(1, MAX_SUBGRAPH_DEPTH + 1))),
+            GRAPH_DATA: (_graph_data, ("",) + tuple(sorted(self.node_labels))),
+        }
+        self._templates: Dict[Tuple[str, TemplateKey], str] = {
+            (operation, key): builder(key)
+            for operation, (builder, keys) in builders.items()
+            for key in keys
+        }
+        # 本进程内每条模板的使用次数。只能说明查询文本被复用，无法观察Neo4j服务器端的计划缓存
+        # （其他进程可能已缓存该计划，缓存也可能被驱逐）
+        self._uses: Counter = Counter()
+
+    def get(self, operation: str, key: TemplateKey = "") -> str:
+        """返回模板文本；键不在本体中（或深度越界）时抛出 ValueError"""
+        template_key = (operation, key)
+        template = self._templates.get(template_key)
+        if template is None:
+            raise ValueError(f"没有 {operation} 的查询模板: {key!r}")
+        self._uses[template_key] += 1
+        return template
+
+    def validate_node_labels(self, labels: List[str]) -> List[str]:
+        """校验作为参数传入的节点类型列表"""
+        unknown = [label for label in labels if label not in self.node_labels]
+        if unknown:
+            raise ValueError(f"未知的节点类型: {unknown}")
+        return labels
+
+    def validate_relationship_types(self, rel_types: List[str]) -> List[str]:
+        """校验作为参数传入的关系类型列表"""
+        unknown = [rel_type for rel_type in rel_types if rel_type not in self.relationship_types]
+        if unknown:
+            raise ValueError(f"未知的关系类型: {unknown}")
+        return rel_types
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        本进程内已使用模板的使用次数，按次数降序
+
+        uses 为总次数，repeat_uses 为首次使用之后的次数（同一查询文本被复用的次数）；
+        它们不是Neo4j计划缓存的命中/未命中统计。
+        """
+        return [
+            {"operation": operation, "key": key, "uses": uses, "repeat_uses": uses - 1}
+            for (operation, key), uses in self._uses.most_common()
+        ]
+
+    def __len__(self) -> int:
+        return len(self._templates)
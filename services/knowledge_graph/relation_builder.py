@@ -6,7 +6,12 @@ between extracted EMC entities, based on the defined ontology.
 """
 
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+from .cooccurrence import (
+    WINDOW_SENTENCE, WINDOW_BOUNDARY_PATTERNS, Mention,
+    cooccurring_pairs, locate_mentions, window_cuts as window_cuts_for
+)
 
 from .emc_ontology import (
     # Node Labels
@@ -25,9 +30,46 @@ from .emc_ontology import (
 
 logger = logging.getLogger(__name__)
 
+# Co-occurrence rules: (source label, target label, relationship type, base confidence).
+# A rule fires when entities with these labels co-occur within one window.
+COOCCURRENCE_RULES: List[Tuple[str, str, str, float]] = [
+    (NODE_PRODUCT, NODE_EMC_STANDARD, REL_HAS_STANDARD, 0.5),
+    (NODE_EMC_STANDARD, NODE_PRODUCT, REL_APPLIES_TO, 0.5),
+    (NODE_TEST, NODE_FREQUENCY, REL_USES_FREQUENCY, 0.4),
+    (NODE_TEST, NODE_FREQUENCY_RANGE, REL_HAS_FREQUENCY_RANGE, 0.4),
+]
+
+
 class EMCRelationBuilder:
-    def __init__(self, deepseek_service: Optional[Any] = None): # Placeholder for AI service
+    def __init__(
+        self,
+        deepseek_service: Optional[Any] = None, # Placeholder for AI service
+        window: str = WINDOW_SENTENCE,
+        max_distance: int = 500,
+        distance_decay: float = 0.5
+    ):
+        """
+        Args:
+            deepseek_service: AI service for relationship extraction (optional).
+            window: Co-occurrence window for rule-based relationships:
+                    WINDOW_SENTENCE, WINDOW_PARAGRAPH or WINDOW_TABLE_ROW.
+            max_distance: Maximum gap in characters between two co-occurring mentions.
+            distance_decay: Fraction of the base confidence lost at max_distance.
+        """
+        if window not in WINDOW_BOUNDARY_PATTERNS:
+            raise ValueError(f"Unknown co-occurrence window: {window}")
         self.deepseek_service = deepseek_service
+        self.window = window
+        self.max_distance = max_distance
+        self.distance_decay = distance_decay
+
+        self._rules_by_labels: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+        for source_label, target_label, rel_type, base_confidence in COOCCURRENCE_RULES:
+            self._rules_by_labels.setdefault((source_label, target_label), []).append((rel_type, base_confidence))
+
+    def window_cuts(self, text: str, offset: int = 0) -> List[int]:
+        """Window boundaries of `text` for this builder's window kind, shifted by `offset`."""
+        return window_cuts_for(text, self.window, offset)
 
     def _get_entity_id(self, entity_data: Dict[str, Any]) -> str:
         """
@@ -41,17 +83,31 @@ class EMCRelationBuilder:
         self,
         entities: List[Dict[str, Any]],
         text_content: str, # Original text for context if needed
-        document_id: Optional[str] = None
+        document_id: Optional[str] = None,
+        window_cuts: Optional[Sequence[int]] = None
     ) -> List[Dict[str, Any]]:
         """
         Identifies relationships between entities using rule-based methods.
+
+        Entities are only linked when they co-occur: some mention of one lies in the
+        same window (sentence, paragraph or table row, see self.window) as a mention of
+        the other, at most self.max_distance characters away. Confidence is the rule's
+        base score, reduced linearly with the distance of the closest co-occurrence by
+        up to self.distance_decay of its value. Document nodes are linked to every
+        Standard and Product extracted from them.
+
         Args:
             entities: A list of extracted entity dicts. Each dict should have at least:
                       'label': str (e.g., NODE_PRODUCT)
                       'data': dict (the __dict__ of the ontology dataclass instance)
                       'id_in_document': str (a unique temporary ID for this entity within this document context)
+                      and may carry 'spans': [(start, end), ...], the character offsets of
+                      its mentions in text_content. Entities without spans are located in
+                      text_content by name (case-insensitive).
             text_content: The original text from which entities were extracted.
             document_id: ID of the source document.
+            window_cuts: Precomputed window boundaries (see cooccurrence.window_cuts), for
+                      callers that pass spans but no text_content, e.g. streamed documents.
         Returns:
             A list of relationship dicts, e.g.:
             {
@@ -79,65 +135,44 @@ class EMCRelationBuilder:
             if not entity_name and 'name' in entity_dict: # Check one level up
                 entity_name = entity_dict['name']
 
-            if not entity_name: # Still no name, log and skip (or use a default)
-                logger.warning(f"Entity missing name: {entity_dict}. Cannot generate reliable ID.")
-                temp_id = f"temp_ent_idx_{i}"
-            else:
-                temp_id = f"{entity_dict['label']}_{entity_name}_{i}" # Add index to ensure uniqueness for now
+            temp_id = entity_dict.get('id_in_document')
+            if not temp_id:
+                if not entity_name: # Still no name, log and skip (or use a default)
+                    logger.warning(f"Entity missing name: {entity_dict}. Cannot generate reliable ID.")
+                    temp_id = f"temp_ent_idx_{i}"
+                else:
+                    temp_id = f"{entity_dict['label']}_{entity_name}_{i}" # Add index to ensure uniqueness for now
 
             entities_with_ids.append({**entity_dict, "id_in_document": temp_id, "data": entity_data_dict})
 
+        # 1. Co-occurrence rules:
+        #    Product HAS_STANDARD Standard, Standard APPLIES_TO Product,
+        #    Test USES_FREQUENCY Frequency, Test HAS_FREQUENCY_RANGE FrequencyRange
+        cooccurrences = self._find_cooccurrences(entities_with_ids, text_content, window_cuts)
+        for (from_index, to_index, rel_type), (base_confidence, distance, count) in cooccurrences.items():
+            rel_schema = get_relationship_schema(rel_type) or BaseRelationship
+            rel_instance = rel_schema(
+                source_document_ids=source_doc_ids,
+                confidence_score=self._weight_confidence(base_confidence, distance),
+                properties={
+                    "method": f"co-occurrence_in_{self.window}",
+                    "distance_chars": distance,
+                    "cooccurrence_count": count
+                }
+            )
+            if isinstance(rel_instance, AppliesToRel):
+                rel_instance.conditions = "Assumed from co-occurrence"
+            relationships.append({
+                "type": rel_type,
+                "from_entity_id": entities_with_ids[from_index]["id_in_document"],
+                "to_entity_id": entities_with_ids[to_index]["id_in_document"],
+                "data": rel_instance.__dict__
+            })
 
-        # --- Rule Examples ---
-
-        # 1. Product <-> EMCStandard (APPLIES_TO / HAS_STANDARD)
-        #    If a Product and an EMCStandard are mentioned closely, or common phrases appear.
-        #    This is a very simplified rule. Real NLP would look at sentence structure.
         products = [e for e in entities_with_ids if e['label'] == NODE_PRODUCT]
         standards = [e for e in entities_with_ids if e['label'] == NODE_EMC_STANDARD]
         documents = [e for e in entities_with_ids if e['label'] == NODE_DOCUMENT]
 
-        for product_entity in products:
-            for standard_entity in standards:
-                # Simplistic proximity: if both appear in text (improve with actual proximity/sentence analysis)
-                # A more robust check would involve analyzing the text_content for co-occurrence patterns.
-                # For now, let's assume if both are extracted from the same document, a potential link exists.
-                # This needs significant refinement.
-
-                # Example: Product HAS_STANDARD Standard
-                rel_schema_hs = get_relationship_schema(REL_HAS_STANDARD) or BaseRelationship
-                rel_instance_hs = rel_schema_hs(
-                    source_document_ids=source_doc_ids,
-                    confidence_score=0.5, # Arbitrary score for rule-based
-                    properties={"method": "co-occurrence_in_document"}
-                )
-                relationships.append({
-                    "type": REL_HAS_STANDARD,
-                    "from_entity_id": product_entity["id_in_document"],
-                    "to_entity_id": standard_entity["id_in_document"],
-                    "data": rel_instance_hs.__dict__
-                })
-
-                # Example: Standard APPLIES_TO Product
-                # This is often context-dependent, e.g. "Product X complies with Standard Y"
-                # For now, let's create a symmetric relationship for demonstration if not contradictory.
-                # In a real scenario, APPLIES_TO might be inferred from specific phrases.
-                rel_schema_at = get_relationship_schema(REL_APPLIES_TO) or BaseRelationship
-                rel_instance_at = rel_schema_at(
-                    source_document_ids=source_doc_ids,
-                    confidence_score=0.5,
-                    properties={"method": "co-occurrence_in_document"}
-                )
-                if isinstance(rel_instance_at, AppliesToRel):
-                    rel_instance_at.conditions = "Assumed from co-occurrence"
-
-                relationships.append({
-                    "type": REL_APPLIES_TO,
-                    "from_entity_id": standard_entity["id_in_document"], # Standard APPLIES_TO Product
-                    "to_entity_id": product_entity["id_in_document"],
-                    "data": rel_instance_at.__dict__
-                })
-
         # 2. Document <-> EMCStandard (REFERENCES_STANDARD)
         for doc_entity in documents:
             for std_entity in standards:
@@ -171,35 +206,6 @@ class EMCRelationBuilder:
                     "data": rel_instance_mp.__dict__
                 })
 
-        # 4. Test <-> Frequency/FrequencyRange (USES_FREQUENCY / HAS_FREQUENCY_RANGE)
-        tests = [e for e in entities_with_ids if e['label'] == NODE_TEST]
-        frequencies = [e for e in entities_with_ids if e['label'] == NODE_FREQUENCY]
-        freq_ranges = [e for e in entities_with_ids if e['label'] == NODE_FREQUENCY_RANGE]
-
-        for test_entity in tests:
-            for freq_entity in frequencies:
-                # Simplified: if a test and a frequency are mentioned.
-                # Needs context: e.g., "test performed AT 100MHz"
-                rel_schema_uf = get_relationship_schema(REL_USES_FREQUENCY) or BaseRelationship
-                rel_instance_uf = rel_schema_uf(source_document_ids=source_doc_ids, confidence_score=0.4)
-                relationships.append({
-                    "type": REL_USES_FREQUENCY,
-                    "from_entity_id": test_entity["id_in_document"],
-                    "to_entity_id": freq_entity["id_in_document"],
-                    "data": rel_instance_uf.__dict__
-                })
-            for fr_entity in freq_ranges:
-                # Simplified: if a test and a frequency range are mentioned.
-                # Needs context: e.g., "test scanned OVER 30MHz-1GHz"
-                rel_schema_hfr = get_relationship_schema(REL_HAS_FREQUENCY_RANGE) or BaseRelationship
-                rel_instance_hfr = rel_schema_hfr(source_document_ids=source_doc_ids, confidence_score=0.4)
-                relationships.append({
-                    "type": REL_HAS_FREQUENCY_RANGE,
-                    "from_entity_id": test_entity["id_in_document"],
-                    "to_entity_id": fr_entity["id_in_document"],
-                    "data": rel_instance_hfr.__dict__
-                })
-
         # TODO: Add more rules for other relationships like:
         # - Test PERFORMED_TEST_ON Product
         # - TestResult OBSERVES_PHENOMENON Phenomenon
@@ -213,6 +219,58 @@ class EMCRelationBuilder:
         logger.info(f"Rule-based relationship builder found {len(final_relationships)} relationships for doc {document_id or 'N/A'}.")
         return final_relationships
 
+    def _find_cooccurrences(
+        self,
+        entities_with_ids: List[Dict[str, Any]],
+        text_content: str,
+        window_cuts: Optional[Sequence[int]]
+    ) -> Dict[Tuple[int, int, str], Tuple[float, int, int]]:
+        """
+        Sweeps the entity mentions in offset order and returns, for each
+        (from entity index, to entity index, relationship type) that some rule matches,
+        (base confidence, closest distance, number of co-occurring mention pairs).
+        """
+        rule_labels = {label for pair in self._rules_by_labels for label in pair}
+        mentions: List[Mention] = []
+        unlocated: Dict[str, List[int]] = {}
+        for index, entity in enumerate(entities_with_ids):
+            if entity['label'] not in rule_labels:
+                continue
+            spans = entity.get('spans')
+            if spans:
+                mentions.extend((start, end, index) for start, end in spans)
+            elif entity['data'].get('name'):
+                unlocated.setdefault(entity['data']['name'].lower(), []).append(index)
+
+        if unlocated and text_content:
+            for start, end, name in locate_mentions(text_content, unlocated):
+                mentions.extend((start, end, index) for index in unlocated[name])
+
+        if not mentions:
+            return {}
+        mentions.sort()
+        cuts = window_cuts if window_cuts is not None else window_cuts_for(text_content, self.window)
+
+        found: Dict[Tuple[int, int, str], Tuple[float, int, int]] = {}
+        for first, second, distance in cooccurring_pairs(mentions, cuts, self.max_distance):
+            first_label = entities_with_ids[first]['label']
+            second_label = entities_with_ids[second]['label']
+            directed = [(first, second, rule) for rule in self._rules_by_labels.get((first_label, second_label), ())]
+            directed += [(second, first, rule) for rule in self._rules_by_labels.get((second_label, first_label), ())]
+            for from_index, to_index, (rel_type, base_confidence) in directed:
+                key = (from_index, to_index, rel_type)
+                previous = found.get(key)
+                if previous is None:
+                    found[key] = (base_confidence, distance, 1)
+                else:
+                    found[key] = (base_confidence, min(previous[1], distance), previous[2] + 1)
+        return found
+
+    def _weight_confidence(self, base_confidence: float, distance: int) -> float:
+        """Reduces a rule's base confidence linearly with the co-occurrence distance."""
+        closeness = 1.0 - distance / self.max_distance if self.max_distance > 0 else 1.0
+        return round(base_confidence * (1.0 - self.distance_decay * (1.0 - closeness)), 3)
+
     async def build_relationships_ai(
         self,
         entities: List[Dict[str, Any]],
@@ -261,15 +319,17 @@ class EMCRelationBuilder:
         text_content: str,
         document_id: Optional[str] = None,
         use_ai: bool = False, # Defaulting AI to False for relationships initially
-        use_rules: bool = True
+        use_rules: bool = True,
+        window_cuts: Optional[Sequence[int]] = None
     ) -> List[Dict[str, Any]]:
         """
         Orchestrates relationship extraction.
+        window_cuts is passed on to build_relationships_rule_based.
         """
         all_relationships = []
 
         if use_rules:
-            rule_relationships = self.build_relationships_rule_based(entities, text_content, document_id)
+            rule_relationships = self.build_relationships_rule_based(entities, text_content, document_id, window_cuts)
             all_relationships.extend(rule_relationships)
 
         if use_ai and self.deepseek_service:
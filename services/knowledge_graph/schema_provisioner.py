@@ -0,0 +1,336 @@
+"""
+知识图谱模式（约束与索引）配置
+根据 ONTOLOGY_DEFINITIONS 生成每个节点标签的唯一约束、范围索引、文本索引和全文索引，
+启动时幂等执行；为已有图谱补打共享 :Entity 标签的分批迁移；
+并提供索引顾问，分析记录下来的查询模板，找出没有索引支撑的标签/属性查找
+"""
+
+import json
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from neo4j.exceptions import Neo4jError
+
+from .emc_ontology import ENTITY_LABEL, NODE_DOCUMENT, ONTOLOGY_DEFINITIONS
+
+logger = logging.getLogger(__name__)
+
+# create_emc_node 按 id 合并节点；Document 有 file_id 时按 file_id 合并
+UNIQUE_KEYS: Dict[str, Tuple[str, ...]] = {NODE_DOCUMENT: ("id", "file_id")}
+DEFAULT_UNIQUE_KEYS = ("id",)
+# graph_manager 按 name 合并实体，但通过API按 id 创建的节点可以同名（Document 的 name 是文件名），
+# 因此 name 只建范围索引支撑合并查找，不加唯一约束
+RANGE_KEYS = ("name",)
+# 本体字段中作为过滤条件的属性：类型/分类、型号编号、频率数值等
+_FILTER_FIELD_PATTERN = re.compile(r'(_type|_number|_hz|^category|^version|^manufacturer|^jurisdiction)$')
+# 支持 CONTAINS / ENDS WITH 搜索的文本索引属性
+TEXT_INDEX_KEYS = ("name",)
+# 跨所有标签的全文索引
+FULLTEXT_INDEX_NAME = "emc_entity_fulltext"
+FULLTEXT_PROPERTIES = ("name", "description")
+# :Entity 回填迁移每个事务处理的节点数
+ENTITY_BACKFILL_BATCH_SIZE = 10000
+
+
+@dataclass(frozen=True)
+class SchemaItem:
+    """一条约束或索引定义，kind 为 unique / range / text / fulltext"""
+    kind: str
+    name: str
+    labels: Tuple[str, ...]
+    properties: Tuple[str, ...]
+
+    @property
+    def cypher(self) -> str:
+        if self.kind == "fulltext":
+            labels = "|".join(self.labels)
+            properties = ", ".join(f"n.{p}" for p in self.properties)
+            return f"CREATE FULLTEXT INDEX {self.name} IF NOT EXISTS FOR (n:{labels}) ON EACH [{properties}]"
+        label, prop = self.labels[0], self.properties[0]
+        if self.kind == "unique":
+            return f"CREATE CONSTRAINT {self.name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+        return f"CREATE {self.kind.upper()} INDEX {self.name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+
+
+def _item_name(label: str, prop: str, kind: str) -> str:
+    snake_label = re.sub(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])', '_', label).lower()
+    return f"{snake_label}_{prop}_{kind}"
+
+
+def _single(kind: str, label: str, prop: str) -> SchemaItem:
+    return SchemaItem(kind=kind, name=_item_name(label, prop, kind), labels=(label,), properties=(prop,))
+
+
+def filter_properties(label: str, ontology: Dict[str, Any] = ONTOLOGY_DEFINITIONS) -> List[str]:
+    """本体中该标签作为过滤条件的属性"""
+    schema = ontology["node_schemas"].get(label)
+    if schema is None:
+        return []
+    return [f.name for f in fields(schema) if _FILTER_FIELD_PATTERN.search(f.name)]
+
+
+def build_schema_plan(ontology: Dict[str, Any] = ONTOLOGY_DEFINITIONS) -> List[SchemaItem]:
+    """根据本体生成全部约束和索引定义，唯一约束在前"""
+    # 不知道节点类型的按 id 查找使用 (:Entity {id})
+    plan: List[SchemaItem] = [_single("unique", ENTITY_LABEL, "id")]
+    for label in ontology["node_labels"]:
+        unique_keys = UNIQUE_KEYS.get(label, DEFAULT_UNIQUE_KEYS)
+        plan.extend(_single("unique", label, prop) for prop in unique_keys)
+        range_keys = [p for p in RANGE_KEYS if p not in unique_keys]
+        range_keys += [p for p in filter_properties(label, ontology) if p not in unique_keys and p not in range_keys]
+        plan.extend(_single("range", label, prop) for prop in range_keys)
+        plan.extend(_single("text", label, prop) for prop in TEXT_INDEX_KEYS)
+    plan.append(SchemaItem(
+        kind="fulltext",
+        name=FULLTEXT_INDEX_NAME,
+        labels=tuple(ontology["node_labels"]),
+        properties=FULLTEXT_PROPERTIES
+    ))
+    return plan
+
+
+async def provision_schema(service: Any, plan: Optional[List[SchemaItem]] = None) -> Dict[str, Any]:
+    """
+    幂等地创建约束和索引
+
+    先读取已有约束和索引的名称，只执行缺少的定义。唯一约束因已有重复数据创建失败时，
+    改为在同一属性上创建范围索引，保证合并查找仍然走索引。
+    service 为 Neo4jEMCService。
+    """
+    plan = plan if plan is not None else build_schema_plan()
+    existing = {row["name"] for row in await service._execute_query("SHOW CONSTRAINTS YIELD name")}
+    existing |= {row["name"] for row in await service._execute_query("SHOW INDEXES YIELD name")}
+
+    report: Dict[str, List[Any]] = {"created": [], "existing": [], "fallbacks": [], "failed": []}
+    for item in plan:
+        if item.name in existing:
+            report["existing"].append(item.name)
+            continue
+        try:
+            await service._execute_query(item.cypher)
+            report["created"].append(item.name)
+        except Neo4jError as e:
+            if item.kind != "unique":
+                logger.error(f"创建索引 {item.name} 失败: {str(e)}")
+                report["failed"].append({"name": item.name, "error": str(e)})
+                continue
+            fallback = _single("range", item.labels[0], item.properties[0])
+            logger.warning(f"唯一约束 {item.name} 创建失败（可能存在重复数据），改建范围索引 {fallback.name}: {str(e)}")
+            try:
+                if fallback.name not in existing:
+                    await service._execute_query(fallback.cypher)
+                report["fallbacks"].append(fallback.name)
+            except Neo4jError as fallback_error:
+                report["failed"].append({"name": item.name, "error": str(fallback_error)})
+
+    logger.info(
+        f"图模式配置完成: 新建 {len(report['created'])}, 已存在 {len(report['existing'])}, "
+        f"降级 {len(report['fallbacks'])}, 失败 {len(report['failed'])}"
+    )
+    return report
+
+
+# --- :Entity 标签回填迁移 ---
+
+async def find_duplicate_entity_ids(service: Any, limit: int = 20) -> List[Dict[str, Any]]:
+    """找出被多个节点共用的 id，这些节点会使 :Entity(id) 唯一约束失效"""
+    return await service._execute_query("""
+    MATCH (n) WHERE n.id IS NOT NULL
+    WITH n.id AS id, count(n) AS nodes, collect(DISTINCT labels(n)) AS labels
+    WHERE nodes > 1
+    RETURN id, nodes, labels
+    ORDER BY nodes DESC
+    LIMIT $limit
+    """, {"limit": limit})
+
+
+async def count_unlabelled_entities(service: Any) -> int:
+    """统计缺少 :Entity 标签的节点数；这些节点无法被按 id 的查找和关系写入找到"""
+    rows = await service._execute_query(f"MATCH (n) WHERE NOT n:{ENTITY_LABEL} RETURN count(n) AS count")
+    return rows[0]["count"]
+
+
+async def backfill_entity_label(service: Any, batch_size: int = ENTITY_BACKFILL_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    为已有节点补上 :Entity 标签，没有 id 的节点补一个 UUID
+
+    使用 CALL { ... } IN TRANSACTIONS 分批提交，每批只锁定 batch_size 个节点，可在线执行、中断后重跑。
+    存在重复 id 时不做任何修改，返回冲突列表，需先人工合并或改写这些节点。
+    """
+    duplicates = await find_duplicate_entity_ids(service)
+    if duplicates:
+        logger.error(f"发现 {len(duplicates)} 个重复的节点 id，:{ENTITY_LABEL} 回填已中止")
+        return {"labelled": 0, "remaining": None, "duplicates": duplicates}
+
+    # IN TRANSACTIONS 只能在自动提交事务中执行，因此走 _execute_query
+    pending = await count_unlabelled_entities(service)
+    await service._execute_query(f"""
+    MATCH (n) WHERE NOT n:{ENTITY_LABEL}
+    CALL {{
+        WITH n
+        SET n:{ENTITY_LABEL}, n.id = coalesce(n.id, randomUUID())
+    }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+    """)
+    remaining = await count_unlabelled_entities(service)
+
+    labelled = pending - remaining
+    logger.info(f":{ENTITY_LABEL} 回填完成: 标记 {labelled} 个节点, 剩余 {remaining}")
+    return {"labelled": labelled, "remaining": remaining, "duplicates": []}
+
+
+# --- 索引顾问 ---
+
+# 等值、IN、范围比较和 STARTS WITH 可使用范围索引（及唯一约束）；CONTAINS / ENDS WITH 需要文本索引；正则无法使用索引
+_TEXT_OPERATORS = {"CONTAINS", "ENDS WITH"}
+
+_CLAUSE_PATTERN = re.compile(
+    r'\b(ON\s+CREATE\s+SET|ON\s+MATCH\s+SET|OPTIONAL\s+MATCH|MATCH|MERGE|CREATE|WHERE|(?<!STARTS )(?<!ENDS )WITH|RETURN|'
+    r'DETACH\s+DELETE|DELETE|SET|REMOVE|UNWIND|ORDER\s+BY|SKIP|LIMIT|CALL|FOREACH)\b',
+    re.IGNORECASE
+)
+_NODE_PATTERN = re.compile(r'\(\s*(\w*)\s*((?::\s*`?\w+`?\s*)*)(\{[^}]*\})?\s*\)')
+_MAP_KEY_PATTERN = re.compile(r'(\w+)\s*:')
+_PREDICATE_PATTERN = re.compile(
+    r'(?<![\w.])(?<!\w\()(\w+)\.(\w+)\s*(STARTS\s+WITH|ENDS\s+WITH|CONTAINS|IN\b|=~|<=|>=|<>|=|<|>)',
+    re.IGNORECASE
+)
+
+
+@dataclass
+class IndexAdvice:
+    """一条缺少索引的查找：suggested 为建议的索引类型，None 表示该写法无法使用索引"""
+    label: Optional[str]
+    property: str
+    operator: str
+    suggested: Optional[str]
+    occurrences: int
+    example: str
+    reason: str
+
+
+def _clauses(query: str) -> List[Tuple[str, str]]:
+    """把查询切分为 (子句关键字, 子句内容)"""
+    matches = list(_CLAUSE_PATTERN.finditer(query))
+    return [
+        (re.sub(r'\s+', ' ', m.group(1).upper()), query[m.end():matches[i + 1].start() if i + 1 < len(matches) else len(query)])
+        for i, m in enumerate(matches)
+    ]
+
+
+def extract_lookups(query: str) -> List[Tuple[Optional[str], str, str]]:
+    """
+    提取查询中的节点属性查找 (标签, 属性, 运算符)
+
+    MATCH / MERGE 中的内联属性（(n:Label {name: $name})）视为等值查找，
+    WHERE 中的 var.prop 比较按变量绑定的标签归类；没有标签的查找标签为 None。
+    """
+    clauses = _clauses(query)
+    if any(keyword == "CREATE" and body.lstrip().upper().startswith(("CONSTRAINT", "INDEX", "RANGE", "TEXT", "FULLTEXT"))
+           for keyword, body in clauses):
+        return []
+
+    variable_labels: Dict[str, Optional[str]] = {}
+    lookups: List[Tuple[Optional[str], str, str]] = []
+    for keyword, body in clauses:
+        if keyword not in ("MATCH", "OPTIONAL MATCH", "MERGE"):
+            continue
+        for variable, labels, properties in _NODE_PATTERN.findall(body):
+            label_names = re.findall(r'\w+', labels)
+            label = label_names[0] if label_names else None
+            if variable:
+                variable_labels[variable] = variable_labels.get(variable) or label
+            if properties:
+                lookups.extend((label, key, "=") for key in _MAP_KEY_PATTERN.findall(properties))
+
+    for keyword, body in clauses:
+        if keyword != "WHERE":
+            continue
+        for variable, prop, operator in _PREDICATE_PATTERN.findall(body):
+            if variable not in variable_labels:
+                continue  # 关系变量、UNWIND/WITH 绑定的值等不是节点查找
+            operator = re.sub(r'\s+', ' ', operator.upper())
+            if operator == "<>":
+                continue  # 不等比较不会使用索引查找
+            lookups.append((variable_labels.get(variable), prop, operator))
+    return lookups
+
+
+def load_query_templates(path: Union[str, Path]) -> List[str]:
+    """
+    读取查询日志：每行一个查询，或JSON行（取 "query" 字段，兼容Neo4j的JSON格式query.log）；
+    Neo4j文本格式的query.log整行作为查询文本，前后的元数据不影响解析
+    """
+    templates = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+                line = record.get("query") or ""
+            except json.JSONDecodeError:
+                pass
+        if line:
+            templates.append(line)
+    return templates
+
+
+def indexes_from_plan(plan: Iterable[SchemaItem]) -> Set[Tuple[str, str, str]]:
+    """把配置计划转为 (标签, 属性, range|text) 集合；唯一约束的后备索引等同于范围索引"""
+    indexes = set()
+    for item in plan:
+        if item.kind in ("unique", "range", "text"):
+            indexes.add((item.labels[0], item.properties[0], "text" if item.kind == "text" else "range"))
+    return indexes
+
+
+def indexes_from_rows(rows: Iterable[Dict[str, Any]]) -> Set[Tuple[str, str, str]]:
+    """把 SHOW INDEXES 的结果转为 (标签, 属性, range|text) 集合，只计入单属性的节点索引"""
+    indexes = set()
+    for row in rows:
+        index_type = (row.get("type") or "").lower()
+        labels, properties = row.get("labelsOrTypes") or [], row.get("properties") or []
+        if row.get("entityType") != "NODE" or index_type not in ("range", "text") or len(properties) != 1:
+            continue
+        indexes.update((label, properties[0], index_type) for label in labels)
+    return indexes
+
+
+def advise_indexes(
+    query_templates: Iterable[str],
+    indexes: Set[Tuple[str, str, str]]
+) -> List[IndexAdvice]:
+    """找出查询模板中没有索引支撑的查找，按出现次数降序返回"""
+    occurrences: Counter = Counter()
+    examples: Dict[Tuple[Optional[str], str, str], str] = {}
+    for query in query_templates:
+        for lookup in set(extract_lookups(query)):
+            occurrences[lookup] += 1
+            examples.setdefault(lookup, query.strip())
+
+    advice = []
+    for (label, prop, operator), count in occurrences.most_common():
+        if label is None:
+            suggested, reason = None, "节点模式没有标签，无法使用任何属性索引"
+            if prop == "id":
+                reason += f"，按 id 查找请改用 (:{ENTITY_LABEL} {{id: ...}})"
+        elif operator == "=~":
+            suggested, reason = None, "正则匹配无法使用索引"
+        elif operator in _TEXT_OPERATORS:
+            if (label, prop, "text") in indexes:
+                continue
+            suggested, reason = "text", f"{operator} 需要文本索引"
+        else:
+            if (label, prop, "range") in indexes or (operator == "STARTS WITH" and (label, prop, "text") in indexes):
+                continue
+            suggested, reason = "range", f"{operator} 查找没有范围索引或唯一约束"
+        advice.append(IndexAdvice(
+            label=label, property=prop, operator=operator, suggested=suggested,
+            occurrences=count, example=examples[(label, prop, operator)], reason=reason
+        ))
+    return advice
@@ -0,0 +1,78 @@
+"""
+EMC知识图谱相似度聚类引擎
+将特征向量堆叠为归一化矩阵，按块计算余弦相似度并执行贪心阈值聚类
+"""
+
+from typing import List, Sequence, Union
+
+import numpy as np
+
+# 每个相似度块最多包含的元素数（float32时约64MB）
+DEFAULT_MAX_BLOCK_ELEMENTS = 1 << 24
+
+
+def normalize_rows(vectors: Union[np.ndarray, Sequence[np.ndarray]]) -> np.ndarray:
+    """
+    将向量堆叠为矩阵并按行做L2归一化
+
+    零向量保持为零行，因此与任何向量的相似度都为0，
+    与 EntityDisambiguator.calculate_similarity 的零向量处理一致。
+    """
+    matrix = np.asarray(vectors) if isinstance(vectors, np.ndarray) else np.vstack(vectors)
+    if not np.issubdtype(matrix.dtype, np.floating):
+        matrix = matrix.astype(np.float64)
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def greedy_threshold_clustering(
+    vectors: Union[np.ndarray, Sequence[np.ndarray]],
+    threshold: float,
+    max_block_elements: int = DEFAULT_MAX_BLOCK_ELEMENTS
+) -> List[List[int]]:
+    """
+    贪心阈值聚类 - 分块矩阵乘法版本
+
+    语义与逐对比较的实现相同：按顺序遍历未分配的实体 i，
+    把所有 j > i 且未分配、相似度 max(0, cos) >= threshold 的实体并入 i 的聚类。
+    相似度按行块计算，每块最多 max_block_elements 个元素，内存占用与输入规模无关。
+
+    Args:
+        vectors: 特征向量（n × d 矩阵或向量列表）
+        threshold: 相似度阈值
+        max_block_elements: 单个相似度块的元素上限
+
+    Returns:
+        聚类列表，每个聚类为原始下标列表（首元素为聚类起点，其余按下标递增）
+    """
+    if len(vectors) == 0:
+        return []
+
+    matrix = normalize_rows(vectors)
+    n = matrix.shape[0]
+    used = np.zeros(n, dtype=bool)
+    clusters: List[List[int]] = []
+    block_rows = max(1, max_block_elements // n)
+
+    for block_start in range(0, n, block_rows):
+        block_end = min(block_start + block_rows, n)
+        # 块开始时已分配的行不可能再成为聚类起点
+        rows = np.flatnonzero(~used[block_start:block_end]) + block_start
+        if rows.size == 0:
+            continue
+
+        # 只需要与块起点之后的列比较
+        similarities = matrix[rows] @ matrix[block_start:].T
+        np.maximum(similarities, 0.0, out=similarities)
+
+        for r, i in enumerate(rows):
+            if used[i]:
+                continue
+            row = similarities[r, i - block_start + 1:]
+            members = np.flatnonzero((row >= threshold) & ~used[i + 1:]) + i + 1
+            used[i] = True
+            used[members] = True
+            clusters.append([int(i)] + members.tolist())
+
+    return clusters
@@ -0,0 +1,241 @@
+"""
+EMC知识图谱实体向量索引
+基于NumPy的IVF（倒排文件）近似最近邻索引，用于跨文档实体链接
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from .similarity_clustering import normalize_rows
+
+
+class EntityVectorIndex:
+    """
+    规范实体上下文向量的近似最近邻索引（余弦相似度）
+
+    向量数量达到 train_threshold 之前做精确搜索；之后用k-means训练
+    n_lists 个粗聚类中心，每个向量归入最近的倒排列表，查询时只扫描与
+    查询最相近的 n_probe 个列表。索引规模增长到上次训练时的 retrain_factor
+    倍时自动重新训练。支持增量插入/更新和磁盘保存/加载。
+    """
+
+    def __init__(self,
+                 dim: Optional[int] = None,
+                 n_lists: Optional[int] = None,
+                 n_probe: int = 8,
+                 train_threshold: int = 2048,
+                 retrain_factor: float = 4.0,
+                 seed: int = 0):
+        """
+        Args:
+            dim: 向量维度（为空时由第一次插入确定）
+            n_lists: 倒排列表数量（为空时按 sqrt(n) 自动选择）
+            n_probe: 查询时扫描的倒排列表数量
+            train_threshold: 开始使用IVF的最小向量数量
+            retrain_factor: 规模增长多少倍后重新训练
+            seed: k-means 随机种子
+        """
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_threshold = train_threshold
+        self.retrain_factor = retrain_factor
+        self.seed = seed
+
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self._size = 0
+
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[Set[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []  # 倒排列表的数组缓存，列表变化时失效
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._id_to_row
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def add(self, ids: Sequence[str], vectors: Union[np.ndarray, Sequence[np.ndarray]]):
+        """
+        插入或更新向量
+
+        已存在的ID会覆盖原向量并重新分配倒排列表。
+        """
+        if len(ids) == 0:
+            return
+        matrix = normalize_rows(vectors).astype(np.float32)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        if matrix.shape[1] != self.dim:
+            raise ValueError(f"向量维度不匹配: 期望 {self.dim}, 实际 {matrix.shape[1]}")
+
+        rows = []
+        for entity_id in ids:
+            row = self._id_to_row.get(entity_id)
+            if row is None:
+                row = self._size
+                self._id_to_row[entity_id] = row
+                self._ids.append(entity_id)
+                self._size += 1
+            rows.append(row)
+        self._reserve(self._size)
+        # 同一批次中重复的ID以最后一次为准
+        self._vectors[rows] = matrix
+
+        if self.is_trained and self._size < self._trained_size * self.retrain_factor:
+            self._assign(np.asarray(rows))
+        elif self._size >= self.train_threshold:
+            self.train()
+
+    def search(self, queries: Union[np.ndarray, Sequence[np.ndarray]], k: int = 1) -> List[List[Tuple[str, float]]]:
+        """
+        查找每个查询向量最相似的 k 个实体
+
+        Returns:
+            每个查询一个 [(实体ID, 余弦相似度), ...] 列表，按相似度降序
+        """
+        if len(queries) == 0:
+            return []
+        matrix = normalize_rows(queries).astype(np.float32)
+        if self._size == 0:
+            return [[] for _ in range(matrix.shape[0])]
+
+        vectors = self._vectors[:self._size]
+        if not self.is_trained:
+            return [self._top_k(vectors @ query, np.arange(self._size), k) for query in matrix]
+
+        n_probe = min(self.n_probe, len(self._lists))
+        centroid_scores = matrix @ self._centroids.T
+        probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+        results = []
+        for query, probe in zip(matrix, probes):
+            rows = np.concatenate([self._list_array(list_id) for list_id in probe])
+            if rows.size == 0:
+                results.append([])
+                continue
+            results.append(self._top_k(vectors[rows] @ query, rows, k))
+        return results
+
+    def train(self, iterations: int = 10):
+        """用当前全部向量训练k-means粗聚类中心并重建倒排列表"""
+        vectors = self._vectors[:self._size]
+        n_lists = self.n_lists or max(1, int(np.sqrt(self._size)))
+        n_lists = min(n_lists, self._size)
+        rng = np.random.default_rng(self.seed)
+
+        centroids = vectors[rng.choice(self._size, size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = self._nearest_centroids(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=n_lists)
+            nonempty = counts > 0
+            centroids[nonempty] = normalize_rows(sums[nonempty])
+
+        self._centroids = centroids
+        self._trained_size = self._size
+        self._lists = [set() for _ in range(n_lists)]
+        self._list_arrays = [None] * n_lists
+        self._assignments = np.full(self._vectors.shape[0], -1, dtype=np.int32)
+        self._assign(np.arange(self._size))
+
+    def save(self, path: Union[str, Path]):
+        """保存索引到 .npz 文件"""
+        np.savez(
+            path,
+            vectors=self._vectors[:self._size],
+            ids=np.array(json.dumps(self._ids)),
+            centroids=self._centroids if self.is_trained else np.zeros((0, self.dim or 0), dtype=np.float32),
+            assignments=self._assignments[:self._size] if self.is_trained else np.zeros(0, dtype=np.int32),
+            config=np.array(json.dumps({
+                "dim": self.dim,
+                "n_lists": self.n_lists,
+                "n_probe": self.n_probe,
+                "train_threshold": self.train_threshold,
+                "retrain_factor": self.retrain_factor,
+                "seed": self.seed,
+                "trained_size": self._trained_size,
+            }))
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "EntityVectorIndex":
+        """从 .npz 文件加载索引"""
+        with np.load(path) as data:
+            config = json.loads(str(data["config"]))
+            trained_size = config.pop("trained_size")
+            index = cls(**config)
+            ids = json.loads(str(data["ids"]))
+            vectors = data["vectors"]
+            index._ids = ids
+            index._id_to_row = {entity_id: row for row, entity_id in enumerate(ids)}
+            index._vectors = vectors.astype(np.float32)
+            index._size = len(ids)
+
+            if data["centroids"].shape[0]:
+                index._centroids = data["centroids"]
+                index._trained_size = trained_size
+                index._assignments = data["assignments"].astype(np.int32)
+                index._lists = [set() for _ in range(index._centroids.shape[0])]
+                index._list_arrays = [None] * len(index._lists)
+                for row, list_id in enumerate(index._assignments):
+                    index._lists[list_id].add(row)
+        return index
+
+    def _reserve(self, size: int):
+        """按倍增策略扩容向量矩阵"""
+        capacity = self._vectors.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+        grown = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        grown[:capacity] = self._vectors
+        self._vectors = grown
+        if self.is_trained:
+            assignments = np.full(new_capacity, -1, dtype=np.int32)
+            assignments[:len(self._assignments)] = self._assignments
+            self._assignments = assignments
+
+    def _assign(self, rows: np.ndarray):
+        """把指定行分配到最近的倒排列表"""
+        nearest = self._nearest_centroids(self._vectors[rows], self._centroids)
+        for row, list_id in zip(rows.tolist(), nearest.tolist()):
+            previous = self._assignments[row]
+            if previous >= 0:
+                self._lists[previous].discard(row)
+                self._list_arrays[previous] = None
+            self._lists[list_id].add(row)
+            self._list_arrays[list_id] = None
+            self._assignments[row] = list_id
+
+    def _list_array(self, list_id: int) -> np.ndarray:
+        """倒排列表对应的行号数组"""
+        array = self._list_arrays[list_id]
+        if array is None:
+            members = self._lists[list_id]
+            array = np.fromiter(members, dtype=np.int64, count=len(members))
+            self._list_arrays[list_id] = array
+        return array
+
+    @staticmethod
+    def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ centroids.T, axis=1)
+
+    def _top_k(self, scores: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[rows[i]], float(scores[i])) for i in top]
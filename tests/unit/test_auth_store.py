@@ -0,0 +1,209 @@
+"""
+Unit tests for the gateway authentication state stores.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from gateway.middleware.auth_store import (
+    AuthStateStore, InMemoryAuthStateStore, RedisAuthStateStore, create_auth_state_store
+)
+
+
+class FakePipeline:
+    """Buffers commands like redis.asyncio's Pipeline and applies them on execute()."""
+
+    def __init__(self, client, transaction):
+        self.client = client
+        self.transaction = transaction
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        def buffer(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return buffer
+
+    async def execute(self):
+        self.client.round_trips += 1
+        self.client.executed.append((self.transaction, [name for name, _, _ in self.commands]))
+        return [getattr(self.client, f"_{name}")(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """Minimal in-process stand-in for redis.asyncio.Redis with decode_responses=True."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttl = {}
+        self.round_trips = 0
+        self.executed = []
+        self.scripts = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, transaction)
+
+    def register_script(self, script):
+        self.scripts.append(script)
+        name = "touch" if "HGETALL" in script else "terminate"
+
+        async def run(keys, args):
+            self.round_trips += 1
+            return getattr(self, f"_script_{name}")(keys, args)
+        return run
+
+    async def exists(self, key):
+        self.round_trips += 1
+        return int(key in self.data)
+
+    async def set(self, key, value, ex=None):
+        self.round_trips += 1
+        self.data[key] = value
+        self.ttl[key] = ex
+
+    async def hgetall(self, key):
+        self.round_trips += 1
+        return dict(self.data.get(key, {}))
+
+    async def smembers(self, key):
+        self.round_trips += 1
+        return set(self.data.get(key, set()))
+
+    def _hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def _sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def _expire(self, key, ttl):
+        self.ttl[key] = ttl
+
+    def _lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, value)
+
+    def _ltrim(self, key, start, end):
+        self.data[key] = self.data[key][start:end + 1]
+
+    def _script_touch(self, keys, args):
+        if keys[0] not in self.data:
+            return []
+        self.data[keys[0]]["last_activity"] = args[0]
+        self.ttl[keys[0]] = args[1]
+        return [item for field in self.data[keys[0]].items() for item in field]
+
+    def _script_terminate(self, keys, args):
+        session = self.data.pop(keys[0], None)
+        if session:
+            self.data.get(f"{args[0]}{session['user_id']}", set()).discard(keys[0])
+
+
+SESSION_DATA = {"user_id": "7", "created_at": "t0", "last_activity": "t0", "device_info": "{}", "is_active": "1"}
+
+
+class TestInMemoryAuthStateStore(unittest.TestCase):
+
+    def test_session_lifecycle(self):
+        store = InMemoryAuthStateStore()
+
+        async def run():
+            await store.create_session("session:7:1", 7, SESSION_DATA, ttl=60)
+            touched = await store.touch_session("session:7:1", "t1", ttl=60)
+            sessions = await store.get_user_sessions(7)
+            await store.terminate_session("session:7:1")
+            return touched, sessions, await store.get_session("session:7:1"), await store.get_user_sessions(7)
+
+        touched, sessions, after, sessions_after = asyncio.run(run())
+        self.assertEqual(touched["last_activity"], "t1")
+        self.assertEqual(sessions, ["session:7:1"])
+        self.assertIsNone(after)
+        self.assertEqual(sessions_after, [])
+
+    def test_touch_does_not_create_missing_session(self):
+        store = InMemoryAuthStateStore()
+        self.assertIsNone(asyncio.run(store.touch_session("session:missing", "t1", ttl=60)))
+        self.assertIsNone(asyncio.run(store.get_session("session:missing")))
+
+    def test_blacklist_expires(self):
+        store = InMemoryAuthStateStore()
+        with patch("gateway.middleware.auth_store.time.monotonic", return_value=100.0):
+            asyncio.run(store.blacklist_token("token-a", ttl=10))
+            self.assertTrue(asyncio.run(store.is_token_blacklisted("token-a")))
+        with patch("gateway.middleware.auth_store.time.monotonic", return_value=111.0):
+            self.assertFalse(asyncio.run(store.is_token_blacklisted("token-a")))
+
+    def test_record_activity_keeps_most_recent_entries(self):
+        store = InMemoryAuthStateStore()
+
+        async def run():
+            for i in range(5):
+                await store.record_activity(7, f"entry {i}", max_entries=3, ttl=60)
+
+        asyncio.run(run())
+        self.assertEqual(store._get("user_activity:7"), ["entry 4", "entry 3", "entry 2"])
+
+    def test_auth_state_store_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AuthStateStore()
+
+
+class TestRedisAuthStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeRedis()
+        self.store = RedisAuthStateStore(self.client)
+
+    def test_create_session_is_one_transactional_round_trip(self):
+        asyncio.run(self.store.create_session("session:7:1", 7, SESSION_DATA, ttl=86400))
+
+        self.assertEqual(self.client.round_trips, 1)
+        self.assertEqual(self.client.executed, [(True, ["hset", "expire", "sadd", "expire"])])
+        self.assertEqual(self.client.data["user_sessions:7"], {"session:7:1"})
+        self.assertEqual(self.client.ttl["session:7:1"], 86400)
+
+    def test_touch_and_terminate_are_single_round_trips(self):
+        asyncio.run(self.store.create_session("session:7:1", 7, SESSION_DATA, ttl=86400))
+        self.client.round_trips = 0
+
+        touched = asyncio.run(self.store.touch_session("session:7:1", "t1", ttl=86400))
+        asyncio.run(self.store.terminate_session("session:7:1"))
+
+        self.assertEqual(self.client.round_trips, 2)
+        self.assertEqual(touched["last_activity"], "t1")
+        self.assertNotIn("session:7:1", self.client.data)
+        self.assertEqual(self.client.data["user_sessions:7"], set())
+
+    def test_record_activity_is_one_pipelined_round_trip(self):
+        asyncio.run(self.store.record_activity(7, "entry", max_entries=100, ttl=604800))
+
+        self.assertEqual(self.client.executed, [(False, ["lpush", "ltrim", "expire"])])
+        self.assertEqual(self.client.data["user_activity:7"], ["entry"])
+
+    def test_blacklist_round_trip(self):
+        asyncio.run(self.store.blacklist_token("token-a", ttl=30))
+
+        self.assertTrue(asyncio.run(self.store.is_token_blacklisted("token-a")))
+        self.assertFalse(asyncio.run(self.store.is_token_blacklisted("token-b")))
+        self.assertEqual(self.client.ttl["blacklist:token-a"], 30)
+
+
+class TestCreateAuthStateStore(unittest.TestCase):
+
+    def test_memory_backend(self):
+        self.assertIsInstance(create_auth_state_store("memory"), InMemoryAuthStateStore)
+
+    def test_rejects_unknown_backend_and_missing_url(self):
+        with self.assertRaises(ValueError):
+            create_auth_state_store("memcached")
+        with self.assertRaises(ValueError):
+            create_auth_state_store("redis")
+
+
+if __name__ == '__main__':
+    unittest.main()
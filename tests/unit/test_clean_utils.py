@@ -0,0 +1,105 @@
+"""
+Unit tests for the compiled single-pass rules in EMCDataCleaner.
+"""
+
+import re
+import unicodedata
+import unittest
+
+from data_processing.clean_utils import EMCDataCleaner, clean_entities_for_disambiguation
+
+
+def reference_context_terms(cleaner, text):
+    """One re.sub per term, as clean_context_text used to do it."""
+    for term, normalized in cleaner.term_normalizations.items():
+        text = re.sub(r'\b' + re.escape(term) + r'\b', normalized, text, flags=re.IGNORECASE)
+    return text
+
+
+def reference_entity_terms(cleaner, text):
+    """Sequential str.replace, as _normalize_emc_terms used to do it."""
+    for term, normalized in cleaner.term_normalizations.items():
+        if term in text:
+            text = text.replace(term, normalized)
+    return text
+
+
+class TestEMCDataCleaner(unittest.TestCase):
+
+    def setUp(self):
+        self.cleaner = EMCDataCleaner()
+        self.samples = [
+            "iec  61000-4-2", "EMi Filter", "spectrum•analyzer", "100 mhz", "  ESD  test  ",
+            "The iec 61000-4-2 standard defines  emi test procedures",
+            "This emi filter operates at 100mhz frequency range",
+            "  conducted  emission   limits   per   fcc  part  15  ",
+            "Mhz GHZ khz HZ eFT EMc radiated immunity CONDUCTED IMMUNITY",
+        ]
+
+    def test_entity_terms_match_sequential_replace(self):
+        for text in self.samples:
+            self.assertEqual(self.cleaner._normalize_emc_terms(text),
+                             reference_entity_terms(self.cleaner, text))
+
+    def test_context_terms_match_per_term_sub(self):
+        for text in self.samples:
+            self.assertEqual(self.cleaner.clean_context_text(text),
+                             re.sub(r'\s+', ' ', reference_context_terms(
+                                 self.cleaner,
+                                 self.cleaner._remove_noise_characters(
+                                     self.cleaner._normalize_unicode(text)))).strip())
+
+    def test_clean_entity_text(self):
+        self.assertEqual(self.cleaner.clean_entity_text("iec  61000-4-2"), "IEC 61000-4-2")
+        self.assertEqual(self.cleaner.clean_entity_text("EMi Filter"), "EMI Filter")
+        self.assertEqual(self.cleaner.clean_entity_text("spectrum•analyzer"), "spectrumanalyzer")
+        self.assertEqual(self.cleaner.clean_entity_text("fcc part 15"), "FCC part 15")
+
+    def test_every_standard_occurrence_is_normalized(self):
+        self.assertEqual(self.cleaner.clean_entity_text("iec61000-4-2 / iec61000-4-3 cispr22"),
+                         "IEC 61000-4-2 / IEC 61000-4-3 CISPR 22")
+
+    def test_overlapping_terms_fall_back_to_sequential_replace(self):
+        self.cleaner.term_normalizations = {'bc': 'X', 'ab': 'Y'}
+        self.cleaner.compile_rules()
+        self.assertIsNone(self.cleaner._entity_term_pattern)
+        self.assertEqual(self.cleaner._normalize_emc_terms("abc"), "aX")
+
+    def test_recompile_after_rule_change(self):
+        self.cleaner.term_normalizations['dbuv'] = 'dBμV'
+        self.cleaner.compile_rules()
+        self.assertEqual(self.cleaner.clean_context_text("limit 40 DBUV"), "limit 40 dBμV")
+
+    def test_control_char_table_matches_category_filter(self):
+        text = "IEC\x0061000\u200b-4-2\t中文\x85测试\ue000\n\ufeffEMC\U000e0001"
+        expected = ''.join(
+            char for char in unicodedata.normalize('NFKD', text)
+            if unicodedata.category(char)[0] != 'C' or char in '\n\t'
+        )
+        self.assertEqual(self.cleaner._normalize_unicode(text), expected)
+
+    def test_parallel_batch_keeps_input_order(self):
+        entities = [f"iec 61000-4-{i}" for i in range(50)] + ["•", "emi filter"]
+        contexts = [f"emi test {i} at 100 mhz" for i in range(len(entities))]
+        serial = self.cleaner.batch_clean_entities(entities, contexts)
+        parallel = self.cleaner.batch_clean_entities(
+            entities, contexts, n_process=2, chunk_size=7, min_parallel_size=1
+        )
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(parallel[0]), len(entities) - 1)
+
+    def test_parallel_workers_use_custom_rules(self):
+        self.cleaner.term_normalizations['dbuv'] = 'dBμV'
+        self.cleaner.compile_rules()
+        cleaned, _ = self.cleaner.batch_clean_entities(
+            ["40 dbuv"] * 4, n_process=2, chunk_size=1, min_parallel_size=1
+        )
+        self.assertEqual(cleaned, ["40 dBμV"] * 4)
+
+    def test_small_batches_stay_in_process(self):
+        cleaned, contexts = clean_entities_for_disambiguation(["EMi Filter"], n_process=4)
+        self.assertEqual((cleaned, contexts), (["EMI Filter"], [""]))
+
+
+if __name__ == '__main__':
+    unittest.main()
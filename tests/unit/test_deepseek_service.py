@@ -0,0 +1,211 @@
+"""
+Unit tests for DeepSeekService conversation handling.
+The AsyncOpenAI client is mocked.
+"""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from services.ai_integration.deepseek_service import (
+    DeepSeekConfig, DeepSeekService, DeepSeekEMCService, create_deepseek_service_from_settings
+)
+from services.ai_integration.response_cache import ResponseCache
+from services.ai_integration.session_store import InMemorySessionStore
+
+
+def make_response(content):
+    return SimpleNamespace(
+        id="resp-1",
+        model="deepseek-chat",
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    )
+
+
+def make_settings(**overrides):
+    """The deepseek_* fields of gateway.config.Settings, at their defaults."""
+    settings = dict(
+        deepseek_api_key="test-key",
+        deepseek_base_url="https://api.deepseek.com/v1",
+        deepseek_model="deepseek-chat",
+        deepseek_max_tokens=4000,
+        deepseek_temperature=0.7,
+        deepseek_timeout=30,
+        deepseek_max_retries=3,
+        deepseek_max_concurrency=8,
+        deepseek_initial_concurrency=4,
+        deepseek_retry_base_delay=0.5,
+        deepseek_retry_max_delay=30.0,
+        deepseek_session_backend="memory",
+        deepseek_max_sessions=1000,
+        deepseek_session_ttl=3600,
+        deepseek_history_max_tokens=3000,
+        deepseek_summarize_history=False,
+        deepseek_extraction_chunk_tokens=3000,
+        deepseek_extraction_chunk_overlap_tokens=200,
+        deepseek_extraction_concurrency=4,
+        deepseek_response_cache_enabled=False,
+        deepseek_response_cache_path="deepseek_response_cache.sqlite3",
+        deepseek_response_cache_max_mb=64,
+        deepseek_response_cache_max_temperature=0.3,
+        redis_url="redis://localhost:6379/0",
+    )
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+class TestDeepSeekServiceHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.service = DeepSeekService(DeepSeekConfig(api_key="test-key"))
+        self.create = AsyncMock(side_effect=[make_response("答复1"), make_response("答复2")])
+        self.service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self.create)))
+
+    def test_history_is_prepended_and_stored_once(self):
+        async def run():
+            await self.service.chat_completion([{"role": "user", "content": "问题1"}], session_id="s1")
+            await self.service.chat_completion([{"role": "user", "content": "问题2"}], session_id="s1")
+            return await self.service.session_store.get_prompt_messages("s1")
+
+        history = asyncio.run(run())
+        second_call_messages = self.create.call_args_list[1].kwargs["messages"]
+        self.assertEqual(second_call_messages, [
+            {"role": "user", "content": "问题1"},
+            {"role": "assistant", "content": "答复1"},
+            {"role": "user", "content": "问题2"},
+        ])
+        self.assertEqual(len(history), 4)  # previous turns are not appended again
+
+    def test_emc_service_session_helpers(self):
+        emc_service = DeepSeekEMCService(DeepSeekConfig(api_key="test-key"))
+        emc_service.deepseek.client = self.service.client
+
+        async def run():
+            await emc_service.deepseek.chat_completion([{"role": "user", "content": "问题1"}], session_id="s1")
+            history = await emc_service.get_session_history("s1")
+            await emc_service.clear_session("s1")
+            return history, await emc_service.get_session_history("s1")
+
+        history, cleared = asyncio.run(run())
+        self.assertEqual([m["content"] for m in history], ["问题1", "答复1"])
+        self.assertEqual(cleared, [])
+
+
+class TestDeepSeekServiceResponseCache(unittest.TestCase):
+
+    def test_low_temperature_requests_are_cached(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ResponseCache(str(Path(cache_dir) / "cache.sqlite3"))
+            emc_service = DeepSeekEMCService(DeepSeekConfig(api_key="test-key"), response_cache=cache)
+            create = AsyncMock(side_effect=lambda **params: make_response('{"entities": []}'))
+            emc_service.deepseek.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+            async def run():
+                first = await emc_service.extract_entities_from_text("EN 55032")
+                second = await emc_service.extract_entities_from_text("EN 55032")
+                await emc_service.interactive_chat("EN 55032?", session_id="s1")
+                await emc_service.interactive_chat("EN 55032?", session_id="s2")
+                return first, second
+
+            first, second = asyncio.run(run())
+            stats = cache.get_stats()
+            cache.close()
+
+        self.assertEqual(create.await_count, 3)  # chat (temperature 0.7) is never cached
+        self.assertEqual(second["content"], first["content"])
+        self.assertTrue(second["cached"])
+        self.assertEqual((stats["hits"], stats["saved_tokens"]), (1, 15))
+
+
+class TestDeepSeekEMCServiceChunkedExtraction(unittest.TestCase):
+
+    def test_chunks_run_concurrently_up_to_limit(self):
+        config = DeepSeekConfig(api_key="test-key", extraction_chunk_tokens=20,
+                                extraction_chunk_overlap_tokens=0, extraction_concurrency=2)
+        emc_service = DeepSeekEMCService(config)
+        running = {"now": 0, "peak": 0}
+
+        async def fake_extract(text_content, session_id=None, priority=None):
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            if "CISPR 3" in text_content:
+                raise RuntimeError("rate limited")
+            return {"content": text_content}
+
+        emc_service.extract_entities_from_text = fake_extract
+        text = "\n\n".join(f"Clause {i} references CISPR {i} limits." for i in range(6))
+
+        results = asyncio.run(emc_service.extract_entities_chunked(text))
+
+        self.assertEqual(running["peak"], 2)
+        self.assertEqual([r["chunk_index"] for r in results], list(range(len(results))))
+        for result in results:
+            self.assertEqual(result["text"], text[result["start"]:result["end"]])
+        failed = [r for r in results if "error" in r]
+        self.assertEqual(len(failed), 1)
+        self.assertIn("CISPR 3", failed[0]["text"])
+        self.assertNotIn("response", failed[0])
+
+
+class TestCreateDeepSeekServiceFromSettings(unittest.TestCase):
+
+    def test_scheduler_settings_reach_the_scheduler(self):
+        emc_service = create_deepseek_service_from_settings(make_settings(
+            deepseek_model="deepseek-reasoner", deepseek_max_concurrency=16, deepseek_initial_concurrency=2,
+            deepseek_retry_base_delay=1.5, deepseek_retry_max_delay=60.0
+        ))
+
+        config = emc_service.deepseek.config
+        self.assertEqual((config.api_key, config.model), ("test-key", "deepseek-reasoner"))
+        scheduler = emc_service.deepseek.scheduler
+        self.assertEqual(
+            (scheduler.max_concurrency, scheduler.window, scheduler.base_delay, scheduler.max_delay), (16, 2.0, 1.5, 60.0)
+        )
+
+    def test_session_settings_configure_the_session_store(self):
+        emc_service = create_deepseek_service_from_settings(make_settings(
+            deepseek_max_sessions=5, deepseek_session_ttl=60,
+            deepseek_history_max_tokens=500, deepseek_summarize_history=True
+        ))
+
+        store = emc_service.deepseek.session_store
+        self.assertIsInstance(store, InMemorySessionStore)
+        self.assertEqual((store.max_sessions, store.ttl_seconds, store.max_history_tokens), (5, 60, 500))
+        self.assertTrue(emc_service.deepseek.config.summarize_history)
+
+    def test_extraction_chunk_settings_reach_the_config(self):
+        emc_service = create_deepseek_service_from_settings(make_settings(
+            deepseek_extraction_chunk_tokens=1200, deepseek_extraction_chunk_overlap_tokens=100,
+            deepseek_extraction_concurrency=6
+        ))
+
+        config = emc_service.deepseek.config
+        self.assertEqual(
+            (config.extraction_chunk_tokens, config.extraction_chunk_overlap_tokens, config.extraction_concurrency),
+            (1200, 100, 6)
+        )
+
+    def test_response_cache_is_built_when_enabled(self):
+        self.assertIsNone(create_deepseek_service_from_settings(make_settings()).deepseek.response_cache)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            emc_service = create_deepseek_service_from_settings(make_settings(
+                deepseek_response_cache_enabled=True,
+                deepseek_response_cache_path=str(Path(cache_dir) / "cache.sqlite3"),
+                deepseek_response_cache_max_mb=2,
+                deepseek_response_cache_max_temperature=0.2
+            ))
+            cache = emc_service.deepseek.response_cache
+            cache.close()
+
+        self.assertEqual((cache.max_bytes, cache.max_temperature), (2 * 1024 * 1024, 0.2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,12 +7,15 @@ File I/O for content extraction will also be mocked for most tests.
 import unittest
 from unittest.mock import MagicMock, AsyncMock, patch, mock_open, call
 import asyncio
+import tempfile
 from pathlib import Path
 from datetime import datetime
 from dataclasses import asdict
 
+from services.file_processing.extraction_cache import ExtractionCache
+from services.file_processing.upload_stream import UploadedFile
 from services.file_processing.emc_file_processor import (
-    EMCFileProcessor, FileMetadata, ExtractionResult,
+    EMCFileProcessor, FileMetadata, ExtractionResult, PdfPageChunk,
     EMCContentExtractor, FormatConverter # If these have complex logic, they might need own tests
 )
 # Mocked service types
@@ -24,10 +27,16 @@ class MockDeepSeekEMCService:
     async def extract_entities_from_text(self, text_content: str, session_id: str):
         return {"content": '{"entities": [], "relationships": []}'} # Default mock response
 
+    async def extract_entities_chunked(self, text_content: str):
+        return [] # Default mock response: one result per chunk
+
 class MockEMCGraphManager:
     async def process_document_content(self, text_content: str, document_id: str, document_metadata: dict):
         return {"status": "completed", "entities_extracted_count": 0, "errors": []}
 
+    async def process_document_stream(self, text_chunks, document_id: str, document_metadata: dict):
+        return {"status": "completed", "entities_extracted_count": 0, "errors": []}
+
 
 class TestEMCFileProcessor(unittest.TestCase):
 
@@ -209,6 +218,218 @@ class TestEMCFileProcessor(unittest.TestCase):
         mock_aio_open.assert_called_once_with(txt_file_path, 'r', encoding='utf-8')
 
 
+    @patch('services.file_processing.emc_file_processor.Path.exists')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._extract_metadata')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._extract_content')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._extract_entities_with_ai')
+    def test_process_file_reuses_extraction_cache(
+        self, mock_ai_extract, mock_content_extract, mock_metadata_extract, mock_path_exists
+    ):
+        mock_path_exists.return_value = True
+        mock_metadata_extract.side_effect = lambda path, file_id, upload=None: FileMetadata(**{
+            **asdict(self.mocked_metadata), "file_id": file_id, "mime_type": "text/plain"
+        })
+        mock_content_extract.return_value = self.sample_content
+        mock_ai_extract.return_value = self.mocked_extraction_result
+        self.mock_graph_manager.process_document_content.return_value = {"status": "completed", "errors": []}
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.processor.extraction_cache = ExtractionCache(cache_dir)
+            _, first = asyncio.run(self.processor.process_file(self.sample_file_path, "file_a"))
+            _, second = asyncio.run(self.processor.process_file(self.sample_file_path, "file_b"))
+            # Reprocessing the same file_id also reuses its graph summary
+            asyncio.run(self.processor.process_file(self.sample_file_path, "file_a"))
+            # A different analysis mode is a different cache entry
+            asyncio.run(self.processor.process_file(self.sample_file_path, "file_c", analysis_mode="fast"))
+
+        self.assertEqual(second, first)
+        self.assertEqual(mock_content_extract.call_count, 2)
+        self.assertEqual(mock_ai_extract.call_count, 2)
+        # A re-upload under a new file_id still gets its own Document node
+        self.assertEqual(
+            [c.kwargs["document_id"] for c in self.mock_graph_manager.process_document_content.call_args_list],
+            ["file_a", "file_b", "file_c"]
+        )
+        stats = self.processor.get_processing_stats()
+        self.assertEqual((stats['extraction_cache_content_hits'], stats['extraction_cache_content_misses']), (2, 2))
+        self.assertEqual((stats['extraction_cache_ai_hits'], stats['extraction_cache_ai_misses']), (2, 2))
+        self.assertEqual((stats['extraction_cache_graph_hits'], stats['extraction_cache_graph_misses']), (1, 3))
+
+    @patch('services.file_processing.emc_file_processor._extract_pdf_page_range')
+    @patch('services.file_processing.emc_file_processor._pdf_page_count')
+    def test_stream_pdf_pages_yields_pages_in_order(self, mock_page_count, mock_extract_range):
+        mock_page_count.return_value = 5
+        mock_extract_range.side_effect = lambda path, start, end: [
+            PdfPageChunk(page_number=i + 1, text=f"page {i + 1}") for i in range(start, end) if i != 2
+        ]
+
+        async def collect():
+            return [chunk async for chunk in self.processor.stream_pdf_pages(
+                self.sample_file_path, pages_per_range=2, window_pages=2
+            )]
+
+        chunks = asyncio.run(collect())
+
+        self.assertEqual([c.page_number for c in chunks], [1, 2, 4, 5]) # Empty page 3 skipped
+        self.assertEqual(
+            mock_extract_range.call_args_list,
+            [call(str(self.sample_file_path), 0, 2), call(str(self.sample_file_path), 2, 4),
+             call(str(self.sample_file_path), 4, 5)]
+        )
+
+        with patch.object(self.processor, 'stream_pdf_pages', side_effect=lambda path: self._async_iter(chunks)):
+            content = asyncio.run(self.processor._extract_pdf_content(self.sample_file_path))
+        self.assertEqual(content, "page 1\n\npage 2\n\npage 4\n\npage 5")
+
+    @patch('services.file_processing.emc_file_processor.PDF_AI_WINDOW_PAGES', 2)
+    @patch('services.file_processing.emc_file_processor.Path.exists')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._extract_metadata')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._extract_content')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._extract_entities_with_ai')
+    def test_process_file_streams_pdf_pages_into_graph(
+        self, mock_ai_extract, mock_content_extract, mock_metadata_extract, mock_path_exists
+    ):
+        mock_path_exists.return_value = True
+        mock_metadata_extract.return_value = self.mocked_metadata
+        pages = [f"page {n}" for n in range(1, 6)]
+        chunks = [PdfPageChunk(page_number=n, text=text) for n, text in enumerate(pages, 1)]
+        streamed = []
+
+        async def consume(text_chunks, document_id, document_metadata):
+            streamed.extend([text async for text in text_chunks])
+            return {"status": "completed", "errors": []}
+
+        async def extract_window(text):
+            # One chunk per window, naming the window's first page as a standard
+            name = text.split("\n\n")[0]
+            return [{"chunk_index": 0, "start": 0, "end": len(text), "text": text, "response": {
+                "content": f'{{"entities": [{{"type": "EMCStandard", "name": "{name}"}}], "relationships": []}}',
+                "usage": {"total_tokens": 50}}}]
+
+        self.mock_graph_manager.process_document_stream.side_effect = consume
+        self.mock_deepseek_service.extract_entities_chunked.side_effect = extract_window
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.processor.extraction_cache = ExtractionCache(cache_dir)
+            with patch.object(self.processor, 'stream_pdf_pages', side_effect=lambda path: self._async_iter(chunks)):
+                metadata_out, extraction_out = asyncio.run(
+                    self.processor.process_file(self.sample_file_path, self.sample_file_id)
+                )
+            cached = asyncio.run(self.processor.extraction_cache.get(
+                ExtractionCache.make_key("fake_checksum", EMCFileProcessor.EXTRACTOR_VERSION, "comprehensive")
+            ))
+
+        self.assertEqual(streamed, pages)
+        self.assertEqual(
+            self.mock_graph_manager.process_document_stream.call_args.kwargs["document_id"], self.sample_file_id
+        )
+        mock_content_extract.assert_not_called()
+        self.mock_graph_manager.process_document_content.assert_not_called()
+        self.assertTrue(metadata_out.processed)
+
+        # AI extraction runs per window of pages; offsets point into the document as _extract_pdf_content joins it
+        mock_ai_extract.assert_not_called()
+        self.assertEqual(
+            [c.args[0] for c in self.mock_deepseek_service.extract_entities_chunked.call_args_list],
+            ["page 1\n\npage 2", "page 3\n\npage 4", "page 5"]
+        )
+        full_text = "\n\n".join(pages)
+        self.assertEqual(
+            {e["name"]: [full_text[start:end] for start, end in e["chunk_offsets"]] for e in extraction_out.entities},
+            {"page 1": ["page 1\n\npage 2"], "page 3": ["page 3\n\npage 4"], "page 5": ["page 5"]}
+        )
+        self.assertEqual(extraction_out.content_summary, "page 1\n\npage 2")
+
+        # The cache gets the whole text from the temporary content file, which is removed afterwards
+        self.assertEqual(cached["content"], full_text)
+        self.assertIn(self.sample_file_id, cached["graph_summaries"])
+        self.assertEqual(
+            [path for path in (self.storage_path / "temp").iterdir() if path.name.endswith(".content")], []
+        )
+
+    @patch('services.file_processing.emc_file_processor.Path.exists')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._extract_metadata')
+    def test_process_file_pdf_parse_error_is_not_a_graph_error(self, mock_metadata_extract, mock_path_exists):
+        mock_path_exists.return_value = True
+        mock_metadata_extract.return_value = self.mocked_metadata
+
+        async def broken_pages(path):
+            raise ValueError("corrupt PDF")
+            yield
+
+        async def consume(text_chunks, document_id, document_metadata):
+            try:
+                [text async for text in text_chunks]
+            except ValueError as e:
+                return {"status": "failed", "errors": [str(e)]}
+
+        self.mock_graph_manager.process_document_stream.side_effect = consume
+
+        with patch.object(self.processor, 'stream_pdf_pages', side_effect=broken_pages):
+            metadata_out, extraction_out = asyncio.run(
+                self.processor.process_file(self.sample_file_path, self.sample_file_id)
+            )
+
+        self.assertEqual(metadata_out.extraction_status, "failed_in_file_processing")
+        self.assertIsNone(extraction_out)
+
+    def test_extract_entities_with_ai_merges_chunks(self):
+        content = "EN 55032 applies to multimedia equipment. " * 30
+        self.mock_deepseek_service.extract_entities_chunked.return_value = [
+            {"chunk_index": 0, "start": 0, "end": 700, "text": content[:700], "response": {
+                "content": '{"entities": [{"type": "Standard", "name": "EN 55032", "properties": {"year": "2015"}}],'
+                           ' "relationships": [{"source": "EN 55032", "target": "Multimedia", "type": "APPLIES_TO"}]}',
+                "usage": {"total_tokens": 80}}},
+            {"chunk_index": 1, "start": 600, "end": 1260, "text": content[600:], "response": {
+                "content": '{"entities": [{"type": "Standard", "name": "en 55032", "properties": {"class": "B"}},'
+                           ' {"type": "ProductCategory", "name": "Multimedia"}],'
+                           ' "relationships": [{"source": "EN 55032", "target": "multimedia", "type": "APPLIES_TO"}]}',
+                "usage": {"total_tokens": 70}}},
+            {"chunk_index": 2, "start": 1200, "end": 1260, "text": "CISPR 32 also applies.",
+             "error": "timeout"},
+        ]
+
+        result = asyncio.run(self.processor._extract_entities_with_ai("f1", content, self.mocked_metadata))
+
+        by_name = {e["name"]: e for e in result.entities}
+        self.assertEqual(set(by_name), {"EN 55032", "Multimedia", "CISPR 32"})
+        self.assertEqual(by_name["EN 55032"]["properties"], {"year": "2015", "class": "B"})
+        self.assertEqual(by_name["EN 55032"]["chunk_offsets"], [[0, 700], [600, 1260]])
+        self.assertEqual(by_name["CISPR 32"]["chunk_offsets"], [[1200, 1260]])  # rule-based fallback
+        self.assertEqual(len(result.relationships), 1)
+        self.assertGreater(result.confidence_score, 0.5)
+
+    def test_extract_entities_with_ai_fails_when_every_chunk_fails(self):
+        self.mock_deepseek_service.extract_entities_chunked.return_value = [
+            {"chunk_index": 0, "start": 0, "end": 10, "text": "EN 55032 x", "error": "timeout"}
+        ]
+
+        result = asyncio.run(self.processor._extract_entities_with_ai("f1", "EN 55032 x", self.mocked_metadata))
+
+        self.assertEqual(result.content_summary, "提取失败")
+        self.assertEqual(result.entities, [])
+
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._detect_encoding')
+    @patch('services.file_processing.emc_file_processor.EMCFileProcessor._calculate_checksum')
+    def test_extract_metadata_uses_upload_metadata(self, mock_checksum, mock_encoding):
+        upload = UploadedFile(size_bytes=42, checksum="abc123", mime_type="text/plain", encoding="utf-8")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "notes.txt"
+            file_path.write_text("EN 55032")
+            metadata = asyncio.run(self.processor._extract_metadata(file_path, "file_txt", upload))
+
+        mock_checksum.assert_not_called()
+        mock_encoding.assert_not_called()
+        self.assertEqual(
+            (metadata.checksum, metadata.size_bytes, metadata.mime_type, metadata.encoding),
+            ("abc123", 42, "text/plain", "utf-8")
+        )
+
+    @staticmethod
+    async def _async_iter(items):
+        for item in items:
+            yield item
+
     def tearDown(self):
         # Clean up any files created in storage_path if necessary,
         # but these tests primarily use mocks for file operations.
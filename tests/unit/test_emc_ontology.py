@@ -9,13 +9,14 @@ from services.knowledge_graph.emc_ontology import (
     # Node Labels
     NODE_EMC_STANDARD, NODE_PRODUCT, NODE_COMPONENT, NODE_TEST, NODE_TEST_RESULT,
     NODE_FREQUENCY, NODE_FREQUENCY_RANGE, NODE_PHENOMENON, NODE_REGULATION,
-    NODE_MITIGATION_MEASURE, NODE_DOCUMENT, NODE_ORGANIZATION, NODE_EQUIPMENT,
+    NODE_MITIGATION_MEASURE, NODE_DOCUMENT, NODE_ORGANIZATION, NODE_EQUIPMENT, NODE_TEST_METHOD,
     # Relationship Types
     REL_APPLIES_TO, REL_CONTAINS_COMPONENT, REL_HAS_STANDARD, REL_PERFORMED_TEST,
     REL_HAS_TEST_RESULT, REL_OBSERVES_PHENOMENON, REL_REGULATES, REL_MITIGATES,
     REL_REFERENCES_STANDARD, REL_MENTIONS_PRODUCT, REL_USES_FREQUENCY,
     REL_HAS_FREQUENCY_RANGE, REL_SPECIFIES_LIMIT, REL_CONDUCTED_BY,
     REL_MANUFACTURED_BY, REL_ISSUED_BY, REL_USES_EQUIPMENT, REL_PART_OF,
+    REL_REQUIRES, REL_TESTS, REL_COMPLIES_WITH, REL_RELATED_TO,
     # Node Schemas (Dataclasses)
     BaseNode, EMCStandardNode, ProductNode, ComponentNode, TestNode, TestResultNode,
     FrequencyNode, FrequencyRangeNode, PhenomenonNode, RegulationNode, MitigationMeasureNode,
@@ -33,7 +34,8 @@ class TestEMCOntology(unittest.TestCase):
         expected_node_labels = [
             NODE_EMC_STANDARD, NODE_PRODUCT, NODE_COMPONENT, NODE_TEST, NODE_TEST_RESULT,
             NODE_FREQUENCY, NODE_FREQUENCY_RANGE, NODE_PHENOMENON, NODE_REGULATION,
-            NODE_MITIGATION_MEASURE, NODE_DOCUMENT, NODE_ORGANIZATION, NODE_EQUIPMENT
+            NODE_MITIGATION_MEASURE, NODE_DOCUMENT, NODE_ORGANIZATION, NODE_EQUIPMENT,
+            NODE_TEST_METHOD
         ]
         for label in expected_node_labels:
             self.assertIsInstance(label, str)
@@ -49,7 +51,8 @@ class TestEMCOntology(unittest.TestCase):
             REL_HAS_TEST_RESULT, REL_OBSERVES_PHENOMENON, REL_REGULATES, REL_MITIGATES,
             REL_REFERENCES_STANDARD, REL_MENTIONS_PRODUCT, REL_USES_FREQUENCY,
             REL_HAS_FREQUENCY_RANGE, REL_SPECIFIES_LIMIT, REL_CONDUCTED_BY,
-            REL_MANUFACTURED_BY, REL_ISSUED_BY, REL_USES_EQUIPMENT, REL_PART_OF
+            REL_MANUFACTURED_BY, REL_ISSUED_BY, REL_USES_EQUIPMENT, REL_PART_OF,
+            REL_REQUIRES, REL_TESTS, REL_COMPLIES_WITH, REL_RELATED_TO
         ]
         for rel_type in expected_relationship_types:
             self.assertIsInstance(rel_type, str)
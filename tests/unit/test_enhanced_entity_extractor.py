@@ -0,0 +1,126 @@
+"""
+Unit tests for EnhancedEMCEntityExtractor.extract_from_file orchestration.
+The KAG adapter, AI extraction and file parsing are mocked.
+"""
+
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from services.knowledge_graph.enhanced_entity_extractor import EnhancedEMCEntityExtractor
+from services.knowledge_graph.emc_ontology import NODE_EMC_STANDARD
+
+DELAY = 0.2
+
+
+class FakeKAGAdapter:
+    def __init__(self):
+        self.calls = []
+
+    def is_kag_available(self):
+        return True
+
+    async def extract_from_emc_pdf(self, pdf_path, use_kag=True, fallback_to_deepseek=True,
+                                   text_content=None, pages=None):
+        self.calls.append({"text_content": text_content, "pages": pages})
+        await asyncio.sleep(DELAY)
+        return {
+            "entities": [{"id": "k1", "name": "EN 55032", "type": NODE_EMC_STANDARD, "properties": {},
+                          "confidence": 0.9, "extraction_method": "KAG"}],
+            "relationships": [],
+            "chunks": pages,
+            "metadata": {"success": True, "extraction_method": "KAG"}
+        }
+
+
+def legacy_entity(name, source):
+    return {"label": NODE_EMC_STANDARD, "data": {"name": name, "properties": {"source": source}}}
+
+
+class TestEnhancedEntityExtractorExtractFromFile(unittest.TestCase):
+
+    def setUp(self):
+        self.kag = FakeKAGAdapter()
+        with patch("services.knowledge_graph.enhanced_entity_extractor.create_emc_kag_adapter",
+                   return_value=self.kag):
+            self.extractor = EnhancedEMCEntityExtractor(deepseek_service=MagicMock())
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.pdf_path = str(Path(self.temp_dir.name) / "report.pdf")
+        Path(self.pdf_path).write_bytes(b"%PDF")
+        self.parse_threads = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def fake_read(self, file_path, file_type):
+        self.parse_threads.append(threading.get_ident())
+        return "page one EN 55032\npage two CISPR 32", ["page one EN 55032", "page two CISPR 32"]
+
+    def test_methods_run_concurrently_on_one_parse(self):
+        async def extract_ai(text_content, document_id=None):
+            await asyncio.sleep(DELAY)
+            return [legacy_entity("CISPR 32", "ai")]
+
+        def extract_rules(text_content, document_id=None):
+            time.sleep(DELAY)  # blocking work must not stall the other methods
+            return [legacy_entity("CISPR 32", "rules"), legacy_entity("EN 55032", "rules")]
+
+        self.extractor.extract_entities_ai = extract_ai
+        self.extractor.extract_entities_rule_based = extract_rules
+
+        with patch("services.knowledge_graph.enhanced_entity_extractor._read_file_text", self.fake_read):
+            started = time.perf_counter()
+            result = asyncio.run(self.extractor.extract_from_file(self.pdf_path))
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, DELAY * 2)  # about the slowest method, not the sum of three
+        self.assertEqual(len(self.parse_threads), 1)
+        self.assertNotEqual(self.parse_threads[0], threading.get_ident())
+        self.assertEqual(self.kag.calls, [{
+            "text_content": "page one EN 55032\npage two CISPR 32",
+            "pages": ["page one EN 55032", "page two CISPR 32"]
+        }])
+        self.assertEqual(result["metadata"]["extraction_methods"], ["KAG", "DeepSeek_Legacy", "Rules"])
+        self.assertEqual(set(result["metadata"]["method_timings"]), {"kag", "ai", "rules"})
+
+        by_name = {e["name"]: e for e in result["entities"]}
+        self.assertEqual(len(result["entities"]), 2)
+        self.assertEqual(by_name["EN 55032"]["extraction_method"], "KAG")  # higher confidence wins
+        self.assertEqual(by_name["CISPR 32"]["properties"]["source"], "rules")
+        self.assertTrue(result["metadata"]["success"])
+
+    def test_failed_method_does_not_discard_the_others(self):
+        async def extract_ai(text_content, document_id=None):
+            raise RuntimeError("deepseek down")
+
+        self.extractor.extract_entities_ai = extract_ai
+        self.extractor.extract_entities_rule_based = lambda text, document_id=None: [legacy_entity("CISPR 32", "rules")]
+
+        with patch("services.knowledge_graph.enhanced_entity_extractor._read_file_text", self.fake_read):
+            result = asyncio.run(self.extractor.extract_from_file(self.pdf_path, use_kag=False))
+
+        self.assertEqual(result["metadata"]["extraction_methods"], ["Rules"])
+        self.assertEqual([e["name"] for e in result["entities"]], ["CISPR 32"])
+        self.assertEqual(result["chunks"], ["page one EN 55032\npage two CISPR 32"])
+        self.assertEqual(self.kag.calls, [])
+
+    def test_cancelled_method_does_not_discard_the_others(self):
+        async def extract_ai(text_content, document_id=None):
+            raise asyncio.CancelledError()
+
+        self.extractor.extract_entities_ai = extract_ai
+        self.extractor.extract_entities_rule_based = lambda text, document_id=None: [legacy_entity("CISPR 32", "rules")]
+
+        with patch("services.knowledge_graph.enhanced_entity_extractor._read_file_text", self.fake_read):
+            result = asyncio.run(self.extractor.extract_from_file(self.pdf_path, use_kag=False))
+
+        self.assertEqual(result["metadata"]["extraction_methods"], ["Rules"])
+        self.assertEqual([e["name"] for e in result["entities"]], ["CISPR 32"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Unit tests for EntityBatch, the columnar entity mention record.
+"""
+import unittest
+
+from services.knowledge_graph.entity_batch import EntityBatch, EntityMention
+
+
+class TestEntityBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = EntityBatch()
+        self.batch.append("EMCStandard", "EN 55032", 0, 8)
+        self.batch.append("Frequency", "100MHz", 20, 27, unit="MHz", value_hz=100e6)
+        self.batch.append("EMCStandard", "EN 55032", 40, 48)
+
+    def test_rows_round_trip(self):
+        self.assertEqual(len(self.batch), 3)
+        self.assertEqual(self.batch[1], EntityMention("Frequency", "100MHz", 20, 27, "MHz", 100e6, None))
+        self.assertEqual(self.batch[0].unit, None)
+        self.assertEqual(self.batch[0].value_hz, None)
+        self.assertEqual([m.start for m in self.batch], [0, 20, 40])
+
+    def test_repeated_strings_are_interned(self):
+        # Two labels, two names and one unit
+        self.assertEqual(len(self.batch.strings), 5)
+        self.assertEqual(self.batch.name_ids[0], self.batch.name_ids[2])
+
+    def test_spans_by_entity(self):
+        self.assertEqual(self.batch.spans_by_entity(), {
+            ("EN 55032", "EMCStandard"): [(0, 8), (40, 48)],
+            ("100MHz", "Frequency"): [(20, 27)],
+        })
+
+    def test_extend_shifts_offsets_and_remaps_strings(self):
+        other = EntityBatch()
+        other.append("FrequencyRange", "30MHz-1GHz", 5, 15, unit="Hz", value_hz=30e6, max_value_hz=1e9)
+        other.append("EMCStandard", "EN 55032", 0, 8)
+        self.batch.extend(other, offset=100)
+
+        self.assertEqual(len(self.batch), 5)
+        self.assertEqual(self.batch[3], EntityMention("FrequencyRange", "30MHz-1GHz", 105, 115, "Hz", 30e6, 1e9))
+        self.assertEqual(self.batch[4].name, "EN 55032")
+        self.assertEqual(self.batch.name_ids[4], self.batch.name_ids[0])
+
+    def test_context_and_highlights(self):
+        text = "EN 55032, limits at 100 MHz apply; see EN 55032"
+        self.assertEqual(self.batch.context(text, 1, width=3), "at 100 MHz ap")
+        self.assertEqual(self.batch.highlights()[1], {"start": 20, "end": 27, "label": "Frequency"})
+
+    def test_nbytes_counts_columns(self):
+        self.assertEqual(self.batch.nbytes, 3 * (4 + 8 + 8 + 4 + 4 + 8 + 8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Unit tests for EntityDisambiguator feature extraction (nlp.pipe batching and the vector cache).
+A blank spaCy pipeline with a few static vectors stands in for the real model.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import spacy
+
+from services.knowledge_graph.entity_disambiguation import EntityDisambiguator
+
+
+class TestEntityDisambiguatorFeatures(unittest.TestCase):
+
+    def setUp(self):
+        nlp = spacy.blank("en")
+        rng = np.random.default_rng(0)
+        for word in ["iec", "esd", "immunity", "cispr", "emission", "filter"]:
+            nlp.vocab.set_vector(word, rng.random(8).astype("float32"))
+        with patch("spacy.load", return_value=nlp):
+            self.disambiguator = EntityDisambiguator(vector_cache_size=2)
+        self.nlp = nlp
+
+    def test_batch_matches_single_extraction(self):
+        pairs = [("IEC", "esd immunity"), ("CISPR", "emission"), ("IEC", "esd immunity")]
+        batch = self.disambiguator.extract_context_features_batch(pairs)
+
+        self.assertEqual(len(batch), 3)
+        for (entity, context), vector in zip(pairs, batch):
+            np.testing.assert_allclose(vector, self.disambiguator.extract_context_features(entity, context))
+
+    def test_repeated_pairs_hit_cache(self):
+        pairs = [("IEC", "esd immunity"), ("CISPR", "emission")]
+        self.disambiguator.extract_context_features_batch(pairs)
+        with patch.object(self.nlp, "pipe", wraps=self.nlp.pipe) as pipe:
+            self.disambiguator.extract_context_features_batch(pairs)
+            pipe.assert_not_called()
+
+        stats = self.disambiguator.get_cache_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_cache_is_bounded_lru(self):
+        self.disambiguator.extract_context_features_batch([("IEC", "esd"), ("CISPR", "emission")])
+        self.disambiguator.extract_context_features("IEC", "esd") # Refresh the first entry
+        self.disambiguator.extract_context_features("EMI", "filter") # Evicts ("CISPR", "emission")
+
+        self.assertEqual(self.disambiguator.get_cache_stats()["size"], 2)
+        self.assertIn(self.disambiguator._cache_key("IEC", "esd"), self.disambiguator._vector_cache)
+        self.assertNotIn(self.disambiguator._cache_key("CISPR", "emission"), self.disambiguator._vector_cache)
+
+    def test_disambiguate_groups_identical_contexts(self):
+        result = self.disambiguator.disambiguate_entities([
+            ("IEC 61000-4-2", "esd immunity"),
+            ("IEC61000-4-2", "esd immunity"),
+        ])
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].original_indices, [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,13 @@
 Unit tests for EMCEntityExtractor, focusing on rule-based extraction.
 """
 
+import re
 import unittest
 import asyncio # For async methods, though rule-based might not be async here
 
 from services.knowledge_graph.entity_extractor import EMCEntityExtractor
 from services.knowledge_graph.emc_ontology import (
-    NODE_EMC_STANDARD, NODE_FREQUENCY, NODE_FREQUENCY_RANGE,
+    NODE_EMC_STANDARD, NODE_FREQUENCY, NODE_FREQUENCY_RANGE, NODE_ORGANIZATION,
     FrequencyNode, FrequencyRangeNode, EMCStandardNode
 )
 
@@ -72,6 +73,41 @@ class TestEMCEntityExtractorRuleBased(unittest.TestCase):
         self.assertAlmostEqual(range_30m_1g_info['data']['max_value_hz'], 1e9)
         self.assertEqual(range_30m_1g_info['data']['unit'], "Hz") # Common unit is Hz for value_hz fields
 
+    def test_entities_carry_mention_spans(self):
+        text = "EN 55032 applies. Emissions from 30MHz-1GHz per en 55032 too."
+        entities = asyncio.run(self.extractor.extract_entities(text, "doc5", use_ai=False, use_rules=True))
+
+        spans = {e['data']['name']: e['spans'] for e in entities}
+        self.assertEqual(spans["EN 55032"], [(0, 8), (48, 56)]) # Both mentions kept after deduplication
+        start, end = spans["30MHz-1GHz"][0]
+        self.assertEqual(text[start:end], "30MHz-1GHz")
+
+    def test_entity_batch_matches_entity_dicts(self):
+        text = "EN 55032 applies. Emissions from 150 kHz to 30MHz and at 100 MHz per en 55032 too."
+        batch = self.extractor.extract_entity_batch(text)
+
+        self.assertEqual(len(batch), 4)
+        self.assertEqual([text[m.start:m.end] for m in batch], ["EN 55032", "150 kHz to 30MHz", "100 MHz", "en 55032"])
+        frequency = batch[2]
+        self.assertEqual((frequency.label, frequency.name, frequency.unit), (NODE_FREQUENCY, "100MHz", "MHz"))
+        self.assertAlmostEqual(frequency.value_hz, 100e6)
+        self.assertAlmostEqual(batch[1].max_value_hz, 30e6)
+
+        entities = asyncio.run(self.extractor.extract_entities(text, "doc6", use_ai=False, use_rules=True))
+        from_batch = self.extractor.entities_from_batch(batch, "doc6")
+        self.assertEqual(
+            sorted((e['label'], e['data']['name'], e['spans']) for e in from_batch),
+            sorted((e['label'], e['data']['name'], e['spans']) for e in entities)
+        )
+        range_entity = next(e for e in from_batch if e['label'] == NODE_FREQUENCY_RANGE)
+        self.assertAlmostEqual(range_entity['data']['min_value_hz'], 150e3)
+        self.assertEqual(range_entity['data']['source_document_ids'], ["doc6"])
+
+    def test_entity_batch_appends_chunks_with_offset(self):
+        batch = self.extractor.extract_entity_batch("EN 55032.")
+        self.extractor.extract_entity_batch("at 50 Hz", batch=batch, offset=10)
+        self.assertEqual([(m.name, m.start, m.end) for m in batch], [("EN 55032.", 0, 9), ("50Hz", 13, 18)])
+
     def test_no_entities_found(self):
         text = "This is a generic text without any specific EMC information."
         entities = asyncio.run(self.extractor.extract_entities(text, "doc4", use_ai=False, use_rules=True))
@@ -109,6 +145,25 @@ class TestEMCEntityExtractorRuleBased(unittest.TestCase):
         freq_entities = [e for e in entities if e['label'] == NODE_FREQUENCY and e['data']['name'] == "50MHz"]
         self.assertEqual(len(freq_entities), 1, "50MHz should be deduplicated")
 
+    def test_range_endpoints_not_emitted_as_frequencies(self):
+        text = "Conducted emissions 150kHz-30MHz, radiated 30MHz-1GHz."
+        entities = self.extractor.extract_entities_rule_based(text, "doc_ranges")
+
+        self.assertEqual([e['label'] for e in entities], [NODE_FREQUENCY_RANGE, NODE_FREQUENCY_RANGE])
+        self.assertEqual([e['data']['name'] for e in entities], ["150kHz-30MHz", "30MHz-1GHz"])
+
+    def test_scanner_reports_spans_in_text_order(self):
+        text = "EN 55032 at 100MHz"
+        spans = [(label, start, end) for label, _groups, start, end in self.extractor.scanner.scan(text)]
+        self.assertEqual(spans, [(NODE_EMC_STANDARD, 0, 8), (NODE_FREQUENCY, 12, 18)])
+
+    def test_register_pattern_adds_entity_kind(self):
+        self.extractor.register_pattern(NODE_ORGANIZATION, re.compile(r'\b(TÜV \w+)'))
+        entities = self.extractor.extract_entities_rule_based("Tested by TÜV Rheinland at 50MHz.", "doc_org")
+
+        self.assertEqual([e['label'] for e in entities], [NODE_ORGANIZATION, NODE_FREQUENCY])
+        self.assertEqual(entities[0]['data']['name'], "TÜV Rheinland")
+
 
 if __name__ == '__main__':
     unittest.main()
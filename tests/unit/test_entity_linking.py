@@ -0,0 +1,112 @@
+"""
+Unit tests for EntityLinker's cross-document linking on top of EntityVectorIndex.
+The spaCy/word-vector disambiguator is replaced by a stub that maps each context to a fixed vector.
+"""
+
+import hashlib
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from kg_construction.entity_linking import EntityLinker
+from services.knowledge_graph.entity_disambiguation import DisambiguatedEntity
+from services.knowledge_graph.similarity_clustering import greedy_threshold_clustering
+
+CONTEXT_VECTORS = {
+    "esd": [1.0, 0.0, 0.0, 0.0],
+    "esd immunity": [0.95, 0.05, 0.0, 0.0],
+    "rf": [0.0, 1.0, 0.0, 0.0],
+    "filter": [0.0, 0.0, 1.0, 0.0],
+}
+
+
+class StubDisambiguator:
+    """Context -> fixed vector; clusters the same way EntityDisambiguator does."""
+
+    def __init__(self, model_path=None, spacy_model=None):
+        self.similarity_threshold = 0.7
+        self.feature_batches = []
+        self.received_vectors = []
+
+    def extract_context_features_batch(self, pairs):
+        self.feature_batches.append(pairs)
+        return [np.asarray(CONTEXT_VECTORS[context], dtype=np.float32) for _, context in pairs]
+
+    def disambiguate_entities(self, entities, vectors=None):
+        self.received_vectors.append(vectors)
+        if vectors is None:
+            vectors = self.extract_context_features_batch(entities)
+        disambiguated = []
+        for members in greedy_threshold_clustering(vectors, self.similarity_threshold):
+            texts = [entities[k][0] for k in members]
+            canonical_form = max(texts, key=len)
+            disambiguated.append(DisambiguatedEntity(
+                unique_id=self.generate_unique_id(canonical_form),
+                canonical_form=canonical_form,
+                variants=list(dict.fromkeys(texts)),
+                confidence=1.0,
+                original_indices=list(members)
+            ))
+        return disambiguated
+
+    def generate_unique_id(self, canonical_form):
+        return f"entity_{hashlib.md5(canonical_form.lower().strip().encode()).hexdigest()[:12]}"
+
+
+class TestEntityLinkerIndex(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch("kg_construction.entity_linking.EntityDisambiguator", StubDisambiguator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.linker = EntityLinker()
+        self.first = self.linker.link_entities(
+            ["IEC 61000-4-2", "IEC61000-4-2", "Spectrum Analyzer"], ["esd", "esd", "rf"], ["Standard", "Standard", "Equipment"]
+        )
+        self.standard = self.linker.get_entity_by_text("IEC 61000-4-2")
+
+    def test_first_pass_extracts_context_features_once(self):
+        disambiguator = self.linker.disambiguator
+
+        self.assertEqual(len(disambiguator.feature_batches), 1)
+        self.assertIsNotNone(disambiguator.received_vectors[0])
+        self.assertEqual(len(self.first), 2)
+        self.assertEqual(len(self.linker.vector_index), 2)
+
+    def test_second_batch_links_to_canonical_entities_from_first(self):
+        linked = self.linker.link_entities_incremental(["IEC 61000-4-2 ESD"], ["esd immunity"], ["Standard"])
+
+        self.assertEqual([entity.unique_id for entity in linked], [self.standard.unique_id])
+        self.assertIn("IEC 61000-4-2 ESD", self.standard.variants)
+        self.assertEqual(len(self.standard.original_mentions), 3)
+        self.assertEqual(len(self.linker.vector_index), 2)
+        self.assertIs(self.linker.get_entity_by_text("IEC 61000-4-2 ESD"), self.standard)
+
+    def test_new_mentions_are_inserted_into_the_index(self):
+        (filter_entity,) = self.linker.link_entities_incremental(["EMI Filter", "EMI filter"], ["filter", "filter"])
+
+        self.assertEqual(len(self.linker.vector_index), 3)
+        self.assertEqual(len(filter_entity.original_mentions), 2)
+        self.assertEqual(self.linker.vector_index.search(np.array([CONTEXT_VECTORS["filter"]]), k=1)[0][0][0],
+                         filter_entity.unique_id)
+
+    def test_save_and_load_give_the_same_lookups(self):
+        queries = np.array([CONTEXT_VECTORS[context] for context in ("esd", "rf", "filter")])
+        with tempfile.TemporaryDirectory() as index_dir:
+            self.linker.save_index(index_dir)
+            loaded = EntityLinker(index_dir=index_dir)
+
+        self.assertEqual(loaded.vector_index.search(queries, k=2), self.linker.vector_index.search(queries, k=2))
+        for text in ("IEC 61000-4-2", "IEC61000-4-2", "Spectrum Analyzer"):
+            self.assertEqual(loaded.get_entity_by_text(text).unique_id, self.linker.get_entity_by_text(text).unique_id)
+
+        # The reloaded linker keeps linking new mentions to the saved entities
+        linked = loaded.link_entities_incremental(["IEC 61000-4-2 ESD"], ["esd immunity"])
+        self.assertEqual([entity.unique_id for entity in linked], [self.standard.unique_id])
+        self.assertEqual(len(linked[0].original_mentions), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Unit tests for the on-disk ExtractionCache used by EMCFileProcessor.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from services.file_processing.extraction_cache import ExtractionCache
+
+
+class TestExtractionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temp_dir.name) / "cache"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_depends_on_checksum_version_and_mode(self):
+        key = ExtractionCache.make_key("abc", "1", "fast")
+        self.assertEqual(key, ExtractionCache.make_key("abc", "1", "fast"))
+        self.assertNotEqual(key, ExtractionCache.make_key("abc", "2", "fast"))
+        self.assertNotEqual(key, ExtractionCache.make_key("abc", "1", "detailed"))
+
+    def test_put_and_get_round_trip(self):
+        cache = ExtractionCache(str(self.cache_dir))
+        entry = {"content": "IEC 61000-4-2 测试", "graph_summary": {"status": "completed"}}
+
+        asyncio.run(cache.put("k1", entry))
+
+        self.assertEqual(asyncio.run(cache.get("k1")), entry)
+        self.assertIsNone(asyncio.run(cache.get("missing")))
+        # A new instance picks up entries already on disk
+        self.assertEqual(ExtractionCache(str(self.cache_dir)).get_stats()["entries"], 1)
+
+    def test_evicts_least_recently_used_when_over_size(self):
+        entry = {"content": "x" * 100}
+        cache = ExtractionCache(str(self.cache_dir), max_bytes=250)
+
+        asyncio.run(cache.put("old", entry))
+        asyncio.run(cache.put("recent", entry))
+        asyncio.run(cache.get("old")) # "recent" is now the least recently used
+        asyncio.run(cache.put("new", entry))
+
+        self.assertIsNotNone(asyncio.run(cache.get("old")))
+        self.assertIsNone(asyncio.run(cache.get("recent")))
+        self.assertIsNotNone(asyncio.run(cache.get("new")))
+        self.assertLessEqual(cache.get_stats()["size_bytes"], 250)
+
+    def test_reload_orders_entries_by_access_time(self):
+        cache = ExtractionCache(str(self.cache_dir), max_bytes=250)
+        asyncio.run(cache.put("a", {"content": "x" * 100}))
+        asyncio.run(cache.put("b", {"content": "x" * 100}))
+        past = time.time() - 60
+        os.utime(self.cache_dir / "b.json", (past, past))
+
+        reloaded = ExtractionCache(str(self.cache_dir), max_bytes=250)
+        asyncio.run(reloaded.put("c", {"content": "x" * 100}))
+
+        self.assertIsNone(asyncio.run(reloaded.get("b")))
+        self.assertIsNotNone(asyncio.run(reloaded.get("a")))
+
+    @patch("services.file_processing.extraction_cache.CONTENT_BLOCK_CHARS", 4)
+    def test_put_streams_content_from_file(self):
+        cache = ExtractionCache(str(self.cache_dir))
+        content = 'IEC 61000-4-2 "ESD"\r\n第2页\t\\ 8kV\n\nEN 55032'
+        content_file = Path(self.temp_dir.name) / "content.txt"
+        content_file.write_bytes(content.encode("utf-8"))
+
+        asyncio.run(cache.put("k1", {"graph_summaries": {"f1": {"status": "completed"}}}, content_file=content_file))
+        asyncio.run(cache.put("k2", {}, content_file=content_file))
+
+        self.assertEqual(asyncio.run(cache.get("k1")),
+                         {"content": content, "graph_summaries": {"f1": {"status": "completed"}}})
+        self.assertEqual(asyncio.run(cache.get("k2")), {"content": content})
+        self.assertEqual(cache.get_stats()["size_bytes"],
+                         sum(path.stat().st_size for path in self.cache_dir.glob("*.json")))
+
+    def test_corrupt_entry_is_dropped(self):
+        cache = ExtractionCache(str(self.cache_dir))
+        asyncio.run(cache.put("k", {"content": "ok"}))
+        (self.cache_dir / "k.json").write_text("{not json", encoding="utf-8")
+
+        self.assertIsNone(asyncio.run(cache.get("k")))
+        self.assertEqual(cache.get_stats(), {"entries": 0, "size_bytes": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Route tests for gateway.routing.file_routes.
+Jobs run through a real IngestionQueue and EMCFileProcessor; AI extraction and the graph manager are mocked.
+"""
+
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from gateway.ingestion.job_queue import IngestionQueue, JobStore
+from gateway.middleware.auth import get_current_user
+from gateway.routing import file_routes
+from services.file_processing.emc_file_processor import EMCFileProcessor, ExtractionResult
+from services.file_processing.extraction_cache import ExtractionCache
+
+
+class TestReprocessRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        self.file_path = root / "report.txt"
+        self.file_path.write_text("EN 55032 Class B 辐射发射限值 30MHz-1GHz", encoding="utf-8")
+
+        self.graph_manager = AsyncMock()
+        self.graph_manager.process_document_content.return_value = {"status": "completed", "errors": []}
+        self.processor = EMCFileProcessor(
+            deepseek_service=AsyncMock(),
+            storage_path=str(root / "uploads"),
+            graph_manager=self.graph_manager,
+            extraction_cache=ExtractionCache(str(root / "cache"))
+        )
+        self.processor._extract_entities_with_ai = AsyncMock(return_value=ExtractionResult(
+            file_id="ignored", entities=[], relationships=[], content_summary="", confidence_score=1.0,
+            processing_time=0.0, extracted_at=datetime.now()
+        ))
+
+        self.store = JobStore(str(root / "jobs.sqlite3"))
+        self.queue = IngestionQueue(
+            self.store,
+            lambda job, report_progress: file_routes._process_file_job(job, report_progress, self.processor),
+            num_workers=1
+        )
+        self.app = FastAPI()
+        self.app.include_router(file_routes.router, prefix="/api/files")
+        self.app.add_event_handler("startup", self.queue.start)
+        self.app.add_event_handler("shutdown", self.queue.stop)
+        self.app.dependency_overrides[get_current_user] = lambda: {"id": "u1", "username": "tester"}
+        self.app.dependency_overrides[file_routes.get_ingestion_queue] = lambda: self.queue
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def wait_until_finished(client, task_id, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = client.get(f"/api/files/status/{task_id}").json()
+            if status["status"] in ("completed", "failed"):
+                return status
+            time.sleep(0.02)
+        raise AssertionError(f"task {task_id} did not finish")
+
+    def test_reprocess_reuses_the_cached_graph_summary(self):
+        with TestClient(self.app) as client:
+            payload = file_routes._job_payload(self.file_path, "report.txt", True, True, "comprehensive", "u1")
+            original = client.portal.call(self.queue.submit, payload, "queued")
+            self.wait_until_finished(client, original.task_id)
+
+            response = client.post(f"/api/files/reprocess/{original.task_id}", json={})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.wait_until_finished(client, response.json()["new_task_id"])["status"], "completed")
+
+        # The graph is built once, for the original file_id; reprocessing hits the cached summary
+        self.assertEqual(
+            [c.kwargs["document_id"] for c in self.graph_manager.process_document_content.await_args_list],
+            [original.task_id]
+        )
+        stats = self.processor.get_processing_stats()
+        self.assertEqual((stats["extraction_cache_graph_hits"], stats["extraction_cache_graph_misses"]), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
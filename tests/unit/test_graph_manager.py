@@ -220,6 +220,107 @@ class TestEMCGraphManager(unittest.TestCase):
         self.assertEqual(summary["nodes_added_count"], 3) # All 3 nodes (Doc, Prod, Std)
         self.assertEqual(summary["relationships_added_count"], 0)
 
+    def test_process_document_bulk_ingest(self):
+        self.mock_entity_extractor.extract_entities.return_value = self.extracted_entities_raw
+        self.mock_relation_builder.build_relationships.return_value = self.extracted_relations
+        self.mock_neo4j_service.bulk_merge_entities_and_relationships = AsyncMock(return_value={
+            "entities_written": [0, 1, 2],
+            "relationships_written": [0],
+            "failures": []
+        })
+
+        summary = asyncio.run(
+            self.graph_manager.process_document_content(
+                self.sample_text, self.document_id, self.document_metadata, bulk_ingest=True
+            )
+        )
+
+        self.assertEqual(summary["status"], "completed")
+        self.assertEqual(summary["nodes_added_count"], 3) # Doc node + 2 entities, one transaction
+        self.assertEqual(summary["relationships_added_count"], 1)
+        self.mock_neo4j_service.add_emc_entity.assert_not_called()
+        self.mock_neo4j_service.add_emc_relationship.assert_not_called()
+
+        kwargs = self.mock_neo4j_service.bulk_merge_entities_and_relationships.call_args.kwargs
+        self.assertEqual(
+            [(e["label"], e["unique_field"]) for e in kwargs["entities"]],
+            [(NODE_DOCUMENT, "file_id"), (NODE_PRODUCT, "name"), (NODE_EMC_STANDARD, "name")]
+        )
+        self.assertEqual(kwargs["relationships"], [{
+            "type": REL_HAS_STANDARD,
+            "from_label": NODE_PRODUCT, "from_field": "name", "from_value": "ProductX",
+            "to_label": NODE_EMC_STANDARD, "to_field": "name", "to_value": "StandardA",
+            "properties": self.extracted_relations[0]["data"]
+        }])
+
+    def test_process_document_bulk_ingest_reports_item_failures(self):
+        self.mock_entity_extractor.extract_entities.return_value = self.extracted_entities_raw
+        self.mock_relation_builder.build_relationships.return_value = self.extracted_relations
+        self.mock_neo4j_service.bulk_merge_entities_and_relationships = AsyncMock(return_value={
+            "entities_written": [0, 1, 2],
+            "relationships_written": [],
+            "failures": [{"kind": "relationship", "index": 0, "error": "endpoint missing"}]
+        })
+
+        summary = asyncio.run(
+            self.graph_manager.process_document_content(
+                self.sample_text, self.document_id, self.document_metadata, bulk_ingest=True
+            )
+        )
+
+        self.assertEqual(summary["status"], "completed_with_errors")
+        self.assertEqual(summary["relationships_added_count"], 0)
+        self.assertIn(
+            "Failed to add relationship HAS_STANDARD between ProductX and StandardA: endpoint missing",
+            summary["errors"]
+        )
+
+    def test_process_document_stream_extracts_each_chunk(self):
+        async def pages():
+            for text in ["ProductX is a new device.", "   ", "It complies with StandardA. ProductX again."]:
+                yield text
+
+        self.mock_entity_extractor.extract_entities.side_effect = [
+            [self.extracted_entities_raw[0]],
+            [self.extracted_entities_raw[1], self.extracted_entities_raw[0]]
+        ]
+        self.mock_relation_builder.build_relationships.return_value = self.extracted_relations
+        self.mock_relation_builder.window_cuts = MagicMock(side_effect=lambda text, offset: [offset + len(text)])
+
+        summary = asyncio.run(
+            self.graph_manager.process_document_stream(pages(), self.document_id, self.document_metadata)
+        )
+
+        self.assertEqual(summary["status"], "completed")
+        self.assertEqual(summary["entities_extracted_count"], 2) # ProductX deduplicated across pages
+        self.assertEqual(self.mock_entity_extractor.extract_entities.call_count, 2) # Blank chunk skipped
+        self.mock_entity_extractor.extract_entities.assert_any_call(
+            text_content="ProductX is a new device.", document_id=self.document_id, use_ai=False, use_rules=True
+        )
+        self.mock_relation_builder.build_relationships.assert_called_once_with(
+            entities=self.entities_for_relation_builder,
+            text_content="", document_id=self.document_id, use_ai=False, use_rules=True,
+            window_cuts=[0, 25, 26, 69] # Chunk starts and the mocked per-chunk cuts, in document offsets
+        )
+
+    def test_process_document_stream_shifts_spans_to_document_offsets(self):
+        async def pages():
+            for text in ["ProductX page.", "StandardA and ProductX."]:
+                yield text
+
+        self.mock_entity_extractor.extract_entities.side_effect = [
+            [{**self.extracted_entities_raw[0], "spans": [(0, 8)]}],
+            [{**self.extracted_entities_raw[1], "spans": [(0, 9)]}, {**self.extracted_entities_raw[0], "spans": [(14, 22)]}]
+        ]
+        self.mock_relation_builder.build_relationships.return_value = []
+        self.mock_relation_builder.window_cuts = MagicMock(return_value=[])
+
+        asyncio.run(self.graph_manager.process_document_stream(pages(), self.document_id, self.document_metadata))
+
+        entities = self.mock_relation_builder.build_relationships.call_args.kwargs["entities"]
+        spans = {e["data"]["name"]: e["spans"] for e in entities}
+        self.assertEqual(spans, {"ProductX": [(0, 8), (29, 37)], "StandardA": [(15, 24)]})
+
     def test_close_connections_called(self):
         self.graph_manager.close_connections()
         self.mock_neo4j_service.close.assert_called_once()
@@ -0,0 +1,87 @@
+"""
+Route tests for the NDJSON streaming endpoints in gateway.routing.graph_routes.
+The Neo4j service dependency is replaced by a fake that yields fixed batches.
+"""
+
+import json
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from neo4j.exceptions import ServiceUnavailable
+
+from gateway.routing import graph_routes
+
+
+def graph_record(source_id, target_id, rel_type="APPLIES_TO"):
+    return {
+        "source_id": source_id, "source_type": "EMCStandard", "source_label": source_id, "source_props": {},
+        "target_id": target_id, "target_type": "Product", "target_label": target_id, "target_props": {},
+        "rel_type": rel_type, "rel_props": {}
+    }
+
+
+class FakeNeo4jService:
+    """Yields the given batches, then raises `error` (if any) as a mid-stream failure."""
+
+    def __init__(self, batches, error=None):
+        self.batches = batches
+        self.error = error
+        self.calls = []
+
+    async def _batches(self):
+        for batch in self.batches:
+            yield batch
+        if self.error:
+            raise self.error
+
+    def iter_graph_data(self, **filters):
+        self.calls.append(("iter_graph_data", filters))
+        return self._batches()
+
+    def iter_query(self, query_str, parameters=None, batch_size=None, access_mode=None):
+        self.calls.append(("iter_query", query_str))
+        return self._batches()
+
+
+class TestStreamingRoutes(unittest.TestCase):
+
+    def client_for(self, service):
+        app = FastAPI()
+        app.include_router(graph_routes.router, prefix="/api/graph")
+        app.dependency_overrides[graph_routes.get_neo4j_service] = lambda: service
+        return TestClient(app)
+
+    @staticmethod
+    def lines(response):
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_graph_data_streams_one_line_per_record(self):
+        service = FakeNeo4jService([[graph_record("s1", "p1")], [graph_record("s1", "p2")]])
+
+        response = self.client_for(service).get("/api/graph/data", params={"stream": "true", "node_types": "EMCStandard"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = self.lines(response)
+        self.assertEqual([line["edge"]["id"] for line in lines], ["s1-p1-APPLIES_TO", "s1-p2-APPLIES_TO"])
+        self.assertEqual(service.calls, [
+            ("iter_graph_data", {"node_types": ["EMCStandard"], "relationship_types": None, "limit": 1000})
+        ])
+
+    def test_query_stream_ends_with_error_line_when_connection_drops_mid_stream(self):
+        service = FakeNeo4jService([[{"i": 0}, {"i": 1}]], error=ServiceUnavailable("connection reset"))
+
+        response = self.client_for(service).post(
+            "/api/graph/query", json={"query": "UNWIND range(0, 9) AS i RETURN i", "stream": True}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        lines = self.lines(response)
+        self.assertEqual(lines[:2], [{"i": 0}, {"i": 1}])
+        self.assertEqual(list(lines[2]), ["error"])
+        self.assertEqual(len(lines), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Unit tests for the SQLite-backed ingestion job queue used by file_routes.
+"""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from gateway.ingestion.job_queue import IngestionQueue, JobStore, QueueFullError
+
+
+class TestIngestionQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.temp_dir.name) / "jobs.sqlite3")
+        self.store = JobStore(self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_runs_jobs_by_priority_and_records_progress(self):
+        order = []
+        queue = None
+
+        async def handler(job, report_progress):
+            report_progress(50.0, "halfway")
+            # Store operations run in order, so the read sees the progress update
+            self.assertEqual((await queue.get_job(job.task_id)).progress, 50.0)
+            order.append(job.payload["name"])
+            return {"name": job.payload["name"]}
+
+        async def run():
+            nonlocal queue
+            queue = IngestionQueue(self.store, handler, num_workers=1)
+            low = await queue.submit({"name": "low"}, "queued")
+            high = await queue.submit({"name": "high"}, "queued", priority=5)
+            await queue.start()
+            await queue._queue.join()
+            await queue.stop()
+            return low, high
+
+        low, high = asyncio.run(run())
+
+        self.assertEqual(order, ["high", "low"])
+        job = self.store.get(low.task_id)
+        self.assertEqual((job.status, job.progress, job.result), ("completed", 100.0, {"name": "low"}))
+        self.assertIsNotNone(job.completed_at)
+
+    def test_failed_job_keeps_error_message(self):
+        async def handler(job, report_progress):
+            raise RuntimeError("parse error")
+
+        async def run():
+            queue = IngestionQueue(self.store, handler, num_workers=1)
+            await queue.start()
+            job = await queue.submit({}, "queued")
+            await queue._queue.join()
+            await queue.stop()
+            return job
+
+        job = self.store.get(asyncio.run(run()).task_id)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("parse error", job.message)
+
+    def test_submit_rejects_when_queue_full(self):
+        async def run():
+            queue = IngestionQueue(self.store, handler=None, max_queue_size=2)
+            # Concurrent submits reserve capacity while their rows are being written
+            results = await asyncio.gather(*(queue.submit({}, "queued") for _ in range(3)), return_exceptions=True)
+            self.assertEqual(sum(isinstance(r, QueueFullError) for r in results), 1)
+            self.assertFalse(queue.has_capacity())
+            with self.assertRaises(QueueFullError):
+                await queue.submit({}, "queued")
+            await queue.stop()
+
+        asyncio.run(run())
+        self.assertEqual(self.store.count_by_status(), {"pending": 2})
+
+    def test_unfinished_jobs_resume_after_restart(self):
+        async def submit_only():
+            queue = IngestionQueue(self.store, handler=None)
+            pending = await queue.submit({"name": "pending"}, "queued")
+            interrupted = await queue.submit({"name": "interrupted"}, "queued")
+            await queue.stop()
+            self.store.update(interrupted.task_id, status="processing", progress=40.0)
+            return pending, interrupted
+
+        pending, interrupted = asyncio.run(submit_only())
+        self.store.close()
+        self.store = JobStore(self.db_path)
+        processed = []
+
+        async def handler(job, report_progress):
+            processed.append(job.task_id)
+            return {}
+
+        async def restart():
+            queue = IngestionQueue(self.store, handler, num_workers=2)
+            await queue.start()
+            await queue._queue.join()
+            await queue.stop()
+
+        asyncio.run(restart())
+
+        self.assertCountEqual(processed, [pending.task_id, interrupted.task_id])
+        self.assertEqual(self.store.count_by_status(), {"completed": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Unit tests for EMCKAGAdapter extraction scheduling.
+KAG components are replaced with blocking fakes.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from services.integrations.kag_adapter import EMCKAGAdapter
+
+
+class BlockingExtractor:
+    """Sleeps like a synchronous KAG extractor and records the threads it ran on."""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.threads = set()
+
+    def extract(self, chunk, schema=None, domain_context=None):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return {"entities": [SimpleNamespace(id=None, name=chunk, type="EMCStandard")], "relationships": []}
+
+
+def make_adapter(max_workers=4, delay=0.1):
+    with patch("services.integrations.kag_adapter.KAG_AVAILABLE", False):
+        adapter = EMCKAGAdapter(max_workers=max_workers)
+    adapter.kag_enabled = True
+    adapter.pdf_reader = MagicMock()
+    adapter.chunk_runner = None
+    adapter.extractor = BlockingExtractor(delay)
+    adapter.emc_schema = {}
+    adapter.deepseek_service = None
+    return adapter
+
+
+class TestEMCKAGAdapterExtraction(unittest.TestCase):
+
+    def test_chunks_are_extracted_in_parallel_off_the_event_loop(self):
+        adapter = make_adapter(max_workers=4, delay=0.1)
+        pages = ["EN 55032", "CISPR 32", "IEC 61000-4-2", "FCC Part 15"]
+
+        async def run():
+            ticks = 0
+            extraction = asyncio.ensure_future(adapter.extract_from_emc_pdf("report.pdf", pages=pages))
+            while not extraction.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return extraction.result(), ticks, threading.get_ident()
+
+        started = time.perf_counter()
+        result, ticks, loop_thread = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        adapter.close()
+
+        self.assertTrue(result["metadata"]["success"])
+        self.assertEqual([e["name"] for e in result["entities"]], pages)  # chunk order is kept
+        self.assertLess(elapsed, 0.3)  # four 0.1s chunks ran concurrently
+        self.assertGreater(ticks, 3)  # the event loop kept running during extraction
+        self.assertNotIn(loop_thread, adapter.extractor.threads)
+        adapter.pdf_reader.read.assert_not_called()  # pre-extracted pages are reused
+
+        timings = result["metadata"]["chunk_timings"]
+        self.assertEqual([t["chunk_index"] for t in timings], [0, 1, 2, 3])
+        self.assertTrue(all(t["seconds"] >= 0.09 and t["entities"] == 1 for t in timings))
+
+    def test_width_is_bounded_by_max_workers(self):
+        adapter = make_adapter(max_workers=2, delay=0.05)
+
+        result = asyncio.run(adapter.extract_from_emc_pdf("report.pdf", pages=[f"EN {i}" for i in range(6)]))
+        adapter.close()
+
+        self.assertEqual(len(result["entities"]), 6)
+        self.assertLessEqual(len(adapter.extractor.threads), 2)
+
+    def test_pdf_is_read_in_executor_when_no_text_is_given(self):
+        adapter = make_adapter()
+        adapter.pdf_reader.read.return_value = "EN 55032 text"
+
+        result = asyncio.run(adapter.extract_from_emc_pdf("report.pdf"))
+        adapter.close()
+
+        adapter.pdf_reader.read.assert_called_once_with("report.pdf")
+        self.assertEqual(result["chunks"], ["EN 55032 text"])
+
+    def test_deepseek_fallback_reuses_text(self):
+        adapter = make_adapter()
+        adapter.extractor.extract = MagicMock(side_effect=RuntimeError("kag down"))
+        adapter.deepseek_service = MagicMock()
+
+        async def extract_entities_from_text(text_content):
+            return {"content": '{"entities": [{"type": "EMCStandard", "name": "EN 55032"}], "relationships": []}'}
+
+        adapter.deepseek_service.extract_entities_from_text = extract_entities_from_text
+
+        with patch("services.integrations.kag_adapter._read_pdf_text") as read_pdf:
+            result = asyncio.run(adapter.extract_from_emc_pdf("report.pdf", text_content="EN 55032 applies."))
+        adapter.close()
+
+        read_pdf.assert_not_called()
+        self.assertEqual(result["metadata"]["extraction_method"], "DeepSeek")
+        self.assertEqual(result["chunks"], ["EN 55032 applies."])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Unit tests for the Neo4jEMCService transaction API (sessions, unit of work, read/write routing).
+The async Neo4j driver is replaced by small in-process fakes.
+"""
+
+import asyncio
+import unittest
+
+from neo4j import Query, READ_ACCESS, WRITE_ACCESS
+
+from services.knowledge_graph.neo4j_emc_service import Neo4jEMCService
+
+
+class FakeRecord:
+    def __init__(self, data):
+        self._data = data
+
+    def data(self):
+        return self._data
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self._rows:
+            yield FakeRecord(row)
+
+
+class FakeTransaction:
+    def __init__(self, driver, kind):
+        self.driver = driver
+        self.kind = kind
+        self.outcome = None
+
+    async def run(self, query, parameters):
+        self.driver.statements.append((self.kind, query.text))
+        return FakeResult(self.driver.rows_for(query.text))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.outcome = "rolled_back" if exc_type else "committed"
+        self.driver.outcomes.append(self.outcome)
+
+
+class FakeSession:
+    def __init__(self, driver, config):
+        self.driver = driver
+        self.config = config
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute_read(self, work, *args):
+        return await work(FakeTransaction(self.driver, "read"), *args)
+
+    async def execute_write(self, work, *args):
+        return await work(FakeTransaction(self.driver, "write"), *args)
+
+    async def run(self, query, parameters):
+        self.driver.statements.append(("auto", query.text))
+        return FakeResult(self.driver.rows_for(query.text))
+
+    async def begin_transaction(self):
+        kind = "read" if self.config["default_access_mode"] == READ_ACCESS else "write"
+        return FakeTransaction(self.driver, f"explicit_{kind}")
+
+
+class FakeDriver:
+    def __init__(self):
+        self.sessions = []
+        self.statements = []
+        self.outcomes = []
+
+    def session(self, **config):
+        self.sessions.append(config)
+        return FakeSession(self, config)
+
+    @staticmethod
+    def rows_for(query_text):
+        if "node_stats" in query_text:
+            return [{"node_stats": [{"type": "Product", "count": 3}, {"type": "EMCStandard", "count": 2}]}]
+        if "rel_stats" in query_text:
+            return [{"rel_stats": [{"type": "COMPLIES_WITH", "count": 4}]}]
+        if "$id" in query_text:
+            return []
+        if "range(" in query_text:
+            return [{"i": i} for i in range(5)]
+        return [{"ok": 1}]
+
+
+class TestNeo4jTransactions(unittest.TestCase):
+
+    def setUp(self):
+        self.service = Neo4jEMCService("bolt://localhost:7687", "neo4j", "password", fetch_size=250)
+        self.driver = FakeDriver()
+        self.service.driver = self.driver
+
+    def test_summary_runs_in_one_read_transaction(self):
+        summary = asyncio.run(self.service.get_knowledge_graph_summary())
+
+        self.assertEqual(len(self.driver.sessions), 1)
+        self.assertEqual([kind for kind, _ in self.driver.statements], ["read", "read"])
+        self.assertEqual(summary["total_nodes"], 5)
+        self.assertEqual(summary["relationships"], {"COMPLIES_WITH": 4})
+
+    def test_sessions_share_bookmark_manager_and_fetch_size(self):
+        async def run():
+            await self.service._execute_write_query("CREATE (n:Product {name: 'X'})")
+            await self.service._execute_read_query("MATCH (n:Product) RETURN n.name")
+
+        asyncio.run(run())
+
+        self.assertEqual([kind for kind, _ in self.driver.statements], ["write", "read"])
+        for config in self.driver.sessions:
+            self.assertIs(config["bookmark_manager"], self.service.bookmark_manager)
+            self.assertEqual(config["fetch_size"], 250)
+
+    def test_unit_of_work_reuses_one_session(self):
+        async def run():
+            async with self.service.unit_of_work() as uow:
+                await uow.write("MERGE (n:Product {name: 'X'})")
+                await uow.read("MATCH (n:Product) RETURN n")
+                return await uow.read_batch([("MATCH (a) RETURN a", {}), ("MATCH (b) RETURN b", {})])
+
+        results = asyncio.run(run())
+
+        self.assertEqual(len(self.driver.sessions), 1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual([kind for kind, _ in self.driver.statements], ["write", "read", "read", "read"])
+
+    def test_explicit_transactions_commit_or_roll_back(self):
+        async def run():
+            async with self.service.read_tx() as tx:
+                await tx.run(Query("MATCH (n) RETURN n"), {})
+            with self.assertRaises(ValueError):
+                async with self.service.write_tx():
+                    raise ValueError("abort")
+
+        asyncio.run(run())
+
+        self.assertEqual([config["default_access_mode"] for config in self.driver.sessions], [READ_ACCESS, WRITE_ACCESS])
+        self.assertEqual(self.driver.statements, [("explicit_read", "MATCH (n) RETURN n")])
+        self.assertEqual(self.driver.outcomes, ["committed", "rolled_back"])
+
+    def test_id_lookup_uses_entity_label(self):
+        asyncio.run(self.service.get_node_by_id("n1"))
+
+        kind, query_text = self.driver.statements[0]
+        self.assertEqual(kind, "read")
+        self.assertIn("MATCH (n:Entity {id: $id})", query_text)
+        self.assertIn("[l IN labels(n) WHERE l <> 'Entity'][0]", query_text)
+
+    def test_iter_query_streams_batches(self):
+        async def run():
+            return [batch async for batch in self.service.iter_query("UNWIND range(0, 4) AS i RETURN i", batch_size=2)]
+
+        batches = asyncio.run(run())
+
+        self.assertEqual(batches, [[{"i": 0}, {"i": 1}], [{"i": 2}, {"i": 3}], [{"i": 4}]])
+        self.assertEqual(self.driver.sessions[0]["fetch_size"], 2)
+        self.assertEqual(self.driver.sessions[0]["default_access_mode"], READ_ACCESS)
+        self.assertEqual([kind for kind, _ in self.driver.statements], ["auto"])
+
+    def test_iter_graph_data_validates_before_iterating(self):
+        with self.assertRaises(ValueError):
+            self.service.iter_graph_data(node_types=["Product", "n) DETACH DELETE n //"])
+        self.assertEqual(self.driver.sessions, [])
+
+    def test_requires_driver(self):
+        self.service.driver = None
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.service._execute_read_query("RETURN 1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Unit tests for the Cypher query template registry and its use in Neo4jEMCService.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from services.knowledge_graph.emc_ontology import ONTOLOGY_DEFINITIONS
+from services.knowledge_graph.neo4j_emc_service import EMCNode, EMCRelationship, Neo4jEMCService
+from services.knowledge_graph.query_templates import (
+    CREATE_NODE, CREATE_RELATIONSHIP, GRAPH_DATA, MAX_SUBGRAPH_DEPTH, SUBGRAPH, QueryTemplateRegistry
+)
+
+
+class TestQueryTemplateRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = QueryTemplateRegistry()
+
+    def test_precompiles_one_template_per_ontology_key(self):
+        labels = len(ONTOLOGY_DEFINITIONS["node_labels"]) + 1  # plus the shared Entity label
+        expected = (
+            labels
+            + len(ONTOLOGY_DEFINITIONS["relationship_types"])
+            + MAX_SUBGRAPH_DEPTH
+            + labels + 1  # graph data per label, plus the unfiltered one
+        )
+        self.assertEqual(len(self.registry), expected)
+        self.assertIn("MERGE (n:Product {id: $id})", self.registry.get(CREATE_NODE, "Product"))
+        self.assertIn("MERGE (a)-[r:APPLIES_TO]->(b)", self.registry.get(CREATE_RELATIONSHIP, "APPLIES_TO"))
+        self.assertIn("[*1..3]", self.registry.get(SUBGRAPH, 3))
+        self.assertIn("MATCH (n:Product)-[r]-(m)", self.registry.get(GRAPH_DATA, "Product"))
+        self.assertIn("MATCH (n)-[r]-(m)", self.registry.get(GRAPH_DATA))
+
+    def test_limits_are_parameters(self):
+        self.assertIn("LIMIT $limit", self.registry.get(GRAPH_DATA))
+        self.assertIn("[..$limit]", self.registry.get(SUBGRAPH, 2))
+
+    def test_accepts_types_emitted_by_extraction_prompt_and_frontend(self):
+        self.registry.get(CREATE_NODE, "TestMethod")
+        for rel_type in ("REQUIRES", "TESTS", "COMPLIES_WITH", "RELATED_TO"):
+            self.registry.get(CREATE_RELATIONSHIP, rel_type)
+
+    def test_rejects_keys_outside_the_ontology(self):
+        with self.assertRaises(ValueError):
+            self.registry.get(CREATE_NODE, "Product {id: 1}) DETACH DELETE n //")
+        with self.assertRaises(ValueError):
+            self.registry.get(CREATE_RELATIONSHIP, "TESTED_BY")
+        with self.assertRaises(ValueError):
+            self.registry.get(GRAPH_DATA, "Nope")
+        with self.assertRaises(ValueError):
+            self.registry.get(SUBGRAPH, MAX_SUBGRAPH_DEPTH + 1)
+        with self.assertRaises(ValueError):
+            self.registry.validate_node_labels(["Product", "Nope"])
+
+    def test_stats_count_uses_per_template_in_this_process(self):
+        for _ in range(3):
+            self.registry.get(CREATE_NODE, "Product")
+        self.registry.get(SUBGRAPH, 2)
+
+        self.assertEqual(self.registry.stats(), [
+            {"operation": CREATE_NODE, "key": "Product", "uses": 3, "repeat_uses": 2},
+            {"operation": SUBGRAPH, "key": 2, "uses": 1, "repeat_uses": 0},
+        ])
+
+
+class TestServiceUsesTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.service = Neo4jEMCService("bolt://localhost:7687", "neo4j", "password")
+        self.service._execute_write_query = AsyncMock(return_value=[{"id": "x", "created_or_matched": True}])
+        self.service._execute_read_query = AsyncMock(return_value=[])
+
+    def test_nodes_of_one_type_share_a_query_string(self):
+        async def run():
+            await self.service.create_emc_node(EMCNode(id="p1", label="A", node_type="Product", properties={}))
+            await self.service.create_emc_node(EMCNode(id="p2", label="B", node_type="Product", properties={}))
+
+        asyncio.run(run())
+
+        first, second = (call.args[0] for call in self.service._execute_write_query.await_args_list)
+        self.assertIs(first, second)
+        self.assertEqual(self.service.templates.stats()[0]["repeat_uses"], 1)
+
+    def test_unknown_relationship_type_is_rejected_before_querying(self):
+        relationship = EMCRelationship(source_id="a", target_id="b", relationship_type="X]->() DETACH DELETE a //", properties={})
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.service.create_relationship(relationship))
+        self.service._execute_write_query.assert_not_awaited()
+
+    def test_graph_data_and_subgraph_pass_limits_as_parameters(self):
+        async def run():
+            await self.service.get_graph_data(node_types=["Product"], limit=10)
+            return await self.service.export_subgraph("p1", depth=2, limit=50)
+
+        subgraph = asyncio.run(run())
+
+        (data_query, data_params), (sub_query, sub_params) = (
+            call.args for call in self.service._execute_read_query.await_args_list
+        )
+        self.assertIn("MATCH (n:Product)-[r]-(m)", data_query)
+        self.assertEqual(data_params, {"relationship_types": None, "limit": 10})
+        self.assertEqual(sub_params, {"center_id": "p1", "limit": 50})
+        self.assertEqual(subgraph, {"nodes": [], "relationships": []})
+
+    def test_graph_data_runs_one_label_scan_per_node_type_within_the_limit(self):
+        self.service._execute_read_query = AsyncMock(side_effect=[[{"source_id": "p1"}, {"source_id": "p2"}], [{"source_id": "e1"}]])
+
+        records = asyncio.run(self.service.get_graph_data(node_types=["Product", "Equipment", "Product"], limit=3))
+
+        self.assertEqual([record["source_id"] for record in records], ["p1", "p2", "e1"])
+        (product_query, product_params), (equipment_query, equipment_params) = (
+            call.args for call in self.service._execute_read_query.await_args_list
+        )
+        self.assertIn("MATCH (n:Product)", product_query)
+        self.assertIn("MATCH (n:Equipment)", equipment_query)
+        self.assertEqual((product_params["limit"], equipment_params["limit"]), (3, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ Unit tests for EMCRelationBuilder, focusing on rule-based relationship identific
 import unittest
 import asyncio
 
+from services.knowledge_graph.cooccurrence import WINDOW_SENTENCE, WINDOW_PARAGRAPH
 from services.knowledge_graph.relation_builder import EMCRelationBuilder
 from services.knowledge_graph.emc_ontology import (
     NODE_PRODUCT, NODE_EMC_STANDARD, NODE_DOCUMENT, NODE_TEST, NODE_FREQUENCY, NODE_FREQUENCY_RANGE,
@@ -35,7 +36,7 @@ class TestEMCRelationBuilderRuleBased(unittest.TestCase):
             self.builder.build_relationships(entities, self.sample_text_context, "doc001", use_ai=False, use_rules=True)
         )
 
-        # Current rule creates both from co-occurrence
+        # Both are created from co-occurrence in the first sentence
         self.assertEqual(len(relationships), 2)
 
         has_std_rels = [r for r in relationships if r['type'] == REL_HAS_STANDARD]
@@ -91,50 +92,117 @@ class TestEMCRelationBuilderRuleBased(unittest.TestCase):
         self.assertEqual(has_frange_rels[0]['to_entity_id'], self.frange1['id_in_document'])
 
     def test_no_relationships_for_unrelated_entities(self):
-        # std2 is not mentioned in relation to prod1 in the simple rules
-        entities = [self.prod1, self.std2, self.freq1] # freq1 is not related to prod1 or std2 by current rules
+        # prod1 and std2 are mentioned in different sentences, freq1 has no Test to attach to
+        entities = [self.prod1, self.std2, self.freq1]
         relationships = asyncio.run(
             self.builder.build_relationships(entities, "Product DeviceAlpha. Standard IEC 61000-3-2. Freq 100MHz", "doc001", use_ai=False, use_rules=True)
         )
-        # Current simple rules: prod1<->std2 (2 rels). No direct link for freq1 to these.
-        self.assertEqual(len(relationships), 2)
-        has_std_rel = any(r['type'] == REL_HAS_STANDARD and r['from_entity_id'] == self.prod1['id_in_document'] and r['to_entity_id'] == self.std2['id_in_document'] for r in relationships)
-        applies_to_rel = any(r['type'] == REL_APPLIES_TO and r['from_entity_id'] == self.std2['id_in_document'] and r['to_entity_id'] == self.prod1['id_in_document'] for r in relationships)
-        self.assertTrue(has_std_rel)
-        self.assertTrue(applies_to_rel)
+        self.assertEqual(relationships, [])
 
 
     def test_all_entity_types_present(self):
         # This test ensures that when all types of entities are present,
-        # the expected pairwise relationships are formed by the current simple rules.
+        # only entities co-occurring in a sentence are linked, while the Document
+        # is linked to every Standard and Product.
         all_entities = [self.doc1, self.prod1, self.std1, self.std2, self.test1, self.freq1, self.frange1]
         relationships = asyncio.run(
             self.builder.build_relationships(all_entities, self.sample_text_context, "doc001", use_ai=False, use_rules=True)
         )
 
-        # Expected relationships based on simple co-occurrence rules:
-        # Prod1 <-> Std1 (2 rels: HAS_STANDARD, APPLIES_TO)
-        # Prod1 <-> Std2 (2 rels)
+        # Expected relationships:
+        # Prod1 <-> Std1 (2 rels: HAS_STANDARD, APPLIES_TO), same sentence
+        # Prod1 <-> Std2: none, Std2 is not mentioned in the text
         # Doc1 -> Prod1 (1 rel: MENTIONS_PRODUCT)
         # Doc1 -> Std1 (1 rel: REFERENCES_STANDARD)
         # Doc1 -> Std2 (1 rel: REFERENCES_STANDARD)
         # Test1 -> Freq1 (1 rel: USES_FREQUENCY)
         # Test1 -> Frange1 (1 rel: HAS_FREQUENCY_RANGE)
-        # Total = 2 + 2 + 1 + 1 + 1 + 1 + 1 = 9
+        # Total = 2 + 1 + 1 + 1 + 1 + 1 = 7
 
         # Count them by type to be more specific
         rel_counts = {}
         for r in relationships:
             rel_counts[r['type']] = rel_counts.get(r['type'], 0) + 1
 
-        self.assertEqual(rel_counts.get(REL_HAS_STANDARD, 0), 2) # prod1-std1, prod1-std2
-        self.assertEqual(rel_counts.get(REL_APPLIES_TO, 0), 2)   # std1-prod1, std2-prod1
+        self.assertEqual(rel_counts.get(REL_HAS_STANDARD, 0), 1) # prod1-std1
+        self.assertEqual(rel_counts.get(REL_APPLIES_TO, 0), 1)   # std1-prod1
         self.assertEqual(rel_counts.get(REL_MENTIONS_PRODUCT, 0), 1) # doc1-prod1
         self.assertEqual(rel_counts.get(REL_REFERENCES_STANDARD, 0), 2) # doc1-std1, doc1-std2
         self.assertEqual(rel_counts.get(REL_USES_FREQUENCY, 0), 1) # test1-freq1
         self.assertEqual(rel_counts.get(REL_HAS_FREQUENCY_RANGE, 0), 1) # test1-frange1
 
-        self.assertEqual(len(relationships), 9)
+        self.assertEqual(len(relationships), 7)
+
+
+class TestEMCRelationBuilderCooccurrence(unittest.TestCase):
+
+    def setUp(self):
+        self.prod1 = {"label": NODE_PRODUCT, "data": ProductNode(name="DeviceAlpha").__dict__, "id_in_document": "prod_entity_1"}
+        self.std1 = {"label": NODE_EMC_STANDARD, "data": EMCStandardNode(name="EN 55032").__dict__, "id_in_document": "std_entity_1"}
+        self.std2 = {"label": NODE_EMC_STANDARD, "data": EMCStandardNode(name="IEC 61000-3-2").__dict__, "id_in_document": "std_entity_2"}
+
+    def _build(self, builder, entities, text):
+        return builder.build_relationships_rule_based(entities, text, "doc001")
+
+    def test_spans_take_precedence_over_name_lookup(self):
+        text = "DeviceAlpha meets EN 55032. DeviceAlpha"
+        # Only the second mention of DeviceAlpha is given, in a different sentence than EN 55032
+        prod = {**self.prod1, "spans": [(28, 39)]}
+        self.assertEqual(self._build(EMCRelationBuilder(), [prod, self.std1], text), [])
+        self.assertEqual(len(self._build(EMCRelationBuilder(), [self.prod1, self.std1], text)), 2)
+
+    def test_paragraph_window_links_across_sentences(self):
+        text = "DeviceAlpha was tested. It meets EN 55032.\n\nIEC 61000-3-2 is not applicable."
+        entities = [self.prod1, self.std1, self.std2]
+
+        sentence_rels = self._build(EMCRelationBuilder(window=WINDOW_SENTENCE), entities, text)
+        self.assertEqual(sentence_rels, [])
+
+        paragraph_rels = self._build(EMCRelationBuilder(window=WINDOW_PARAGRAPH), entities, text)
+        self.assertEqual(
+            {(r["type"], r["from_entity_id"], r["to_entity_id"]) for r in paragraph_rels},
+            {(REL_HAS_STANDARD, "prod_entity_1", "std_entity_1"), (REL_APPLIES_TO, "std_entity_1", "prod_entity_1")}
+        )
+        self.assertEqual(paragraph_rels[0]["data"]["properties"]["method"], "co-occurrence_in_paragraph")
+
+    def test_table_rows_are_separate_windows(self):
+        text = "Product | Standard\nDeviceAlpha | EN 55032\nDeviceBeta | IEC 61000-3-2"
+        rels = self._build(EMCRelationBuilder(window=WINDOW_PARAGRAPH), [self.prod1, self.std1, self.std2], text)
+        self.assertEqual(
+            {(r["from_entity_id"], r["to_entity_id"]) for r in rels if r["type"] == REL_HAS_STANDARD},
+            {("prod_entity_1", "std_entity_1")}
+        )
+
+    def test_confidence_decreases_with_distance(self):
+        builder = EMCRelationBuilder(max_distance=100, distance_decay=0.5)
+        near = self._build(builder, [self.prod1, self.std1], "DeviceAlpha EN 55032.")
+        far = self._build(builder, [self.prod1, self.std1], "DeviceAlpha " + "x" * 50 + " EN 55032.")
+        too_far = self._build(builder, [self.prod1, self.std1], "DeviceAlpha " + "x" * 150 + " EN 55032.")
+
+        near_score = near[0]["data"]["confidence_score"]
+        far_score = far[0]["data"]["confidence_score"]
+        self.assertAlmostEqual(near_score, 0.5 * (1 - 0.5 * 0.01), delta=0.001)
+        self.assertLess(far_score, near_score)
+        self.assertEqual(far[0]["data"]["properties"]["distance_chars"], 52)
+        self.assertEqual(too_far, [])
+
+    def test_closest_cooccurrence_is_kept(self):
+        text = "DeviceAlpha, then some words, EN 55032. DeviceAlpha EN 55032."
+        rels = self._build(EMCRelationBuilder(), [self.prod1, self.std1], text)
+        has_std = next(r for r in rels if r["type"] == REL_HAS_STANDARD)
+        self.assertEqual(has_std["data"]["properties"]["distance_chars"], 1)
+        self.assertEqual(has_std["data"]["properties"]["cooccurrence_count"], 2)
+
+    def test_precomputed_window_cuts_without_text(self):
+        prod = {**self.prod1, "spans": [(0, 11), (100, 111)]}
+        std = {**self.std1, "spans": [(20, 28)]}
+        builder = EMCRelationBuilder()
+        self.assertEqual(len(builder.build_relationships_rule_based([prod, std], "", "doc001", window_cuts=[])), 2)
+        self.assertEqual(builder.build_relationships_rule_based([prod, std], "", "doc001", window_cuts=[15, 50]), [])
+
+    def test_unknown_window_rejected(self):
+        with self.assertRaises(ValueError):
+            EMCRelationBuilder(window="page")
 
 
 if __name__ == '__main__':
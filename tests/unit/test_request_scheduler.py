@@ -0,0 +1,236 @@
+"""
+Unit tests for the DeepSeek request scheduler (AIMD window, retries, priority lanes).
+The HTTP tests run against a local mock server.
+"""
+
+import asyncio
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from services.ai_integration.request_scheduler import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestScheduler
+)
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:
+    AsyncOpenAI = None
+
+
+class StatusError(Exception):
+    """Shaped like openai.APIStatusError: status_code plus response.headers."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class MockDeepSeekHandler(BaseHTTPRequestHandler):
+    """Answers the first `throttled` requests with 429 + Retry-After, then with a chat completion."""
+
+    throttled = 2
+    requests = 0
+
+    def do_POST(self):
+        cls = type(self)
+        cls.requests += 1
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if cls.requests <= cls.throttled:
+            body = json.dumps({"error": {"message": "rate limited", "type": "rate_limit"}}).encode()
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            body = json.dumps({
+                "id": "resp-1", "object": "chat.completion", "created": 0, "model": "deepseek-chat",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "EN 55032"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+            }).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def test_retry_after_is_honoured(self):
+        scheduler = RequestScheduler(max_retries=3)
+        attempts = []
+
+        async def call():
+            attempts.append(len(attempts))
+            if len(attempts) < 3:
+                raise StatusError(429, {"retry-after": "2"})
+            return "ok"
+
+        delays = []
+
+        async def fake_sleep(delay):
+            delays.append(delay)
+
+        with patch("services.ai_integration.request_scheduler.asyncio.sleep", fake_sleep):
+            result = asyncio.run(scheduler.run(call))
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(delays, [2.0, 2.0])
+        stats = scheduler.get_stats()
+        self.assertEqual((stats["retries"], stats["throttled"], stats["succeeded"]), (2, 2, 1))
+
+    def test_backoff_is_exponential_with_jitter(self):
+        scheduler = RequestScheduler(base_delay=1.0, max_delay=3.0)
+        delays = [scheduler._retry_delay(StatusError(503), attempt) for attempt in range(4)]
+
+        for delay, cap in zip(delays, [1.0, 2.0, 3.0, 3.0]):
+            self.assertGreaterEqual(delay, cap / 2)
+            self.assertLessEqual(delay, cap)
+
+    def test_non_retryable_errors_and_exhausted_retries_raise(self):
+        scheduler = RequestScheduler(max_retries=2, base_delay=0)
+        calls = {"bad_request": 0, "server_error": 0}
+
+        async def bad_request():
+            calls["bad_request"] += 1
+            raise StatusError(400)
+
+        async def server_error():
+            calls["server_error"] += 1
+            raise StatusError(500)
+
+        with self.assertRaises(StatusError):
+            asyncio.run(scheduler.run(bad_request))
+        with self.assertRaises(StatusError):
+            asyncio.run(scheduler.run(server_error))
+        self.assertEqual(calls, {"bad_request": 1, "server_error": 3})
+        self.assertEqual(scheduler.get_stats()["active"], 0)
+
+    def test_window_shrinks_once_per_burst_and_grows_on_success(self):
+        scheduler = RequestScheduler(max_concurrency=8, initial_concurrency=8, max_retries=0)
+
+        async def run():
+            gate = asyncio.Event()
+
+            async def throttled():
+                await gate.wait()
+                raise StatusError(429)
+
+            tasks = [asyncio.ensure_future(scheduler.run(throttled)) for _ in range(8)]
+            await asyncio.sleep(0)
+            gate.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            shrunk = scheduler.limit
+
+            async def ok():
+                return None
+
+            for _ in range(20):
+                await scheduler.run(ok)
+            return shrunk
+
+        shrunk = asyncio.run(run())
+
+        self.assertEqual(shrunk, 4)  # eight simultaneous 429s halve the window once
+        self.assertGreater(scheduler.limit, 4)
+        self.assertLessEqual(scheduler.limit, 8)
+
+    def test_interactive_requests_jump_ahead_of_background(self):
+        scheduler = RequestScheduler(max_concurrency=1, initial_concurrency=1)
+        order = []
+
+        async def run():
+            gate = asyncio.Event()
+
+            async def job(name, wait=False):
+                if wait:
+                    await gate.wait()
+                order.append(name)
+
+            first = asyncio.ensure_future(scheduler.run(lambda: job("running", wait=True)))
+            await asyncio.sleep(0)
+            queued = [asyncio.ensure_future(scheduler.run(lambda i=i: job(f"background-{i}"), PRIORITY_BACKGROUND))
+                      for i in range(3)]
+            await asyncio.sleep(0)
+            chat = asyncio.ensure_future(scheduler.run(lambda: job("chat"), PRIORITY_INTERACTIVE))
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.get_stats()["waiting"], 4)
+            gate.set()
+            await asyncio.gather(first, chat, *queued)
+
+        asyncio.run(run())
+
+        self.assertEqual(order, ["running", "chat", "background-0", "background-1", "background-2"])
+
+    def test_cancelled_waiter_does_not_leak_a_slot(self):
+        scheduler = RequestScheduler(max_concurrency=1, initial_concurrency=1)
+
+        async def run():
+            gate = asyncio.Event()
+            holder = asyncio.ensure_future(scheduler.run(gate.wait))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(scheduler.run(gate.wait))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            gate.set()
+            await holder
+            await asyncio.gather(waiter, return_exceptions=True)
+            return await asyncio.wait_for(scheduler.run(gate.wait), timeout=1)
+
+        asyncio.run(run())
+        self.assertEqual(scheduler.get_stats()["active"], 0)
+
+
+class TestRequestSchedulerAgainstMockServer(unittest.TestCase):
+
+    def setUp(self):
+        MockDeepSeekHandler.requests = 0
+        self.server = HTTPServer(("127.0.0.1", 0), MockDeepSeekHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_http_429_is_retried_until_success(self):
+        scheduler = RequestScheduler(max_retries=3)
+
+        def post():
+            request = urllib.request.Request(f"{self.base_url}/chat/completions", data=b"{}", method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    return json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                raise StatusError(e.code, {k.lower(): v for k, v in e.headers.items()}) from None
+
+        result = asyncio.run(scheduler.run(lambda: asyncio.get_running_loop().run_in_executor(None, post)))
+
+        self.assertEqual(result["choices"][0]["message"]["content"], "EN 55032")
+        self.assertEqual(MockDeepSeekHandler.requests, 3)
+        self.assertEqual(scheduler.get_stats()["throttled"], 2)
+
+    @unittest.skipIf(AsyncOpenAI is None, "openai is not installed")
+    def test_openai_client_rate_limit_is_retried(self):
+        client = AsyncOpenAI(api_key="test-key", base_url=self.base_url, max_retries=0)
+        scheduler = RequestScheduler(max_retries=3)
+
+        response = asyncio.run(scheduler.run(lambda: client.chat.completions.create(
+            model="deepseek-chat", messages=[{"role": "user", "content": "EN 55032?"}]
+        )))
+
+        self.assertEqual(response.choices[0].message.content, "EN 55032")
+        self.assertEqual(MockDeepSeekHandler.requests, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Unit tests for the persistent DeepSeek response cache.
+"""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.ai_integration.response_cache import ResponseCache
+
+
+def make_params(content="EN 55032?", temperature=0.1, **overrides):
+    params = {
+        "model": "deepseek-chat",
+        "messages": [{"role": "user", "content": content}],
+        "max_tokens": 4000,
+        "temperature": temperature,
+        "top_p": 0.9,
+        "stream": False,
+    }
+    params.update(overrides)
+    return params
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.temp_dir.name) / "cache.sqlite3")
+        self.cache = ResponseCache(self.db_path)
+        self.calls = 0
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def fetcher(self, content="ok", tokens=100, delay=0.0):
+        async def fetch():
+            self.calls += 1
+            await asyncio.sleep(delay)
+            return {"content": content, "usage": {"total_tokens": tokens}}
+        return fetch
+
+    def test_repeated_request_is_served_from_cache(self):
+        async def run():
+            first = await self.cache.get_or_fetch(make_params(), self.fetcher())
+            second = await self.cache.get_or_fetch(make_params(), self.fetcher())
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        self.assertEqual(self.calls, 1)
+        self.assertNotIn("cached", first)
+        self.assertEqual(second, {"content": "ok", "usage": {"total_tokens": 100}, "cached": True})
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["saved_tokens"]), (1, 1, 100))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_key_covers_sampling_parameters(self):
+        self.assertNotEqual(ResponseCache.make_key(make_params()), ResponseCache.make_key(make_params(top_p=0.5)))
+        self.assertNotEqual(ResponseCache.make_key(make_params()), ResponseCache.make_key(make_params(max_tokens=10)))
+        self.assertEqual(ResponseCache.make_key(make_params()), ResponseCache.make_key(make_params(stream=True)))
+
+    def test_non_deterministic_requests_bypass_cache(self):
+        async def run():
+            for _ in range(2):
+                await self.cache.get_or_fetch(make_params(temperature=0.7), self.fetcher())
+                await self.cache.get_or_fetch(make_params(stream=True), self.fetcher())
+
+        asyncio.run(run())
+
+        self.assertEqual(self.calls, 4)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["bypassed"], stats["requests"], stats["entries"]), (4, 0, 0))
+
+    def test_concurrent_duplicates_share_one_upstream_call(self):
+        async def run():
+            return await asyncio.gather(*(
+                self.cache.get_or_fetch(make_params(), self.fetcher(delay=0.01)) for _ in range(5)
+            ))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({r["content"] for r in results}, {"ok"})
+        self.assertEqual(self.cache.get_stats()["coalesced"], 4)
+
+    def test_upstream_failure_reaches_waiters_and_is_not_cached(self):
+        async def failing():
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def run():
+            return await asyncio.gather(
+                *(self.cache.get_or_fetch(make_params(), failing) for _ in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(self.cache.get_stats()["entries"], 0)
+
+    def test_cancelled_leader_hands_the_request_to_a_waiter(self):
+        async def run():
+            leader = asyncio.create_task(self.cache.get_or_fetch(make_params(), self.fetcher(delay=1.0)))
+            await asyncio.sleep(0.01)
+            waiter = asyncio.create_task(self.cache.get_or_fetch(make_params(), self.fetcher(content="retried")))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+        leader_result, waiter_result = asyncio.run(run())
+
+        self.assertIsInstance(leader_result, asyncio.CancelledError)
+        self.assertEqual(waiter_result, {"content": "retried", "usage": {"total_tokens": 100}})
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.cache.get_stats()["entries"], 1)
+
+    def test_entries_persist_and_evict_least_recently_used(self):
+        self.cache.max_bytes = 200
+        self.cache.put("a", {"content": "a" * 60})
+        self.cache.put("b", {"content": "b" * 60})
+        self.cache.get("a")
+        self.cache.put("c", {"content": "c" * 60})  # over budget: "b" is least recently used
+
+        reopened = ResponseCache(self.db_path, max_bytes=200)
+        try:
+            self.assertIsNone(reopened.get("b"))
+            self.assertEqual(reopened.get("a"), {"content": "a" * 60})
+            self.assertEqual(reopened.get_stats()["entries"], 2)
+            self.assertLessEqual(reopened.get_stats()["size_bytes"], 200)
+        finally:
+            reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Unit tests for ontology-driven schema provisioning and the index advisor.
+"""
+
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from neo4j.exceptions import Neo4jError
+
+from services.knowledge_graph.emc_ontology import ENTITY_LABEL, ONTOLOGY_DEFINITIONS
+from services.knowledge_graph.schema_provisioner import (
+    advise_indexes, backfill_entity_label, build_schema_plan, count_unlabelled_entities, extract_lookups, indexes_from_plan, indexes_from_rows,
+    load_query_templates, provision_schema
+)
+
+
+class FakeService:
+    """Records statements passed to _execute_query; SHOW commands return the given names."""
+
+    def __init__(self, existing=(), failing=()):
+        self.existing = existing
+        self.failing = failing
+        self.statements = []
+
+    async def _execute_query(self, query_str, parameters=None):
+        if query_str.startswith("SHOW"):
+            return [{"name": name} for name in self.existing]
+        self.statements.append(query_str)
+        if any(name in query_str for name in self.failing):
+            raise Neo4jError("duplicate values")
+        return []
+
+
+class FakeGraph:
+    """Answers the backfill migration's queries from a fixed duplicate list and unlabelled-node counts."""
+
+    def __init__(self, duplicates=(), pending=(120, 0)):
+        self.duplicates = list(duplicates)
+        self.pending = list(pending)
+        self.statements = []
+
+    async def _execute_query(self, query_str, parameters=None):
+        self.statements.append(query_str)
+        if "nodes > 1" in query_str:
+            return self.duplicates
+        if "count(n) AS count" in query_str:
+            return [{"count": self.pending.pop(0)}]
+        return []
+
+
+class TestSchemaPlan(unittest.TestCase):
+
+    def test_plan_covers_every_ontology_label_and_merge_key(self):
+        plan = build_schema_plan()
+        unique = {(item.labels[0], item.properties[0]) for item in plan if item.kind == "unique"}
+
+        for label in ONTOLOGY_DEFINITIONS["node_labels"]:
+            self.assertIn((label, "id"), unique)
+        self.assertIn(("Document", "file_id"), unique)
+        # API-created nodes and documents may share a name: merge lookups get a range index instead
+        range_keys = {(item.labels[0], item.properties[0]) for item in plan if item.kind == "range"}
+        for label in ONTOLOGY_DEFINITIONS["node_labels"]:
+            self.assertNotIn((label, "name"), unique)
+            self.assertIn((label, "name"), range_keys)
+        self.assertEqual(len({item.name for item in plan}), len(plan))
+
+    def test_plan_starts_with_entity_id_constraint(self):
+        first = build_schema_plan()[0]
+
+        self.assertEqual(first.cypher, "CREATE CONSTRAINT entity_id_unique IF NOT EXISTS FOR (n:Entity) REQUIRE n.id IS UNIQUE")
+        self.assertNotIn(ENTITY_LABEL, ONTOLOGY_DEFINITIONS["node_labels"])
+
+    def test_plan_indexes_filter_properties(self):
+        cyphers = {item.cypher for item in build_schema_plan()}
+
+        self.assertIn("CREATE RANGE INDEX product_model_number_range IF NOT EXISTS FOR (n:Product) ON (n.model_number)", cyphers)
+        self.assertIn("CREATE RANGE INDEX frequency_value_hz_range IF NOT EXISTS FOR (n:Frequency) ON (n.value_hz)", cyphers)
+        self.assertIn("CREATE TEXT INDEX emc_standard_name_text IF NOT EXISTS FOR (n:EMCStandard) ON (n.name)", cyphers)
+        self.assertTrue(any(c.startswith("CREATE FULLTEXT INDEX emc_entity_fulltext") for c in cyphers))
+
+
+class TestProvisionSchema(unittest.TestCase):
+
+    def test_skips_existing_and_falls_back_to_range_index(self):
+        plan = [item for item in build_schema_plan() if item.labels == ("Document",)]
+        service = FakeService(existing=["document_id_unique"], failing=["document_file_id_unique"])
+
+        report = asyncio.run(provision_schema(service, plan))
+
+        self.assertEqual(report["existing"], ["document_id_unique"])
+        self.assertEqual(report["fallbacks"], ["document_file_id_range"])
+        self.assertEqual(report["failed"], [])
+        self.assertIn(
+            "CREATE RANGE INDEX document_file_id_range IF NOT EXISTS FOR (n:Document) ON (n.file_id)", service.statements
+        )
+        self.assertFalse(any("document_id_unique" in statement for statement in service.statements))
+
+
+class TestEntityBackfill(unittest.TestCase):
+
+    def test_backfill_runs_in_batched_transactions(self):
+        graph = FakeGraph()
+
+        report = asyncio.run(backfill_entity_label(graph, batch_size=500))
+
+        self.assertEqual(report, {"labelled": 120, "remaining": 0, "duplicates": []})
+        backfill = next(statement for statement in graph.statements if "IN TRANSACTIONS" in statement)
+        self.assertIn("IN TRANSACTIONS OF 500 ROWS", backfill)
+        self.assertIn("SET n:Entity, n.id = coalesce(n.id, randomUUID())", backfill)
+
+    def test_backfill_aborts_on_duplicate_ids(self):
+        duplicates = [{"id": "n1", "nodes": 2, "labels": [["Product"], ["Test"]]}]
+        graph = FakeGraph(duplicates=duplicates)
+
+        report = asyncio.run(backfill_entity_label(graph))
+
+        self.assertEqual(report["duplicates"], duplicates)
+        self.assertEqual(report["labelled"], 0)
+        self.assertEqual(len(graph.statements), 1)
+
+    def test_counts_unlabelled_nodes_without_writing(self):
+        graph = FakeGraph(pending=(7,))
+
+        self.assertEqual(asyncio.run(count_unlabelled_entities(graph)), 7)
+        self.assertEqual(graph.statements, ["MATCH (n) WHERE NOT n:Entity RETURN count(n) AS count"])
+
+
+class TestIndexAdvisor(unittest.TestCase):
+
+    def test_extract_lookups(self):
+        query = """
+        MATCH (p:Product {name: $name})-[:HAS_STANDARD]->(s:EMCStandard)
+        WHERE s.category = $category AND toLower(s.name) CONTAINS $q AND p.model_number STARTS WITH $prefix
+        MERGE (d:Document {file_id: $file_id})
+        ON CREATE SET d.created_at = datetime()
+        RETURN p, s
+        """
+        self.assertEqual(sorted(extract_lookups(query)), sorted([
+            ("Product", "name", "="),
+            ("Document", "file_id", "="),
+            ("EMCStandard", "category", "="),
+            ("Product", "model_number", "STARTS WITH"),
+        ]))
+
+    def test_ignores_non_node_variables_and_schema_commands(self):
+        self.assertEqual(extract_lookups("UNWIND $rows AS row MATCH (a)-[r]->(b) WHERE r.weight > 1 AND row.x = 1 RETURN a"), [])
+        self.assertEqual(extract_lookups("CREATE TEXT INDEX x IF NOT EXISTS FOR (n:Product) ON (n.name)"), [])
+
+    def test_reports_unindexed_lookups(self):
+        templates = [
+            "MATCH (n:Product) WHERE n.name = $name RETURN n",
+            "MATCH (n:Product) WHERE n.description CONTAINS $q RETURN n",
+            "MATCH (n:Product) WHERE n.description CONTAINS $other RETURN n.id",
+            "MATCH (n {id: $id}) RETURN n",
+            "MATCH (n:Entity {id: $id}) RETURN n",
+            "MATCH (n:Test) WHERE n.test_procedure_id = $pid RETURN n",
+        ]
+        advice = advise_indexes(templates, indexes_from_plan(build_schema_plan()))
+        summary = [(a.label, a.property, a.suggested, a.occurrences) for a in advice]
+
+        self.assertEqual(summary[0], ("Product", "description", "text", 2))
+        self.assertIn((None, "id", None, 1), summary)
+        self.assertIn(("Test", "test_procedure_id", "range", 1), summary)
+        self.assertNotIn(("Product", "name", "range", 1), summary)
+        self.assertNotIn(("Entity", "id", "range", 1), summary)
+
+    def test_indexes_from_show_indexes_rows(self):
+        rows = [
+            {"type": "RANGE", "entityType": "NODE", "labelsOrTypes": ["Product"], "properties": ["name"]},
+            {"type": "TEXT", "entityType": "NODE", "labelsOrTypes": ["Product"], "properties": ["description"]},
+            {"type": "RANGE", "entityType": "RELATIONSHIP", "labelsOrTypes": ["APPLIES_TO"], "properties": ["x"]},
+            {"type": "LOOKUP", "entityType": "NODE", "labelsOrTypes": None, "properties": None},
+        ]
+        self.assertEqual(indexes_from_rows(rows), {("Product", "name", "range"), ("Product", "description", "text")})
+
+    def test_load_query_templates_reads_plain_and_json_lines(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "query.log"
+            path.write_text("MATCH (n:Product) RETURN n\n\n" + json.dumps({"query": "MATCH (m:Test) RETURN m"}) + "\n")
+            self.assertEqual(load_query_templates(path), ["MATCH (n:Product) RETURN n", "MATCH (m:Test) RETURN m"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+Unit tests for the DeepSeek conversation session stores.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from services.ai_integration.session_store import (
+    ConversationStore, InMemorySessionStore, RedisSessionStore, create_session_store
+)
+from services.ai_integration.token_utils import estimate_message_tokens
+
+
+class FakeRedis:
+    """Minimal async stand-in for redis.asyncio.Redis (get/set/delete)."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return value.encode("utf-8") if value is not None else None
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expiry[key] = ex
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+def turn(user, assistant):
+    return [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+
+
+class TestInMemorySessionStore(unittest.TestCase):
+
+    def test_history_round_trip_skips_system_messages(self):
+        store = InMemorySessionStore()
+
+        async def run():
+            await store.append("s1", [{"role": "system", "content": "你是EMC专家"}] + turn("CISPR 32?", "多媒体设备发射标准"))
+            return await store.get_history("s1"), await store.get_prompt_messages("s1")
+
+        history, prompt = asyncio.run(run())
+        self.assertEqual([m["role"] for m in history], ["user", "assistant"])
+        self.assertIn("timestamp", history[0])
+        self.assertEqual(prompt, turn("CISPR 32?", "多媒体设备发射标准"))
+
+    def test_trims_oldest_messages_to_token_budget(self):
+        long_document = "EN 55032 " * 400
+        budget = estimate_message_tokens({"content": "q2"}) + estimate_message_tokens({"content": "a2"})
+        store = InMemorySessionStore(max_history_tokens=budget)
+
+        async def run():
+            await store.append("s1", turn(long_document, "a1"))
+            await store.append("s1", turn("q2", "a2"))
+            return await store.get_prompt_messages("s1")
+
+        self.assertEqual(asyncio.run(run()), turn("q2", "a2"))
+
+    def test_dropped_messages_are_folded_into_summary(self):
+        store = InMemorySessionStore(max_history_tokens=20)
+        calls = []
+
+        async def summarizer(previous, dropped):
+            calls.append((previous, [m["content"] for m in dropped]))
+            return f"{previous or ''}|" + ",".join(m["content"] for m in dropped)
+
+        async def run():
+            await store.append("s1", turn("q1", "a1"), summarizer=summarizer)
+            await store.append("s1", turn("q2 " * 20, "a2"), summarizer=summarizer)
+            return await store.get_prompt_messages("s1")
+
+        prompt = asyncio.run(run())
+        self.assertEqual(calls, [(None, ["q1", "a1", "q2 " * 20])])
+        self.assertEqual(prompt[0]["role"], "system")
+        self.assertIn("|q1,a1", prompt[0]["content"])
+        self.assertEqual(prompt[1:], [{"role": "assistant", "content": "a2"}])
+
+    def test_summarizer_failure_keeps_trimmed_history(self):
+        store = InMemorySessionStore(max_history_tokens=10)
+
+        async def failing(previous, dropped):
+            raise RuntimeError("upstream down")
+
+        async def run():
+            await store.append("s1", turn("q1 " * 20, "a1"), summarizer=failing)
+            return await store.get_prompt_messages("s1")
+
+        self.assertEqual(asyncio.run(run()), [{"role": "assistant", "content": "a1"}])
+
+    def test_lru_eviction_across_sessions(self):
+        store = InMemorySessionStore(max_sessions=2)
+
+        async def run():
+            await store.append("s1", turn("q", "a"))
+            await store.append("s2", turn("q", "a"))
+            await store.get_history("s1")  # s1 is now most recently used
+            await store.append("s3", turn("q", "a"))
+            return [bool(await store.get_history(s)) for s in ("s1", "s2", "s3")]
+
+        self.assertEqual(asyncio.run(run()), [True, False, True])
+
+    def test_idle_sessions_expire(self):
+        store = InMemorySessionStore(ttl_seconds=60)
+
+        async def run():
+            with patch("services.ai_integration.session_store.time.time", return_value=1000.0):
+                await store.append("s1", turn("q", "a"))
+            with patch("services.ai_integration.session_store.time.time", return_value=1061.0):
+                return await store.get_history("s1")
+
+        self.assertEqual(asyncio.run(run()), [])
+
+    def test_clear(self):
+        store = InMemorySessionStore()
+
+        async def run():
+            await store.append("s1", turn("q", "a"))
+            await store.clear("s1")
+            return await store.get_history("s1")
+
+        self.assertEqual(asyncio.run(run()), [])
+
+
+class TestRedisSessionStore(unittest.TestCase):
+
+    def test_sessions_are_shared_through_redis(self):
+        redis = FakeRedis()
+        worker_a = RedisSessionStore(redis, ttl_seconds=120)
+        worker_b = RedisSessionStore(redis, ttl_seconds=120)
+
+        async def run():
+            await worker_a.append("s1", turn("q1", "a1"))
+            await worker_b.append("s1", turn("q2", "a2"))
+            return await worker_a.get_prompt_messages("s1")
+
+        self.assertEqual(asyncio.run(run()), turn("q1", "a1") + turn("q2", "a2"))
+        self.assertEqual(redis.expiry["emc:deepseek:session:s1"], 120)
+
+        asyncio.run(worker_b.clear("s1"))
+        self.assertEqual(redis.data, {})
+
+    def test_concurrent_appends_in_one_process_are_serialized(self):
+        class SlowRedis(FakeRedis):
+            async def get(self, key):
+                await asyncio.sleep(0.01)
+                return await super().get(key)
+
+        store = RedisSessionStore(SlowRedis())
+
+        async def run():
+            await asyncio.gather(store.append("s1", turn("q1", "a1")), store.append("s1", turn("q2", "a2")))
+            return await store.get_history("s1")
+
+        self.assertEqual([m["content"] for m in asyncio.run(run())], ["q1", "a1", "q2", "a2"])
+        self.assertEqual(len(store._append_locks), 0)
+
+    def test_conversation_store_is_abstract(self):
+        with self.assertRaises(TypeError):
+            ConversationStore()
+
+    def test_create_session_store_validates_backend(self):
+        self.assertIsInstance(create_session_store("memory", max_sessions=5), InMemorySessionStore)
+        with self.assertRaises(ValueError):
+            create_session_store("redis")
+        with self.assertRaises(ValueError):
+            create_session_store("memcached")
+
+
+if __name__ == '__main__':
+    unittest.main()
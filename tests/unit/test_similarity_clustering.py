@@ -0,0 +1,68 @@
+"""
+Unit tests for the blocked greedy similarity clustering used by EntityDisambiguator.
+"""
+
+import unittest
+
+import numpy as np
+
+from services.knowledge_graph.similarity_clustering import greedy_threshold_clustering, normalize_rows
+
+
+def reference_clustering(vectors, threshold):
+    """Pairwise greedy clustering, as EntityDisambiguator._cluster_entities used to do it."""
+    def similarity(v1, v2):
+        n1, n2 = np.linalg.norm(v1), np.linalg.norm(v2)
+        if n1 == 0 or n2 == 0:
+            return 0.0
+        return max(0.0, np.dot(v1, v2) / (n1 * n2))
+
+    clusters, used = [], set()
+    for i in range(len(vectors)):
+        if i in used:
+            continue
+        members = [i]
+        for j in range(i + 1, len(vectors)):
+            if j not in used and similarity(vectors[i], vectors[j]) >= threshold:
+                members.append(j)
+                used.add(j)
+        used.add(i)
+        clusters.append(members)
+    return clusters
+
+
+class TestGreedyThresholdClustering(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        centers = rng.standard_normal((8, 16))
+        self.vectors = centers[rng.integers(0, 8, size=200)] + 0.4 * rng.standard_normal((200, 16))
+        self.vectors[[3, 50, 51]] = 0.0 # Contexts without any word vectors
+
+    def test_matches_pairwise_assignment(self):
+        for threshold in (0.0, 0.5, 0.7, 0.95):
+            self.assertEqual(
+                greedy_threshold_clustering(self.vectors, threshold),
+                reference_clustering(self.vectors, threshold),
+                f"threshold={threshold}"
+            )
+
+    def test_small_blocks_give_same_result(self):
+        expected = greedy_threshold_clustering(self.vectors, 0.7)
+        for max_block_elements in (1, 200, 3 * 200, 10_000):
+            self.assertEqual(greedy_threshold_clustering(self.vectors, 0.7, max_block_elements), expected)
+
+    def test_accepts_list_of_vectors(self):
+        vectors = [np.array([1.0, 0.0]), np.array([0.9, 0.1]), np.array([0.0, 1.0])]
+        self.assertEqual(greedy_threshold_clustering(vectors, 0.9), [[0, 1], [2]])
+
+    def test_empty_input(self):
+        self.assertEqual(greedy_threshold_clustering([], 0.7), [])
+
+    def test_normalize_rows_keeps_zero_rows(self):
+        normalized = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+        np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Unit tests for token estimation and token-budget text chunking.
+"""
+
+import unittest
+
+from services.ai_integration.token_utils import chunk_text, estimate_tokens
+
+
+class TestChunkText(unittest.TestCase):
+
+    def test_short_text_is_one_chunk(self):
+        chunks = chunk_text("EN 55032 applies.\n\nLimits are in clause 6.", max_tokens=100)
+
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual((chunks[0].start, chunks[0].end), (0, 42))
+
+    def test_chunks_respect_budget_and_cover_text(self):
+        paragraphs = [f"{i} 测试方法\n" + "辐射发射在30MHz至1GHz范围内测量。" * 8 for i in range(1, 6)]
+        text = "\n\n".join(paragraphs)
+
+        chunks = chunk_text(text, max_tokens=120, overlap_tokens=0)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(chunk.text) <= 120 for chunk in chunks))
+        self.assertEqual(chunks[0].start, 0)
+        self.assertEqual(chunks[-1].end, len(text))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(chunk.start, previous.end)  # no gaps, no overlap
+        for chunk in chunks:
+            self.assertEqual(chunk.text, text[chunk.start:chunk.end])
+
+    def test_overlap_repeats_tail_of_previous_chunk(self):
+        text = " ".join(f"Sentence {i} cites CISPR {i}." for i in range(60))
+
+        chunks = chunk_text(text, max_tokens=40, overlap_tokens=15)
+
+        self.assertGreater(len(chunks), 2)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertLess(chunk.start, previous.end)
+            self.assertGreater(chunk.start, previous.start)
+        self.assertEqual(chunks[-1].end, len(text))
+
+    def test_unbroken_text_is_hard_split(self):
+        chunks = chunk_text("x" * 1000, max_tokens=30)
+
+        self.assertEqual([chunk.index for chunk in chunks], list(range(len(chunks))))
+        self.assertEqual("".join(chunk.text for chunk in chunks), "x" * 1000)
+        self.assertTrue(all(estimate_tokens(chunk.text) <= 30 for chunk in chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
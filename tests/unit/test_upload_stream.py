@@ -0,0 +1,98 @@
+"""
+Unit tests for streaming uploads to disk with hash-on-write.
+"""
+
+import asyncio
+import hashlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.file_processing.upload_stream import (
+    FileTooLargeError, save_upload_stream, sniff_mime_type
+)
+
+
+class FakeUpload:
+    """Mimics fastapi.UploadFile.read(size) and records the requested sizes."""
+
+    def __init__(self, data: bytes):
+        self._buffer = io.BytesIO(data)
+        self.read_sizes = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.read_sizes.append(size)
+        return self._buffer.read(size)
+
+
+class TestSaveUploadStream(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.destination = Path(self.temp_dir.name) / "upload.pdf"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_writes_file_and_hashes_in_one_pass(self):
+        data = b"%PDF-1.7\n" + bytes(range(256)) * 10000
+        source = FakeUpload(data)
+
+        upload = asyncio.run(save_upload_stream(source, self.destination, max_bytes=10 * 1024 * 1024,
+                                                filename="report.pdf", chunk_size=64 * 1024))
+
+        self.assertEqual(self.destination.read_bytes(), data)
+        self.assertEqual(upload.size_bytes, len(data))
+        self.assertEqual(upload.checksum, hashlib.sha256(data).hexdigest())
+        self.assertEqual(upload.mime_type, "application/pdf")
+        self.assertIsNone(upload.encoding)
+        self.assertTrue(all(size == 64 * 1024 for size in source.read_sizes))
+
+    def test_oversized_upload_is_rejected_and_removed(self):
+        source = FakeUpload(b"x" * 5000)
+
+        with self.assertRaises(FileTooLargeError):
+            asyncio.run(save_upload_stream(source, self.destination, max_bytes=4096, chunk_size=1024))
+
+        self.assertFalse(self.destination.exists())
+        self.assertEqual(list(Path(self.temp_dir.name).iterdir()), [])
+        self.assertLessEqual(len(source.read_sizes), 5)  # stopped as soon as the limit was crossed
+
+    def test_oversized_reupload_leaves_existing_file_untouched(self):
+        self.destination.write_bytes(b"%PDF-1.7 original")
+
+        with self.assertRaises(FileTooLargeError):
+            asyncio.run(save_upload_stream(FakeUpload(b"x" * 5000), self.destination, max_bytes=4096, chunk_size=1024))
+
+        self.assertEqual(self.destination.read_bytes(), b"%PDF-1.7 original")
+        self.assertEqual(list(Path(self.temp_dir.name).iterdir()), [self.destination])
+
+    def test_text_upload_gets_encoding(self):
+        destination = Path(self.temp_dir.name) / "notes.txt"
+        data = "EN 55032 辐射发射限值 Class B\n".encode("utf-8") * 50
+
+        upload = asyncio.run(save_upload_stream(FakeUpload(data), destination, max_bytes=1024 * 1024))
+
+        self.assertEqual(upload.mime_type, "text/plain")
+        self.assertEqual(upload.encoding.lower(), "utf-8")
+
+
+class TestSniffMimeType(unittest.TestCase):
+
+    def test_magic_number_wins_over_extension(self):
+        self.assertEqual(sniff_mime_type(b"%PDF-1.4", "scan.txt"), "application/pdf")
+        self.assertEqual(sniff_mime_type(b"\x89PNG\r\n\x1a\n", "report.pdf"), "image/png")
+
+    def test_zip_container_uses_office_extension(self):
+        docx = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        self.assertEqual(sniff_mime_type(b"PK\x03\x04rest", "report.docx"), docx)
+        self.assertEqual(sniff_mime_type(b"PK\x03\x04rest", "report.pdf"), "application/zip")
+
+    def test_falls_back_to_extension(self):
+        self.assertEqual(sniff_mime_type(b"a,b\n1,2", "data.csv"), "text/csv")
+        self.assertEqual(sniff_mime_type(b"", "unknown.emcx"), "application/octet-stream")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Unit tests for EntityVectorIndex, the IVF index used by EntityLinker for cross-document linking.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from services.knowledge_graph.vector_index import EntityVectorIndex
+
+
+class TestEntityVectorIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.vectors = rng.standard_normal((3000, 16)).astype(np.float32)
+        self.ids = [f"entity_{i}" for i in range(len(self.vectors))]
+        self.queries = self.vectors[:200] + 0.05 * rng.standard_normal((200, 16)).astype(np.float32)
+
+    def test_exact_search_before_training(self):
+        index = EntityVectorIndex(train_threshold=10_000)
+        index.add(self.ids[:100], self.vectors[:100])
+
+        self.assertFalse(index.is_trained)
+        results = index.search(self.queries[:50], k=3)
+        self.assertEqual([r[0][0] for r in results], self.ids[:50])
+        self.assertTrue(all(r[0][1] >= r[1][1] >= r[2][1] for r in results))
+
+    def test_incremental_inserts_train_ivf_and_keep_recall(self):
+        index = EntityVectorIndex(train_threshold=1000, n_probe=8)
+        for start in range(0, len(self.ids), 500):
+            index.add(self.ids[start:start + 500], self.vectors[start:start + 500])
+
+        self.assertTrue(index.is_trained)
+        self.assertEqual(len(index), 3000)
+        found = [r[0][0] for r in index.search(self.queries, k=1)]
+        recall = np.mean([f == expected for f, expected in zip(found, self.ids[:200])])
+        self.assertGreaterEqual(recall, 0.9)
+
+    def test_add_existing_id_updates_vector(self):
+        index = EntityVectorIndex()
+        index.add(["a", "b"], np.array([[1.0, 0.0], [0.0, 1.0]]))
+        index.add(["a"], np.array([[0.0, -1.0]]))
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search(np.array([[0.0, -1.0]]), k=1)[0][0][0], "a")
+
+    def test_save_and_load_round_trip(self):
+        index = EntityVectorIndex(train_threshold=1000)
+        index.add(self.ids, self.vectors)
+        path = os.path.join(tempfile.mkdtemp(), "index.npz")
+        index.save(path)
+
+        loaded = EntityVectorIndex.load(path)
+        self.assertEqual(len(loaded), len(index))
+        self.assertTrue(loaded.is_trained)
+        self.assertEqual(loaded.search(self.queries[:20], k=2), index.search(self.queries[:20], k=2))
+
+        loaded.add(["new_entity"], self.queries[:1] * -1)
+        self.assertEqual(loaded.search(self.queries[:1] * -1, k=1)[0][0][0], "new_entity")
+
+    def test_dimension_mismatch_raises(self):
+        index = EntityVectorIndex(dim=4)
+        with self.assertRaises(ValueError):
+            index.add(["x"], np.ones((1, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()